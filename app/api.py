@@ -5,6 +5,7 @@ from app.person.router import router as person_router, router_referrers as refer
 from app.users.router import router as users_router
 from app.contracts.router import router as contract_router
 from app.loan_payments.router import router as loan_payments_router
+from app.receipts.router import router as receipts_router
 
 from app.email_config.router import router as email_router
 from app.company.router import router as company_router
@@ -28,6 +29,7 @@ def register_routers(app: FastAPI) -> None:
     app.include_router(referrer_router)
     app.include_router(contract_router)
     app.include_router(loan_payments_router)
+    app.include_router(receipts_router)
 
     app.include_router(email_router)
     app.include_router(company_router)
@@ -1 +1,200 @@
+"""
+Comandos administrativos de ynterx API.
+
+Uso:
+    python -m app.cli generate-contracts contratos.ndjson --user-id <uuid>
+    python -m app.cli regenerate-receipts --workers 4 --checkpoint recibos.checkpoint.json
+    python -m app.cli import-statement extracto.csv --chunk-size 200
+"""
 # TODO: Agregar un comando para crear usuarios
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+import asyncpg
+import typer
+
+from app.config import settings
+
+cli = typer.Typer(help="Comandos administrativos de ynterx API", no_args_is_help=True)
+
+
+@cli.callback()
+def main() -> None:
+    """Comandos administrativos de ynterx API"""
+
+
+def _emit(event: dict, output) -> None:
+    output.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+    output.flush()
+
+
+async def _create_db_pool() -> asyncpg.Pool:
+    """Pool asyncpg equivalente al creado en el lifespan de la aplicación"""
+    return await asyncpg.create_pool(
+        dsn=str(settings.DATABASE_URL),
+        max_size=settings.DATABASE_POOL_SIZE,
+        server_settings={"application_name": "ynterxal API CLI"},
+        command_timeout=60,
+    )
+
+
+def _app_context(db_pool: asyncpg.Pool) -> SimpleNamespace:
+    """Objeto con la forma de Request que esperan los servicios (request.app.state.db_pool)"""
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db_pool=db_pool)))
+
+
+@cli.command("generate-contracts")
+def generate_contracts(
+    source: str = typer.Argument(..., help="Archivo JSON (lista) o NDJSON con payloads de contrato; '-' para stdin"),
+    user_id: str = typer.Option(..., "--user-id", help="UUID del usuario que figura como creador de los contratos"),
+    persist_limit: int = typer.Option(4, help="Contratos registrándose en BD a la vez"),
+    render_limit: int = typer.Option(2, help="Documentos renderizándose a la vez"),
+    upload_limit: int = typer.Option(4, help="Documentos subiéndose a la vez"),
+    output: Optional[Path] = typer.Option(None, help="Archivo NDJSON de resultados (por defecto stdout)"),
+) -> None:
+    """Generar contratos en lote con el mismo pipeline que POST /contracts/generate-batch"""
+    raw = sys.stdin.read() if source == "-" else Path(source).read_text(encoding="utf-8")
+    content_type = "application/x-ndjson" if source.endswith((".ndjson", ".jsonl")) else None
+    asyncio.run(_generate_contracts(raw, content_type, user_id, persist_limit, render_limit, upload_limit, output))
+
+
+async def _generate_contracts(
+    raw: str,
+    content_type: Optional[str],
+    user_id: str,
+    persist_limit: int,
+    render_limit: int,
+    upload_limit: int,
+    output_path: Optional[Path],
+) -> None:
+    from app.contracts.contract_creation_service import ContractCreationService
+    from app.contracts.participant_service import ParticipantService
+    from app.contracts.router import get_contract_service
+    from app.contracts.services.contract_batch_service import (
+        BatchStageLimits,
+        ContractBatchService,
+        parse_contract_batch,
+    )
+
+    db_pool = await _create_db_pool()
+    output = output_path.open("w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        batch_service = ContractBatchService(
+            get_contract_service(),
+            ParticipantService(),
+            ContractCreationService(),
+            limits=BatchStageLimits(persist=persist_limit, render=render_limit, upload=upload_limit),
+        )
+        async for event in batch_service.run(parse_contract_batch(raw, content_type), _app_context(db_pool), user_id):
+            _emit(event, output)
+            if event["event"] == "summary":
+                typer.echo(
+                    f"{event['succeeded']}/{event['total']} contratos generados en "
+                    f"{event['elapsed_seconds']}s ({event['contracts_per_second']} contratos/s)",
+                    err=True,
+                )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        await db_pool.close()
+
+
+@cli.command("regenerate-receipts")
+def regenerate_receipts(
+    checkpoint: Path = typer.Option(Path("receipts_checkpoint.json"), help="Archivo de checkpoint para reanudar"),
+    restart: bool = typer.Option(False, "--restart", help="Ignorar el checkpoint y empezar desde la primera transacción"),
+    workers: int = typer.Option(os.cpu_count() or 2, help="Procesos dibujando recibos"),
+    window: int = typer.Option(0, help="Recibos en vuelo como máximo (0 = 2 por worker)"),
+    batch_size: int = typer.Option(500, help="Transacciones leídas de la BD por consulta"),
+    contract_loan_id: Optional[int] = typer.Option(None, help="Solo las transacciones de este préstamo"),
+    limit: Optional[int] = typer.Option(None, help="Número máximo de transacciones en esta ejecución"),
+    update_urls: bool = typer.Option(True, help="Guardar la nueva URL en url_payment_receipt"),
+    output: Optional[Path] = typer.Option(None, help="Archivo NDJSON de resultados (por defecto stdout)"),
+) -> None:
+    """Regenerar los recibos de las transacciones de pago históricas"""
+    from app.receipts.receipt_regeneration import ReceiptCheckpoint, RegenerationOptions
+
+    receipt_checkpoint = ReceiptCheckpoint(checkpoint)
+    if restart:
+        receipt_checkpoint.clear()
+    options = RegenerationOptions(
+        workers=workers,
+        window=window,
+        batch_size=batch_size,
+        update_urls=update_urls,
+        contract_loan_id=contract_loan_id,
+        limit=limit,
+    )
+    asyncio.run(_regenerate_receipts(receipt_checkpoint, options, output))
+
+
+async def _regenerate_receipts(receipt_checkpoint, options, output_path: Optional[Path]) -> None:
+    from app.receipts.receipt_regeneration import ReceiptRegenerationService
+
+    db_pool = await _create_db_pool()
+    output = output_path.open("w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        service = ReceiptRegenerationService(db_pool, receipt_checkpoint, options)
+        async for event in service.run():
+            _emit(event, output)
+            if event["event"] == "summary":
+                typer.echo(
+                    f"{event['succeeded']}/{event['processed']} recibos regenerados en "
+                    f"{event['elapsed_seconds']}s ({event['receipts_per_second']} recibos/s); "
+                    f"última transacción {event['last_transaction_id']}",
+                    err=True,
+                )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        await db_pool.close()
+
+
+@cli.command("import-statement")
+def import_statement(
+    source: Path = typer.Argument(..., help="Extracto bancario CSV o NDJSON"),
+    payment_method: str = typer.Option("Transferencia", help="Método de pago si la línea no lo indica"),
+    chunk_size: int = typer.Option(100, help="Líneas por transacción"),
+    concurrency: int = typer.Option(4, help="Conexiones aplicando pagos a la vez"),
+    receipts: bool = typer.Option(True, help="Registrar los recibos en el outbox (se generan después)"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Solo interpretar y asociar las líneas"),
+    output: Optional[Path] = typer.Option(None, help="Archivo NDJSON del informe (por defecto stdout)"),
+) -> None:
+    """Importar los pagos de un extracto bancario, como POST /loan-payments/import-statement"""
+    from app.loan_payments.statement_import import StatementImportService, parse_statement
+    from app.receipts.receipt_service import ReceiptService
+
+    lines = parse_statement(source.read_bytes(), filename=source.name)
+    service = StatementImportService(
+        ReceiptService(),
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+        payment_method=payment_method,
+        receipts=receipts,
+    )
+    report = asyncio.run(service.run(lines, dry_run=dry_run))
+
+    out = output.open("w", encoding="utf-8") if output else sys.stdout
+    try:
+        for line in report.pop("lines"):
+            _emit({"event": "line", **line}, out)
+        _emit({"event": "summary", **report}, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    totals = report["totals"]
+    typer.echo(
+        f"{totals['applied']}/{report['total_lines']} líneas aplicadas ({report['applied_amount']}), "
+        f"{totals['unmatched']} sin asociar, {totals['failed']} fallidas en {report['elapsed_seconds']}s "
+        f"({report['lines_per_minute']} líneas/min)",
+        err=True,
+    )
+
+
+if __name__ == "__main__":
+    cli()
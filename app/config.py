@@ -61,6 +61,57 @@ class Config(CustomBaseSettings):
     # Contract storage configuration
     CONTRACTS_DIR: str = "contracts"
 
+    # Almacenamiento de documentos: "local", "drive" o "s3" (vacío: según USE_GOOGLE_DRIVE)
+    DOCUMENT_STORE_BACKEND: str | None = None
+    # Raíz del backend local (vacío: app/generated_contracts)
+    DOCUMENT_STORE_LOCAL_DIR: str | None = None
+    S3_ENDPOINT_URL: str | None = None
+    S3_BUCKET: str = "contracts"
+    S3_ACCESS_KEY: str | None = None
+    S3_SECRET_KEY: str | None = None
+    S3_REGION: str = "us-east-1"
+
+    # Outbox de subidas al almacenamiento de documentos (procesadas en segundo plano)
+    UPLOAD_OUTBOX_ENABLED: bool = True
+    UPLOAD_OUTBOX_CONCURRENCY: int = 4
+    UPLOAD_OUTBOX_MAX_ATTEMPTS: int = 8
+    UPLOAD_OUTBOX_POLL_SECONDS: float = 5.0
+    UPLOAD_OUTBOX_BACKOFF_SECONDS: float = 5.0
+    UPLOAD_OUTBOX_MAX_BACKOFF_SECONDS: float = 15 * 60
+    UPLOAD_OUTBOX_TIMEOUT_SECONDS: float = 120.0
+
+    # Cache de /contracts/{id}/detail (invalidado por LISTEN contract_changed)
+    CONTRACT_DETAIL_CACHE_ENABLED: bool = True
+    CONTRACT_DETAIL_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Cache de /loan-payments/schedule por contrato (mismo LISTEN contract_changed)
+    PAYMENT_SCHEDULE_CACHE_ENABLED: bool = True
+    PAYMENT_SCHEDULE_CACHE_MAX_ENTRIES: int = 2000
+
+    # KPIs precalculados (/contracts/kpis): reconstrucción periódica completa
+    CONTRACT_KPI_ENABLED: bool = True
+    CONTRACT_KPI_REFRESH_SECONDS: float = 15 * 60
+
+    # Morosidad de cuotas (overdue y aging_bucket): job periódico en el proceso.
+    # Desactivado hasta confirmar que sp_register_payment_transaction aplica pagos a cuotas 'overdue'
+    PAYMENT_AGING_ENABLED: bool = False
+    PAYMENT_AGING_INTERVAL_SECONDS: float = 60 * 60
+
+    # Render de recibos en hilos propios (fuera del event loop)
+    RECEIPT_RENDER_WORKERS: int = 2
+    RECEIPT_RENDER_MAX_PENDING: int = 16
+    RECEIPT_RENDER_TIMEOUT_SECONDS: float = 10.0
+
+    # URLs firmadas de descarga de recibos (receipt_mode=signed_url); sin secreto propio se usa JWT_SECRET_KEY
+    RECEIPT_URL_SECRET: str | None = None
+    RECEIPT_URL_TTL_SECONDS: int = 10 * 60
+    # Modo de entrega del recibo si la petición no indica receipt_mode (ver ReceiptMode)
+    RECEIPT_DEFAULT_MODE: str = "deferred"
+
+    # Idempotency-Key en endpoints de pago: vida de las respuestas guardadas y espera máxima por el lock
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 60 * 60
+    IDEMPOTENCY_LOCK_TIMEOUT_SECONDS: float = 30.0
+
     # JWT Configuration
     JWT_SECRET_KEY: str = "your-super-secret-jwt-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
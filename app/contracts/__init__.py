@@ -104,10 +104,11 @@ from .validators import (
 
 # Importación condicional de Google Drive
 try:
-    from .gdrive_service import GoogleDriveService
+    from .gdrive_service import GoogleDriveService, get_shared_drive_service
     GOOGLE_DRIVE_AVAILABLE = True
 except ImportError:
     GoogleDriveService = None
+    get_shared_drive_service = None
     GOOGLE_DRIVE_AVAILABLE = False
 
 __version__ = "3.0.0"
@@ -173,6 +174,7 @@ __all__ = [
 
     # Google Drive (si está disponible)
     "GoogleDriveService",
+    "get_shared_drive_service",
     "GOOGLE_DRIVE_AVAILABLE",
 
     # Metadatos
@@ -12,7 +12,12 @@ from app.contracts.models import (
     contract_bank_account as contract_bank_account_table,
 )
 from app.contracts.participant_service import ParticipantService
-from fastapi import Request
+from app.contracts.services.drive_folder_cache import DriveFolders, drive_folder_cache
+from app.contracts.loan_property_service import ContractLoanPropertyService
+from app.contracts.schemas import ContractResponse
+from app.uploads.models import UPLOAD_CONTRACT_DOCUMENT
+from app.uploads.outbox import enqueue_upload
+from fastapi import HTTPException, Request, status
 
 # person_type_id: 1 = client, 2 = investor
 _COMPANY_ROLES = [("client_company", 1), ("investor_company", 2)]
@@ -306,6 +311,172 @@ class ContractCreationService:
 
         return client_referrer_created, client_referrer_errors
 
+    async def persist_contract_payload(
+        self,
+        data: Dict[str, Any],
+        db,
+        request: Request,
+        current_user: str,
+        participant_service: ParticipantService,
+    ) -> Dict[str, Any]:
+        """
+        Registrar participantes, contrato, préstamo y propiedades de un payload completo.
+
+        Lanza HTTPException 400 si fallan los participantes o el préstamo/propiedades
+        (en ese caso el contrato ya creado se elimina en cascada).
+        """
+        participants_for_contract, participant_errors, processed_persons_summary = await participant_service.process_all_participants(data, request)
+
+        if participant_errors:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "message": "No se puede generar el contrato: hay errores en el procesamiento de participantes. Corrija los datos e intente de nuevo.",
+                    "errors": participant_errors,
+                    "summary": processed_persons_summary
+                }
+            )
+
+        contract_type_name = "CNT"
+        contract_number = await self.generate_contract_number(contract_type_name, db)
+
+        contract_id = await self.create_contract_record(data, contract_number, db, current_user)
+        await self.register_contract_participants(contract_id, participants_for_contract, db)
+        await self.create_client_referrer_relationships(participants_for_contract, db)
+
+        loan_property_result = None
+        loan_property_errors = []
+
+        if data.get("loan") or data.get("properties"):
+            try:
+                loan_property_result = await ContractLoanPropertyService.create_contract_loan_and_properties(
+                    contract_id=contract_id,
+                    loan_data=data.get("loan"),
+                    properties_data=data.get("properties", []),
+                    connection=db,
+                    contract_context=data
+                )
+
+                if not loan_property_result["overall_success"]:
+                    if loan_property_result.get("loan_result") and not loan_property_result["loan_result"].get("success"):
+                        loan_property_errors.append({
+                            "type": "loan",
+                            "error": loan_property_result["loan_result"].get("message", "Error desconocido en loan")
+                        })
+
+                    if loan_property_result.get("bank_account_result") and not loan_property_result["bank_account_result"].get("success"):
+                        loan_property_errors.append({
+                            "type": "bank_account",
+                            "error": loan_property_result["bank_account_result"].get("message", "Error desconocido en bank account")
+                        })
+
+                    if loan_property_result.get("properties_result") and not loan_property_result["properties_result"].get("success"):
+                        loan_property_errors.append({
+                            "type": "properties",
+                            "error": loan_property_result["properties_result"].get("message", "Error desconocido en properties")
+                        })
+
+            except Exception as e:
+                loan_property_errors.append({
+                    "type": "general",
+                    "error": f"Error general procesando loan/properties: {str(e)}"
+                })
+                loan_property_result = {
+                    "overall_success": False,
+                    "message": f"Error general: {str(e)}"
+                }
+
+        # Si falló loan o propiedades, no generar contrato: limpiar transacción abortada, borrar contrato y devolver error
+        if loan_property_result is not None and not loan_property_result.get("overall_success", True):
+            try:
+                await db.rollback()
+            except Exception:
+                pass
+            await self.delete_contract_cascade(contract_id, db)
+            detail = {
+                "message": "No se puede generar el contrato: hay errores en préstamo o propiedades. Corrija los datos e intente de nuevo.",
+                "errors": loan_property_errors,
+            }
+            if loan_property_result.get("properties_result") and loan_property_result["properties_result"].get("errors"):
+                detail["properties_errors"] = loan_property_result["properties_result"]["errors"]
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=detail,
+            )
+
+        return {
+            "contract_id": contract_id,
+            "contract_number": contract_number,
+            "participants_for_contract": participants_for_contract,
+            "participant_errors": participant_errors,
+            "processed_persons_summary": processed_persons_summary,
+            "loan_property_result": loan_property_result,
+        }
+
+    def build_generation_payload(self, data: Dict[str, Any], persisted: Dict[str, Any]) -> Dict[str, Any]:
+        """Datos de entrada para el generador de documentos una vez registrado el contrato"""
+        enhanced_data = data.copy()
+        enhanced_data.update({
+            "contract_id": str(persisted["contract_id"]),
+            "contract_number": persisted["contract_number"],
+            "generated_at": datetime.now().isoformat(),
+            "loan_property_result": persisted["loan_property_result"]
+        })
+        return enhanced_data
+
+    def build_contract_response(
+        self,
+        data: Dict[str, Any],
+        persisted: Dict[str, Any],
+        document_result: Dict[str, Any],
+    ) -> ContractResponse:
+        """Construir la respuesta de /generate-complete a partir del registro y del documento"""
+        contract_number = persisted["contract_number"]
+        participant_errors = persisted["participant_errors"]
+        processed_persons_summary = persisted["processed_persons_summary"]
+
+        file_path = document_result.get("path", "")
+        folder_path = document_result.get("folder_path", "")
+
+        if document_result.get("drive_success") and document_result.get("drive_link"):
+            file_path = document_result.get("drive_view_link", file_path)
+            folder_path = document_result.get("drive_link", folder_path)
+
+        return ContractResponse(
+            success=True,
+            message="Contrato completo generado exitosamente",
+            contract_id=str(persisted["contract_id"]),
+            contract_number=contract_number,
+            filename=document_result.get("filename", f"{contract_number}.docx"),
+            path=file_path,
+            folder_path=folder_path,
+            processed_data={
+                "persons_summary": processed_persons_summary,
+                "participants_count": len(persisted["participants_for_contract"]),
+                "contract_type": data.get("contract_type", "unknown"),
+                "loan_amount": data.get("loan", {}).get("amount"),
+                "properties_count": len(data.get("properties", [])),
+                "persons_detail": {
+                    "new_persons": processed_persons_summary['successful'] - processed_persons_summary['existing'] - processed_persons_summary['reused'],
+                    "existing_persons": processed_persons_summary['existing'],
+                    "reused_persons": processed_persons_summary['reused'],
+                    "total_successful": processed_persons_summary['successful']
+                }
+            },
+            drive_success=document_result.get("drive_success"),
+            drive_folder_id=document_result.get("drive_folder_id"),
+            drive_file_id=document_result.get("drive_file_id"),
+            drive_link=document_result.get("drive_link"),
+            drive_view_link=document_result.get("drive_view_link"),
+            storage_type=document_result.get("storage_type"),
+            document_status=document_result.get("document_status"),
+            document_upload_id=document_result.get("document_upload_id"),
+            warnings={
+                "person_errors": participant_errors,
+                "message": f"Se procesaron {processed_persons_summary['successful']} personas exitosamente ({processed_persons_summary['reused']} reutilizadas), {processed_persons_summary['errors']} errores reales"
+            } if participant_errors else None
+        )
+
     async def delete_contract_cascade(self, contract_id: str | UUID, db) -> None:
         """
         Elimina el contrato y, por CASCADE en BD, sus participantes, loan y propiedades.
@@ -318,6 +489,26 @@ class ContractCreationService:
             commit_after=True,
         )
 
+    async def enqueue_document_upload(self, contract_id: str, rendered: Dict[str, Any], backend: str, db) -> int:
+        """
+        Registrar en el outbox la subida del documento renderizado al backend indicado.
+
+        Se confirma junto con update_contract_with_document_info; el despachador
+        guarda file_path y folder_path cuando termina.
+        """
+        return await enqueue_upload(
+            db,
+            UPLOAD_CONTRACT_DOCUMENT,
+            rendered["doc_content"],
+            f"{rendered['contract_id']}.docx",
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            {
+                "contract_id": str(contract_id),
+                "document_id": rendered["contract_id"],
+                "backend": backend,
+            },
+        )
+
     async def update_contract_with_document_info(
         self,
         contract_id: str,
@@ -353,6 +544,19 @@ class ContractCreationService:
             await db.execute(update_query)
             await db.commit()
 
+            # Recordar las carpetas de Drive para las subidas de vouchers y recibos
+            if document_result.get("drive_success") and document_result.get("drive_folder_id"):
+                await drive_folder_cache.save(DriveFolders(
+                    contract_id=contract_id_str,
+                    folder_path=folder_path,
+                    contract_folder_id=document_result["drive_folder_id"],
+                    attachments_folder_id=document_result.get("drive_attachments_folder_id"),
+                    payments_folder_id=document_result.get("drive_payments_folder_id"),
+                    folder_name=document_result.get("contract_id"),
+                ))
+            else:
+                drive_folder_cache.invalidate(contract_id_str)
+
     async def update_contract_data_in_db(
         self,
         contract_id: str,
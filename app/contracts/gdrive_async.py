@@ -0,0 +1,318 @@
+# gdrive_async.py
+"""
+Transporte asíncrono para Google Drive (API REST v3 sobre httpx).
+
+Comparte un pool de conexiones HTTP entre todas las peticiones, limita el número
+de subidas simultáneas y agrupa llamadas independientes en peticiones batch.
+"""
+import asyncio
+import json
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+
+DRIVE_API_URL = "https://www.googleapis.com"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+# Tamaño de trozo para subidas reanudables (Drive exige múltiplos de 256 KB)
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Drive acepta como máximo 100 llamadas por batch
+MAX_BATCH_SIZE = 100
+
+FILE_FIELDS = "id,webViewLink,webContentLink"
+
+# Campos para stat/descarga de un archivo existente
+FILE_STAT_FIELDS = "id,name,mimeType,size,md5Checksum,modifiedTime,webViewLink,webContentLink"
+
+# Tamaño de trozo para descargas en streaming
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# (método, ruta, parámetros de query, cuerpo JSON)
+BatchCall = Tuple[str, str, Optional[Dict[str, str]], Optional[Dict[str, Any]]]
+
+
+class DriveAPIError(Exception):
+    """Respuesta de error de la API de Google Drive"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Drive API error {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class AsyncDriveClient:
+    """Cliente asíncrono de Google Drive con pool de conexiones y subidas concurrentes acotadas"""
+
+    def __init__(
+        self,
+        token_provider: Callable[[], Awaitable[str]],
+        base_url: str = DRIVE_API_URL,
+        max_connections: int = 20,
+        upload_concurrency: int = 4,
+        timeout: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self._token_provider = token_provider
+        self._upload_semaphore = asyncio.Semaphore(max(1, upload_concurrency))
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> httpx.Response:
+        token = await self._token_provider()
+        response = await self._client.request(
+            method, url, headers={"Authorization": f"Bearer {token}", **(headers or {})}, **kwargs
+        )
+        if response.status_code >= 400:
+            raise DriveAPIError(response.status_code, response.text)
+        return response
+
+    async def create_folder(self, name: str, parent_id: str) -> str:
+        """Crear una carpeta y devolver su id"""
+        response = await self._request(
+            "POST",
+            "/drive/v3/files",
+            params={"fields": "id", "supportsAllDrives": "true"},
+            json={"name": name, "mimeType": FOLDER_MIME_TYPE, "parents": [parent_id]},
+        )
+        return response.json()["id"]
+
+    async def find_child(
+        self, name: str, parent_id: str, folder: Optional[bool] = None, fields: str = FILE_STAT_FIELDS
+    ) -> Optional[Dict[str, Any]]:
+        """Buscar por nombre un archivo (o carpeta) hijo de parent_id; None si no existe"""
+        escaped = name.replace("\\", "\\\\").replace("'", "\\'")
+        query = f"name='{escaped}' and '{parent_id}' in parents and trashed=false"
+        if folder is True:
+            query += f" and mimeType='{FOLDER_MIME_TYPE}'"
+        elif folder is False:
+            query += f" and mimeType!='{FOLDER_MIME_TYPE}'"
+        response = await self._request(
+            "GET",
+            "/drive/v3/files",
+            params={
+                "q": query,
+                "fields": f"files({fields})",
+                "pageSize": "1",
+                "supportsAllDrives": "true",
+                "includeItemsFromAllDrives": "true",
+            },
+        )
+        files = response.json().get("files", [])
+        return files[0] if files else None
+
+    async def get_file(self, file_id: str, fields: str = FILE_STAT_FIELDS) -> Dict[str, Any]:
+        """Metadatos de un archivo por id"""
+        response = await self._request(
+            "GET", f"/drive/v3/files/{file_id}", params={"fields": fields, "supportsAllDrives": "true"}
+        )
+        return response.json()
+
+    async def download(
+        self, file_id: str, start: int = 0, end: Optional[int] = None, chunk_size: int = DOWNLOAD_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        Descargar el contenido de un archivo en trozos, sin cargarlo entero en memoria.
+
+        start/end (inclusivo) se envían como cabecera Range.
+        """
+        headers = {"Authorization": f"Bearer {await self._token_provider()}"}
+        if start or end is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        async with self._client.stream(
+            "GET",
+            f"/drive/v3/files/{file_id}",
+            params={"alt": "media", "supportsAllDrives": "true"},
+            headers=headers,
+        ) as response:
+            if response.status_code >= 400:
+                raise DriveAPIError(response.status_code, (await response.aread()).decode("utf-8", "replace"))
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def create_folders(self, names: Sequence[str], parent_id: str) -> Dict[str, str]:
+        """Crear varias carpetas hermanas en una sola petición batch"""
+        calls: List[BatchCall] = [
+            (
+                "POST",
+                "/drive/v3/files",
+                {"fields": "id", "supportsAllDrives": "true"},
+                {"name": name, "mimeType": FOLDER_MIME_TYPE, "parents": [parent_id]},
+            )
+            for name in names
+        ]
+        results = await self.batch(calls)
+        folder_ids = {}
+        for name, (status_code, body) in zip(names, results, strict=True):
+            if status_code >= 400:
+                raise DriveAPIError(status_code, json.dumps(body))
+            folder_ids[name] = body["id"]
+        return folder_ids
+
+    async def create_permissions(self, file_ids: Sequence[str], permission: Dict[str, Any]) -> None:
+        """Aplicar el mismo permiso a varios archivos/carpetas en una petición batch"""
+        calls: List[BatchCall] = [
+            ("POST", f"/drive/v3/files/{file_id}/permissions", {"supportsAllDrives": "true"}, permission)
+            for file_id in file_ids
+        ]
+        for status_code, body in await self.batch(calls):
+            if status_code >= 400:
+                raise DriveAPIError(status_code, json.dumps(body))
+
+    async def batch(self, calls: Sequence[BatchCall]) -> List[Tuple[int, Any]]:
+        """
+        Ejecutar llamadas independientes en peticiones batch (multipart/mixed).
+
+        Devuelve (status, cuerpo JSON) de cada llamada, en el mismo orden.
+        """
+        results: List[Tuple[int, Any]] = []
+        for start in range(0, len(calls), MAX_BATCH_SIZE):
+            chunk = calls[start:start + MAX_BATCH_SIZE]
+            boundary = f"batch_{uuid.uuid4().hex}"
+            response = await self._request(
+                "POST",
+                "/batch/drive/v3",
+                headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+                content=_encode_batch(chunk, boundary),
+            )
+            results.extend(_decode_batch(response, len(chunk)))
+        return results
+
+    async def upload_bytes(
+        self,
+        content: Union[bytes, bytearray, memoryview],
+        parent_id: str,
+        name: str,
+        mime_type: str,
+        fields: str = FILE_FIELDS,
+    ) -> Dict[str, Any]:
+        """
+        Subir un buffer en memoria respetando el límite de subidas simultáneas.
+
+        Los buffers mayores que UPLOAD_CHUNK_SIZE usan subida reanudable por trozos;
+        los menores van en una sola petición multipart.
+        """
+        view = memoryview(content).cast("B")
+        metadata = {"name": name, "parents": [parent_id]}
+        async with self._upload_semaphore:
+            if view.nbytes > UPLOAD_CHUNK_SIZE:
+                return await self._upload_resumable(view, metadata, mime_type, fields)
+            return await self._upload_multipart(view, metadata, mime_type, fields)
+
+    async def update_bytes(
+        self,
+        content: Union[bytes, bytearray, memoryview],
+        file_id: str,
+        mime_type: str,
+        fields: str = FILE_FIELDS,
+    ) -> Dict[str, Any]:
+        """Reemplazar el contenido de un archivo existente (misma id y enlaces)"""
+        view = memoryview(content).cast("B")
+        async with self._upload_semaphore:
+            response = await self._request(
+                "PATCH",
+                f"/upload/drive/v3/files/{file_id}",
+                params={"uploadType": "media", "fields": fields, "supportsAllDrives": "true"},
+                headers={"Content-Type": mime_type},
+                content=view.tobytes(),
+            )
+        return response.json()
+
+    async def _upload_multipart(self, view: memoryview, metadata: Dict[str, Any], mime_type: str, fields: str) -> Dict[str, Any]:
+        boundary = f"upload_{uuid.uuid4().hex}"
+        body = b"".join([
+            f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n".encode(),
+            json.dumps(metadata).encode(),
+            f"\r\n--{boundary}\r\nContent-Type: {mime_type}\r\n\r\n".encode(),
+            view,
+            f"\r\n--{boundary}--".encode(),
+        ])
+        response = await self._request(
+            "POST",
+            "/upload/drive/v3/files",
+            params={"uploadType": "multipart", "fields": fields, "supportsAllDrives": "true"},
+            headers={"Content-Type": f"multipart/related; boundary={boundary}"},
+            content=body,
+        )
+        return response.json()
+
+    async def _upload_resumable(self, view: memoryview, metadata: Dict[str, Any], mime_type: str, fields: str) -> Dict[str, Any]:
+        total = view.nbytes
+        session = await self._request(
+            "POST",
+            "/upload/drive/v3/files",
+            params={"uploadType": "resumable", "fields": fields, "supportsAllDrives": "true"},
+            headers={"X-Upload-Content-Type": mime_type, "X-Upload-Content-Length": str(total)},
+            json=metadata,
+        )
+        location = session.headers["Location"]
+
+        offset = 0
+        while True:
+            end = min(offset + UPLOAD_CHUNK_SIZE, total)
+            response = await self._request(
+                "PUT",
+                location,
+                headers={"Content-Range": f"bytes {offset}-{end - 1}/{total}"},
+                content=view[offset:end].tobytes(),
+            )
+            if response.status_code != 308:
+                return response.json()
+            # Drive indica en Range hasta qué byte ha recibido
+            received = response.headers.get("Range")
+            offset = int(received.rsplit("-", 1)[1]) + 1 if received else 0
+
+
+def _encode_batch(calls: Sequence[BatchCall], boundary: str) -> bytes:
+    parts = []
+    for index, (method, path, params, body) in enumerate(calls):
+        url = str(httpx.URL(path, params=params or {}))
+        payload = json.dumps(body) if body is not None else ""
+        parts.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <item-{index}>\r\n\r\n"
+            f"{method} {url} HTTP/1.1\r\n"
+            "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{payload}\r\n"
+        )
+    parts.append(f"--{boundary}--")
+    return "".join(parts).encode("utf-8")
+
+
+def _decode_batch(response: httpx.Response, expected: int) -> List[Tuple[int, Any]]:
+    content_type = response.headers.get("Content-Type", "")
+    boundary = content_type.split("boundary=", 1)[1].strip('"') if "boundary=" in content_type else None
+    if not boundary:
+        raise DriveAPIError(response.status_code, "Respuesta batch sin boundary")
+
+    results: List[Optional[Tuple[int, Any]]] = [None] * expected
+    for part in response.text.split(f"--{boundary}"):
+        part = part.strip()
+        if not part or part == "--":
+            continue
+        part_headers, _, http_response = part.replace("\r\n", "\n").partition("\n\n")
+        index = None
+        for line in part_headers.split("\n"):
+            key, _, value = line.partition(":")
+            if key.strip().lower() == "content-id":
+                index = int(value.strip().strip("<>").rsplit("-", 1)[1])
+        status_line, _, rest = http_response.partition("\n")
+        _, _, body = rest.partition("\n\n")
+        status_code = int(status_line.split()[1])
+        try:
+            parsed = json.loads(body) if body.strip() else None
+        except json.JSONDecodeError:
+            parsed = body
+        if index is not None and 0 <= index < expected:
+            results[index] = (status_code, parsed)
+
+    return [result if result is not None else (500, {"error": "Respuesta batch incompleta"}) for result in results]
@@ -1,18 +1,72 @@
 # gdrive_service.py
+import asyncio
+import io
 import os
 import json
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 from fastapi import HTTPException
 
+from app.contracts.gdrive_async import DRIVE_API_URL, FILE_FIELDS, UPLOAD_CHUNK_SIZE, AsyncDriveClient
+
 try:
     from google.oauth2.service_account import Credentials
     from googleapiclient.discovery import build
-    from googleapiclient.http import MediaFileUpload
+    from googleapiclient.http import HttpRequest, MediaFileUpload, MediaIoBaseUpload
+    import google_auth_httplib2
+    import httplib2
     GOOGLE_AVAILABLE = True
 except ImportError:
     GOOGLE_AVAILABLE = False
 
+FileContent = Union[bytes, bytearray, memoryview]
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Stream de solo lectura sobre un buffer en memoria, sin copiarlo completo"""
+
+    def __init__(self, content: FileContent):
+        self._view = memoryview(content).cast('B')
+        self._position = 0
+
+    @property
+    def size(self) -> int:
+        return self._view.nbytes
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        self._position = max(0, position)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def read(self, size: int = -1) -> bytes:
+        end = self.size if size is None or size < 0 else min(self.size, self._position + size)
+        chunk = self._view[self._position:end].tobytes()
+        self._position = max(self._position, end)
+        return chunk
+
 
 class GoogleDriveService:
     """Servicio para interactuar con Google Drive"""
@@ -43,20 +97,74 @@ class GoogleDriveService:
             self.main_folder_id = self._create_main_folder()
 
     def _authenticate(self):
-        """Autenticar con Google Drive API - VERSIÓN CORREGIDA"""
+        """Autenticar con Google Drive API"""
         try:
             scopes = ['https://www.googleapis.com/auth/drive']
-            credentials = Credentials.from_service_account_file(
+            self._credentials = Credentials.from_service_account_file(
                 self.credentials_path, scopes=scopes
             )
-            
-            # SOLUCIÓN: Usar solo credentials, sin el parámetro http
-            # Esta es la forma correcta y más limpia
-            self.service = build('drive', 'v3', credentials=credentials)
+            self._refresh_lock = threading.Lock()
+            self._local = threading.local()
+
+            # httplib2.Http no es thread-safe: cada hilo usa su propia conexión autorizada,
+            # mientras que las credenciales y el documento de discovery (estático) se comparten
+            self.service = build(
+                'drive', 'v3',
+                http=self._thread_http(),
+                requestBuilder=self._build_request,
+                static_discovery=True,
+            )
 
         except Exception as e:
             raise HTTPException(500, f"Error authenticating with Google Drive: {str(e)}")
 
+    def _refresh_credentials(self) -> None:
+        """Renovar el token de acceso si expiró (una sola renovación a la vez)"""
+        with self._refresh_lock:
+            if not self._credentials.valid:
+                self._credentials.refresh(google_auth_httplib2.Request(httplib2.Http()))
+
+    async def get_access_token(self) -> str:
+        """Token de acceso vigente para el transporte asíncrono"""
+        if not self._credentials.valid:
+            await asyncio.to_thread(self._refresh_credentials)
+        return self._credentials.token
+
+    def async_client(self) -> AsyncDriveClient:
+        """Cliente asíncrono compartido (pool de conexiones) del event loop actual"""
+        loop = asyncio.get_running_loop()
+        client = getattr(self, '_async_client', None)
+        if client is None or self._async_loop is not loop:
+            client = AsyncDriveClient(
+                self.get_access_token,
+                base_url=os.getenv("GOOGLE_DRIVE_API_URL", DRIVE_API_URL),
+                upload_concurrency=int(os.getenv("GOOGLE_DRIVE_UPLOAD_CONCURRENCY", "4")),
+            )
+            self._async_client = client
+            self._async_loop = loop
+        return client
+
+    async def aclose(self) -> None:
+        """Cerrar el pool de conexiones del cliente asíncrono"""
+        client = getattr(self, '_async_client', None)
+        if client is not None:
+            self._async_client = None
+            await client.aclose()
+
+    def _thread_http(self):
+        """Conexión HTTP autorizada del hilo actual, con el token renovado si expiró"""
+        self._refresh_credentials()
+
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(self._credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    def _build_request(self, http, *args, **kwargs):
+        """requestBuilder que ejecuta cada petición con la conexión del hilo que la crea"""
+        return HttpRequest(self._thread_http(), *args, **kwargs)
+
     # EL RESTO DEL CÓDIGO SE MANTIENE IGUAL (sin cambios)
     def _create_main_folder(self) -> str:
         """Crear carpeta principal 'Ynterx_Contracts'"""
@@ -110,105 +218,145 @@ class GoogleDriveService:
         except Exception as e:
             raise HTTPException(500, f"Error creating attachments folder: {str(e)}")
 
+    @staticmethod
+    def _guess_mime_type(file_name: str) -> str:
+        """Determinar tipo MIME a partir de la extensión"""
+        suffix = Path(file_name).suffix.lower()
+        if suffix == '.docx':
+            return 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        elif suffix == '.pdf':
+            return 'application/pdf'
+        elif suffix in ['.jpg', '.jpeg']:
+            return 'image/jpeg'
+        elif suffix == '.png':
+            return 'image/png'
+        elif suffix == '.gif':
+            return 'image/gif'
+        elif suffix == '.json':
+            return 'application/json'
+        return 'application/octet-stream'
+
     def _upload_file(self, file_path: Path, parent_folder_id: str, file_name: Optional[str] = None) -> Dict[str, str]:
-        """Subir archivo a Google Drive"""
+        """Subir archivo del disco a Google Drive"""
         # Convertir a Path si viene como string
         file_path = Path(file_path)
         
         if not file_name:
             file_name = file_path.name
 
+        media = MediaFileUpload(str(file_path), mimetype=self._guess_mime_type(file_path.name))
+        return self._create_file(file_name, parent_folder_id, media)
+
+    def _upload_bytes(
+        self,
+        content: FileContent,
+        parent_folder_id: str,
+        file_name: str,
+        mime_type: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """
+        Subir un buffer en memoria a Google Drive sin pasar por el disco.
+
+        Los buffers mayores que UPLOAD_CHUNK_SIZE se envían como subida reanudable
+        en trozos de ese tamaño; los menores van en una sola petición multipart.
+        """
+        stream = MemoryViewReader(content)
+        media = MediaIoBaseUpload(
+            stream,
+            mimetype=mime_type or self._guess_mime_type(file_name),
+            chunksize=UPLOAD_CHUNK_SIZE,
+            resumable=stream.size > UPLOAD_CHUNK_SIZE,
+        )
+        return self._create_file(file_name, parent_folder_id, media)
+
+    def _create_file(self, file_name: str, parent_folder_id: str, media) -> Dict[str, str]:
+        """Crear el archivo en Drive con el contenido de media y construir sus enlaces"""
         file_metadata = {
             'name': file_name,
             'parents': [parent_folder_id]
         }
 
-        # Determinar tipo MIME
-        if file_path.suffix.lower() == '.docx':
-            mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        elif file_path.suffix.lower() == '.pdf':
-            mime_type = 'application/pdf'
-        elif file_path.suffix.lower() in ['.jpg', '.jpeg']:
-            mime_type = 'image/jpeg'
-        elif file_path.suffix.lower() == '.png':
-            mime_type = 'image/png'
-        else:
-            mime_type = 'application/octet-stream'
-
-        media = MediaFileUpload(str(file_path), mimetype=mime_type)
-
         try:
             file = self.service.files().create(
                 body=file_metadata,
                 media_body=media,
-                fields='id,webViewLink,webContentLink',
+                fields=FILE_FIELDS,
                 supportsAllDrives=True
             ).execute()
 
-            file_id = file.get('id')
-            web_view_link_original = file.get('webViewLink')
-            
-            # Usar el ouid correcto desde variable de entorno
-            ouid = os.getenv("GOOGLE_DRIVE_OWNER_OUID")
-            if not ouid:
-                # Fallback: extraer del webViewLink si no está configurado
-                if web_view_link_original and 'ouid=' in web_view_link_original:
-                    import re
-                    match = re.search(r'ouid=(\d+)', web_view_link_original)
-                    if match:
-                        ouid = match.group(1)
+            return self._build_file_links(file)
+        except Exception as e:
+            raise HTTPException(500, f"Error uploading file to Drive: {str(e)}")
+
+    @staticmethod
+    def _build_file_links(file: Dict[str, Any]) -> Dict[str, str]:
+        """Construir enlaces de visualización/descarga a partir de la respuesta de Drive"""
+        file_id = file.get('id')
+        web_view_link_original = file.get('webViewLink')
+        
+        # Usar el ouid correcto desde variable de entorno
+        ouid = os.getenv("GOOGLE_DRIVE_OWNER_OUID")
+        if not ouid:
+            # Fallback: extraer del webViewLink si no está configurado
+            if web_view_link_original and 'ouid=' in web_view_link_original:
+                import re
+                match = re.search(r'ouid=(\d+)', web_view_link_original)
+                if match:
+                    ouid = match.group(1)
+        
+        # Construir enlace con el ouid correcto
+        if web_view_link_original:
+            # Detectar tipo de archivo y construir URL base
+            if '/document/d/' in web_view_link_original:
+                base_url = f"https://docs.google.com/document/d/{file_id}/edit"
+            elif '/spreadsheets/d/' in web_view_link_original:
+                base_url = f"https://docs.google.com/spreadsheets/d/{file_id}/edit"
+            elif '/presentation/d/' in web_view_link_original:
+                base_url = f"https://docs.google.com/presentation/d/{file_id}/edit"
+            else:
+                base_url = f"https://drive.google.com/file/d/{file_id}/view"
             
-            # Construir enlace con el ouid correcto
-            if web_view_link_original:
-                # Detectar tipo de archivo y construir URL base
-                if '/document/d/' in web_view_link_original:
-                    base_url = f"https://docs.google.com/document/d/{file_id}/edit"
-                elif '/spreadsheets/d/' in web_view_link_original:
-                    base_url = f"https://docs.google.com/spreadsheets/d/{file_id}/edit"
-                elif '/presentation/d/' in web_view_link_original:
-                    base_url = f"https://docs.google.com/presentation/d/{file_id}/edit"
-                else:
-                    base_url = f"https://drive.google.com/file/d/{file_id}/view"
-                
-                # Construir enlace con ouid y parámetros correctos
-                if ouid:
-                    web_view_link = f"{base_url}?usp=drive_link&ouid={ouid}&rtpof=true&sd=true"
-                else:
-                    # Fallback: solo corregir usp=drivesdk
-                    web_view_link = web_view_link_original.replace('usp=drivesdk', 'usp=drive_link')
+            # Construir enlace con ouid y parámetros correctos
+            if ouid:
+                web_view_link = f"{base_url}?usp=drive_link&ouid={ouid}&rtpof=true&sd=true"
             else:
-                web_view_link = f"https://drive.google.com/file/d/{file_id}/view?usp=drive_link"
+                # Fallback: solo corregir usp=drivesdk
+                web_view_link = web_view_link_original.replace('usp=drivesdk', 'usp=drive_link')
+        else:
+            web_view_link = f"https://drive.google.com/file/d/{file_id}/view?usp=drive_link"
 
-            return {
-                'file_id': file_id,
-                'web_view_link': web_view_link,
-                'download_link': file.get('webContentLink')
-            }
-        except Exception as e:
-            raise HTTPException(500, f"Error uploading file to Drive: {str(e)}")
+        return {
+            'file_id': file_id,
+            'web_view_link': web_view_link,
+            'download_link': file.get('webContentLink')
+        }
 
     def _upload_metadata(self, metadata: Dict[str, Any], folder_id: str) -> str:
         """Subir metadatos como archivo JSON"""
-        # Crear archivo temporal
-        temp_file = Path("/tmp/metadata.json")
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
-
+        content = json.dumps(metadata, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+        result = self._upload_bytes(content, folder_id, "metadata.json", mime_type='application/json')
+        return result['file_id']
+
+    def upload_contract(
+        self,
+        contract_id: str,
+        contract: Union[Path, str, FileContent],
+        metadata: Dict[str, Any],
+        attachments_dir: Optional[Path] = None,
+    ) -> Dict[str, Any]:
+        """
+        Subir contrato completo a Google Drive.
+
+        contract puede ser la ruta del .docx o su contenido en memoria (bytes/memoryview).
+        """
         try:
-            result = self._upload_file(temp_file, folder_id, "metadata.json")
-            temp_file.unlink()  # Limpiar archivo temporal
-            return result['file_id']
-        except Exception as e:
-            if temp_file.exists():
-                temp_file.unlink()
-            raise e
+            if isinstance(contract, (str, Path)):
+                contract_path = Path(contract)
+                if attachments_dir is None:
+                    attachments_dir = contract_path.parent / 'attachments'
+            else:
+                contract_path = None
 
-    def upload_contract(self, contract_id: str, contract_path: Path, metadata: Dict[str, Any]) -> Dict[str, Any]:
-        """Subir contrato completo a Google Drive"""
-        try:
-            # Convertir a Path si viene como string
-            contract_path = Path(contract_path)
-            
             # Crear carpeta del contrato
             contract_folder_id = self._create_contract_folder(contract_id)
 
@@ -220,16 +368,18 @@ class GoogleDriveService:
             descriptive_filename = f"{contract_number}.docx"
 
             # Subir archivo del contrato con nombre descriptivo
-            contract_result = self._upload_file(contract_path, contract_folder_id, descriptive_filename)
+            if contract_path is not None:
+                contract_result = self._upload_file(contract_path, contract_folder_id, descriptive_filename)
+            else:
+                contract_result = self._upload_bytes(contract, contract_folder_id, descriptive_filename)
 
             # Subir metadatos
             metadata_file_id = self._upload_metadata(metadata, contract_folder_id)
 
             # Subir archivos de attachments si existen localmente
-            local_attachments_dir = contract_path.parent / 'attachments'
             attachments_uploaded = []
-            if local_attachments_dir.exists() and local_attachments_dir.is_dir():
-                for file in local_attachments_dir.iterdir():
+            if attachments_dir is not None and attachments_dir.exists() and attachments_dir.is_dir():
+                for file in attachments_dir.iterdir():
                     if file.is_file():
                         try:
                             upload_result = self._upload_file(file, attachments_folder_id)
@@ -260,6 +410,80 @@ class GoogleDriveService:
                 "drive_error": str(e)
             }
 
+    async def upload_contract_async(
+        self,
+        contract_id: str,
+        contract: Union[Path, str, FileContent],
+        metadata: Dict[str, Any],
+        attachments_dir: Optional[Path] = None,
+    ) -> Dict[str, Any]:
+        """
+        Subir contrato completo a Google Drive sin bloquear el event loop.
+
+        Tras crear la carpeta del contrato, las subcarpetas (attachments y payments)
+        se crean en una sola petición batch mientras se suben en paralelo el
+        documento y los metadatos; los adjuntos se suben después de forma concurrente.
+        """
+        try:
+            if isinstance(contract, (str, Path)):
+                contract_path = Path(contract)
+                if attachments_dir is None:
+                    attachments_dir = contract_path.parent / 'attachments'
+                contract = await asyncio.to_thread(contract_path.read_bytes)
+
+            client = self.async_client()
+            contract_folder_id = await client.create_folder(contract_id, self.main_folder_id)
+
+            contract_number = contract_id.replace("contract_", "")
+            descriptive_filename = f"{contract_number}.docx"
+            metadata_content = json.dumps(metadata, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+
+            subfolders, contract_file, metadata_file = await asyncio.gather(
+                client.create_folders(['attachments', 'payments'], contract_folder_id),
+                client.upload_bytes(contract, contract_folder_id, descriptive_filename, self._guess_mime_type(descriptive_filename)),
+                client.upload_bytes(metadata_content, contract_folder_id, "metadata.json", 'application/json'),
+            )
+            contract_result = self._build_file_links(contract_file)
+
+            attachments_uploaded = []
+            if attachments_dir is not None and attachments_dir.exists() and attachments_dir.is_dir():
+                files = [file for file in attachments_dir.iterdir() if file.is_file()]
+
+                async def upload_attachment_file(file: Path):
+                    content = await asyncio.to_thread(file.read_bytes)
+                    return await client.upload_bytes(
+                        content, subfolders['attachments'], file.name, self._guess_mime_type(file.name)
+                    )
+
+                results = await asyncio.gather(*(upload_attachment_file(file) for file in files), return_exceptions=True)
+                for file, result in zip(files, results):
+                    if isinstance(result, Exception):
+                        continue
+                    links = self._build_file_links(result)
+                    attachments_uploaded.append({
+                        'filename': file.name,
+                        'file_id': links['file_id'],
+                        'web_view_link': links['web_view_link']
+                    })
+
+            return {
+                "drive_success": True,
+                "drive_folder_id": contract_folder_id,
+                "drive_file_id": contract_result['file_id'],
+                "drive_link": f"https://drive.google.com/drive/folders/{contract_folder_id}",
+                "drive_view_link": contract_result['web_view_link'],
+                "drive_attachments_folder_id": subfolders['attachments'],
+                "drive_payments_folder_id": subfolders['payments'],
+                "metadata_file_id": metadata_file['id'],
+                "attachments_uploaded": attachments_uploaded
+            }
+
+        except Exception as e:
+            return {
+                "drive_success": False,
+                "drive_error": str(e)
+            }
+
     async def upload_attachment(self, contract_id: str, file_path: Path) -> Dict[str, Any]:
         """Subir archivo adjunto a carpeta existente"""
         # Buscar carpeta del contrato
@@ -327,4 +551,31 @@ class GoogleDriveService:
             return None
 
         except Exception:
-            return None
\ No newline at end of file
+            return None
+
+
+_shared_service: Optional[GoogleDriveService] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_drive_service() -> GoogleDriveService:
+    """
+    Cliente de Google Drive compartido por toda la aplicación.
+
+    Se crea una sola vez (bajo demanda o en el lifespan) y reutiliza credenciales,
+    discovery y validación de la carpeta principal. Si la creación falla no se
+    guarda el error, de modo que la siguiente llamada vuelve a intentarlo.
+    """
+    global _shared_service
+    if _shared_service is None:
+        with _shared_lock:
+            if _shared_service is None:
+                _shared_service = GoogleDriveService()
+    return _shared_service
+
+
+def reset_shared_drive_service() -> None:
+    """Descartar el cliente compartido (apagado de la aplicación y pruebas)"""
+    global _shared_service
+    with _shared_lock:
+        _shared_service = None
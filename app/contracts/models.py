@@ -7,7 +7,7 @@ from sqlalchemy import (
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 from app.database import metadata
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import text
 
 
@@ -326,6 +326,82 @@ contract_bank_account = Table(
     ),
 )
 
+# Tabla contract_drive_folder (ids de carpetas de Google Drive por contrato)
+contract_drive_folder = Table(
+    "contract_drive_folder",
+    metadata,
+    Column("contract_id", UUID, ForeignKey("contract.contract_id", ondelete="CASCADE"), primary_key=True),
+    Column("folder_path", Text),
+    Column("contract_folder_id", String(128)),
+    Column("attachments_folder_id", String(128)),
+    Column("payments_folder_id", String(128)),
+    Column("updated_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), nullable=False),
+)
+
+# Tabla contract_document (metadatos del documento generado; sustituye a metadata.json)
+contract_document = Table(
+    "contract_document",
+    metadata,
+    Column("document_id", String(120), primary_key=True),
+    Column("contract_number", String(100), nullable=False, unique=True),
+    Column("version", Integer, nullable=False, server_default=text("1")),
+    Column("storage_type", String(20), nullable=False, server_default=text("'local'")),
+    Column("file_path", Text),
+    Column("original_data", JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), nullable=False),
+    Column("modified_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), nullable=False),
+    # Manifiesto del último render (migrations/004_contract_render_manifest.sql)
+    Column("render_manifest", JSONB),
+    CheckConstraint("version >= 1", name="contract_document_version_check"),
+)
+
+# Tabla contract_document_version (historial de versiones del documento)
+contract_document_version = Table(
+    "contract_document_version",
+    metadata,
+    Column("document_id", String(120), ForeignKey("contract_document.document_id", ondelete="CASCADE"), primary_key=True),
+    Column("version", Integer, primary_key=True),
+    Column("storage_type", String(20), nullable=False),
+    Column("file_path", Text),
+    Column("original_data", JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+    Column("created_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), nullable=False),
+)
+
+# KPIs precalculados por préstamo (migrations/007_contract_kpi.sql)
+contract_kpi = Table(
+    "contract_kpi",
+    metadata,
+    Column("contract_loan_id", Integer, ForeignKey("contract_loan.contract_loan_id", ondelete="CASCADE"), primary_key=True),
+    Column("contract_id", UUID, nullable=False),
+    Column("currency", String(3), nullable=False),
+    Column("loan_amount", Numeric(15, 2), nullable=False, server_default=text("0")),
+    Column("total_paid", Numeric(15, 2), nullable=False, server_default=text("0")),
+    Column("outstanding_principal", Numeric(15, 2), nullable=False, server_default=text("0")),
+    Column("pending_interest", Numeric(15, 2), nullable=False, server_default=text("0")),
+    Column("total_pending", Numeric(15, 2), nullable=False, server_default=text("0")),
+    Column("payments_made", Integer, nullable=False, server_default=text("0")),
+    Column("payments_total", Integer, nullable=False, server_default=text("0")),
+    Column("overdue_payments", Integer, nullable=False, server_default=text("0")),
+    Column("refreshed_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), nullable=False),
+)
+
+# Totales de la cartera por moneda
+contract_kpi_portfolio = Table(
+    "contract_kpi_portfolio",
+    metadata,
+    Column("currency", String(3), primary_key=True),
+    Column("contracts", Integer, nullable=False, server_default=text("0")),
+    Column("loan_amount", Numeric(18, 2), nullable=False, server_default=text("0")),
+    Column("total_paid", Numeric(18, 2), nullable=False, server_default=text("0")),
+    Column("outstanding_principal", Numeric(18, 2), nullable=False, server_default=text("0")),
+    Column("pending_interest", Numeric(18, 2), nullable=False, server_default=text("0")),
+    Column("total_pending", Numeric(18, 2), nullable=False, server_default=text("0")),
+    Column("payments_made", BigInteger, nullable=False, server_default=text("0")),
+    Column("payments_total", BigInteger, nullable=False, server_default=text("0")),
+    Column("overdue_payments", BigInteger, nullable=False, server_default=text("0")),
+    Column("refreshed_at", TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), nullable=False),
+)
+
 class ContractParagraph(Base):
     """SQLAlchemy model for contract paragraphs"""
     __tablename__ = "contract_paragraphs"
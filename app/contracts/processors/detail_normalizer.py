@@ -0,0 +1,162 @@
+"""Normalización del detalle de contrato que devuelve fn_get_contract_detail.
+
+Las reglas por campo (numéricos y de texto) se compilan al importar en una tabla
+campo -> conversión, y normalize_contract_detail recorre el JSON una sola vez:
+aplana person.person de los participantes y convierte los tipos en la misma pasada.
+"""
+
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+# Campos que el frontend espera como número (la BD a veces los devuelve como texto)
+NUMERIC_FIELDS = frozenset({
+    "amount", "interest_rate", "term_months", "discount_rate",
+    "monthly_payment", "final_payment", "payment_qty_quotes",
+    "total_paid", "loan_amount", "net_earnings", "total_earning",
+    "total_pending", "total_payments", "total_amount_due",
+    "progress_percentage", "total_pending_interest", "contract_loan_id",
+    "payments_made", "surface_area", "covered_area", "property_value",
+    "contract_type_id", "company_id", "participation_percentage",
+    "p_person_role_id"
+})
+
+# Campos que el frontend espera como texto aunque parezcan números
+STRING_FIELDS = frozenset({
+    "postal_code", "title_number", "cadastral_number", "document_number",
+    "issuing_country_id"
+})
+
+PARTICIPANT_ROLES = ("clients", "investors", "witnesses", "notaries", "referents", "notary")
+
+# Campos que fn_get_contract_detail puede omitir; se completan con una sola consulta
+MISSING_FIELDS_QUERY = """
+    SELECT c.end_date,
+           ba.bank_account_id IS NOT NULL AS has_bank_account,
+           ba.bank_name, ba.account_number, ba.account_type, ba.currency
+    FROM contract c
+    LEFT JOIN LATERAL (
+        SELECT bank_account_id, bank_name, account_number, account_type, currency
+        FROM contract_bank_account
+        WHERE contract_id = c.contract_id
+        ORDER BY bank_account_id DESC
+        LIMIT 1
+    ) ba ON TRUE
+    WHERE c.contract_id = $1
+"""
+
+
+def _to_number(value: Any) -> Any:
+    if type(value) is str:
+        try:
+            if '.' in value:
+                return float(value)
+            if value.isdigit() or (value.startswith('-') and value[1:].isdigit()):
+                return int(value)
+        except (ValueError, TypeError):
+            pass
+    return value
+
+
+def _to_string(value: Any) -> Any:
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value
+
+
+_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    **{name: _to_number for name in NUMERIC_FIELDS},
+    **{name: _to_string for name in STRING_FIELDS},
+}
+
+
+def _flatten_participants(participants: Any) -> None:
+    """Subir los campos de person.person al nivel de person"""
+    if type(participants) is not dict:
+        return
+    for role in PARTICIPANT_ROLES:
+        members = participants.get(role)
+        if type(members) is not list:
+            continue
+        for member in members:
+            if type(member) is dict:
+                person = member.get("person")
+                if person and type(person) is dict and "person" in person:
+                    person.update(person.pop("person"))
+
+
+def _normalize_dict(obj: Dict[str, Any]) -> Dict[str, Any]:
+    if "participants" in obj:
+        _flatten_participants(obj["participants"])
+    result = {}
+    get_converter = _CONVERTERS.get
+    for key, value in obj.items():
+        convert = get_converter(key)
+        cls = type(value)
+        if cls is dict:
+            value = _normalize_dict(value)
+        elif cls is list:
+            value = _normalize_list(value, convert)
+        elif convert is not None:
+            value = convert(value)
+        result[key] = value
+    return result
+
+
+def _normalize_list(items: List[Any], convert: Optional[Callable[[Any], Any]]) -> List[Any]:
+    # Los elementos de una lista heredan la regla del campo que la contiene
+    result = []
+    for value in items:
+        cls = type(value)
+        if cls is dict:
+            value = _normalize_dict(value)
+        elif cls is list:
+            value = _normalize_list(value, convert)
+        elif convert is not None:
+            value = convert(value)
+        result.append(value)
+    return result
+
+
+def normalize_contract_detail(data: Any) -> Any:
+    """Normalizar estructura de participantes y tipos del detalle en una pasada"""
+    cls = type(data)
+    if cls is dict:
+        return _normalize_dict(data)
+    if cls is list:
+        return _normalize_list(data, None)
+    return data
+
+
+def apply_missing_fields(data: Dict[str, Any], row: Optional[Dict[str, Any]]) -> None:
+    """Completar contract_end_date y loan.bank_account con la fila de MISSING_FIELDS_QUERY"""
+    if not row:
+        return
+    if data.get("contract_end_date") is None and row["end_date"] is not None:
+        data["contract_end_date"] = row["end_date"].strftime("%d/%m/%Y")
+
+    loan = data.get("loan") or {}
+    if loan.get("bank_account") is None and row["has_bank_account"]:
+        loan["bank_account"] = {
+            "bank_name": row["bank_name"],
+            "bank_account_number": row["account_number"],
+            "bank_account_type": row["account_type"],
+            "bank_account_currency": row["currency"],
+        }
+        data["loan"] = loan
+
+
+def needs_missing_fields(data: Dict[str, Any]) -> bool:
+    """True si falta algún campo que completa MISSING_FIELDS_QUERY"""
+    return data.get("contract_end_date") is None or (data.get("loan") or {}).get("bank_account") is None
+
+
+def decimals_to_float(obj: Any) -> Any:
+    """Convertir Decimal a float (model_dump en modo python) para serializar a JSON"""
+    cls = type(obj)
+    if cls is dict:
+        return {key: decimals_to_float(value) for key, value in obj.items()}
+    if cls is list:
+        return [decimals_to_float(item) for item in obj]
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return obj
@@ -0,0 +1,181 @@
+"""Seguimiento de dependencias para regenerar contratos de forma incremental.
+
+Cada párrafo de la BD se calcula con un TrackingDict que registra las variables
+aplanadas que lee. El manifiesto resultante (plantilla del párrafo, variables
+leídas y texto generado) se guarda con la versión del documento; al modificar
+el contrato solo se recalculan los párrafos cuyas variables cambiaron.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+# Sección de la BD -> variable de Word (igual que en get_all_paragraphs_for_contract)
+SECTION_MAPPING = {
+    'identification': 'client_paragraph',
+    'investors': 'investor_paragraph',
+    'clients': 'client_paragraph',
+    'witnesses': 'witness_paragraph',
+    'notaries': 'notary_paragraph',
+    'guarantees': 'guarantee_paragraph',
+    'terms_conditions': 'terms_paragraph',
+    'payment_terms': 'payment_paragraph',
+    'legal_clauses': 'legal_paragraph',
+    'signatures': 'signature_paragraph'
+}
+
+_MISSING = object()
+
+
+class TrackingDict(dict):
+    """dict que recuerda las claves consultadas (get, [] e in)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads: Set[str] = set()
+
+    def __getitem__(self, key):
+        self.reads.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.reads.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self.reads.add(key)
+        return super().__contains__(key)
+
+
+def changed_keys(old: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    """Claves añadidas, eliminadas o con otro valor"""
+    return {key for key in old.keys() | new.keys() if old.get(key, _MISSING) != new.get(key, _MISSING)}
+
+
+@dataclass(frozen=True)
+class ParagraphJob:
+    """Un párrafo a buscar en la BD y procesar"""
+    person_role: Optional[str]
+    contract_type: Optional[str]
+    section: Optional[str]
+    contract_services: Optional[str]
+    word_variable: Optional[str]
+    # Texto si el párrafo no existe en la BD (paragraph_request); None = omitirlo
+    default_text: Optional[str] = None
+
+    @property
+    def result_key(self) -> str:
+        return self.word_variable or f"{self.person_role}_{self.contract_type}_{self.section}"
+
+    @property
+    def cache_key(self) -> str:
+        mode = "request" if self.default_text is not None else "auto"
+        return "|".join(str(part) for part in (
+            mode, self.person_role, self.contract_type, self.section, self.contract_services, self.word_variable
+        ))
+
+
+def paragraph_jobs(data: Dict[str, Any]) -> List[ParagraphJob]:
+    """Párrafos que necesita el contrato, en el orden en que se aplican"""
+    if "paragraph_request" in data:
+        jobs = []
+        for req in data["paragraph_request"]:
+            person_role = req.get("person_role")
+            contract_type = req.get("contract_type")
+            section = req.get("section")
+            word_variable = SECTION_MAPPING.get(section)
+            if section == 'identification':
+                word_variable = 'client_paragraph' if person_role == 'client' else 'investor_paragraph'
+            jobs.append(ParagraphJob(
+                person_role=person_role,
+                contract_type=contract_type,
+                section=section,
+                contract_services=req.get("contract_services", contract_type),
+                word_variable=word_variable,
+                default_text=f"Párrafo por defecto para {person_role} - {section}",
+            ))
+        return jobs
+
+    contract_type = data.get("contract_type_db") or data.get("contract_type_person") or "juridica"
+    if contract_type not in ("juridica", "fisica_soltera", "fisica_casada"):
+        contract_type = "juridica"
+    contract_services = data.get("contract_services") or data.get("contract_type", "mortgage")
+
+    # Primero los párrafos de cliente y después los de inversionista (estos prevalecen)
+    jobs = []
+    for person_role in ("client", "investor"):
+        for section, word_variable in SECTION_MAPPING.items():
+            if section == 'identification':
+                word_variable = 'client_paragraph' if person_role == 'client' else 'investor_paragraph'
+            jobs.append(ParagraphJob(person_role, contract_type, section, contract_services, word_variable))
+    return jobs
+
+
+def render_paragraph(job: ParagraphJob, template: str, data: Dict[str, Any]) -> str:
+    """Procesar la plantilla del párrafo con los datos aplanados"""
+    from app.contracts.paragraphs import _process_multiple_clients_paragraph, process_paragraph
+
+    if job.word_variable == 'client_paragraph':
+        clients_count = data.get('clients_count', 0)
+        if clients_count > 1 or 'client2_full_name' in data:
+            return _process_multiple_clients_paragraph(template, data, clients_count)
+    return process_paragraph(template, data)
+
+
+@dataclass
+class ParagraphEntry:
+    template: Optional[str]
+    deps: List[str] = field(default_factory=list)
+    output: Optional[str] = None
+
+
+@dataclass
+class RenderManifest:
+    """Lo necesario para reutilizar un render anterior"""
+    paragraphs: Dict[str, ParagraphEntry] = field(default_factory=dict)
+    template_name: Optional[str] = None
+    # Coste del último render completo (ms), para estimar el ahorro
+    paragraphs_ms: float = 0.0
+    render_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "paragraphs": {key: entry.__dict__ for key, entry in self.paragraphs.items()},
+            "template_name": self.template_name,
+            "paragraphs_ms": round(self.paragraphs_ms, 3),
+            "render_ms": round(self.render_ms, 3),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["RenderManifest"]:
+        if not data:
+            return None
+        return cls(
+            paragraphs={key: ParagraphEntry(**entry) for key, entry in (data.get("paragraphs") or {}).items()},
+            template_name=data.get("template_name"),
+            paragraphs_ms=data.get("paragraphs_ms") or 0.0,
+            render_ms=data.get("render_ms") or 0.0,
+        )
+
+
+@dataclass
+class RenderStats:
+    """Resumen de lo recalculado y reutilizado en una regeneración"""
+    paragraphs_total: int = 0
+    paragraphs_recomputed: int = 0
+    paragraphs_reused: int = 0
+    db_lookups: int = 0
+    document_reused: bool = False
+    elapsed_ms: float = 0.0
+    estimated_full_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "paragraphs_total": self.paragraphs_total,
+            "paragraphs_recomputed": self.paragraphs_recomputed,
+            "paragraphs_reused": self.paragraphs_reused,
+            "db_lookups": self.db_lookups,
+            "document_reused": self.document_reused,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "estimated_full_ms": round(self.estimated_full_ms, 1),
+            "saved_ms": round(max(self.estimated_full_ms - self.elapsed_ms, 0.0), 1),
+        }
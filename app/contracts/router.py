@@ -2,8 +2,9 @@
 from dotenv import load_dotenv
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Request, status, Query
-from fastapi.responses import FileResponse, JSONResponse
-from typing import Dict, Any, Optional, List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Dict, Any, Literal, Optional, List
 from pathlib import Path
 import os
 import uuid
@@ -14,8 +15,18 @@ from datetime import datetime, date
 from app.auth.dependencies import DepCurrentUser
 from app.exceptions import GenericHTTPException
 from app.enums import ErrorCodeEnum
+from app.config import settings
+from app.uploads.models import UPLOAD_PENDING
+from app.storage.responses import document_response, etag_matches
 from .service import ContractService
 from .services import ContractListService
+from .services.contract_list_service import ContractListFilters, parse_fields
+from .services.contract_kpi_service import ContractKpiService
+from .services.contract_batch_service import ContractBatchService, BatchStageLimits, parse_contract_batch
+from .services.contract_detail_cache import CachedDetail, contract_detail_cache, detail_etag
+from .processors.detail_normalizer import (
+    MISSING_FIELDS_QUERY, apply_missing_fields, decimals_to_float, needs_missing_fields, normalize_contract_detail,
+)
 from .schemas import *
 from .loan_property_schemas import *
 from app.database import DepDatabase, fetch_one, fetch_all, execute
@@ -24,6 +35,8 @@ from app.contracts.models import contract as contract_table, contract_participan
 from app.contracts.loan_property_service import ContractLoanPropertyService
 from app.contracts.participant_service import ParticipantService
 from app.contracts.contract_creation_service import ContractCreationService
+from app.contracts.utils.validators import contract_payload_body
+from app.contracts.validators.payload_validator import contract_payload_errors
 from app.person.service import PersonService
 from app.person.schemas import PersonCompleteCreate, PersonDocumentCreate, PersonAddressCreate
 from sqlalchemy import text as sql_text
@@ -48,161 +61,44 @@ def get_contract_creation_service() -> ContractCreationService:
     return ContractCreationService()
 
 
-def validate_contract_data(data: Dict[str, Any]) -> None:
-    """Validate that JSON has all required data to generate a contract"""
-    missing_fields = []
-    
-    investors = data.get("investors") or []
-    clients = data.get("clients") or []
-    investor_company = data.get("investor_company", {})
-    client_company = data.get("client_company", {})
-    notaries = data.get("notaries") or data.get("notary") or []
-    
-    has_investor_person = investors and len(investors) > 0
-    has_investor_company = investor_company and investor_company.get("company_name")
-    
-    if not has_investor_person and not has_investor_company:
-        missing_fields.append("investors o investor_company: Se requiere al menos 1 inversionista (persona física o empresa)")
-    
-    has_client_person = clients and len(clients) > 0
-    has_client_company = client_company and client_company.get("company_name")
-    
-    if not has_client_person and not has_client_company:
-        missing_fields.append("clients o client_company: Se requiere al menos 1 cliente (persona física o empresa)")
-    
-    if not notaries or len(notaries) == 0:
-        missing_fields.append("notaries: Se requiere al menos 1 notario")
-    
-    properties = data.get("properties") or []
-    if not properties or len(properties) == 0:
-        missing_fields.append("properties: Se requiere al menos 1 propiedad")
-    
-    if not data.get("paragraph_request"):
-        missing_fields.append("paragraph_request: Se requiere la configuración de párrafos")
-    
-    if not data.get("loan"):
-        missing_fields.append("loan: Se requiere información del préstamo")
-    
-    if missing_fields:
-        raise GenericHTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            error_code=ErrorCodeEnum.VALIDATION_ERROR,
-            message="Datos incompletos para generar el contrato",
-            success=False,
-            detail={
-                "error_code": ErrorCodeEnum.VALIDATION_ERROR.value,
-                "message": "Datos incompletos para generar el contrato",
-                "success": False,
-                "missing_fields": missing_fields
-            }
-        )
+# El cuerpo se lee en contract_payload_body; se documenta aquí para OpenAPI
+CONTRACT_PAYLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"type": "object", "additionalProperties": True}}},
+    }
+}
 
 
-@router.post("/generate-complete", response_model=ContractResponse)
+@router.post("/generate-complete", response_model=ContractResponse, openapi_extra=CONTRACT_PAYLOAD_OPENAPI)
 async def generate_contract_complete(
-    data: Dict[str, Any],
     db: DepDatabase,
     request: Request,
     current_user: DepCurrentUser,
     service: ContractService = Depends(get_contract_service),
     participant_service: ParticipantService = Depends(get_participant_service),
-    contract_creation_service: ContractCreationService = Depends(get_contract_creation_service)
+    contract_creation_service: ContractCreationService = Depends(get_contract_creation_service),
+    data: Dict[str, Any] = Depends(contract_payload_body)
 ) -> Dict[str, Any]:
     """
     Generate complete contract from structured JSON with persons, properties and loan.
     """
-    
-    validate_contract_data(data)
-
-    participants_for_contract, participant_errors, processed_persons_summary = await participant_service.process_all_participants(data, request)
+    persisted = await contract_creation_service.persist_contract_payload(
+        data, db, request, current_user, participant_service
+    )
+    contract_id = persisted["contract_id"]
+    enhanced_data = contract_creation_service.build_generation_payload(data, persisted)
 
-    if participant_errors:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail={
-                "message": "No se puede generar el contrato: hay errores en el procesamiento de participantes. Corrija los datos e intente de nuevo.",
-                "errors": participant_errors,
-                "summary": processed_persons_summary
-            }
+    try:
+        rendered = await service.generation_service.render_contract(enhanced_data, connection=db)
+        document_result = await service.generation_service.store_contract(
+            rendered, defer_upload=settings.UPLOAD_OUTBOX_ENABLED, connection=db
         )
-
-    contract_type_name = "CNT"
-    contract_number = await contract_creation_service.generate_contract_number(contract_type_name, db)
-
-    contract_id = await contract_creation_service.create_contract_record(data, contract_number, db, current_user)
-    participant_db_errors = await contract_creation_service.register_contract_participants(contract_id, participants_for_contract, db)
-    client_referrer_created, client_referrer_errors = await contract_creation_service.create_client_referrer_relationships(participants_for_contract, db)
-
-    loan_property_result = None
-    loan_property_errors = []
-
-    if data.get("loan") or data.get("properties"):
-        try:
-            loan_property_result = await ContractLoanPropertyService.create_contract_loan_and_properties(
-                contract_id=contract_id,
-                loan_data=data.get("loan"),
-                properties_data=data.get("properties", []),
-                connection=db,
-                contract_context=data
+        if document_result.get("document_status") == UPLOAD_PENDING:
+            # La subida se confirma junto con el contrato y la hace el despachador
+            document_result["document_upload_id"] = await contract_creation_service.enqueue_document_upload(
+                contract_id, rendered, service.store.name, db
             )
-
-            if not loan_property_result["overall_success"]:
-                if loan_property_result.get("loan_result") and not loan_property_result["loan_result"].get("success"):
-                    loan_property_errors.append({
-                        "type": "loan",
-                        "error": loan_property_result["loan_result"].get("message", "Error desconocido en loan")
-                    })
-
-                if loan_property_result.get("bank_account_result") and not loan_property_result["bank_account_result"].get("success"):
-                    loan_property_errors.append({
-                        "type": "bank_account",
-                        "error": loan_property_result["bank_account_result"].get("message", "Error desconocido en bank account")
-                    })
-
-                if loan_property_result.get("properties_result") and not loan_property_result["properties_result"].get("success"):
-                    loan_property_errors.append({
-                        "type": "properties",
-                        "error": loan_property_result["properties_result"].get("message", "Error desconocido en properties")
-                    })
-
-        except Exception as e:
-            loan_property_errors.append({
-                "type": "general",
-                "error": f"Error general procesando loan/properties: {str(e)}"
-            })
-            loan_property_result = {
-                "overall_success": False,
-                "message": f"Error general: {str(e)}"
-            }
-
-    # Si falló loan o propiedades, no generar contrato: limpiar transacción abortada, borrar contrato y devolver error
-    if loan_property_result is not None and not loan_property_result.get("overall_success", True):
-        try:
-            await db.rollback()
-        except Exception:
-            pass
-        await contract_creation_service.delete_contract_cascade(contract_id, db)
-        detail = {
-            "message": "No se puede generar el contrato: hay errores en préstamo o propiedades. Corrija los datos e intente de nuevo.",
-            "errors": loan_property_errors,
-        }
-        if loan_property_result.get("properties_result") and loan_property_result["properties_result"].get("errors"):
-            detail["properties_errors"] = loan_property_result["properties_result"]["errors"]
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=detail,
-        )
-
-    enhanced_data = data.copy()
-    enhanced_data.update({
-        "contract_id": str(contract_id),
-        "contract_number": contract_number,
-        "generated_at": datetime.now().isoformat(),
-        "loan_property_result": loan_property_result
-    })
-
-    try:
-        document_result = await service.generate_contract(enhanced_data, connection=db)
         await contract_creation_service.update_contract_with_document_info(contract_id, document_result, db)
     except Exception as e:
         document_result = {
@@ -211,107 +107,115 @@ async def generate_contract_complete(
             "message": f"Error generando documento: {str(e)}"
         }
 
-    file_path = document_result.get("path", "")
-    folder_path = document_result.get("folder_path", "")
-    
-    if document_result.get("drive_success") and document_result.get("drive_link"):
-        file_path = document_result.get("drive_view_link", file_path)
-        folder_path = document_result.get("drive_link", folder_path)
-    
-    return ContractResponse(
-        success=True,
-        message="Contrato completo generado exitosamente",
-        contract_id=str(contract_id),
-        contract_number=contract_number,
-        filename=document_result.get("filename", f"{contract_number}.docx"),
-        path=file_path,
-        folder_path=folder_path,
-        processed_data={
-            "persons_summary": processed_persons_summary,
-            "participants_count": len(participants_for_contract),
-            "contract_type": data.get("contract_type", "unknown"),
-            "loan_amount": data.get("loan", {}).get("amount"),
-            "properties_count": len(data.get("properties", [])),
-            "persons_detail": {
-                "new_persons": processed_persons_summary['successful'] - processed_persons_summary['existing'] - processed_persons_summary['reused'],
-                "existing_persons": processed_persons_summary['existing'],
-                "reused_persons": processed_persons_summary['reused'],
-                "total_successful": processed_persons_summary['successful']
-            }
-        },
-        drive_success=document_result.get("drive_success"),
-        drive_folder_id=document_result.get("drive_folder_id"),
-        drive_file_id=document_result.get("drive_file_id"),
-        drive_link=document_result.get("drive_link"),
-        drive_view_link=document_result.get("drive_view_link"),
-        warnings={
-            "person_errors": participant_errors,
-            "message": f"Se procesaron {processed_persons_summary['successful']} personas exitosamente ({processed_persons_summary['reused']} reutilizadas), {processed_persons_summary['errors']} errores reales"
-        } if participant_errors else None
+    return contract_creation_service.build_contract_response(data, persisted, document_result)
+
+
+@router.post("/generate-batch")
+async def generate_contract_batch(
+    request: Request,
+    current_user: DepCurrentUser,
+    persist_limit: int = Query(default=4, ge=1, le=32, description="Contratos registrándose en BD a la vez"),
+    render_limit: int = Query(default=2, ge=1, le=16, description="Documentos renderizándose a la vez"),
+    upload_limit: int = Query(default=4, ge=1, le=32, description="Documentos subiéndose a la vez"),
+    service: ContractService = Depends(get_contract_service),
+    participant_service: ParticipantService = Depends(get_participant_service),
+    contract_creation_service: ContractCreationService = Depends(get_contract_creation_service)
+) -> StreamingResponse:
+    """
+    Generar un lote de contratos completos.
+
+    Acepta una lista JSON de payloads de /generate-complete (o {"contracts": [...]})
+    o NDJSON con Content-Type application/x-ndjson. Responde en NDJSON: un evento
+    por contrato a medida que termina (con su error si falla) y un resumen final
+    con totales y throughput.
+    """
+    payloads = parse_contract_batch(await request.body(), request.headers.get("content-type"))
+    batch_service = ContractBatchService(
+        service,
+        participant_service,
+        contract_creation_service,
+        limits=BatchStageLimits(persist=persist_limit, render=render_limit, upload=upload_limit),
     )
 
+    async def stream_events():
+        async for event in batch_service.run(payloads, request, current_user):
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(stream_events(), media_type="application/x-ndjson")
+
 
 @router.post("/validate-complete", response_model=Dict[str, Any])
 async def validate_contract_complete(
-    data: ContractCompleteRequest,
+    data: Dict[str, Any],
     _: DepCurrentUser
 ) -> Dict[str, Any]:
     """
     Validar datos de contrato completo sin crear el registro.
-    Útil para validación frontend antes de envío.
+    Útil para validación frontend antes de envío; aplica la misma validación
+    que /generate-complete.
     """
-    try:
-        validation_summary = {
-            "contract_type": data.contract_type,
-            "has_loan": data.loan is not None,
-            "has_properties": data.properties is not None and len(data.properties) > 0,
-            "participants_count": {
-                "clients": len(data.clients) if data.clients else 0,
-                "investors": len(data.investors) if data.investors else 0,
-                "witnesses": len(data.witnesses) if data.witnesses else 0,
-                "notaries": len(data.notaries) if data.notaries else 0,
-                "referrers": len(data.referrers) if data.referrers else 0
-            }
-        }
-
-        return {
-            "valid": True,
-            "message": "Datos del contrato válidos",
-            "summary": validation_summary,
-            "total_participants": sum(validation_summary["participants_count"].values())
-        }
-    except Exception as e:
+    errors = contract_payload_errors(data)
+    if errors:
         return {
             "valid": False,
-            "message": f"Error de validación: {str(e)}",
-            "errors": [str(e)]
+            "message": "Datos incompletos para generar el contrato",
+            "errors": errors
         }
 
+    validation_summary = {
+        "contract_type": data.get("contract_type"),
+        "has_loan": bool(data.get("loan")),
+        "has_properties": bool(data.get("properties")),
+        "participants_count": {
+            "clients": len(data.get("clients") or []),
+            "investors": len(data.get("investors") or []),
+            "witnesses": len(data.get("witnesses") or []),
+            "notaries": len(data.get("notaries") or data.get("notary") or []),
+            "referrers": len(data.get("referents") or data.get("referrers") or [])
+        }
+    }
+
+    return {
+        "valid": True,
+        "message": "Datos del contrato válidos",
+        "summary": validation_summary,
+        "total_participants": sum(validation_summary["participants_count"].values())
+    }
+
 
 @router.get("/list", response_model=ContractListResponse)
 async def list_contracts(
     _: DepCurrentUser,
-    request: Request,
+    db: DepDatabase,
+    limit: int = Query(default=50, ge=1, le=200, description="Contratos por página"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    status: Optional[Literal["active", "inactive"]] = Query(None, description="Filtrar por contratos activos o inactivos"),
+    contract_service_id: Optional[int] = Query(None, description="Filtrar por tipo de servicio"),
+    date_from: Optional[date] = Query(None, description="contract_date desde (inclusive)"),
+    date_to: Optional[date] = Query(None, description="contract_date hasta (inclusive)"),
+    client: Optional[str] = Query(None, min_length=2, description="Nombre del cliente (contiene)"),
+    client_id: Optional[uuid.UUID] = Query(None, description="person_id del cliente"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (por defecto todos)"),
+    include_total: bool = Query(False, description="Calcular el total de contratos que cumplen los filtros"),
 ) -> Dict[str, Any]:
     """
-    Listar todos los contratos generados desde la base de datos
+    Listar contratos paginados por cursor, del más reciente al más antiguo
 
-    Incluye metadatos, versiones y conteo de archivos adjuntos
+    Cada página tiene como máximo limit contratos; para la siguiente se envía
+    next_cursor mientras has_more sea true. Los filtros se aplican en la BD.
     """
+    filters = ContractListFilters(
+        status=status,
+        contract_service_id=contract_service_id,
+        date_from=date_from,
+        date_to=date_to,
+        client=client,
+        client_id=client_id,
+    )
     try:
-        async with request.app.state.db_pool.acquire() as connection:
-            result = await ContractListService.get_contracts(connection=connection)
-            
-            if not result.get("success", False):
-                error_code = result.get("error", "UNKNOWN_ERROR")
-                error_message = result.get("message", "Error al obtener contratos")
-                status_code = 404 if error_code == "NO_DATA" else 500
-                raise HTTPException(
-                    status_code=status_code,
-                    detail=f"{error_message} (Error: {error_code})"
-                )
-            
-            return result
+        return await ContractListService.list_contracts_page(
+            db, filters, limit=limit, cursor=cursor, fields=parse_fields(fields), include_total=include_total
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -321,6 +225,29 @@ async def list_contracts(
         )
 
 
+@router.get("/kpis", response_model=ContractKpiResponse)
+async def get_contract_kpis(
+    _: DepCurrentUser,
+    db: DepDatabase,
+    contract_id: Optional[uuid.UUID] = Query(None, description="Incluir los KPIs de los préstamos de este contrato"),
+) -> Dict[str, Any]:
+    """
+    KPIs de la cartera por moneda (capital pendiente, pagado, interés pendiente, avance)
+
+    Se leen de los agregados precalculados (se actualizan al registrar pagos y
+    periódicamente), sin recorrer contratos ni cuotas.
+    """
+    portfolio = await ContractKpiService.get_portfolio(db)
+    loans = await ContractKpiService.get_contract_kpis(str(contract_id), db) if contract_id else None
+    refreshed = [row["refreshed_at"] for row in portfolio if row.get("refreshed_at")]
+    return {
+        "success": True,
+        "portfolio": portfolio,
+        "loans": loans,
+        "refreshed_at": max(refreshed) if refreshed else None,
+    }
+
+
 @router.get("/services", response_model=ContractServiceListResponse)
 async def list_contract_services(
     _: DepCurrentUser,
@@ -356,12 +283,19 @@ async def list_contract_services(
     )
 
 
+def _detail_response(cached: CachedDetail, request: Request) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
 @router.get("/{contract_id}/detail", response_model=ContractDetailResponse)
 async def get_contract_detail(
     contract_id: str,
     _: DepCurrentUser,
     request: Request,
-) -> Dict[str, Any]:
+) -> Response:
     """
     Obtener detalle completo de un contrato por UUID o número de contrato
     
@@ -374,7 +308,15 @@ async def get_contract_detail(
     - Información del préstamo
     - Propiedades asociadas
     - Cuentas bancarias
+
+    La respuesta se cachea (invalidada por cambios en la BD) y lleva ETag;
+    con If-None-Match coincidente se responde 304 sin cuerpo.
     """
+    cached = contract_detail_cache.get(contract_id)
+    if cached is not None:
+        return _detail_response(cached, request)
+
+    generation = contract_detail_cache.generation
     try:
         async with request.app.state.db_pool.acquire() as connection:
             try:
@@ -422,123 +364,32 @@ async def get_contract_detail(
                             detail=error_detail_message
                         )
                     
-                    def normalize_data_types(obj, parent_key=""):
-                        """Normalize data types: convert strings to numbers for numeric fields, numbers to strings for string fields"""
-                        numeric_fields = {
-                            "amount", "interest_rate", "term_months", "discount_rate", 
-                            "monthly_payment", "final_payment", "payment_qty_quotes",
-                            "total_paid", "loan_amount", "net_earnings", "total_earning",
-                            "total_pending", "total_payments", "total_amount_due", 
-                            "progress_percentage", "total_pending_interest", "contract_loan_id",
-                            "payments_made", "surface_area", "covered_area", "property_value",
-                            "contract_type_id", "company_id", "participation_percentage",
-                            "p_person_role_id"
-                        }
-                        
-                        string_fields = {
-                            "postal_code", "title_number", "cadastral_number", "document_number",
-                            "issuing_country_id"
-                        }
-                        
-                        if isinstance(obj, str):
-                            if parent_key in numeric_fields:
-                                try:
-                                    if '.' in obj:
-                                        return float(obj)
-                                    elif obj.isdigit() or (obj.startswith('-') and obj[1:].isdigit()):
-                                        return int(obj)
-                                except (ValueError, TypeError):
-                                    pass
-                            return obj
-                        elif isinstance(obj, (int, float)):
-                            if parent_key in string_fields:
-                                return str(obj)
-                            elif parent_key not in numeric_fields:
-                                return obj
-                            return obj
-                        elif isinstance(obj, dict):
-                            return {k: normalize_data_types(v, k) for k, v in obj.items()}
-                        elif isinstance(obj, list):
-                            return [normalize_data_types(item, parent_key) for item in obj]
-                        return obj
-                    
-                    def normalize_participant_structure(data_obj):
-                        """Flatten person.person nested structure if exists"""
-                        if isinstance(data_obj, dict):
-                            if "participants" in data_obj:
-                                participants = data_obj["participants"]
-                                for role_key in ["clients", "investors", "witnesses", "notaries", "referents", "notary"]:
-                                    if role_key in participants and isinstance(participants[role_key], list):
-                                        for p in participants[role_key]:
-                                            if isinstance(p, dict):
-                                                person = p.get("person")
-                                                if person and isinstance(person, dict) and "person" in person:
-                                                    nested_person = person.pop("person")
-                                                    person.update(nested_person)
-                            return {k: normalize_participant_structure(v) if isinstance(v, (dict, list)) else v 
-                                   for k, v in data_obj.items()}
-                        elif isinstance(data_obj, list):
-                            return [normalize_participant_structure(item) if isinstance(item, (dict, list)) else item 
-                                   for item in data_obj]
-                        return data_obj
-                    
                     if result.get("data"):
-                        result["data"] = normalize_participant_structure(result["data"])
-                        result["data"] = normalize_data_types(result["data"])
-                        # Si la función de BD no devuelve contract_end_date, rellenar desde contract.end_date
-                        if result["data"].get("contract_end_date") is None:
+                        result["data"] = normalize_contract_detail(result["data"])
+                        # Si la función de BD no devuelve contract_end_date o loan.bank_account,
+                        # completarlos con una sola consulta
+                        if needs_missing_fields(result["data"]):
                             try:
                                 row = await connection.fetchrow(
-                                    "SELECT end_date FROM contract WHERE contract_id = $1",
-                                    uuid.UUID(contract_id),
+                                    MISSING_FIELDS_QUERY,
+                                    uuid.UUID(str(result["data"].get("contract_id") or contract_id)),
                                 )
-                                if row and row.get("end_date") is not None:
-                                    result["data"]["contract_end_date"] = row["end_date"].strftime("%d/%m/%Y")
-                            except (ValueError, TypeError, Exception):
+                                apply_missing_fields(result["data"], row)
+                            except Exception:
                                 pass
 
-                        # Si la función de BD no devuelve bank_account en loan, rellenar desde contract_bank_account
-                        try:
-                            loan_obj = result["data"].get("loan") or {}
-                            if loan_obj.get("bank_account") is None:
-                                ba_row = await connection.fetchrow(
-                                    """SELECT bank_name, account_number, account_type, currency,
-                                              bank_code, swift_code, iban, holder_name
-                                       FROM contract_bank_account
-                                       WHERE contract_id = $1
-                                       ORDER BY bank_account_id DESC LIMIT 1""",
-                                    uuid.UUID(contract_id),
-                                )
-                                if ba_row:
-                                    loan_obj["bank_account"] = {
-                                        "bank_name": ba_row["bank_name"],
-                                        "bank_account_number": ba_row["account_number"],
-                                        "bank_account_type": ba_row["account_type"],
-                                        "bank_account_currency": ba_row["currency"],
-                                    }
-                                    result["data"]["loan"] = loan_obj
-                        except Exception:
-                            pass
-                    
-                    from app.contracts.schemas import ContractDetailResponse
-                    from decimal import Decimal
-                    
                     validated_response = ContractDetailResponse(**result)
-                    
-                    def convert_decimals_to_float(obj):
-                        """Convert Decimal to float recursively for JSON serialization"""
-                        if isinstance(obj, Decimal):
-                            return float(obj)
-                        elif isinstance(obj, dict):
-                            return {k: convert_decimals_to_float(v) for k, v in obj.items()}
-                        elif isinstance(obj, list):
-                            return [convert_decimals_to_float(item) for item in obj]
-                        return obj
-                    
-                    result_dict = validated_response.model_dump(mode='python')
-                    result_dict = convert_decimals_to_float(result_dict)
-                    
-                    return result_dict
+                    result_dict = decimals_to_float(validated_response.model_dump(mode='python'))
+                    body = JSONResponse(content=jsonable_encoder(result_dict)).body
+                    data = validated_response.data
+                    cached = CachedDetail(
+                        contract_id=(data.contract_id if data else None) or contract_id,
+                        contract_number=data.contract_number if data else None,
+                        body=body,
+                        etag=detail_etag(body),
+                    )
+                    contract_detail_cache.put(cached, generation)
+                    return _detail_response(cached, request)
                 else:
                     raise HTTPException(
                         status_code=500,
@@ -562,20 +413,24 @@ async def get_contract_detail(
 @router.get("/{contract_id}/download")
 async def download_contract(
     contract_id: str,
+    request: Request,
     service: ContractService = Depends(get_contract_service)
-) -> FileResponse:
-    """Descargar archivo de contrato"""
-    contract_folder = service.contracts_dir / contract_id
-    contract_file = contract_folder / f"{contract_id}.docx"
+) -> Response:
+    """
+    Descargar archivo de contrato
 
-    if not contract_file.exists():
+    Se envía por trozos desde el backend que lo guarda (local con sendfile, Drive o S3),
+    con soporte de Range, ETag e If-None-Match.
+    """
+    try:
+        found = await service.file_service.find_contract_file(contract_id)
+    except ValueError:
+        raise HTTPException(400, "Identificador de contrato inválido")
+    if found is None:
         raise HTTPException(404, "Contrato no encontrado")
 
-    return FileResponse(
-        path=contract_file,
-        filename=f"{contract_id}.docx",
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    )
+    store, stat = found
+    return document_response(store, stat, request, filename=f"{contract_id}.docx")
 
 
 @router.patch("/{contract_id}/update", response_model=UpdateResponse, response_model_exclude_none=True)
@@ -584,6 +439,7 @@ async def update_contract(
     updates: Dict[str, Any],
     db: DepDatabase,
     request: Request,
+    incremental: bool = Query(default=True, description="Reutilizar párrafos y documento no afectados por los cambios"),
     service: ContractService = Depends(get_contract_service),
     participant_service: ParticipantService = Depends(get_participant_service),
     contract_creation_service: ContractCreationService = Depends(get_contract_creation_service)
@@ -595,6 +451,7 @@ async def update_contract(
     con nueva versión automáticamente.
     Acepta contract_id como UUID (desde detalle) o como identificador de carpeta (contract_CNT-XXX).
     Si el body tiene clave "data" (respuesta de GET detail), se usa body["data"] como datos a actualizar.
+    Solo se recalcula lo afectado por los cambios (render_stats); incremental=false fuerza el render completo.
     """
     # Si el body es la respuesta de detalle ({ "success", "data", ... }), usar data
     if "data" in updates and isinstance(updates.get("data"), dict):
@@ -624,7 +481,7 @@ async def update_contract(
         if row and row.get("contract_number"):
             folder_id = f"contract_{row['contract_number']}"
     try:
-        document_result = await service.update_contract(folder_id, updates, connection=db)
+        document_result = await service.update_contract(folder_id, updates, connection=db, incremental=incremental)
         await contract_creation_service.update_contract_with_document_info(contract_id, document_result, db)
         await contract_creation_service.update_contract_data_in_db(contract_id, updates, db)
         # Persistir participantes (personas nuevas y empresas) en BD y vincularlos al contrato
@@ -639,6 +496,7 @@ async def update_contract(
             "success": document_result.get("success", True),
             "message": document_result.get("message", "Contrato actualizado exitosamente"),
             "contract_id": document_result.get("contract_id"),
+            "render_stats": document_result.get("render_stats"),
         }
     except HTTPException:
         raise
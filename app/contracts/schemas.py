@@ -124,6 +124,9 @@ class ContractResponse(BaseModel):
     drive_file_id: Optional[str] = None
     drive_link: Optional[str] = None
     drive_view_link: Optional[str] = None
+    storage_type: Optional[str] = None
+    document_status: Optional[str] = None
+    document_upload_id: Optional[int] = None
 
     # Advertencias
     warnings: Optional[Dict[str, Any]] = None
@@ -441,6 +444,7 @@ class UpdateResponse(BaseModel):
     message: str
     contract_id: Optional[str] = None
     changes: Optional[Dict[str, Any]] = None
+    render_stats: Optional[Dict[str, Any]] = None
 
 
 class UploadResponse(BaseModel):
@@ -454,7 +458,42 @@ class UploadResponse(BaseModel):
 class ContractListResponse(BaseModel):
     success: bool
     contracts: List[Dict[str, Any]]
-    total: int
+    # Solo con include_total=true
+    total: Optional[int] = None
+    count: int = 0
+    has_more: bool = False
+    next_cursor: Optional[str] = None
+
+
+class KpiTotals(BaseModel):
+    """Agregados de un préstamo o de la cartera en una moneda"""
+    currency: str
+    loan_amount: float = 0
+    total_paid: float = 0
+    outstanding_principal: float = 0
+    pending_interest: float = 0
+    total_pending: float = 0
+    payments_made: int = 0
+    payments_total: int = 0
+    overdue_payments: int = 0
+    progress_percentage: float = 0
+    refreshed_at: Optional[datetime] = None
+
+
+class PortfolioKpi(KpiTotals):
+    contracts: int = 0
+
+
+class LoanKpi(KpiTotals):
+    contract_loan_id: int
+    contract_id: str
+
+
+class ContractKpiResponse(BaseModel):
+    success: bool
+    portfolio: List[PortfolioKpi]
+    loans: Optional[List[LoanKpi]] = None
+    refreshed_at: Optional[datetime] = None
 
 
 class ContractServiceItem(BaseModel):
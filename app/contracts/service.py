@@ -1,14 +1,17 @@
 from pathlib import Path
 from typing import Dict, Any, Optional
 from fastapi import HTTPException, UploadFile
+import logging
 import os
 
 from app.contracts.services.contract_list_service import ContractListService
 from app.contracts.services.contract_generation_service import ContractGenerationService
 from app.contracts.services.contract_file_service import ContractFileService
 from app.contracts.services.contract_template_service import ContractTemplateService
-from app.contracts.services.contract_metadata_service import ContractMetadataService
 from app.contracts.utils.file_handlers import ensure_directories
+from app.storage import get_document_store, resolve_backend
+
+log = logging.getLogger(__name__)
 
 
 class ContractService:
@@ -20,8 +23,15 @@ class ContractService:
         self.template_dir = self.base_dir / "templates"
         self.contracts_dir = self.base_dir / "generated_contracts"
         
-        # Solo crear directorios si NO se usa Google Drive
-        if not self.use_google_drive:
+        # Backend de documentos (local, Google Drive o S3)
+        try:
+            self.store = get_document_store(resolve_backend(use_google_drive))
+        except Exception as e:
+            log.warning("Document store unavailable, falling back to local storage: %s", e)
+            self.store = get_document_store("local")
+
+        # Solo crear el directorio de contratos si el backend es local
+        if not self.store.is_remote:
             ensure_directories(self.base_dir, self.template_dir, self.contracts_dir)
         else:
             # Solo crear directorio de templates (necesario para las plantillas)
@@ -32,11 +42,12 @@ class ContractService:
         self.generation_service = ContractGenerationService(
             self.template_dir, 
             self.contracts_dir, 
-            use_google_drive
+            use_google_drive,
+            store=self.store
         )
-        self.file_service = ContractFileService(self.contracts_dir)
+        self.file_service = self.generation_service.file_service
         self.template_service = ContractTemplateService(self.template_dir)
-        self.metadata_service = ContractMetadataService(self.contracts_dir)
+        self.metadata_service = self.generation_service.metadata_service
 
     async def list_contracts(self, db=None) -> Dict[str, Any]:
         """Listar todos los contratos"""
@@ -46,17 +57,19 @@ class ContractService:
         """Generar contrato completo"""
         return await self.generation_service.generate_contract(data, connection)
 
-    async def update_contract(self, contract_id: str, updates: Dict[str, Any], connection=None) -> Dict[str, Any]:
+    async def update_contract(
+        self, contract_id: str, updates: Dict[str, Any], connection=None, incremental: bool = True
+    ) -> Dict[str, Any]:
         """Modificar contrato existente"""
-        return await self.generation_service.update_contract(contract_id, updates, connection)
+        return await self.generation_service.update_contract(contract_id, updates, connection, incremental)
 
     async def upload_attachment(self, contract_id: str, file: UploadFile) -> Dict[str, Any]:
         """Subir archivo adjunto al contrato"""
         return await self.file_service.upload_attachment(contract_id, file)
 
-    def get_contract_file(self, contract_id: str) -> Optional[bytes]:
+    async def get_contract_file(self, contract_id: str) -> Optional[bytes]:
         """Obtener contenido del archivo del contrato"""
-        return self.file_service.get_contract_file(contract_id)
+        return await self.file_service.get_contract_file(contract_id)
 
     def delete_contract_files(self, contract_id: str) -> bool:
         """Eliminar todos los archivos del contrato"""
@@ -78,21 +91,21 @@ class ContractService:
         """Validar datos para la plantilla"""
         return self.template_service.validate_template_data(data)
 
-    def get_contract_metadata(self, contract_id: str) -> Optional[Dict[str, Any]]:
+    async def get_contract_metadata(self, contract_id: str, connection=None) -> Optional[Dict[str, Any]]:
         """Obtener metadatos del contrato"""
-        return self.metadata_service.load_contract_metadata(contract_id)
+        return await self.metadata_service.load_contract_metadata(contract_id, connection)
 
-    def update_contract_metadata(self, contract_id: str, updates: Dict[str, Any]) -> bool:
+    async def update_contract_metadata(self, contract_id: str, updates: Dict[str, Any], connection=None) -> bool:
         """Actualizar metadatos del contrato"""
-        return self.metadata_service.update_contract_metadata(contract_id, updates)
+        return await self.metadata_service.update_contract_metadata(contract_id, updates, connection)
 
-    def get_contract_version(self, contract_id: str) -> int:
+    async def get_contract_version(self, contract_id: str, connection=None) -> int:
         """Obtener versión actual del contrato"""
-        return self.metadata_service.get_contract_version(contract_id)
+        return await self.metadata_service.get_contract_version(contract_id, connection)
 
-    def contract_exists(self, contract_id: str) -> bool:
+    async def contract_exists(self, contract_id: str, connection=None) -> bool:
         """Verificar si existe un contrato"""
-        return self.metadata_service.contract_exists(contract_id)
+        return await self.metadata_service.contract_exists(contract_id, connection)
 
     # Métodos de compatibilidad con el servicio original
     def _generate_contract_id(self, prefix: str = "contract") -> str:
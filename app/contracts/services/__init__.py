@@ -3,11 +3,14 @@ from .contract_generation_service import ContractGenerationService
 from .contract_file_service import ContractFileService
 from .contract_template_service import ContractTemplateService
 from .contract_metadata_service import ContractMetadataService
+from .contract_batch_service import ContractBatchService, BatchStageLimits
 
 __all__ = [
     "ContractListService",
     "ContractGenerationService", 
     "ContractFileService",
     "ContractTemplateService",
-    "ContractMetadataService"
+    "ContractMetadataService",
+    "ContractBatchService",
+    "BatchStageLimits"
 ]
@@ -0,0 +1,253 @@
+"""Generación masiva de contratos con un pipeline por etapas.
+
+Cada contrato del lote pasa por validación, registro de participantes/contrato,
+renderizado del documento y almacenamiento (local o Google Drive). Cada etapa
+tiene su propio límite de concurrencia para que el renderizado (CPU) no compita
+con las llamadas a la BD ni con las subidas a Drive.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Union
+
+from fastapi import HTTPException
+
+from app.contracts.contract_creation_service import ContractCreationService
+from app.contracts.participant_service import ParticipantService
+from app.contracts.utils.validators import validate_contract_data
+from app.database import engine
+
+log = logging.getLogger(__name__)
+
+BATCH_STAGES = ("validate", "persist", "render", "upload")
+
+
+class BatchPayloadError(ValueError):
+    """Línea del lote que no se pudo interpretar como un payload de contrato"""
+
+
+@dataclass
+class BatchStageLimits:
+    """Número máximo de contratos que pueden estar a la vez en cada etapa"""
+    validate: int = 8
+    persist: int = 4
+    render: int = 2
+    upload: int = 4
+
+    @property
+    def max_in_flight(self) -> int:
+        """Contratos aceptados a la vez en el pipeline (acota la memoria del lote)"""
+        return 2 * (self.validate + self.persist + self.render + self.upload)
+
+
+@dataclass
+class _BatchStats:
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    stage_seconds: Dict[str, float] = field(default_factory=lambda: {stage: 0.0 for stage in BATCH_STAGES})
+
+
+def parse_contract_batch(raw: Union[bytes, str], content_type: Optional[str] = None) -> Iterator[Union[Dict[str, Any], BatchPayloadError]]:
+    """
+    Interpretar el cuerpo de un lote de contratos.
+
+    Acepta una lista JSON, un objeto {"contracts": [...]} o NDJSON (un payload por línea).
+    Las líneas NDJSON inválidas se devuelven como BatchPayloadError para que se
+    reporten como error del ítem sin abortar el resto del lote.
+    """
+    text = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+    is_ndjson = bool(content_type and "ndjson" in content_type)
+
+    if not is_ndjson and text.lstrip()[:1] in ("[", "{"):
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            # Un objeto por línea también empieza por "{"
+            parsed = None
+        if isinstance(parsed, dict) and isinstance(parsed.get("contracts"), list):
+            parsed = parsed["contracts"]
+        if isinstance(parsed, list):
+            for item in parsed:
+                yield item if isinstance(item, dict) else BatchPayloadError("Cada contrato debe ser un objeto JSON")
+            return
+        if isinstance(parsed, dict):
+            yield parsed
+            return
+
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield BatchPayloadError(f"Línea {line_number}: JSON inválido ({e.msg})")
+            continue
+        yield item if isinstance(item, dict) else BatchPayloadError(f"Línea {line_number}: se esperaba un objeto JSON")
+
+
+async def _aiter_payloads(payloads: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if hasattr(payloads, "__aiter__"):
+        async for payload in payloads:
+            yield payload
+    else:
+        for payload in payloads:
+            yield payload
+
+
+class ContractBatchService:
+    """Servicio para generar lotes de contratos con paralelismo acotado por etapa"""
+
+    def __init__(
+        self,
+        contract_service,
+        participant_service: ParticipantService,
+        creation_service: ContractCreationService,
+        limits: Optional[BatchStageLimits] = None,
+        connection_factory: Callable = engine.connect,
+    ):
+        self.generation_service = contract_service.generation_service
+        self.participant_service = participant_service
+        self.creation_service = creation_service
+        self.limits = limits or BatchStageLimits()
+        self.connection_factory = connection_factory
+        self._semaphores = {
+            stage: asyncio.Semaphore(max(1, getattr(self.limits, stage))) for stage in BATCH_STAGES
+        }
+
+    @asynccontextmanager
+    async def _stage(self, stage: str, stats: _BatchStats):
+        async with self._semaphores[stage]:
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                stats.stage_seconds[stage] += time.perf_counter() - started
+
+    async def run(
+        self,
+        payloads: Union[Iterable, AsyncIterable],
+        request,
+        current_user: str,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Procesar el lote y emitir un evento por contrato a medida que termina.
+
+        El último evento es el resumen con totales y throughput.
+        """
+        stats = _BatchStats()
+        results: asyncio.Queue = asyncio.Queue()
+        in_flight = asyncio.Semaphore(self.limits.max_in_flight)
+        tasks: set = set()
+        started = time.perf_counter()
+
+        async def process(index: int, payload) -> None:
+            try:
+                results.put_nowait(await self._process_item(index, payload, request, current_user, stats))
+            finally:
+                in_flight.release()
+
+        async def feed() -> None:
+            index = 0
+            try:
+                async for payload in _aiter_payloads(payloads):
+                    await in_flight.acquire()
+                    task = asyncio.create_task(process(index, payload))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    index += 1
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                results.put_nowait(None)
+
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                event = await results.get()
+                if event is None:
+                    break
+                yield event
+            await feeder
+        finally:
+            if not feeder.done():
+                feeder.cancel()
+            for task in list(tasks):
+                task.cancel()
+
+        elapsed = time.perf_counter() - started
+        yield {
+            "event": "summary",
+            "total": stats.total,
+            "succeeded": stats.succeeded,
+            "failed": stats.failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "contracts_per_second": round(stats.total / elapsed, 3) if elapsed > 0 else None,
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in stats.stage_seconds.items()},
+            "limits": {stage: getattr(self.limits, stage) for stage in BATCH_STAGES},
+        }
+
+    async def _process_item(self, index: int, payload, request, current_user: str, stats: _BatchStats) -> Dict[str, Any]:
+        """Ejecutar las cuatro etapas para un contrato y devolver su evento de resultado"""
+        stats.total += 1
+        started = time.perf_counter()
+        stage = "validate"
+        persisted = None
+        event: Dict[str, Any] = {"event": "item", "index": index}
+
+        try:
+            async with self._stage("validate", stats):
+                if isinstance(payload, Exception):
+                    raise payload
+                validate_contract_data(payload)
+
+            async with self.connection_factory() as db:
+                stage = "persist"
+                async with self._stage("persist", stats):
+                    persisted = await self.creation_service.persist_contract_payload(
+                        payload, db, request, current_user, self.participant_service
+                    )
+
+                stage = "render"
+                async with self._stage("render", stats):
+                    generation_payload = self.creation_service.build_generation_payload(payload, persisted)
+                    rendered = await self.generation_service.render_contract(generation_payload, connection=db)
+
+            stage = "upload"
+            async with self._stage("upload", stats):
+                document_result = await self.generation_service.store_contract(rendered)
+
+            async with self.connection_factory() as db:
+                await self.creation_service.update_contract_with_document_info(
+                    persisted["contract_id"], document_result, db
+                )
+
+            response = self.creation_service.build_contract_response(payload, persisted, document_result)
+            event.update({
+                "success": True,
+                "contract_id": response.contract_id,
+                "contract_number": response.contract_number,
+                "path": response.path,
+                "folder_path": response.folder_path,
+                "drive_success": response.drive_success,
+            })
+            stats.succeeded += 1
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                error = e.detail
+            else:
+                log.error("Error generating contract %s of batch", index, exc_info=e)
+                error = str(e)
+            event.update({"success": False, "stage": stage, "error": error})
+            if persisted:
+                event["contract_id"] = str(persisted["contract_id"])
+                event["contract_number"] = persisted["contract_number"]
+            stats.failed += 1
+
+        event["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return event
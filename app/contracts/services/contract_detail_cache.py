@@ -0,0 +1,194 @@
+"""Cache de la respuesta de /contracts/{id}/detail.
+
+Guarda el JSON ya normalizado y serializado (con su ETag) indexado por UUID y por
+número de contrato, acotado por bytes con desalojo LRU. Se invalida con las
+notificaciones contract_changed que emiten los triggers de
+migrations/005_contract_changed_notify.sql y 010_contract_changed_person_details.sql
+(documentos y direcciones de los participantes); sin LISTEN activo no se sirve nada
+desde el cache, para no devolver datos que otro proceso pudo haber cambiado.
+"""
+
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import asyncpg
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+CONTRACT_CHANGED_CHANNEL = "contract_changed"
+
+# Coste fijo aproximado por entrada (claves, objetos) además del cuerpo
+ENTRY_OVERHEAD_BYTES = 256
+
+
+@dataclass(frozen=True)
+class CachedDetail:
+    """Respuesta de detalle lista para enviar"""
+    contract_id: str
+    contract_number: Optional[str]
+    body: bytes
+    etag: str
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + ENTRY_OVERHEAD_BYTES
+
+
+def detail_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class ContractDetailCache:
+    """LRU de respuestas de detalle acotado por tamaño total en bytes"""
+
+    def __init__(self, max_bytes: int = settings.CONTRACT_DETAIL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.enabled = False
+        self.size = 0
+        self._entries: "OrderedDict[str, CachedDetail]" = OrderedDict()
+        self._by_number: Dict[str, str] = {}
+        # Contador de invalidaciones: una lectura empezada antes de una invalidación no se guarda
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedDetail]:
+        """Entrada por UUID o número de contrato"""
+        if not self.enabled:
+            return None
+        contract_id = self._by_number.get(key, key)
+        entry = self._entries.get(contract_id)
+        if entry is not None:
+            self._entries.move_to_end(contract_id)
+        return entry
+
+    def put(self, entry: CachedDetail, generation: int) -> bool:
+        """Guardar la respuesta si nada se invalidó desde generation (leída antes de consultar la BD)"""
+        if not self.enabled or generation != self._generation or entry.size > self.max_bytes:
+            return False
+        self._discard(entry.contract_id)
+        self._entries[entry.contract_id] = entry
+        if entry.contract_number:
+            self._by_number[entry.contract_number] = entry.contract_id
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+        return True
+
+    def _discard(self, contract_id: str) -> None:
+        entry = self._entries.pop(contract_id, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+        if entry.contract_number and self._by_number.get(entry.contract_number) == contract_id:
+            del self._by_number[entry.contract_number]
+
+    def invalidate(self, key: str) -> None:
+        """Olvidar el detalle de un contrato (UUID o número)"""
+        self._generation += 1
+        self._discard(self._by_number.get(str(key), str(key)))
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        self._by_number.clear()
+        self.size = 0
+
+
+contract_detail_cache = ContractDetailCache()
+
+
+class ContractDetailCacheListener:
+    """
+    Mantiene LISTEN contract_changed en una conexión propia y activa el cache mientras dure.
+
+    extra_caches son otros caches por contrato (p. ej. el del cronograma de pagos) que
+    se invalidan con las mismas notificaciones; deben ofrecer enabled, invalidate y clear.
+    """
+
+    def __init__(self, db_pool: asyncpg.Pool, cache: Optional[ContractDetailCache] = contract_detail_cache,
+                 retry_seconds: float = 5.0, extra_caches: Sequence = ()):
+        self.db_pool = db_pool
+        self.cache = cache
+        self.caches = tuple(c for c in (cache, *extra_caches) if c is not None)
+        self.retry_seconds = retry_seconds
+        self._connection: Optional[asyncpg.Connection] = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def _set_enabled(self, enabled: bool) -> None:
+        for cache in self.caches:
+            cache.enabled = enabled
+            if not enabled:
+                cache.clear()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        for cache in self.caches:
+            cache.invalidate(payload)
+
+    def _on_terminate(self, connection) -> None:
+        # Se pudieron perder notificaciones: vaciar y no servir desde el cache hasta reconectar
+        self._set_enabled(False)
+        self._connection = None
+        if not self._stopping:
+            log.warning("Contract detail cache LISTEN connection lost, reconnecting")
+            self._reconnect = asyncio.create_task(self._connect_forever(connection))
+
+    async def _connect(self) -> None:
+        connection = await self.db_pool.acquire()
+        try:
+            await connection.add_listener(CONTRACT_CHANGED_CHANNEL, self._on_notify)
+            connection.add_termination_listener(self._on_terminate)
+        except Exception:
+            await self.db_pool.release(connection)
+            raise
+        self._connection = connection
+        for cache in self.caches:
+            cache.clear()
+        self._set_enabled(True)
+
+    async def _connect_forever(self, lost: Optional[asyncpg.Connection] = None) -> None:
+        if lost is not None:
+            try:
+                await self.db_pool.release(lost)
+            except Exception:
+                pass
+        while not self._stopping:
+            try:
+                await self._connect()
+                return
+            except Exception:
+                log.warning("Contract detail cache LISTEN unavailable, retrying", exc_info=True)
+                await asyncio.sleep(self.retry_seconds)
+
+    async def start(self) -> None:
+        """Suscribirse a contract_changed; si no es posible el cache queda desactivado y se reintenta"""
+        try:
+            await self._connect()
+        except Exception:
+            log.warning("Contract detail cache disabled: LISTEN unavailable", exc_info=True)
+            self._reconnect = asyncio.create_task(self._connect_forever())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._set_enabled(False)
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.remove_termination_listener(self._on_terminate)
+                await connection.remove_listener(CONTRACT_CHANGED_CHANNEL, self._on_notify)
+            finally:
+                await self.db_pool.release(connection)
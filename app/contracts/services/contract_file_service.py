@@ -1,14 +1,18 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 from fastapi import HTTPException, UploadFile
+import json
 import shutil
 from app.contracts.utils.file_handlers import (
-    get_contract_folder, 
     get_contract_file_path, 
     get_attachments_folder,
     count_attachments,
-    get_file_size
+    get_file_size,
+    contract_document_key,
+    contract_metadata_key,
+    legacy_contract_document_key
 )
+from app.storage import DOCX_MIME_TYPE, DocumentNotFound, DocumentStat, DocumentStore, LocalDocumentStore
 
 
 class ContractFileService:
@@ -17,29 +21,63 @@ class ContractFileService:
     ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.doc', '.docx', '.pdf', '.xls', '.xlsx'}
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     
-    def __init__(self, contracts_dir: Path):
+    def __init__(self, contracts_dir: Path, store: Optional[DocumentStore] = None):
         self.contracts_dir = contracts_dir
+        self.store = store or LocalDocumentStore(contracts_dir)
     
-    def save_contract_file(self, contract_id: str, content: bytes) -> str:
-        """Guardar archivo del contrato"""
-        contract_folder = get_contract_folder(self.contracts_dir, contract_id)
-        file_path = get_contract_file_path(contract_folder, contract_id)
-        
-        with open(file_path, 'wb') as f:
-            f.write(content)
-        
-        return str(file_path)
-    
-    def get_contract_file(self, contract_id: str) -> Optional[bytes]:
-        """Obtener contenido del archivo del contrato"""
-        contract_folder = self.contracts_dir / contract_id
-        file_path = get_contract_file_path(contract_folder, contract_id)
-        
-        if not file_path.exists():
+    async def save_contract_document(self, contract_id: str, content: bytes) -> Dict[str, Any]:
+        """
+        Guardar el documento del contrato en el almacenamiento.
+
+        Devuelve filename, path y folder_path (enlaces del backend), storage_type
+        y los datos propios del backend (p. ej. ids de Drive). La versión y los
+        datos del contrato se registran en la BD (ContractMetadataService).
+        """
+        stat = await self.store.put(contract_document_key(contract_id), memoryview(content), DOCX_MIME_TYPE)
+        return {
+            **stat.extra,
+            "filename": stat.key.rsplit("/", 1)[-1],
+            "path": stat.link,
+            "folder_path": await self.store.link(contract_id),
+            "storage_type": self.store.name,
+        }
+
+    async def load_contract_metadata(self, contract_id: str) -> Optional[Dict[str, Any]]:
+        """Cargar el metadata.json heredado (contratos generados antes del índice en BD)"""
+        try:
+            return json.loads(await self.store.get(contract_metadata_key(contract_id)))
+        except DocumentNotFound:
             return None
-        
-        with open(file_path, 'rb') as f:
-            return f.read()
+
+    async def stat_contract_file(self, contract_id: str) -> Optional[DocumentStat]:
+        """Metadatos del documento del contrato (también con el nombre antiguo contract_X.docx)"""
+        found = await self.find_contract_file(contract_id)
+        return found[1] if found else None
+
+    async def find_contract_file(self, contract_id: str) -> Optional[Tuple[DocumentStore, DocumentStat]]:
+        """
+        Backend y metadatos del documento del contrato.
+
+        Con un backend remoto se busca también en la carpeta local, donde quedan
+        los contratos generados antes de cambiar de backend.
+        """
+        stores = [self.store]
+        if self.store.is_remote:
+            stores.append(LocalDocumentStore(self.contracts_dir))
+        for store in stores:
+            for key in (contract_document_key(contract_id), legacy_contract_document_key(contract_id)):
+                stat = await store.stat(key)
+                if stat is not None:
+                    return store, stat
+        return None
+
+    async def get_contract_file(self, contract_id: str) -> Optional[bytes]:
+        """Obtener contenido completo del archivo del contrato (para descargas usar find_contract_file y stream)"""
+        found = await self.find_contract_file(contract_id)
+        if found is None:
+            return None
+        store, stat = found
+        return await store.get(stat.key)
     
     def delete_contract_files(self, contract_id: str) -> bool:
         """Eliminar todos los archivos del contrato"""
@@ -57,9 +95,7 @@ class ContractFileService:
     
     async def upload_attachment(self, contract_id: str, file: UploadFile) -> Dict[str, Any]:
         """Subir archivo adjunto al contrato"""
-        contract_folder = self.contracts_dir / contract_id
-
-        if not contract_folder.exists():
+        if await self.find_contract_file(contract_id) is None:
             raise HTTPException(404, "Contrato no encontrado")
 
         # Validar archivo
@@ -73,18 +109,14 @@ class ContractFileService:
             raise HTTPException(400, "Archivo demasiado grande (máximo 10MB)")
 
         # Guardar archivo
-        attachments_folder = get_attachments_folder(contract_folder)
-        file_path = attachments_folder / file.filename
-
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        stat = await self.store.put(f"{contract_id}/attachments/{Path(file.filename).name}", content, file.content_type)
 
         return {
             "success": True,
             "message": "Archivo subido exitosamente",
             "filename": file.filename,
             "size": len(content),
-            "path": str(file_path)
+            "path": stat.link
         }
     
     def get_contract_info(self, contract_id: str) -> Optional[Dict[str, Any]]:
@@ -1,52 +1,63 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set
 from pathlib import Path
 from fastapi import HTTPException
 import asyncio
-import shutil
+import logging
+import time
 
 from app.contracts.processors.contract_data_processor import ContractDataProcessor
+from app.contracts.processors.incremental_render import (
+    ParagraphEntry, RenderManifest, RenderStats, TrackingDict, changed_keys, paragraph_jobs, render_paragraph,
+)
 from app.contracts.services.contract_template_service import ContractTemplateService
 from app.contracts.services.contract_file_service import ContractFileService
 from app.contracts.services.contract_metadata_service import ContractMetadataService
-from app.contracts.utils.google_drive_utils import GoogleDriveUtils
-from app.contracts.utils.file_handlers import get_contract_folder
 from app.config import settings
+from app.storage import DocumentStore, get_document_store, resolve_backend
+from app.uploads.models import UPLOAD_PENDING
 from app.utils.email_services import send_email, load_email_template
 
+log = logging.getLogger(__name__)
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
 
 class ContractGenerationService:
     """Servicio principal para generación de contratos"""
     
-    def __init__(self, template_dir: Path, contracts_dir: Path, use_google_drive: bool = True):
+    def __init__(
+        self, template_dir: Path, contracts_dir: Path, use_google_drive: bool = True, store: Optional[DocumentStore] = None
+    ):
         self.template_dir = template_dir
         self.contracts_dir = contracts_dir
         self.use_google_drive = use_google_drive
+        self.store = store or get_document_store(resolve_backend(use_google_drive))
         
         # Inicializar servicios
         self.data_processor = ContractDataProcessor()
         self.template_service = ContractTemplateService(template_dir)
-        self.file_service = ContractFileService(contracts_dir)
-        self.metadata_service = ContractMetadataService(contracts_dir)
-        
-        try:
-            self.gdrive_utils = GoogleDriveUtils(use_google_drive)
-        except Exception as e:
-            # Si hay error y use_google_drive es True, esto es un problema serio
-            self.gdrive_utils = None
+        self.file_service = ContractFileService(contracts_dir, self.store)
+        self.metadata_service = ContractMetadataService()
     
     async def generate_contract(self, data: Dict[str, Any], connection: Any = None) -> Dict[str, Any]:
         """Generar contrato completo"""
+        rendered = await self.render_contract(data, connection)
+        return await self.store_contract(rendered, connection=connection)
+
+    async def render_contract(self, data: Dict[str, Any], connection: Any = None) -> Dict[str, Any]:
+        """
+        Renderizar el documento del contrato sin almacenarlo.
+
+        Devuelve un dict con contract_id, template_path, processed_data, doc_content
+        y render_manifest que se pasa tal cual a store_contract.
+        """
         contract_number = data.get("contract_number")
         if not contract_number:
             raise HTTPException(400, "El número de contrato es requerido para generar el contrato.")
 
         contract_id = f"contract_{contract_number}"
-        
-        # Solo crear carpeta local si NO se usa Google Drive
-        if not self.use_google_drive:
-            contract_folder = get_contract_folder(self.contracts_dir, contract_id)
-        else:
-            contract_folder = None
 
         try:
             # Seleccionar plantilla
@@ -56,132 +67,119 @@ class ContractGenerationService:
             processed_data = self.data_processor.flatten_data(data)
 
             # Process paragraphs from database if connection exists
+            manifest = RenderManifest(template_name=template_path.name)
             if connection:
-                await self._process_paragraphs_from_db(connection, data, processed_data)
-
-            # Generar documento
-            doc_content = self.template_service.render_template(template_path, processed_data)
-
-            # Generar nombre descriptivo del archivo para la respuesta
-            contract_number = contract_id.replace("contract_", "")
-            descriptive_filename = f"{contract_number}.docx"
-
-            # Respuesta base
-            response = {
-                "success": True,
-                "message": "Contrato generado exitosamente",
-                "contract_id": contract_id,
-                "template_used": template_path.name,
-                "processed_data": processed_data,
-                "filename": descriptive_filename
-            }
-
-            # Si NO se usa Google Drive, guardar localmente
-            if not self.use_google_drive:
-                output_filename = f"{contract_id}.docx"
-                output_path = contract_folder / output_filename
-                
-                with open(output_path, 'wb') as f:
-                    f.write(doc_content)
-                
-                # Guardar metadatos localmente
-                self.metadata_service.save_contract_metadata(contract_id, processed_data, 1, "local")
-                
-                response.update({
-                    "filename": output_filename,
-                    "path": str(output_path),
-                    "folder_path": str(contract_folder)
-                })
-            else:
-                # Si se usa Google Drive, NO guardar localmente
-                response.update({
-                    "filename": f"{contract_id}.docx",
-                    "path": None,
-                    "folder_path": None,
-                    "storage_type": "google_drive_only"
-                })
+                started = time.perf_counter()
+                manifest.paragraphs = await self._process_paragraphs_from_db(connection, data, processed_data)
+                manifest.paragraphs_ms = _elapsed_ms(started)
+
+            # Generar documento fuera del event loop (docxtpl es CPU-bound)
+            started = time.perf_counter()
+            doc_content = await asyncio.to_thread(
+                self.template_service.render_template, template_path, processed_data
+            )
+            manifest.render_ms = _elapsed_ms(started)
+        except Exception as e:
+            raise HTTPException(400, f"Error generando contrato: {str(e)}")
 
-            # Upload to Google Drive if enabled
-            if self.use_google_drive:
-                if not self.gdrive_utils:
-                    response.update({
-                        "drive_success": False,
-                        "drive_error": "GoogleDriveUtils no inicializado correctamente",
-                        "drive_warning": "Google Drive está habilitado pero el servicio no está disponible"
-                    })
-                else:
-                    # Crear archivo temporal solo para subir a Drive
-                    import tempfile
-                    import os
-
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_file:
-                        temp_file.write(doc_content)
-                        temp_file_path = temp_file.name
-
-                    try:
-                        drive_result = self.gdrive_utils.upload_contract(contract_id, temp_file_path, processed_data)
-                        response.update(drive_result)
-
-                        # Si la subida a Drive fue exitosa, actualizar path y folder_path con las URLs de Drive
-                        if drive_result.get("drive_success") and drive_result.get("drive_link"):
-                            response["path"] = drive_result.get("drive_view_link")
-                            response["folder_path"] = drive_result.get("drive_link")
-                        elif not drive_result.get("drive_success"):
-                            # Incluir el error en la respuesta para debugging
-                            error_msg = drive_result.get("drive_error") or drive_result.get("drive_warning", "Error desconocido")
-                            response["drive_error"] = error_msg
-
-                        # Enviar email si hay enlace de Drive
-                        #if drive_result.get("drive_link"):
-                        #    await self._send_contract_email(contract_id, processed_data, drive_result['drive_link'])
-                    except Exception as e:
-                        response["drive_success"] = False
-                        response["drive_error"] = str(e)
-                    finally:
-                        # Limpiar archivo temporal
-                        if os.path.exists(temp_file_path):
-                            os.unlink(temp_file_path)
+        return {
+            "contract_id": contract_id,
+            "template_path": template_path,
+            "processed_data": processed_data,
+            "doc_content": doc_content,
+            "render_manifest": manifest,
+        }
 
-            return response
+    async def store_contract(self, rendered: Dict[str, Any], defer_upload: bool = False, connection: Any = None) -> Dict[str, Any]:
+        """
+        Guardar en el almacenamiento de documentos un contrato ya renderizado
+        y registrar su versión en contract_document.
 
-        except Exception as e:
-            # Clean up on error (only if local folder was created)
-            if contract_folder and contract_folder.exists():
-                shutil.rmtree(contract_folder)
-            raise HTTPException(400, f"Error generando contrato: {str(e)}")
+        Con defer_upload y un backend remoto no se sube nada: la respuesta queda con
+        document_status "pending" y el llamador registra la subida en el outbox.
+        La versión se registra en la transacción de connection (o con commit propio si no hay).
+        """
+        contract_id = rendered["contract_id"]
+        template_path = rendered["template_path"]
+        processed_data = rendered["processed_data"]
+        doc_content = rendered["doc_content"]
 
-    async def update_contract(self, contract_id: str, updates: Dict[str, Any], connection=None) -> Dict[str, Any]:
-        """Modificar contrato existente"""
-        
-        # Solo buscar carpeta local si NO se usa Google Drive
-        if not self.use_google_drive:
-            contract_folder = self.contracts_dir / contract_id
-            if not contract_folder.exists():
-                raise HTTPException(404, "Contrato no encontrado")
+        contract_number = contract_id.replace("contract_", "")
+
+        # Respuesta base
+        response = {
+            "success": True,
+            "message": "Contrato generado exitosamente",
+            "contract_id": contract_id,
+            "template_used": template_path.name,
+            "processed_data": processed_data,
+            "filename": f"{contract_number}.docx",
+            "path": None,
+            "folder_path": None,
+            "storage_type": self.store.name
+        }
+
+        if defer_upload and self.store.is_remote:
+            response["document_status"] = UPLOAD_PENDING
         else:
-            contract_folder = None
+            try:
+                response.update(await self.file_service.save_contract_document(contract_id, doc_content))
+            except Exception as e:
+                raise HTTPException(400, f"Error generando contrato: {str(e)}")
+
+        manifest = rendered.get("render_manifest")
+        response["version"] = await self.metadata_service.record_version(
+            contract_id, processed_data, self.store.name, response["path"],
+            render_manifest=manifest.to_dict() if manifest else None, connection=connection
+        )
+        return response
 
-        # Cargar metadatos existentes (solo si no se usa Google Drive)
-        metadata = None
-        if not self.use_google_drive:
-            metadata = self.metadata_service.load_contract_metadata(contract_id)
-            if not metadata:
-                raise HTTPException(404, "Metadatos del contrato no encontrados")
+    async def update_contract(
+        self, contract_id: str, updates: Dict[str, Any], connection=None, incremental: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Modificar contrato existente
+
+        Con incremental (y un manifiesto del render anterior) solo se recalculan los
+        párrafos que leen variables modificadas, y si ninguna variable de la plantilla
+        cambió se conserva el documento ya guardado. render_stats resume lo reutilizado
+        y el tiempo ahorrado frente al último render completo.
+        """
+        started = time.perf_counter()
+        stats = RenderStats()
+
+        # Cargar metadatos existentes (BD; metadata.json si el contrato aún no se importó)
+        metadata = await self.metadata_service.load_contract_metadata(contract_id, connection)
+        legacy_version = 0
+        if metadata is None:
+            metadata = await self.file_service.load_contract_metadata(contract_id)
+            legacy_version = (metadata or {}).get("version", 0)
+        if not metadata and not self.store.is_remote:
+            raise HTTPException(404, "Contrato no encontrado")
 
         # Combinar datos existentes con actualizaciones
-        original_data = metadata["original_data"] if metadata else {}
+        original_data = (metadata or {}).get("original_data", {})
         updated_data = {**original_data, **updates}
 
         # Regenerar contrato
         template_path = self.template_service.select_template(updated_data)
         processed_data = self.data_processor.flatten_data(updated_data)
 
+        previous = RenderManifest.from_dict((metadata or {}).get("render_manifest")) if incremental else None
+        manifest = RenderManifest(template_name=template_path.name)
+
         # Process paragraphs from database if connection exists
         if connection:
-            await self._process_paragraphs_from_db(connection, updated_data, processed_data)
-
-        # Renderizar plantilla
-        doc_content = self.template_service.render_template(template_path, processed_data)
+            paragraphs_started = time.perf_counter()
+            manifest.paragraphs = await self._process_paragraphs_from_db(
+                connection, updated_data, processed_data, previous,
+                changed_keys(original_data, processed_data) if previous else None, stats
+            )
+            manifest.paragraphs_ms = _elapsed_ms(paragraphs_started)
+            if previous and stats.paragraphs_reused:
+                # Se guarda el coste completo para estimar el ahorro de la próxima vez
+                stats.estimated_full_ms += previous.paragraphs_ms - manifest.paragraphs_ms
+                manifest.paragraphs_ms = previous.paragraphs_ms
 
         # Respuesta base
         response = {
@@ -192,211 +190,156 @@ class ContractGenerationService:
             "filename": f"{contract_id}.docx"
         }
 
-        # Si NO se usa Google Drive, guardar localmente
-        if not self.use_google_drive:
-            contract_number = contract_id.replace("contract_", "")
-            output_filename = f"{contract_number}.docx"
-            output_path = contract_folder / output_filename
-            with open(output_path, 'wb') as f:
-                f.write(doc_content)
+        # Sin cambios en las variables que usa la plantilla el documento anterior sigue valiendo
+        reused = None
+        if previous and previous.template_name == template_path.name:
+            template_variables = self.template_service.get_template_variables(template_path)
+            if template_variables is not None and not template_variables & changed_keys(original_data, processed_data):
+                reused = await self.file_service.find_contract_file(contract_id)
 
-            new_version = self.metadata_service.increment_version(contract_id)
-            self.metadata_service.save_contract_metadata(contract_id, processed_data, new_version)
+        try:
+            if reused is not None:
+                store, stat = reused
+                response.update({
+                    **stat.extra,
+                    "filename": stat.key.rsplit("/", 1)[-1],
+                    "path": stat.link,
+                    "folder_path": await store.link(contract_id),
+                    "storage_type": store.name,
+                })
+                stats.document_reused = True
+                stats.estimated_full_ms += previous.render_ms
+                manifest.render_ms = previous.render_ms
+            else:
+                # Renderizar plantilla
+                render_started = time.perf_counter()
+                doc_content = await asyncio.to_thread(
+                    self.template_service.render_template, template_path, processed_data
+                )
+                manifest.render_ms = _elapsed_ms(render_started)
 
-            response.update({
-                "version": new_version,
-                "path": str(output_path),
-                "folder_path": str(contract_folder),
-                "filename": output_filename
-            })
-        else:
-            # Si se usa Google Drive, NO guardar localmente
+                # Guardar documento y registrar la nueva versión (incremento atómico en la BD)
+                response.update(await self.file_service.save_contract_document(contract_id, doc_content))
+        except HTTPException:
+            raise
+        except Exception as e:
             response.update({
                 "version": None,
                 "path": None,
                 "folder_path": None,
-                "storage_type": "google_drive_only"
+                "storage_type": self.store.name,
+                "storage_error": str(e)
             })
+            return response
 
-        # Upload to Google Drive si está habilitado y el cliente se inicializó correctamente
-        if self.use_google_drive and self.gdrive_utils is not None:
-            import tempfile
-            import os
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_file:
-                temp_file.write(doc_content)
-                temp_file_path = temp_file.name
-
-            try:
-                drive_result = self.gdrive_utils.upload_contract(contract_id, temp_file_path, processed_data)
-                response.update(drive_result)
-
-                if drive_result.get("drive_success") and drive_result.get("drive_link"):
-                    response["path"] = drive_result.get("drive_view_link")
-                    response["folder_path"] = drive_result.get("drive_link")
-            finally:
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
+        response["version"] = await self.metadata_service.record_version(
+            contract_id, processed_data, self.store.name, response["path"], legacy_version,
+            render_manifest=manifest.to_dict(), connection=connection
+        )
 
+        stats.elapsed_ms = _elapsed_ms(started)
+        stats.estimated_full_ms += stats.elapsed_ms
+        response["render_stats"] = stats.to_dict()
+        log.info("Contract %s updated: %s", contract_id, response["render_stats"])
         return response
 
-    async def _process_paragraphs_from_db(self, connection: Any, data: Dict[str, Any], processed_data: Dict[str, Any]) -> None:
-        """Procesar párrafos desde la base de datos"""
-        try:
-            from app.contracts.paragraphs import get_all_paragraphs_for_contract, get_paragraph_from_db, process_paragraph
-
-            # Si existe paragraph_request, usarlo para obtener los párrafos específicos
-            if "paragraph_request" in data:
-                paragraphs_result = {}
-                paragraph_errors = []
-                
-                # Mapeo de secciones a variables de Word (igual que en get_all_paragraphs_for_contract)
-                section_mapping = {
-                    'identification': 'client_paragraph',  # Will be overwritten based on person_role
-                    'investors': 'investor_paragraph',
-                    'clients': 'client_paragraph',
-                    'witnesses': 'witness_paragraph',
-                    'notaries': 'notary_paragraph',
-                    'guarantees': 'guarantee_paragraph',
-                    'terms_conditions': 'terms_paragraph',
-                    'payment_terms': 'payment_paragraph',
-                    'legal_clauses': 'legal_paragraph',
-                    'signatures': 'signature_paragraph'
-                }
-
-                for req in data["paragraph_request"]:
-                    try:
-                        person_role = req.get("person_role")
-                        contract_type_db = req.get("contract_type")
-                        section = req.get("section")
-                        contract_services = req.get("contract_services", contract_type_db)
-
-                        template = await get_paragraph_from_db(
-                            connection,
-                            person_role=person_role,
-                            contract_type=contract_type_db,
-                            section=section,
-                            contract_services=contract_services
-                        )
+    async def _process_paragraphs_from_db(
+        self,
+        connection: Any,
+        data: Dict[str, Any],
+        processed_data: Dict[str, Any],
+        previous: Optional[RenderManifest] = None,
+        changed: Optional[Set[str]] = None,
+        stats: Optional[RenderStats] = None,
+    ) -> Dict[str, ParagraphEntry]:
+        """
+        Procesar párrafos desde la base de datos.
+
+        Con previous (manifiesto del render anterior) y changed (variables aplanadas
+        modificadas) se reutilizan los párrafos cuyas variables no cambiaron, y las
+        plantillas de párrafo ya leídas, sin consultar la BD.
+        Devuelve las entradas del manifiesto de este render.
+        """
+        from app.contracts.paragraphs import get_paragraph_from_db
+
+        stats = stats if stats is not None else RenderStats()
+        entries: Dict[str, ParagraphEntry] = {}
+        request_mode = "paragraph_request" in data
+        paragraphs_result = {}
+        paragraph_errors = []
+        # Sin paragraph_request los párrafos se aplican al final (los de inversionista prevalecen)
+        auto_paragraphs = {}
 
-                        if template:
-                            # Determine word_variable first to check if we need multiple clients logic
-                            word_variable = section_mapping.get(section)
-                            if section == 'identification':
-                                # For identification, use person_role to determine the variable
-                                word_variable = 'client_paragraph' if person_role == 'client' else 'investor_paragraph'
-                            
-                            # Handle multiple clients for client_paragraph
-                            if word_variable == 'client_paragraph':
-                                clients_count = processed_data.get('clients_count', 0)
-                                has_multiple_clients = clients_count > 1 or 'client2_full_name' in processed_data
-                                
-                                if has_multiple_clients:
-                                    from app.contracts.paragraphs import _process_multiple_clients_paragraph
-                                    processed = _process_multiple_clients_paragraph(template, processed_data, clients_count)
-                                else:
-                                    processed = process_paragraph(template, processed_data)
-                            else:
-                                processed = process_paragraph(template, processed_data)
-                            
-                            if word_variable:
-                                paragraphs_result[word_variable] = processed
-                                # Also add directly to processed_data for template compatibility
-                                processed_data[word_variable] = processed
-                                print(f"✅ Párrafo procesado: {word_variable} (desde {person_role}_{contract_type_db}_{section})")
-                            else:
-                                # If no mapping, use original key
-                                key = f"{person_role}_{contract_type_db}_{section}"
-                                paragraphs_result[key] = processed
+        try:
+            for job in paragraph_jobs(data):
+                try:
+                    cached = previous.paragraphs.get(job.cache_key) if previous else None
+                    if cached is not None and changed is not None and not changed.intersection(cached.deps):
+                        entry = cached
+                        stats.paragraphs_reused += 1
+                    else:
+                        if cached is not None:
+                            template = cached.template
                         else:
-                            # If paragraph not found, use default one
-                            default_template = f"Párrafo por defecto para {person_role} - {section}"
-                            word_variable = section_mapping.get(section)
-                            if section == 'identification':
-                                word_variable = 'client_paragraph' if person_role == 'client' else 'investor_paragraph'
-                            
-                            if word_variable:
-                                paragraphs_result[word_variable] = default_template
-                                processed_data[word_variable] = default_template
-                            else:
-                                key = f"{person_role}_{contract_type_db}_{section}"
-                                paragraphs_result[key] = default_template
-                            
-                            paragraph_errors.append({
-                                "type": "missing_paragraph",
-                                "person_role": person_role,
-                                "contract_type": contract_type_db,
-                                "section": section,
-                                "message": f"No se encontró párrafo para {person_role} - {section}"
-                            })
-
-                    except Exception as paragraph_error:
+                            template = await get_paragraph_from_db(
+                                connection,
+                                person_role=job.person_role,
+                                contract_type=job.contract_type,
+                                section=job.section,
+                                contract_services=job.contract_services
+                            )
+                            stats.db_lookups += 1
+                        entry = ParagraphEntry(template)
+                        if template:
+                            tracked = TrackingDict(processed_data)
+                            entry.output = render_paragraph(job, template, tracked)
+                            entry.deps = sorted(tracked.reads)
+                        stats.paragraphs_recomputed += 1
+                    entries[job.cache_key] = entry
+                    stats.paragraphs_total += 1
+
+                    if not request_mode:
+                        if entry.template:
+                            auto_paragraphs[job.word_variable] = entry.output
+                        continue
+
+                    text = entry.output if entry.template else job.default_text
+                    paragraphs_result[job.result_key] = text
+                    if job.word_variable:
+                        processed_data[job.word_variable] = text
+                    if not entry.template:
                         paragraph_errors.append({
-                            "type": "paragraph_error",
-                            "person_role": req.get("person_role"),
-                            "contract_type": req.get("contract_type"),
-                            "section": req.get("section"),
-                            "error": str(paragraph_error)
+                            "type": "missing_paragraph",
+                            "person_role": job.person_role,
+                            "contract_type": job.contract_type,
+                            "section": job.section,
+                            "message": f"No se encontró párrafo para {job.person_role} - {job.section}"
                         })
+
+                except Exception as paragraph_error:
+                    if not request_mode:
+                        print(f"❌ Error processing {job.section} -> {job.word_variable}: {paragraph_error}")
                         continue
+                    paragraph_errors.append({
+                        "type": "paragraph_error",
+                        "person_role": job.person_role,
+                        "contract_type": job.contract_type,
+                        "section": job.section,
+                        "error": str(paragraph_error)
+                    })
 
+            if request_mode:
                 processed_data["paragraphs_result"] = paragraphs_result
                 if paragraph_errors:
                     processed_data["paragraph_errors"] = paragraph_errors
-
             else:
-                # Previous logic: infer automatically
-                person_role = data.get("person_role")
-                if not person_role:
-                    if "clients" in data and data["clients"]:
-                        person_role = "client"
-                    elif "investors" in data and data["investors"]:
-                        person_role = "investor"
-                    else:
-                        person_role = "client"
-                contract_type_db = data.get("contract_type_db") or data.get("contract_type_person") or "juridica"
-                contract_services = data.get("contract_services") or data.get("contract_type", "mortgage")
-                
-                # Normalizar valores para asegurar compatibilidad con la base de datos
-                if person_role in ["cliente", "client"]:
-                    person_role = "client"
-                elif person_role in ["inversionista", "investor"]:
-                    person_role = "investor"
-                
-                if contract_type_db in ["juridica", "fisica_soltera", "fisica_casada"]:
-                    contract_type_db = contract_type_db
-                else:
-                    contract_type_db = "juridica"  # valor por defecto
-
-                try:
-                    # Get paragraphs for client
-                    client_paragraphs = await get_all_paragraphs_for_contract(
-                        connection,
-                        "client",
-                        contract_type_db,
-                        contract_services,
-                        processed_data
-                    )
-                    
-                    # Get paragraphs for investor
-                    investor_paragraphs = await get_all_paragraphs_for_contract(
-                        connection,
-                        "investor",
-                        contract_type_db,
-                        contract_services,
-                        processed_data
-                    )
-                    
-                    # Combine paragraphs
-                    all_paragraphs = {**client_paragraphs, **investor_paragraphs}
-                    processed_data.update(all_paragraphs)
-                    
-                except Exception as e:
-                    print(f"⚠️ Error procesando párrafos automáticos: {e}")
+                processed_data.update(auto_paragraphs)
 
         except Exception as e:
             print(f"⚠️ Error general procesando párrafos de DB: {e}")
 
+        return entries
+
     async def _send_contract_email(self, contract_id: str, processed_data: Dict[str, Any], drive_link: str) -> None:
         """Enviar email con el contrato generado"""
         try:
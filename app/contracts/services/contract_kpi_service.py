@@ -0,0 +1,236 @@
+"""KPIs precalculados de contratos y préstamos para el dashboard.
+
+contract_kpi guarda por préstamo lo pagado, el capital e interés pendientes y el
+avance; contract_kpi_portfolio los totales de la cartera por moneda. Al registrar
+un pago se recalcula solo ese préstamo y la cartera se ajusta con la diferencia
+(misma sentencia, misma transacción que el pago). KpiRefresher reconstruye todo
+periódicamente (cuotas que pasan a vencidas, préstamos borrados).
+"""
+
+import asyncio
+import logging
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import ARRAY, Integer, bindparam, select, text as sql_text
+
+from app.config import settings
+from app.contracts.models import contract_kpi, contract_kpi_portfolio
+from app.database import engine, execute, fetch_all
+
+log = logging.getLogger(__name__)
+
+# Columnas sumables (por préstamo y en la cartera)
+KPI_COLUMNS = (
+    "loan_amount", "total_paid", "outstanding_principal", "pending_interest", "total_pending",
+    "payments_made", "payments_total", "overdue_payments",
+)
+
+# Lock de aplicación para que dos workers no reconstruyan a la vez
+REFRESH_LOCK_ID = 0x6B7069  # "kpi"
+
+_LOAN_IDS = "CAST(:loan_ids AS INTEGER[])"
+
+# Agregados de cada préstamo activo (todos si loan_ids es NULL)
+AGGREGATE_SQL = f"""
+    SELECT cl.contract_loan_id,
+           cl.contract_id,
+           COALESCE(cl.currency, 'USD') AS currency,
+           COALESCE(cl.loan_amount, 0) AS loan_amount,
+           COALESCE(pt.total_paid, 0) AS total_paid,
+           COALESCE(ps.outstanding_principal, 0) AS outstanding_principal,
+           COALESCE(ps.pending_interest, 0) AS pending_interest,
+           COALESCE(ps.total_pending, 0) AS total_pending,
+           COALESCE(ps.payments_made, 0) AS payments_made,
+           COALESCE(ps.payments_total, 0) AS payments_total,
+           COALESCE(ps.overdue_payments, 0) AS overdue_payments
+    FROM public.contract_loan cl
+    LEFT JOIN LATERAL (
+        SELECT count(*) AS payments_total,
+               count(*) FILTER (WHERE s.payment_status = 'paid') AS payments_made,
+               count(*) FILTER (WHERE s.payment_status IS DISTINCT FROM 'paid' AND s.due_date < CURRENT_DATE) AS overdue_payments,
+               sum(s.capital_amount) FILTER (WHERE s.payment_status IS DISTINCT FROM 'paid') AS outstanding_principal,
+               sum(s.interest_amount) FILTER (WHERE s.payment_status IS DISTINCT FROM 'paid') AS pending_interest,
+               sum(s.amount_due - COALESCE(s.amount_paid, 0)) FILTER (WHERE s.payment_status IS DISTINCT FROM 'paid') AS total_pending
+        FROM public.payment_schedule s
+        WHERE s.contract_loan_id = cl.contract_loan_id AND s.is_active IS NOT FALSE
+    ) ps ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT sum(CASE t.transaction_type WHEN 'payment' THEN t.amount WHEN 'refund' THEN -t.amount ELSE 0 END) AS total_paid
+        FROM public.payment_transaction t
+        JOIN public.payment_schedule s ON s.payment_schedule_id = t.payment_schedule_id
+        WHERE s.contract_loan_id = cl.contract_loan_id AND t.is_active IS NOT FALSE
+    ) pt ON TRUE
+    WHERE cl.is_active IS NOT FALSE
+      AND ({_LOAN_IDS} IS NULL OR cl.contract_loan_id = ANY({_LOAN_IDS}))
+"""
+
+_UPSERT_KPI = f"""
+    INSERT INTO public.contract_kpi (contract_loan_id, contract_id, currency, {", ".join(KPI_COLUMNS)}, refreshed_at)
+    SELECT contract_loan_id, contract_id, currency, {", ".join(KPI_COLUMNS)}, CURRENT_TIMESTAMP FROM fresh
+    ON CONFLICT (contract_loan_id) DO UPDATE SET
+        contract_id = EXCLUDED.contract_id,
+        currency = EXCLUDED.currency,
+        {", ".join(f"{name} = EXCLUDED.{name}" for name in KPI_COLUMNS)},
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+# Recalcular algunos préstamos y aplicar a la cartera la diferencia (nuevo - anterior)
+REFRESH_LOANS_SQL = f"""
+    WITH fresh AS ({AGGREGATE_SQL}),
+    old AS (
+        SELECT * FROM public.contract_kpi
+        WHERE contract_loan_id = ANY({_LOAN_IDS})
+        FOR UPDATE
+    ),
+    removed AS (
+        DELETE FROM public.contract_kpi k
+        WHERE k.contract_loan_id = ANY({_LOAN_IDS})
+          AND NOT EXISTS (SELECT 1 FROM fresh f WHERE f.contract_loan_id = k.contract_loan_id)
+    ),
+    up AS ({_UPSERT_KPI} RETURNING *),
+    delta AS (
+        SELECT currency, 1 AS contracts, {", ".join(KPI_COLUMNS)} FROM up
+        UNION ALL
+        SELECT currency, -1, {", ".join(f"-{name}" for name in KPI_COLUMNS)} FROM old
+    )
+    INSERT INTO public.contract_kpi_portfolio (currency, contracts, {", ".join(KPI_COLUMNS)}, refreshed_at)
+    SELECT currency, sum(contracts), {", ".join(f"sum({name})" for name in KPI_COLUMNS)}, CURRENT_TIMESTAMP
+    FROM delta
+    GROUP BY currency
+    ON CONFLICT (currency) DO UPDATE SET
+        contracts = contract_kpi_portfolio.contracts + EXCLUDED.contracts,
+        {", ".join(f"{name} = contract_kpi_portfolio.{name} + EXCLUDED.{name}" for name in KPI_COLUMNS)},
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+# Reconstrucción completa: todos los préstamos y después la cartera desde contract_kpi
+REBUILD_LOANS_SQL = f"""
+    WITH fresh AS ({AGGREGATE_SQL}),
+    removed AS (
+        DELETE FROM public.contract_kpi k
+        WHERE NOT EXISTS (SELECT 1 FROM fresh f WHERE f.contract_loan_id = k.contract_loan_id)
+    )
+    {_UPSERT_KPI}
+"""
+
+REBUILD_PORTFOLIO_SQL = f"""
+    WITH totals AS (
+        SELECT currency, count(*) AS contracts, {", ".join(f"sum({name}) AS {name}" for name in KPI_COLUMNS)}
+        FROM public.contract_kpi
+        GROUP BY currency
+    ),
+    gone AS (
+        DELETE FROM public.contract_kpi_portfolio p
+        WHERE NOT EXISTS (SELECT 1 FROM totals t WHERE t.currency = p.currency)
+    )
+    INSERT INTO public.contract_kpi_portfolio (currency, contracts, {", ".join(KPI_COLUMNS)}, refreshed_at)
+    SELECT currency, contracts, {", ".join(KPI_COLUMNS)}, CURRENT_TIMESTAMP FROM totals
+    ON CONFLICT (currency) DO UPDATE SET
+        contracts = EXCLUDED.contracts,
+        {", ".join(f"{name} = EXCLUDED.{name}" for name in KPI_COLUMNS)},
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+
+def _loan_ids_param(loan_ids: Optional[Iterable[int]]):
+    return bindparam(
+        "loan_ids", value=None if loan_ids is None else sorted({int(i) for i in loan_ids}), type_=ARRAY(Integer)
+    )
+
+
+def progress_percentage(payments_made: int, payments_total: int) -> float:
+    return round(payments_made * 100.0 / payments_total, 2) if payments_total else 0.0
+
+
+def _with_progress(row: Dict[str, Any]) -> Dict[str, Any]:
+    row = {
+        key: float(value) if isinstance(value, Decimal) else str(value) if isinstance(value, UUID) else value
+        for key, value in row.items()
+    }
+    row["progress_percentage"] = progress_percentage(row["payments_made"], row["payments_total"])
+    return row
+
+
+class ContractKpiService:
+    """Servicio de KPIs precalculados de la cartera"""
+
+    @staticmethod
+    async def refresh_loans(loan_ids: Iterable[int], connection=None) -> None:
+        """
+        Recalcular los KPIs de los préstamos indicados y ajustar la cartera.
+
+        Con la conexión del llamador queda en su transacción (p. ej. la del pago).
+        """
+        loan_ids = list(loan_ids)
+        if not loan_ids:
+            return
+        query = sql_text(REFRESH_LOANS_SQL).bindparams(_loan_ids_param(loan_ids))
+        await execute(query, connection=connection, commit_after=connection is None)
+
+    @staticmethod
+    async def rebuild(connection) -> None:
+        """Reconstruir todos los KPIs y los totales de la cartera (en la transacción de connection)"""
+        await connection.execute(sql_text("SELECT pg_advisory_xact_lock(:lock_id)").bindparams(lock_id=REFRESH_LOCK_ID))
+        await connection.execute(sql_text(REBUILD_LOANS_SQL).bindparams(_loan_ids_param(None)))
+        await connection.execute(sql_text(REBUILD_PORTFOLIO_SQL))
+
+    @staticmethod
+    async def get_portfolio(connection=None) -> List[Dict[str, Any]]:
+        """Totales de la cartera por moneda (una fila por moneda)"""
+        rows = await fetch_all(select(contract_kpi_portfolio).order_by(contract_kpi_portfolio.c.currency), connection=connection)
+        return [_with_progress(row) for row in rows]
+
+    @staticmethod
+    async def get_contract_kpis(contract_id: str, connection=None) -> List[Dict[str, Any]]:
+        """KPIs de los préstamos de un contrato"""
+        rows = await fetch_all(
+            select(contract_kpi).where(contract_kpi.c.contract_id == contract_id).order_by(contract_kpi.c.contract_loan_id),
+            connection=connection,
+        )
+        return [_with_progress(row) for row in rows]
+
+
+async def refresh_loan_kpis(db, contract_loan_id: Optional[int]) -> None:
+    """Recalcular los KPIs de un préstamo dentro de la transacción del pago, sin abortarla si falla"""
+    if contract_loan_id is None:
+        return
+    try:
+        async with db.begin_nested():
+            await ContractKpiService.refresh_loans([contract_loan_id], connection=db)
+    except Exception as e:
+        log.warning("Could not refresh KPIs for loan %s: %s", contract_loan_id, e)
+
+
+class KpiRefresher:
+    """Reconstruye los KPIs al arrancar y cada interval segundos"""
+
+    def __init__(self, interval: float = settings.CONTRACT_KPI_REFRESH_SECONDS):
+        self.interval = interval
+        self._stopping = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> None:
+        async with engine.begin() as connection:
+            await ContractKpiService.rebuild(connection)
+
+    async def start(self) -> None:
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._runner is not None:
+            await self._runner
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self.refresh()
+                log.info("Contract KPIs rebuilt")
+            except Exception:
+                log.error("Error rebuilding contract KPIs", exc_info=True)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
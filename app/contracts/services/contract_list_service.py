@@ -1,9 +1,83 @@
 """Service layer for contract list operations."""
 
+import base64
+import binascii
 import json
+from dataclasses import dataclass
+from datetime import date
 from uuid import UUID
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 import asyncpg
+from fastapi import HTTPException
+from sqlalchemy import and_, exists, func, literal, select, true, tuple_
+
+from app.contracts.models import contract, contract_loan, contract_participant, contract_service
+from app.database import fetch_all, fetch_one
+from app.person.models import person
+
+# person_type_id de los participantes (ver contract_creation_service)
+CLIENT_PERSON_TYPE_ID = 1
+INVESTOR_PERSON_TYPE_ID = 2
+
+# Columnas del listado que salen directamente de contract
+CONTRACT_FIELDS = (
+    "contract_id", "contract_number", "contract_date", "start_date", "end_date", "title",
+    "description", "contract_service_id", "version", "is_active", "folder_path", "created_at", "updated_at",
+)
+LOAN_FIELDS = ("loan_amount", "currency", "interest_rate", "term_months", "loan_type", "monthly_payment")
+LIST_FIELDS = CONTRACT_FIELDS + ("service_name",) + LOAN_FIELDS + ("client_name", "investor_name")
+
+
+@dataclass
+class ContractListFilters:
+    """Filtros del listado paginado de contratos"""
+    status: Optional[str] = None  # "active" | "inactive"
+    contract_service_id: Optional[int] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    client: Optional[str] = None
+    client_id: Optional[UUID] = None
+
+
+def encode_cursor(contract_date: date, contract_id: Any) -> str:
+    """Cursor opaco con la clave de orden (contract_date, contract_id) del último contrato"""
+    raw = json.dumps([contract_date.isoformat(), str(contract_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[date, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        contract_date, contract_id = json.loads(raw)
+        return date.fromisoformat(contract_date), str(UUID(contract_id))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(400, "Cursor inválido")
+
+
+def parse_fields(fields: Optional[str]) -> Sequence[str]:
+    """Proyección pedida (lista separada por comas); contract_id siempre se incluye"""
+    if not fields:
+        return LIST_FIELDS
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(requested) - set(LIST_FIELDS))
+    if unknown:
+        raise HTTPException(400, f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(LIST_FIELDS)}")
+    return ["contract_id"] + [name for name in requested if name != "contract_id"]
+
+
+def _participant_name(person_type_id: int, name: str):
+    """Nombre del participante principal de un rol (LATERAL, una fila por contrato)"""
+    return select(
+        func.concat_ws(" ", person.c.first_name, person.c.last_name).label(name)
+    ).select_from(
+        contract_participant.join(person, person.c.person_id == contract_participant.c.person_id)
+    ).where(
+        contract_participant.c.contract_id == contract.c.contract_id,
+        contract_participant.c.person_type_id == person_type_id,
+        contract_participant.c.is_active.is_not(False),
+    ).order_by(
+        contract_participant.c.is_primary.desc().nulls_last(), contract_participant.c.contract_participant_id
+    ).limit(1).lateral(name)
 
 
 class ContractListService:
@@ -108,3 +182,105 @@ class ContractListService:
             }
 
 
+
+    @staticmethod
+    def _where(filters: ContractListFilters) -> List[Any]:
+        conditions = []
+        if filters.status == "active":
+            conditions.append(contract.c.is_active.is_not(False))
+        elif filters.status == "inactive":
+            conditions.append(contract.c.is_active.is_(False))
+        if filters.contract_service_id is not None:
+            conditions.append(contract.c.contract_service_id == filters.contract_service_id)
+        if filters.date_from is not None:
+            conditions.append(contract.c.contract_date >= filters.date_from)
+        if filters.date_to is not None:
+            conditions.append(contract.c.contract_date <= filters.date_to)
+        if filters.client or filters.client_id:
+            client_conditions = [
+                contract_participant.c.contract_id == contract.c.contract_id,
+                contract_participant.c.person_type_id == CLIENT_PERSON_TYPE_ID,
+            ]
+            if filters.client_id:
+                client_conditions.append(contract_participant.c.person_id == str(filters.client_id))
+            if filters.client:
+                pattern = f"%{filters.client.strip()}%"
+                client_conditions.append(func.concat_ws(" ", person.c.first_name, person.c.last_name).ilike(pattern))
+            conditions.append(exists(
+                select(1).select_from(
+                    contract_participant.join(person, person.c.person_id == contract_participant.c.person_id)
+                ).where(*client_conditions)
+            ))
+        return conditions
+
+    @classmethod
+    async def list_contracts_page(
+        cls,
+        connection,
+        filters: ContractListFilters,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        fields: Sequence[str] = LIST_FIELDS,
+        include_total: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Página de contratos ordenada por (contract_date, contract_id) descendente.
+
+        Paginación por cursor (keyset): el coste de cada página no depende de su
+        posición. Solo se unen el préstamo, el servicio y los participantes si la
+        proyección los pide. total solo se calcula con include_total.
+        """
+        conditions = cls._where(filters)
+        wanted = set(fields)
+
+        columns = [contract.c[name] for name in CONTRACT_FIELDS if name in wanted]
+        # La clave del cursor se lee siempre aunque no se haya pedido
+        columns.append(contract.c.contract_date.label("_cursor_date"))
+        source = contract
+        if "service_name" in wanted:
+            source = source.outerjoin(contract_service, contract_service.c.contract_service_id == contract.c.contract_service_id)
+            columns.append(contract_service.c.service_name)
+        if wanted.intersection(LOAN_FIELDS):
+            loan = select(*[contract_loan.c[name] for name in LOAN_FIELDS]).where(
+                contract_loan.c.contract_id == contract.c.contract_id,
+                contract_loan.c.is_active.is_not(False),
+            ).order_by(contract_loan.c.contract_loan_id).limit(1).lateral("loan")
+            source = source.outerjoin(loan, true())
+            columns.extend(loan.c[name] for name in LOAN_FIELDS if name in wanted)
+        for person_type_id, name in ((CLIENT_PERSON_TYPE_ID, "client_name"), (INVESTOR_PERSON_TYPE_ID, "investor_name")):
+            if name in wanted:
+                participant = _participant_name(person_type_id, name)
+                source = source.outerjoin(participant, true())
+                columns.append(participant.c[name])
+
+        query = select(*columns).select_from(source)
+        page_conditions = list(conditions)
+        if cursor:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            page_conditions.append(tuple_(contract.c.contract_date, contract.c.contract_id) < tuple_(
+                literal(cursor_date, contract.c.contract_date.type), literal(cursor_id, contract.c.contract_id.type)
+            ))
+        if page_conditions:
+            query = query.where(and_(*page_conditions))
+        query = query.order_by(contract.c.contract_date.desc(), contract.c.contract_id.desc()).limit(limit + 1)
+
+        rows = await fetch_all(query, connection=connection)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["_cursor_date"], rows[-1]["contract_id"]) if has_more else None
+
+        total = None
+        if include_total:
+            count_query = select(func.count().label("total")).select_from(contract)
+            if conditions:
+                count_query = count_query.where(and_(*conditions))
+            total = (await fetch_one(count_query, connection=connection))["total"]
+
+        return {
+            "success": True,
+            "contracts": [{name: row[name] for name in fields} for row in rows],
+            "total": total,
+            "count": len(rows),
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        }
@@ -1,80 +1,223 @@
-from typing import Dict, Any, Optional
-from pathlib import Path
+"""Metadatos y versiones de los documentos de contrato en la BD.
+
+Sustituye al metadata.json de cada carpeta: el documento vigente está en
+contract_document y cada versión generada en contract_document_version.
+"""
+
+import json
 from datetime import datetime
-from app.contracts.utils.file_handlers import save_metadata, load_metadata
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+
+from app.contracts.models import contract_document, contract_document_version
+from app.database import execute, fetch_all, fetch_one
+
+HISTORY_COLUMNS = ["document_id", "version", "storage_type", "file_path", "original_data"]
+
+
+def _jsonable(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalizar a JSON (Decimal, fechas, UUID) antes de guardarlo como JSONB"""
+    return json.loads(json.dumps(data or {}, default=str))
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _with_history(upsert):
+    """Insertar en el historial la fila que devuelve upsert, en la misma sentencia"""
+    doc = upsert.returning(*[contract_document.c[name] for name in HISTORY_COLUMNS]).cte("doc")
+    return insert(contract_document_version).from_select(
+        HISTORY_COLUMNS, select(*[doc.c[name] for name in HISTORY_COLUMNS])
+    ).returning(contract_document_version.c.version)
 
 
 class ContractMetadataService:
     """Servicio para manejo de metadatos de contratos"""
-    
-    def __init__(self, contracts_dir: Path):
-        self.contracts_dir = contracts_dir
-    
-    def save_contract_metadata(self, contract_id: str, data: Dict[str, Any], version: int = 1, storage_type: str = "local") -> None:
-        """Guardar metadatos del contrato"""
-        contract_folder = self.contracts_dir / contract_id
-        contract_folder.mkdir(parents=True, exist_ok=True)
-        
-        # Modificar el tipo de almacenamiento si se especifica
-        metadata_data = data.copy()
-        if storage_type != "local":
-            metadata_data["storage_type"] = storage_type
-        
-        save_metadata(contract_folder, contract_id, metadata_data, version)
-    
-    def load_contract_metadata(self, contract_id: str) -> Optional[Dict[str, Any]]:
+
+    @staticmethod
+    def _to_metadata(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Fila de contract_document con el formato del antiguo metadata.json"""
+        return {
+            "contract_id": row["document_id"],
+            "contract_number": row["contract_number"],
+            "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+            "modified_at": row["modified_at"].isoformat() if row["modified_at"] else None,
+            "original_data": row["original_data"] or {},
+            "version": row["version"],
+            "storage_type": row["storage_type"],
+            "file_path": row["file_path"],
+            "render_manifest": row.get("render_manifest"),
+        }
+
+    async def record_version(
+        self,
+        document_id: str,
+        data: Dict[str, Any],
+        storage_type: str,
+        file_path: Optional[str] = None,
+        base_version: int = 0,
+        render_manifest: Optional[Dict[str, Any]] = None,
+        connection=None,
+    ) -> int:
+        """
+        Registrar una nueva versión del documento y devolver su número.
+
+        El incremento y la fila del historial se hacen en una sola sentencia
+        (INSERT ... ON CONFLICT ... RETURNING), así dos regeneraciones simultáneas
+        nunca obtienen la misma versión. base_version es la versión conocida fuera
+        de la BD (metadata.json sin importar) para documentos aún no registrados.
+        render_manifest es el manifiesto del render que produjo esta versión.
+        """
+        upsert = insert(contract_document).values(
+            document_id=document_id,
+            contract_number=document_id.replace("contract_", "", 1),
+            version=base_version + 1,
+            storage_type=storage_type,
+            file_path=file_path,
+            original_data=_jsonable(data),
+            render_manifest=render_manifest,
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[contract_document.c.document_id],
+            set_={
+                "version": contract_document.c.version + 1,
+                "storage_type": upsert.excluded.storage_type,
+                "file_path": upsert.excluded.file_path,
+                "original_data": upsert.excluded.original_data,
+                "render_manifest": upsert.excluded.render_manifest,
+                "modified_at": func.now(),
+            },
+        )
+        row = await fetch_one(_with_history(upsert), connection=connection, commit_after=connection is None)
+        return row["version"]
+
+    async def import_metadata(self, metadata: Dict[str, Any], file_path: Optional[str] = None, connection=None) -> int:
+        """
+        Importar un metadata.json existente; idempotente.
+
+        No pisa un documento ya registrado con una versión igual o mayor.
+        """
+        document_id = metadata["contract_id"]
+        version = int(metadata.get("version") or 1)
+        now = datetime.now()
+        created_at = _parse_timestamp(metadata.get("created_at")) or now
+        modified_at = _parse_timestamp(metadata.get("modified_at")) or created_at
+        values = {
+            "document_id": document_id,
+            "version": version,
+            "storage_type": metadata.get("storage_type") or "local",
+            "file_path": file_path,
+            "original_data": _jsonable(metadata.get("original_data")),
+        }
+
+        upsert = insert(contract_document).values(
+            **values,
+            contract_number=document_id.replace("contract_", "", 1),
+            created_at=created_at,
+            modified_at=modified_at,
+        )
+        # Solo si el archivo es más reciente que lo ya registrado en la BD
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[contract_document.c.document_id],
+            set_={name: upsert.excluded[name] for name in ("version", "storage_type", "file_path", "original_data", "modified_at")},
+            where=contract_document.c.version < upsert.excluded.version,
+        )
+        await execute(upsert, connection=connection, commit_after=connection is None)
+
+        history = insert(contract_document_version).values(**values, created_at=modified_at)
+        await execute(history.on_conflict_do_nothing(), connection=connection, commit_after=connection is None)
+        return version
+
+    async def load_contract_metadata(self, document_id: str, connection=None) -> Optional[Dict[str, Any]]:
         """Cargar metadatos del contrato"""
-        contract_folder = self.contracts_dir / contract_id
-        
-        try:
-            return load_metadata(contract_folder)
-        except FileNotFoundError:
-            return None
-    
-    def update_contract_metadata(self, contract_id: str, updates: Dict[str, Any]) -> bool:
-        """Actualizar metadatos del contrato"""
-        contract_folder = self.contracts_dir / contract_id
-        
-        try:
-            # Cargar metadatos existentes
-            metadata = load_metadata(contract_folder)
-            
-            # Actualizar
-            metadata.update(updates)
-            metadata["modified_at"] = datetime.now().isoformat()
-            
-            # Guardar actualizado
-            save_metadata(contract_folder, contract_id, metadata, metadata.get("version", 1))
-            
-            return True
-        except Exception as e:
-            print(f"Error actualizando metadatos del contrato {contract_id}: {e}")
-            return False
-    
-    def increment_version(self, contract_id: str) -> Optional[int]:
-        """Incrementar versión del contrato"""
-        contract_folder = self.contracts_dir / contract_id
-        
-        try:
-            metadata = load_metadata(contract_folder)
-            new_version = metadata.get("version", 1) + 1
-            metadata["version"] = new_version
-            metadata["modified_at"] = datetime.now().isoformat()
-            
-            save_metadata(contract_folder, contract_id, metadata, new_version)
-            
-            return new_version
-        except Exception as e:
-            print(f"Error incrementando versión del contrato {contract_id}: {e}")
-            return None
-    
-    def get_contract_version(self, contract_id: str) -> int:
+        row = await fetch_one(
+            select(contract_document).where(contract_document.c.document_id == document_id), connection=connection
+        )
+        return self._to_metadata(row) if row else None
+
+    async def find_by_contract_number(self, contract_number: str, connection=None) -> Optional[Dict[str, Any]]:
+        """Metadatos del contrato por su número"""
+        row = await fetch_one(
+            select(contract_document).where(contract_document.c.contract_number == contract_number), connection=connection
+        )
+        return self._to_metadata(row) if row else None
+
+    async def update_contract_metadata(self, document_id: str, updates: Dict[str, Any], connection=None) -> bool:
+        """Combinar updates con original_data sin generar una nueva versión"""
+        query = update(contract_document).where(contract_document.c.document_id == document_id).values(
+            original_data=contract_document.c.original_data.op("||")(literal(_jsonable(updates), JSONB)),
+            modified_at=func.now(),
+        ).returning(contract_document.c.document_id)
+        return await fetch_one(query, connection=connection, commit_after=connection is None) is not None
+
+    async def set_file_path(self, document_id: str, file_path: str, connection=None) -> None:
+        """Guardar el enlace del documento subido después (outbox) en la versión vigente"""
+        current = select(contract_document.c.version).where(contract_document.c.document_id == document_id).scalar_subquery()
+        await execute(
+            update(contract_document).where(contract_document.c.document_id == document_id).values(file_path=file_path),
+            connection=connection,
+            commit_after=connection is None,
+        )
+        await execute(
+            update(contract_document_version).where(
+                contract_document_version.c.document_id == document_id,
+                contract_document_version.c.version == current,
+            ).values(file_path=file_path),
+            connection=connection,
+            commit_after=connection is None,
+        )
+
+    async def increment_version(self, document_id: str, connection=None) -> Optional[int]:
+        """Incrementar versión del contrato (copia los datos vigentes al historial)"""
+        bump = update(contract_document).where(contract_document.c.document_id == document_id).values(
+            version=contract_document.c.version + 1,
+            modified_at=func.now(),
+        )
+        row = await fetch_one(_with_history(bump), connection=connection, commit_after=connection is None)
+        return row["version"] if row else None
+
+    async def get_contract_version(self, document_id: str, connection=None) -> int:
         """Obtener versión actual del contrato"""
-        metadata = self.load_contract_metadata(contract_id)
-        return metadata.get("version", 1) if metadata else 1
-    
-    def contract_exists(self, contract_id: str) -> bool:
+        row = await fetch_one(
+            select(contract_document.c.version).where(contract_document.c.document_id == document_id), connection=connection
+        )
+        return row["version"] if row else 1
+
+    async def get_version(self, document_id: str, version: int, connection=None) -> Optional[Dict[str, Any]]:
+        """Datos de una versión concreta del documento"""
+        return await fetch_one(
+            select(contract_document_version).where(
+                contract_document_version.c.document_id == document_id,
+                contract_document_version.c.version == version,
+            ),
+            connection=connection,
+        )
+
+    async def list_versions(self, document_id: str, connection=None) -> List[Dict[str, Any]]:
+        """Historial de versiones (sin los datos) de la más reciente a la más antigua"""
+        return await fetch_all(
+            select(
+                contract_document_version.c.version,
+                contract_document_version.c.storage_type,
+                contract_document_version.c.file_path,
+                contract_document_version.c.created_at,
+            ).where(
+                contract_document_version.c.document_id == document_id
+            ).order_by(contract_document_version.c.version.desc()),
+            connection=connection,
+        )
+
+    async def contract_exists(self, document_id: str, connection=None) -> bool:
         """Verificar si existe un contrato"""
-        contract_folder = self.contracts_dir / contract_id
-        metadata_file = contract_folder / "metadata.json"
-        return metadata_file.exists()
+        row = await fetch_one(
+            select(contract_document.c.document_id).where(contract_document.c.document_id == document_id), connection=connection
+        )
+        return row is not None
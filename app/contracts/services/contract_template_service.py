@@ -1,5 +1,5 @@
 import warnings
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, FrozenSet, Optional, List, Set, Tuple
 from pathlib import Path
 from fastapi import HTTPException
 
@@ -8,6 +8,9 @@ warnings.filterwarnings("ignore", message="pkg_resources is deprecated as an API
 
 from docxtpl import DocxTemplate
 
+# Variables de cada plantilla por (ruta, mtime); compartido entre instancias del servicio
+_TEMPLATE_VARIABLES: Dict[Tuple[str, int], FrozenSet[str]] = {}
+
 
 class ContractTemplateService:
     """Servicio para manejo de plantillas de contratos"""
@@ -34,62 +37,66 @@ class ContractTemplateService:
 
         return template_path
     
-    def render_template(self, template_path: Path, data: Dict[str, Any]) -> bytes:
-        """Renderizar plantilla con datos"""
-        try:
-            from jinja2 import Environment
-            
-            # Agregar filtros personalizados para formateo de texto
-            def pad_filter(value: Any, width: int) -> str:
-                """Pad string to specified width with spaces on the right"""
-                if value is None:
-                    return " " * width
-                value_str = str(value).strip()
-                if len(value_str) >= width:
-                    return value_str[:width]
-                return value_str + " " * (width - len(value_str))
-            
-            def center_filter(value: Any, width: int) -> str:
-                """Center string in specified width"""
-                if value is None:
-                    return " " * width
-                value_str = str(value).strip()
-                if len(value_str) >= width:
-                    return value_str[:width]
-                padding = width - len(value_str)
-                left_pad = padding // 2
-                right_pad = padding - left_pad
-                return " " * left_pad + value_str + " " * right_pad
-            
-            # Crear entorno Jinja2 con filtros personalizados
-            # No usar trim_blocks/lstrip_blocks para preservar espacios en blanco en Word
-            from jinja2 import Undefined
+    @staticmethod
+    def _build_jinja_env():
+        """Entorno Jinja2 con los filtros de formato de las plantillas"""
+        from jinja2 import Environment
+
+        # Agregar filtros personalizados para formateo de texto
+        def pad_filter(value: Any, width: int) -> str:
+            """Pad string to specified width with spaces on the right"""
+            if value is None:
+                return " " * width
+            value_str = str(value).strip()
+            if len(value_str) >= width:
+                return value_str[:width]
+            return value_str + " " * (width - len(value_str))
+        
+        def center_filter(value: Any, width: int) -> str:
+            """Center string in specified width"""
+            if value is None:
+                return " " * width
+            value_str = str(value).strip()
+            if len(value_str) >= width:
+                return value_str[:width]
+            padding = width - len(value_str)
+            left_pad = padding // 2
+            right_pad = padding - left_pad
+            return " " * left_pad + value_str + " " * right_pad
+        
+        # Crear entorno Jinja2 con filtros personalizados
+        # No usar trim_blocks/lstrip_blocks para preservar espacios en blanco en Word
+        from jinja2 import Undefined
+        
+        class SafeUndefined(Undefined):
+            """Clase para manejar valores undefined de forma segura"""
+            def __int__(self):
+                return 0
             
-            class SafeUndefined(Undefined):
-                """Clase para manejar valores undefined de forma segura"""
-                def __int__(self):
-                    return 0
-                
-                def __float__(self):
-                    return 0.0
-                
-                def __str__(self):
-                    return ""
-                
-                def __repr__(self):
-                    return ""
+            def __float__(self):
+                return 0.0
             
-            jinja_env = Environment(
-                trim_blocks=False, 
-                lstrip_blocks=False,
-                undefined=SafeUndefined
-            )
-            jinja_env.filters['pad'] = pad_filter
-            jinja_env.filters['center'] = center_filter
+            def __str__(self):
+                return ""
             
+            def __repr__(self):
+                return ""
+        
+        jinja_env = Environment(
+            trim_blocks=False, 
+            lstrip_blocks=False,
+            undefined=SafeUndefined
+        )
+        jinja_env.filters['pad'] = pad_filter
+        jinja_env.filters['center'] = center_filter
+        return jinja_env
+
+    def render_template(self, template_path: Path, data: Dict[str, Any]) -> bytes:
+        """Renderizar plantilla con datos"""
+        try:
             # Crear template y renderizar con el entorno personalizado
             doc = DocxTemplate(template_path)
-            doc.render(data, jinja_env=jinja_env)
+            doc.render(data, jinja_env=self._build_jinja_env())
             
             # Guardar en bytes
             from io import BytesIO
@@ -100,6 +107,18 @@ class ContractTemplateService:
             return output.getvalue()
         except Exception as e:
             raise HTTPException(400, f"Error renderizando plantilla: {str(e)}")
+
+    def get_template_variables(self, template_path: Path) -> Optional[Set[str]]:
+        """Variables que usa la plantilla (cache por ruta y fecha de modificación); None si no se pueden leer"""
+        try:
+            key = (str(template_path), template_path.stat().st_mtime_ns)
+            if key not in _TEMPLATE_VARIABLES:
+                doc = DocxTemplate(template_path)
+                _TEMPLATE_VARIABLES[key] = frozenset(doc.get_undeclared_template_variables(self._build_jinja_env()))
+            return _TEMPLATE_VARIABLES[key]
+        except Exception as e:
+            print(f"No se pudieron leer las variables de {template_path}: {e}")
+            return None
     
     def validate_template_data(self, data: Dict[str, Any]) -> List[str]:
         """Validar datos para la plantilla"""
@@ -0,0 +1,166 @@
+"""Cache de ids de carpetas de Google Drive por contrato.
+
+Un LRU en memoria delante de la tabla contract_drive_folder: las subidas
+repetidas para el mismo contrato o préstamo no consultan la BD ni listan
+carpetas en Drive.
+"""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.contracts.models import contract, contract_drive_folder, contract_loan
+from app.database import execute, fetch_one
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DriveFolders:
+    """Carpetas de un contrato (local o Google Drive)"""
+    contract_id: str
+    folder_path: Optional[str]
+    contract_folder_id: Optional[str] = None
+    attachments_folder_id: Optional[str] = None
+    payments_folder_id: Optional[str] = None
+    # Nombre de la carpeta del contrato en el almacenamiento (contract_<número>)
+    folder_name: Optional[str] = None
+
+    @property
+    def is_drive(self) -> bool:
+        return bool(self.folder_path and self.folder_path.startswith("http"))
+
+    @property
+    def storage_prefix(self) -> str:
+        """Primer segmento de las claves del contrato en el DocumentStore"""
+        if self.folder_name:
+            return self.folder_name
+        return self.folder_path.rstrip("/\\").replace("\\", "/").rsplit("/", 1)[-1] if self.folder_path else self.contract_id
+
+
+def _folder_id_from_path(folder_path: Optional[str]) -> Optional[str]:
+    """Extraer el id de carpeta de un enlace de Drive (…/folders/<id>)"""
+    if folder_path and folder_path.startswith("http"):
+        return folder_path.rstrip("/").split("/")[-1].split("?")[0]
+    return None
+
+
+class DriveFolderCache:
+    """LRU de DriveFolders indexado por contract_id y por contract_loan_id"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._by_contract: "OrderedDict[str, DriveFolders]" = OrderedDict()
+        self._loan_to_contract: "OrderedDict[int, str]" = OrderedDict()
+
+    def _remember(self, folders: DriveFolders, contract_loan_id: Optional[int] = None) -> DriveFolders:
+        self._by_contract[folders.contract_id] = folders
+        self._by_contract.move_to_end(folders.contract_id)
+        if contract_loan_id is not None:
+            self._loan_to_contract[contract_loan_id] = folders.contract_id
+            self._loan_to_contract.move_to_end(contract_loan_id)
+
+        while len(self._by_contract) > self.max_entries:
+            self._by_contract.popitem(last=False)
+        while len(self._loan_to_contract) > self.max_entries:
+            self._loan_to_contract.popitem(last=False)
+        return folders
+
+    def _cached(self, contract_id: str) -> Optional[DriveFolders]:
+        folders = self._by_contract.get(contract_id)
+        if folders is not None:
+            self._by_contract.move_to_end(contract_id)
+        return folders
+
+    def invalidate(self, contract_id: str) -> None:
+        """Olvidar las carpetas de un contrato (p. ej. tras regenerarlo)"""
+        self._by_contract.pop(str(contract_id), None)
+
+    def clear(self) -> None:
+        self._by_contract.clear()
+        self._loan_to_contract.clear()
+
+    @staticmethod
+    def _base_query():
+        return select(
+            contract.c.contract_id,
+            contract.c.contract_number,
+            contract.c.folder_path,
+            contract_drive_folder.c.contract_folder_id,
+            contract_drive_folder.c.attachments_folder_id,
+            contract_drive_folder.c.payments_folder_id,
+        ).select_from(
+            contract.outerjoin(contract_drive_folder, contract_drive_folder.c.contract_id == contract.c.contract_id)
+        )
+
+    @staticmethod
+    def _from_row(row) -> DriveFolders:
+        return DriveFolders(
+            contract_id=str(row["contract_id"]),
+            folder_path=row["folder_path"],
+            contract_folder_id=row["contract_folder_id"] or _folder_id_from_path(row["folder_path"]),
+            attachments_folder_id=row["attachments_folder_id"],
+            payments_folder_id=row["payments_folder_id"],
+            folder_name=f"contract_{row['contract_number']}" if row["contract_number"] else None,
+        )
+
+    async def get_by_contract(self, contract_id: str, db) -> Optional[DriveFolders]:
+        """Carpetas del contrato; una sola consulta si no están en memoria"""
+        contract_id = str(contract_id)
+        folders = self._cached(contract_id)
+        if folders is not None:
+            return folders
+
+        row = await fetch_one(self._base_query().where(contract.c.contract_id == contract_id), connection=db)
+        return self._remember(self._from_row(row)) if row else None
+
+    async def get_by_loan(self, contract_loan_id: int, db) -> Optional[DriveFolders]:
+        """Carpetas del contrato al que pertenece el préstamo; una sola consulta si no están en memoria"""
+        contract_id = self._loan_to_contract.get(contract_loan_id)
+        if contract_id is not None:
+            folders = self._cached(contract_id)
+            if folders is not None:
+                self._loan_to_contract.move_to_end(contract_loan_id)
+                return folders
+
+        query = self._base_query().join(
+            contract_loan, contract_loan.c.contract_id == contract.c.contract_id
+        ).where(contract_loan.c.contract_loan_id == contract_loan_id)
+        row = await fetch_one(query, connection=db)
+        return self._remember(self._from_row(row), contract_loan_id) if row else None
+
+    async def save(self, folders: DriveFolders, contract_loan_id: Optional[int] = None) -> DriveFolders:
+        """
+        Persistir (upsert) las carpetas del contrato y actualizar el LRU.
+
+        Usa su propia conexión para no confirmar ni abortar la transacción del llamador;
+        si la escritura falla el cache sigue funcionando solo en memoria.
+        """
+        values = {
+            "contract_id": folders.contract_id,
+            "folder_path": folders.folder_path,
+            "contract_folder_id": folders.contract_folder_id,
+            "attachments_folder_id": folders.attachments_folder_id,
+            "payments_folder_id": folders.payments_folder_id,
+        }
+        query = insert(contract_drive_folder).values(**values)
+        query = query.on_conflict_do_update(
+            index_elements=[contract_drive_folder.c.contract_id],
+            set_={**{key: query.excluded[key] for key in values if key != "contract_id"}, "updated_at": func.now()},
+        )
+        try:
+            await execute(query, commit_after=True)
+        except Exception as e:
+            log.warning("Could not persist Drive folder ids for contract %s: %s", folders.contract_id, e)
+        return self._remember(folders, contract_loan_id)
+
+    async def save_payments_folder(self, folders: DriveFolders, payments_folder_id: str, contract_loan_id: Optional[int] = None) -> DriveFolders:
+        """Registrar la carpeta payments recién resuelta o creada en Drive"""
+        return await self.save(replace(folders, payments_folder_id=payments_folder_id), contract_loan_id)
+
+
+drive_folder_cache = DriveFolderCache()
@@ -21,17 +21,25 @@ def get_contract_folder(contracts_dir: Path, contract_id: str) -> Path:
     return folder
 
 
-def save_metadata(folder: Path, contract_id: str, data: Dict[str, Any], version: int = 1) -> None:
-    """Guardar metadatos del contrato"""
-    metadata = {
+def build_metadata(
+    contract_id: str, data: Dict[str, Any], version: int = 1, storage_type: str = "local", created_at: str = None
+) -> Dict[str, Any]:
+    """Documento metadata.json del contrato"""
+    now = datetime.now().isoformat()
+    return {
         "contract_id": contract_id,
-        "created_at": datetime.now().isoformat(),
-        "modified_at": datetime.now().isoformat(),
+        "created_at": created_at or now,
+        "modified_at": now,
         "original_data": data,
         "version": version,
-        "storage_type": "local"  # Se puede cambiar dinámicamente
+        "storage_type": storage_type
     }
 
+
+def save_metadata(folder: Path, contract_id: str, data: Dict[str, Any], version: int = 1) -> None:
+    """Guardar metadatos del contrato"""
+    metadata = build_metadata(contract_id, data, version)
+
     metadata_file = folder / "metadata.json"
     with open(metadata_file, 'w', encoding='utf-8') as f:
         json.dump(metadata, f, indent=2, ensure_ascii=False, default=str)
@@ -47,6 +55,21 @@ def load_metadata(folder: Path) -> Dict[str, Any]:
         return json.load(f)
 
 
+def contract_document_key(contract_id: str) -> str:
+    """Clave del documento del contrato en el almacenamiento (contract_X/X.docx)"""
+    contract_number = contract_id.replace("contract_", "")
+    return f"{contract_id}/{contract_number}.docx"
+
+
+def legacy_contract_document_key(contract_id: str) -> str:
+    """Nombre usado antes por la generación local (contract_X/contract_X.docx)"""
+    return f"{contract_id}/{contract_id}.docx"
+
+
+def contract_metadata_key(contract_id: str) -> str:
+    return f"{contract_id}/metadata.json"
+
+
 def get_contract_file_path(contract_folder: Path, contract_id: str) -> Path:
     """Obtener la ruta del archivo del contrato con nombre descriptivo"""
     contract_number = contract_id.replace("contract_", "")
@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 from pathlib import Path
 from fastapi import HTTPException
 
@@ -16,13 +16,15 @@ class GoogleDriveUtils:
     def _init_google_drive(self):
         """Inicializar servicio de Google Drive"""
         try:
-            from app.contracts.gdrive_service import GoogleDriveService
-            self.gdrive_service = GoogleDriveService()
+            from app.contracts.gdrive_service import get_shared_drive_service
+            self.gdrive_service = get_shared_drive_service()
         except ImportError:
             raise HTTPException(500, "Google Drive no configurado correctamente")
     
-    def upload_contract(self, contract_id: str, file_path: Path, metadata: Dict[str, Any]) -> Dict[str, Any]:
-        """Subir contrato a Google Drive"""
+    def upload_contract(
+        self, contract_id: str, contract: Union[Path, str, bytes, memoryview], metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Subir contrato a Google Drive (ruta del archivo o contenido en memoria)"""
         if not self.use_google_drive or not self.gdrive_service:
             return {
                 "drive_success": False,
@@ -31,7 +33,7 @@ class GoogleDriveUtils:
             }
         
         try:
-            return self.gdrive_service.upload_contract(contract_id, file_path, metadata)
+            return self.gdrive_service.upload_contract(contract_id, contract, metadata)
         except Exception as e:
             # Importante: incluir drive_success: False para que el código pueda detectar el error
             return {
@@ -41,6 +43,23 @@ class GoogleDriveUtils:
                 "drive_error": str(e)  # Incluir el error completo para debugging
             }
     
+    async def upload_contract_async(
+        self, contract_id: str, contract: Union[Path, str, bytes, memoryview], metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Subir contrato a Google Drive con el transporte asíncrono"""
+        if not self.use_google_drive or not self.gdrive_service:
+            return {
+                "drive_success": False,
+                "drive_link": None,
+                "drive_warning": "Google Drive no disponible"
+            }
+
+        result = await self.gdrive_service.upload_contract_async(contract_id, contract, metadata)
+        if not result.get("drive_success"):
+            result.setdefault("drive_link", None)
+            result.setdefault("drive_warning", f"Error subiendo a Google Drive: {result.get('drive_error')}")
+        return result
+
     def is_available(self) -> bool:
         """Verificar si Google Drive está disponible"""
         return self.use_google_drive and self.gdrive_service is not None
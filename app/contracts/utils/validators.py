@@ -0,0 +1,37 @@
+from typing import Dict, Any, List
+
+from fastapi import Request, status
+
+from app.contracts.validators.payload_validator import contract_payload_errors, parse_contract_payload
+from app.enums import ErrorCodeEnum
+from app.exceptions import GenericHTTPException
+
+
+def _raise_missing_fields(missing_fields: List[str]) -> None:
+    raise GenericHTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        error_code=ErrorCodeEnum.VALIDATION_ERROR,
+        message="Datos incompletos para generar el contrato",
+        success=False,
+        detail={
+            "error_code": ErrorCodeEnum.VALIDATION_ERROR.value,
+            "message": "Datos incompletos para generar el contrato",
+            "success": False,
+            "missing_fields": missing_fields
+        }
+    )
+
+
+def validate_contract_data(data: Dict[str, Any]) -> None:
+    """Validate that JSON has all required data to generate a contract"""
+    missing_fields = contract_payload_errors(data)
+    if missing_fields:
+        _raise_missing_fields(missing_fields)
+
+
+async def contract_payload_body(request: Request) -> Dict[str, Any]:
+    """Dependencia: cuerpo de /generate-complete parseado y validado en una pasada"""
+    data, missing_fields = parse_contract_payload(await request.body())
+    if missing_fields:
+        _raise_missing_fields(missing_fields)
+    return data
@@ -1,9 +1,13 @@
 from .contract_validator import ContractValidator
 from .data_validator import DataValidator
+from .payload_validator import CONTRACT_PAYLOAD_ADAPTER, contract_payload_errors, parse_contract_payload
 
 __all__ = [
     "ContractValidator",
-    "DataValidator"
+    "DataValidator",
+    "CONTRACT_PAYLOAD_ADAPTER",
+    "contract_payload_errors",
+    "parse_contract_payload"
 ]
 
 
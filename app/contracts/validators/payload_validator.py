@@ -0,0 +1,153 @@
+"""Validación compilada del payload de /contracts/generate-complete.
+
+El esquema se compila una vez en un TypeAdapter de pydantic v2: tipos y
+estructura se validan en una sola pasada en el núcleo (Rust) y las reglas de
+mínimos (participantes, notario, propiedades...) se comprueban sobre las claves
+de primer nivel. Los errores salen con el formato de missing_fields
+("campo: mensaje"). Es permisivo a propósito: se aceptan claves adicionales y
+se conservan en el resultado.
+
+Con el cuerpo en bytes (validate_json) el parseo del JSON y la validación son
+la misma pasada, sin json.loads ni el Dict[str, Any] de FastAPI por delante.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pydantic import ConfigDict, Discriminator, Tag, TypeAdapter, ValidationError
+from typing_extensions import Annotated, TypedDict
+
+_ALLOW_EXTRA = ConfigDict(extra="allow")
+
+# Las uniones eligen la variante por el tipo de la entrada, así un error se
+# informa una sola vez; las etiquetas no forman parte de la ruta del campo
+_VARIANT_TAGS = ("int", "number", "company", "companies")
+
+# int o float según llegue, para no convertir 100000 en 100000.0
+Number = Annotated[
+    Union[Annotated[int, Tag("int")], Annotated[float, Tag("number")]],
+    Discriminator(lambda value: "int" if isinstance(value, int) and not isinstance(value, bool) else "number"),
+]
+
+
+class CompanyPayload(TypedDict, total=False):
+    __pydantic_config__ = _ALLOW_EXTRA
+
+    company_name: Optional[str]
+
+
+class ParticipantPayload(TypedDict, total=False):
+    __pydantic_config__ = _ALLOW_EXTRA
+
+    person: Optional[Dict[str, Any]]
+
+
+class PropertyPayload(TypedDict, total=False):
+    __pydantic_config__ = _ALLOW_EXTRA
+
+    property_type: Optional[str]
+    property_value: Optional[Number]
+    surface_area: Optional[Number]
+    covered_area: Optional[Number]
+    currency: Optional[str]
+
+
+class LoanPayload(TypedDict, total=False):
+    __pydantic_config__ = _ALLOW_EXTRA
+
+    amount: Optional[Number]
+    currency: Optional[str]
+    interest_rate: Optional[Number]
+    term_months: Optional[int]
+    loan_type: Optional[str]
+    loan_payments_details: Optional[Dict[str, Any]]
+    bank_account: Optional[Dict[str, Any]]
+
+
+# La empresa llega como objeto o como lista de objetos
+Company = Optional[Annotated[
+    Union[Annotated[CompanyPayload, Tag("company")], Annotated[List[CompanyPayload], Tag("companies")]],
+    Discriminator(lambda value: "companies" if isinstance(value, list) else "company"),
+]]
+Participants = Optional[List[ParticipantPayload]]
+
+
+class ContractPayload(TypedDict, total=False):
+    __pydantic_config__ = _ALLOW_EXTRA
+
+    contract_type: Optional[str]
+    contract_type_id: Optional[int]
+    contract_number: Optional[str]
+    contract_date: Optional[str]
+    contract_end_date: Optional[str]
+    description: Optional[str]
+    client_company: Company
+    investor_company: Company
+    paragraph_request: Optional[List[Dict[str, Any]]]
+    loan: Optional[LoanPayload]
+    properties: Optional[List[PropertyPayload]]
+    clients: Participants
+    investors: Participants
+    witnesses: Participants
+    referents: Participants
+    notaries: Participants
+    notary: Participants
+
+
+CONTRACT_PAYLOAD_ADAPTER = TypeAdapter(ContractPayload)
+
+
+def _has_company(company: Any) -> bool:
+    """Hay empresa si alguna tiene company_name (dict o lista de dicts)"""
+    if isinstance(company, dict):
+        return bool(company.get("company_name"))
+    if isinstance(company, list):
+        return any(isinstance(item, dict) and item.get("company_name") for item in company)
+    return False
+
+
+def _error_location(loc) -> str:
+    return ".".join(str(part) for part in loc if part not in _VARIANT_TAGS)
+
+
+def _format_errors(error: ValidationError) -> List[str]:
+    errors = []
+    for item in error.errors(include_url=False):
+        message = f"{_error_location(item['loc'])}: {item['msg']}" if item["loc"] else item["msg"]
+        if message not in errors:
+            errors.append(message)
+    return errors
+
+
+def _missing_fields(data: Dict[str, Any]) -> List[str]:
+    missing_fields = []
+    if not data.get("investors") and not _has_company(data.get("investor_company")):
+        missing_fields.append("investors o investor_company: Se requiere al menos 1 inversionista (persona física o empresa)")
+    if not data.get("clients") and not _has_company(data.get("client_company")):
+        missing_fields.append("clients o client_company: Se requiere al menos 1 cliente (persona física o empresa)")
+    if not (data.get("notaries") or data.get("notary")):
+        missing_fields.append("notaries: Se requiere al menos 1 notario")
+    if not data.get("properties"):
+        missing_fields.append("properties: Se requiere al menos 1 propiedad")
+    if not data.get("paragraph_request"):
+        missing_fields.append("paragraph_request: Se requiere la configuración de párrafos")
+    if not data.get("loan"):
+        missing_fields.append("loan: Se requiere información del préstamo")
+    return missing_fields
+
+
+def contract_payload_errors(data: Any) -> List[str]:
+    """Errores de un payload ya parseado en formato missing_fields (lista vacía si es válido)"""
+    try:
+        CONTRACT_PAYLOAD_ADAPTER.validate_python(data)
+    except ValidationError as e:
+        return _format_errors(e)
+    return _missing_fields(data)
+
+
+def parse_contract_payload(body: Union[bytes, str]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Parsear y validar el cuerpo JSON en una pasada: (payload, errores)"""
+    try:
+        data = CONTRACT_PAYLOAD_ADAPTER.validate_json(body)
+    except ValidationError as e:
+        return None, _format_errors(e)
+    return data, _missing_fields(data)
@@ -0,0 +1,7 @@
+"""
+Idempotency Module
+
+Claves de idempotencia (cabecera Idempotency-Key) para endpoints que no deben
+ejecutarse dos veces: la primera respuesta se guarda y los reintentos la reciben
+sin volver a ejecutar la operación.
+"""
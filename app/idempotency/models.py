@@ -0,0 +1,20 @@
+from sqlalchemy import TIMESTAMP, Column, Integer, String, Table, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.database import metadata
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Tabla idempotency_key (respuestas guardadas por clave)
+idempotency_key = Table(
+    "idempotency_key",
+    metadata,
+    Column("scope", String(100), primary_key=True),
+    Column("endpoint", String(100), primary_key=True),
+    Column("idempotency_key", String(255), primary_key=True),
+    Column("request_hash", String(64), nullable=False),
+    # NULL mientras la operación está en curso (o si nunca terminó)
+    Column("status_code", Integer),
+    Column("response", JSONB),
+    Column("created_at", TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP")),
+)
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+
+from app.config import settings
+from app.database import engine
+
+from .models import idempotency_key
+
+log = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+LOCK_NOT_AVAILABLE = "55P03"
+REPLAY_HEADER = "Idempotent-Replayed"
+PURGE_BATCH = 100
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Hash sha256 de la petición (JSON canónico) para detectar claves reutilizadas con otro cuerpo"""
+    canonical = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def advisory_lock_id(scope: str, endpoint: str, key: str) -> int:
+    """Identificador bigint (con signo) del advisory lock de una clave"""
+    digest = hashlib.sha256(f"{scope}\x00{endpoint}\x00{key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def _lock_not_available(exc: DBAPIError) -> bool:
+    return getattr(exc.orig, "sqlstate", None) == LOCK_NOT_AVAILABLE or getattr(exc.orig, "pgcode", None) == LOCK_NOT_AVAILABLE
+
+
+class IdempotencyService:
+    """
+    Ejecución idempotente de endpoints por cabecera Idempotency-Key.
+
+    La primera petición con una clave se ejecuta y su respuesta (solo 2xx) queda
+    guardada en idempotency_key; los reintentos con la misma clave y el mismo cuerpo
+    la reciben tal cual, sin volver a ejecutar la operación. Las peticiones
+    concurrentes con la misma clave esperan a la primera en un advisory lock de
+    sesión tomado en una conexión propia (la del request sigue siendo del handler).
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, lock_timeout_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.IDEMPOTENCY_TTL_SECONDS
+        self.lock_timeout_seconds = (
+            lock_timeout_seconds if lock_timeout_seconds is not None else settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS
+        )
+
+    def _expires_before(self) -> datetime:
+        return datetime.now() - timedelta(seconds=self.ttl_seconds)
+
+    def _key_filter(self, scope: str, endpoint: str, key: str):
+        return (
+            (idempotency_key.c.scope == scope)
+            & (idempotency_key.c.endpoint == endpoint)
+            & (idempotency_key.c.idempotency_key == key)
+        )
+
+    async def _stored(self, connection, scope: str, endpoint: str, key: str, fingerprint: str):
+        """Fila vigente de la clave (None si no hay); 422 si la clave se usó con otro cuerpo"""
+        row = (await connection.execute(
+            select(idempotency_key.c.request_hash, idempotency_key.c.status_code, idempotency_key.c.response)
+            .where(self._key_filter(scope, endpoint, key))
+            .where(idempotency_key.c.created_at >= self._expires_before())
+        )).first()
+        if row is not None and row.request_hash != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="La Idempotency-Key ya se usó con una petición distinta",
+            )
+        return row
+
+    async def _reserve(self, connection, scope: str, endpoint: str, key: str, fingerprint: str) -> None:
+        """Registrar la clave como en curso (status_code NULL) antes de ejecutar la operación"""
+        # Upsert: una clave caducada pero aún no purgada se reemplaza
+        statement = insert(idempotency_key).values(
+            scope=scope, endpoint=endpoint, idempotency_key=key,
+            request_hash=fingerprint, status_code=None, response=None, created_at=func.now(),
+        )
+        await connection.execute(statement.on_conflict_do_update(
+            index_elements=[idempotency_key.c.scope, idempotency_key.c.endpoint, idempotency_key.c.idempotency_key],
+            set_={name: statement.excluded[name] for name in ("request_hash", "status_code", "response", "created_at")},
+        ))
+        await connection.commit()
+
+    async def _complete(self, connection, scope: str, endpoint: str, key: str, status_code: int, body: Any) -> None:
+        """Guardar la respuesta de una clave en curso"""
+        await connection.execute(
+            update(idempotency_key)
+            .where(self._key_filter(scope, endpoint, key))
+            .values(status_code=status_code, response=body)
+        )
+        # Purga incremental de claves caducadas (acotada para no alargar la petición)
+        expired = (
+            select(idempotency_key.c.scope, idempotency_key.c.endpoint, idempotency_key.c.idempotency_key)
+            .where(idempotency_key.c.created_at < self._expires_before())
+            .limit(PURGE_BATCH)
+        )
+        await connection.execute(delete(idempotency_key).where(
+            func.row(idempotency_key.c.scope, idempotency_key.c.endpoint, idempotency_key.c.idempotency_key).in_(expired)
+        ))
+        await connection.commit()
+
+    async def _release(self, connection, scope: str, endpoint: str, key: str) -> None:
+        """Borrar la reserva de una operación que terminó en error controlado (no se aplicó)"""
+        try:
+            await connection.execute(delete(idempotency_key).where(self._key_filter(scope, endpoint, key)))
+            await connection.commit()
+        except Exception as exc:
+            await connection.rollback()
+            log.error("Could not release idempotency key %s for %s: %s", key, endpoint, exc)
+
+    @staticmethod
+    def _replay(row) -> JSONResponse:
+        """Respuesta guardada, o 409 si la operación con la clave no terminó"""
+        if row.status_code is None:
+            raise HTTPException(
+                status_code=409,
+                detail="La petición con esta Idempotency-Key está en curso o no terminó; consulte el estado del pago antes de reintentar",
+            )
+        return JSONResponse(row.response, status_code=row.status_code, headers={REPLAY_HEADER: "true"})
+
+    async def run(
+        self,
+        key: Optional[str],
+        scope: str,
+        endpoint: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Any]],
+        response_model: Optional[type] = None,
+    ):
+        """
+        Ejecutar handler una sola vez por (scope, endpoint, key).
+
+        Sin clave se ejecuta handler directamente. Con clave devuelve un JSONResponse:
+        la respuesta guardada (cabecera Idempotent-Replayed) o la recién calculada.
+        La clave se reserva (en curso) antes de ejecutar handler y se completa con la
+        respuesta al terminar; si handler falla con HTTPException la reserva se borra y
+        se puede reintentar. Una reserva que nunca se completó (caída del proceso o
+        error al guardar la respuesta tras confirmar el pago) responde 409 hasta que
+        caduca: no se vuelve a ejecutar una operación que pudo haberse aplicado.
+        Errores: 400 clave inválida, 409 clave en curso o sin terminar, 422 clave
+        reutilizada con otro cuerpo.
+
+        Cada petición con clave ocupa una segunda conexión del pool (la del advisory
+        lock) mientras dura handler, además de la del request: DATABASE_POOL_SIZE debe
+        contar con ello.
+        """
+        if key is None:
+            return await handler()
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres")
+
+        lock_id = advisory_lock_id(scope, endpoint, key)
+        async with engine.connect() as connection:
+            # Camino rápido: un reintento de una petición ya completada no espera ningún lock
+            row = await self._stored(connection, scope, endpoint, key, fingerprint)
+            await connection.commit()
+            if row is not None and row.status_code is not None:
+                return self._replay(row)
+
+            try:
+                await connection.execute(
+                    text("SELECT set_config('lock_timeout', :timeout, true)"),
+                    {"timeout": f"{int(self.lock_timeout_seconds * 1000)}ms"},
+                )
+                await connection.execute(text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": lock_id})
+                await connection.commit()
+            except DBAPIError as exc:
+                await connection.rollback()
+                if _lock_not_available(exc):
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Otra petición con la misma Idempotency-Key sigue en proceso; reintente más tarde",
+                    ) from exc
+                raise
+
+            try:
+                # La petición que tenía el lock pudo terminar (o quedar sin terminar) mientras esperábamos
+                row = await self._stored(connection, scope, endpoint, key, fingerprint)
+                await connection.commit()
+                if row is not None:
+                    return self._replay(row)
+
+                await self._reserve(connection, scope, endpoint, key, fingerprint)
+                try:
+                    result = await handler()
+                except HTTPException:
+                    await self._release(connection, scope, endpoint, key)
+                    raise
+                body = jsonable_encoder(response_model.model_validate(result) if response_model else result)
+                try:
+                    await self._complete(connection, scope, endpoint, key, 200, body)
+                except Exception as exc:
+                    # La clave queda en curso: los reintentos reciben 409 en lugar de repetir el pago
+                    await connection.rollback()
+                    log.error("Could not store idempotent response for %s (%s): %s", endpoint, key, exc)
+                return JSONResponse(body)
+            finally:
+                try:
+                    await connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": lock_id})
+                    await connection.commit()
+                except Exception as exc:
+                    # Al cerrarse la conexión PostgreSQL libera igualmente los locks de sesión
+                    log.warning("Could not release idempotency lock for %s (%s): %s", endpoint, key, exc)
+                    await connection.invalidate()
@@ -0,0 +1,160 @@
+"""
+Morosidad de las cuotas de payment_schedule.
+
+payment_status solo cambiaba al registrar pagos, así que el atraso se calculaba en
+cada lectura. PaymentAgingService lo materializa con un único UPDATE por ejecución:
+las cuotas pending vencidas pasan a overdue (y vuelven a pending si su vencimiento
+se movió al futuro) y aging_bucket guarda el tramo de días de atraso de toda cuota
+vencida no pagada. Solo se escriben las filas que cambian de estado o de tramo,
+de modo que una ejecución sin cambios de tramo no toca la tabla. PaymentAgingJob lo
+ejecuta al arrancar y cada interval segundos (migrations/009_payment_schedule_aging.sql).
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Optional, Set
+
+from sqlalchemy import text as sql_text
+
+from app.config import settings
+from app.contracts.services.contract_kpi_service import ContractKpiService
+from app.database import engine
+
+from .schedule_cache import payment_schedule_cache
+
+log = logging.getLogger(__name__)
+
+# Lock de aplicación para que dos workers no ejecuten el job a la vez
+AGING_LOCK_ID = 0x6167696E67  # "aging"
+
+# Tramos de días de atraso (límite superior inclusive; el último no tiene límite)
+AGING_BUCKETS = (("1-30", 30), ("31-60", 60), ("61-90", 90), ("90+", None))
+
+_DAYS_LATE = "(CAST(:as_of AS DATE) - ps.due_date)"
+_BUCKET_SQL = "CASE WHEN ps.payment_status = 'paid' OR ps.due_date >= CAST(:as_of AS DATE) THEN NULL " + " ".join(
+    f"WHEN {_DAYS_LATE} <= {limit} THEN '{name}'" if limit is not None else f"ELSE '{name}'"
+    for name, limit in AGING_BUCKETS
+) + " END"
+
+# Candidatas: vencidas no pagadas (índice (due_date, payment_status)) y las que ya tienen
+# tramo (índice parcial), para limpiarlo cuando se pagan o cambia su vencimiento. Una cuota
+# overdue siempre tiene tramo, así que si su vencimiento se mueve al futuro vuelve a pending.
+AGING_UPDATE_SQL = f"""
+    WITH aged AS (
+        SELECT ps.payment_schedule_id,
+               CASE
+                   WHEN ps.payment_status = 'pending' AND ps.due_date < CAST(:as_of AS DATE) THEN 'overdue'
+                   WHEN ps.payment_status = 'overdue' AND ps.due_date >= CAST(:as_of AS DATE) THEN 'pending'
+                   ELSE ps.payment_status
+               END AS payment_status,
+               {_BUCKET_SQL} AS aging_bucket
+        FROM public.payment_schedule ps
+        WHERE ps.is_active IS NOT FALSE
+          AND ((ps.due_date < CAST(:as_of AS DATE) AND ps.payment_status <> 'paid')
+               OR ps.aging_bucket IS NOT NULL)
+    )
+    UPDATE public.payment_schedule ps
+    SET payment_status = aged.payment_status,
+        aging_bucket = aged.aging_bucket,
+        updated_at = CURRENT_TIMESTAMP
+    FROM aged
+    WHERE ps.payment_schedule_id = aged.payment_schedule_id
+      AND (ps.payment_status IS DISTINCT FROM aged.payment_status
+           OR ps.aging_bucket IS DISTINCT FROM aged.aging_bucket)
+    RETURNING ps.contract_loan_id, ps.payment_status, ps.aging_bucket
+"""
+
+
+def aging_bucket(days_late: int) -> Optional[str]:
+    """Tramo de atraso de una cuota no pagada (None si no está vencida); mismo criterio que AGING_UPDATE_SQL"""
+    if days_late <= 0:
+        return None
+    for name, limit in AGING_BUCKETS:
+        if limit is None or days_late <= limit:
+            return name
+
+
+@dataclass
+class AgingResult:
+    """Filas que cambiaron en una ejecución (marked_overdue: las que quedaron en overdue)"""
+    as_of: date
+    updated: int = 0
+    marked_overdue: int = 0
+    buckets: Dict[str, int] = field(default_factory=dict)
+    loan_ids: Set[int] = field(default_factory=set)
+    skipped: bool = False
+
+
+class PaymentAgingService:
+    """Marca cuotas vencidas y mantiene aging_bucket con un único UPDATE por ejecución"""
+
+    @staticmethod
+    async def run(connection, as_of: Optional[date] = None) -> AgingResult:
+        """
+        Ejecutar el UPDATE en la transacción de connection (el llamador confirma).
+
+        Si otro worker ya lo está ejecutando no hace nada (skipped). También
+        recalcula los KPIs de los préstamos afectados en la misma transacción.
+        """
+        result = AgingResult(as_of=as_of or date.today())
+        locked = (await connection.execute(
+            sql_text("SELECT pg_try_advisory_xact_lock(:lock_id)").bindparams(lock_id=AGING_LOCK_ID)
+        )).scalar()
+        if not locked:
+            result.skipped = True
+            return result
+
+        rows = (await connection.execute(sql_text(AGING_UPDATE_SQL), {"as_of": result.as_of})).all()
+        for contract_loan_id, payment_status, bucket in rows:
+            result.updated += 1
+            result.loan_ids.add(contract_loan_id)
+            if payment_status == "overdue":
+                result.marked_overdue += 1
+            if bucket is not None:
+                result.buckets[bucket] = result.buckets.get(bucket, 0) + 1
+
+        if result.loan_ids:
+            await ContractKpiService.refresh_loans(result.loan_ids, connection=connection)
+        return result
+
+
+class PaymentAgingJob:
+    """Ejecuta PaymentAgingService al arrancar y cada interval segundos"""
+
+    def __init__(self, interval: float = settings.PAYMENT_AGING_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stopping = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> AgingResult:
+        async with engine.begin() as connection:
+            result = await PaymentAgingService.run(connection)
+        # Los triggers de contract_changed avisan a los demás procesos al confirmar
+        for loan_id in result.loan_ids:
+            payment_schedule_cache.invalidate_loan(loan_id)
+        return result
+
+    async def start(self) -> None:
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._runner is not None:
+            await self._runner
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                result = await self.run_once()
+                if result.updated:
+                    log.info(
+                        "Payment aging updated %s installments (%s now overdue) on %s loans",
+                        result.updated, result.marked_overdue, len(result.loan_ids),
+                    )
+            except Exception:
+                log.error("Error updating payment aging", exc_info=True)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
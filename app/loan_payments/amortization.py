@@ -0,0 +1,313 @@
+"""Motor de amortización vectorizado para cronogramas de pago.
+
+Calcula en NumPy los cronogramas de muchos préstamos a la vez (una matriz
+préstamo x cuota) y devuelve filas con la forma de payment_schedule, para
+previsualizar un cronograma sin escribirlo o insertarlo en bloque.
+
+Métodos:
+    french         cuota constante (sistema francés)
+    flat           capital constante e interés sobre el monto original
+    interest_only  solo interés y todo el capital en la última cuota
+    fixed          importes explícitos, con los mismos parámetros que
+                   sp_generate_loan_payment_schedule
+
+final_payment (loan_payments_details) es un pago global: capital que no se
+amortiza en las cuotas y se paga con la última. Los importes se llevan en
+centavos enteros y las tasas en millonésimas: el interés de cada cuota se
+redondea a centavos (mitad hacia arriba) sobre el saldo ya redondeado, igual
+que calculándolo cuota a cuota en Decimal, y la diferencia de redondeo va a la
+última cuota. La suma del capital es exactamente el monto del préstamo y
+amount_due = capital + interés.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+FRENCH = "french"
+FLAT = "flat"
+INTEREST_ONLY = "interest_only"
+FIXED = "fixed"
+METHODS = (FRENCH, FLAT, INTEREST_ONLY, FIXED)
+
+# Las tasas se llevan en millonésimas (2.5 % mensual = 25000)
+RATE_UNIT = 1_000_000
+
+# payment_type de contract_loan -> método
+PAYMENT_TYPE_METHODS = {
+    "french": FRENCH, "frances": FRENCH, "francés": FRENCH, "cuota_fija": FRENCH,
+    "flat": FLAT, "lineal": FLAT, "capital_fijo": FLAT,
+    "interest_only": INTEREST_ONLY, "interes": INTEREST_ONLY, "interés": INTEREST_ONLY, "solo_interes": INTEREST_ONLY,
+    "fixed": FIXED,
+}
+
+
+def to_cents(value: Any) -> int:
+    """Importe en centavos enteros, redondeado mitad hacia arriba"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value or 0))
+    return int(value.scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def to_rate_units(rate: Any) -> int:
+    """Tasa mensual en % (4 decimales, como contract_loan.interest_rate) en millonésimas"""
+    if not isinstance(rate, Decimal):
+        rate = Decimal(str(rate or 0))
+    return int(rate.scaleb(4).to_integral_value(ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+
+@dataclass(frozen=True)
+class ScheduleTerms:
+    """Condiciones de un cronograma; los importes en la moneda del préstamo"""
+    principal: Decimal
+    quotes: int
+    start_date: date
+    monthly_rate: Decimal = Decimal(0)   # % mensual (contract_loan.interest_rate)
+    method: str = FRENCH
+    final_payment: Decimal = Decimal(0)  # pago global con la última cuota
+    contract_loan_id: Optional[int] = None
+    # Solo método fixed (parámetros de sp_generate_loan_payment_schedule)
+    monthly_principal: Decimal = Decimal(0)
+    monthly_interest: Decimal = Decimal(0)
+    last_principal: Decimal = Decimal(0)
+    last_interest: Decimal = Decimal(0)
+    last_payment_date: Optional[date] = None
+
+    def __post_init__(self):
+        if self.method not in METHODS:
+            raise ValueError(f"Método de amortización desconocido: {self.method}")
+        if self.quotes < 1:
+            raise ValueError("El cronograma necesita al menos 1 cuota")
+        if self.method != FIXED and Decimal(self.final_payment or 0) > Decimal(self.principal or 0):
+            raise ValueError("El pago final no puede superar el monto del préstamo")
+
+
+def terms_from_request(request) -> ScheduleTerms:
+    """Condiciones equivalentes a una llamada a sp_generate_loan_payment_schedule"""
+    monthly = Decimal(request.monthly_amount)
+    last = Decimal(request.last_principal)
+    return ScheduleTerms(
+        principal=monthly * (request.monthly_quotes - 1) + last,
+        quotes=request.monthly_quotes,
+        start_date=request.start_date,
+        method=FIXED,
+        contract_loan_id=request.contract_loan_id,
+        monthly_principal=monthly,
+        monthly_interest=Decimal(request.interest_amount),
+        last_principal=last,
+        last_interest=Decimal(request.last_interest),
+        last_payment_date=request.last_payment_date,
+    )
+
+
+def terms_from_loan(loan: Dict[str, Any], start_date: date, contract_loan_id: Optional[int] = None) -> ScheduleTerms:
+    """
+    Condiciones a partir de un préstamo (fila de contract_loan o payload con
+    amount / loan_payments_details)
+    """
+    details = loan.get("loan_payments_details") or loan
+    payment_type = (details.get("payment_type") or "").strip().lower()
+    return ScheduleTerms(
+        principal=Decimal(str(loan.get("loan_amount", loan.get("amount")) or 0)),
+        quotes=int(details.get("payment_qty_quotes") or loan.get("term_months") or 12),
+        start_date=start_date,
+        monthly_rate=Decimal(str(loan.get("interest_rate") or 0)),
+        method=PAYMENT_TYPE_METHODS.get(payment_type, FRENCH),
+        final_payment=Decimal(str(details.get("final_payment") or 0)),
+        contract_loan_id=contract_loan_id or loan.get("contract_loan_id"),
+    )
+
+
+@dataclass
+class ScheduleBatch:
+    """Cuotas de varios cronogramas en arrays planos, agrupadas por préstamo"""
+    terms: Sequence[ScheduleTerms]
+    loan_index: np.ndarray      # posición en terms de cada cuota
+    payment_number: np.ndarray
+    due_date: np.ndarray        # datetime64[D]
+    capital: np.ndarray         # centavos (int64)
+    interest: np.ndarray
+    balance: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.payment_number)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Filas de payment_schedule (importes Decimal con 2 decimales)"""
+        loan_ids = [terms.contract_loan_id for terms in self.terms]
+        # Los importes se repiten mucho entre cuotas: un Decimal por valor distinto
+        decimals: Dict[int, Decimal] = {}
+
+        def amount(cents: int) -> Decimal:
+            value = decimals.get(cents)
+            if value is None:
+                value = decimals[cents] = from_cents(cents)
+            return value
+
+        return [
+            {
+                "contract_loan_id": loan_ids[index],
+                "payment_number": number,
+                "due_date": due_date,
+                "amount_due": amount(capital + interest),
+                "capital_amount": amount(capital),
+                "interest_amount": amount(interest),
+                "balance": amount(balance),
+                "payment_status": "pending",
+            }
+            for index, number, due_date, capital, interest, balance in zip(
+                self.loan_index.tolist(), self.payment_number.tolist(), self.due_date.tolist(),
+                self.capital.tolist(), self.interest.tolist(), self.balance.tolist(),
+                strict=True,
+            )
+        ]
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Totales de cada cronograma"""
+        counts = np.bincount(self.loan_index, minlength=len(self.terms))
+        last = np.cumsum(counts) - 1
+        first = last - counts + 1
+        # Sumas enteras por préstamo (cada cronograma ocupa un tramo contiguo)
+        capital = np.add.reduceat(self.capital, first).tolist()
+        interest = np.add.reduceat(self.interest, first).tolist()
+        amount_due = self.capital + self.interest
+        first_due, last_due = self.due_date[first].tolist(), self.due_date[last].tolist()
+        first_amount, last_amount = amount_due[first].tolist(), amount_due[last].tolist()
+        return [
+            {
+                "contract_loan_id": terms.contract_loan_id,
+                "method": terms.method,
+                "total_payments": int(counts[i]),
+                "total_principal": from_cents(capital[i]),
+                "total_interest": from_cents(interest[i]),
+                "total_amount": from_cents(capital[i] + interest[i]),
+                "regular_payment": from_cents(first_amount[i]),
+                "final_payment": from_cents(last_amount[i]),
+                "first_due_date": first_due[i],
+                "last_due_date": last_due[i],
+            }
+            for i, terms in enumerate(self.terms)
+        ]
+
+
+def _interest(balance: np.ndarray, rate_units: np.ndarray) -> np.ndarray:
+    """Interés en centavos (mitad hacia arriba), exacto en enteros"""
+    return (balance * rate_units + RATE_UNIT // 2) // RATE_UNIT
+
+
+def _round_half_up(values: np.ndarray) -> np.ndarray:
+    # Centavos enteros; la tolerancia evita que 0.5 represente 0.4999999
+    return np.floor(values + 0.5 + 1e-9).astype(np.int64)
+
+
+def _due_dates(start: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """start + k meses, con el día ajustado al último del mes (31/01 + 1 = 28/02)"""
+    start_month = start.astype("datetime64[M]")
+    day = (start - start_month.astype("datetime64[D]")).astype(np.int64)
+    month = start_month[:, None] + k
+    month_start = month.astype("datetime64[D]")
+    month_days = ((month + 1).astype("datetime64[D]") - month_start).astype(np.int64)
+    return month_start + np.minimum(day[:, None], month_days - 1)
+
+
+def compute_schedules(terms: Sequence[ScheduleTerms]) -> ScheduleBatch:
+    """Cronogramas de todos los préstamos en una pasada vectorizada"""
+    terms = list(terms)
+    n = np.array([t.quotes for t in terms], dtype=np.int64)
+    size = int(n.max()) if len(terms) else 0
+    k = np.arange(1, size + 1, dtype=np.int64)
+    mask = k[None, :] <= n[:, None]
+    last = (np.arange(len(terms)), n - 1)
+
+    method = np.array([t.method for t in terms])
+    french, flat, interest_only, fixed = (method == FRENCH), (method == FLAT), (method == INTEREST_ONLY), (method == FIXED)
+
+    principal = np.array([to_cents(t.principal) for t in terms], dtype=np.float64)
+    balloon = np.array([to_cents(t.final_payment) for t in terms], dtype=np.float64)
+    rate_units = np.array([to_rate_units(t.monthly_rate) for t in terms], dtype=np.int64)
+    rate = rate_units / RATE_UNIT
+    nf = n.astype(np.float64)
+
+    # Francés: cuota P para que tras n cuotas quede el pago global B
+    has_rate = rate > 0
+    discount = np.where(has_rate, (1 + rate) ** -nf, 1.0)
+    payment = np.where(
+        has_rate,
+        np.where(has_rate, rate, 1.0) * (principal - balloon * discount) / np.where(has_rate, 1 - discount, 1.0),
+        (principal - balloon) / nf,
+    )
+    # El interés de cada cuota se calcula sobre el saldo ya redondeado, como al
+    # hacerlo cuota a cuota en Decimal: bucle por número de cuota, vectorizado
+    # sobre los préstamos
+    french_rows = np.nonzero(french)[0]
+    french_interest = np.zeros(mask.shape, dtype=np.int64)
+    french_capital = np.zeros(mask.shape, dtype=np.int64)
+    french_payment = _round_half_up(payment[french_rows])
+    french_rate = rate_units[french_rows]
+    balance = principal[french_rows].astype(np.int64)
+    for j in range(size if len(french_rows) else 0):
+        interest_j = _interest(balance, french_rate)
+        capital_j = french_payment - interest_j
+        french_interest[french_rows, j] = interest_j
+        french_capital[french_rows, j] = capital_j
+        balance = balance - capital_j
+
+    flat_interest = np.broadcast_to(_interest(principal.astype(np.int64), rate_units)[:, None], mask.shape)
+    flat_capital = np.broadcast_to(_round_half_up((principal - balloon) / nf)[:, None], mask.shape)
+
+    fixed_terms = [t if t.method == FIXED else None for t in terms]
+    fixed_capital = np.array([to_cents(t.monthly_principal) if t else 0 for t in fixed_terms], dtype=np.int64)[:, None]
+    fixed_interest = np.array([to_cents(t.monthly_interest) if t else 0 for t in fixed_terms], dtype=np.int64)[:, None]
+
+    capital = np.select(
+        [french[:, None], flat[:, None], fixed[:, None]],
+        [french_capital, flat_capital, np.broadcast_to(fixed_capital, mask.shape)],
+        default=0,
+    ).astype(np.int64)
+    interest = np.select(
+        [french[:, None], flat[:, None] | interest_only[:, None], fixed[:, None]],
+        [french_interest, flat_interest, np.broadcast_to(fixed_interest, mask.shape)],
+        default=0,
+    ).astype(np.int64)
+    capital = np.where(mask, capital, 0)
+    interest = np.where(mask, interest, 0)
+
+    # Última cuota: fixed con sus importes explícitos; el resto con el capital
+    # que falta (pago global y diferencias de redondeo)
+    last_principal = np.array([to_cents(t.last_principal) if t else 0 for t in fixed_terms], dtype=np.int64)
+    last_interest = np.array([to_cents(t.last_interest) if t else 0 for t in fixed_terms], dtype=np.int64)
+    capital[last] = 0
+    remaining = principal.astype(np.int64) - capital.sum(axis=1)
+    capital[last] = np.where(fixed, last_principal, remaining)
+    interest[last] = np.where(fixed, last_interest, interest[last])
+    total = np.where(fixed, capital.sum(axis=1), principal.astype(np.int64))
+    balance = total[:, None] - np.cumsum(capital, axis=1)
+
+    start = np.array([t.start_date for t in terms], dtype="datetime64[D]")
+    due = _due_dates(start, k)
+    last_dates = [(i, t.last_payment_date) for i, t in enumerate(terms) if t.method == FIXED and t.last_payment_date]
+    for i, last_date in last_dates:
+        due[i, n[i] - 1] = np.datetime64(last_date, "D")
+
+    rows = np.nonzero(mask)
+    return ScheduleBatch(
+        terms=terms,
+        loan_index=rows[0],
+        payment_number=rows[1] + 1,
+        due_date=due[rows],
+        capital=capital[rows],
+        interest=interest[rows],
+        balance=balance[rows],
+    )
+
+
+def build_schedule(terms: ScheduleTerms) -> List[Dict[str, Any]]:
+    """Filas del cronograma de un préstamo"""
+    return compute_schedules([terms]).rows()
@@ -23,6 +23,7 @@ payment_schedule = Table(
     Column("interest_amount", Numeric(15,2), nullable=False),
     Column("balance", Numeric(15,2), nullable=False),
     Column("payment_status", String(20), server_default=text("'pending'")),  # pending, paid, overdue, partial
+    Column("aging_bucket", String(10)),  # 1-30, 31-60, 61-90, 90+ (NULL al día); lo mantiene aging.py
     Column("payment_date", Date),
     Column("amount_paid", Numeric(15,2)),
     Column("notes", Text),
@@ -31,11 +32,11 @@ payment_schedule = Table(
     Column("updated_at", DateTime, server_default=text("CURRENT_TIMESTAMP")),
 )
 
-# Tabla payment_transactions (transacciones de pago)
-payment_transactions = Table(
-    "payment_transactions",
+# Tabla payment_transaction (transacciones de pago); sp_register_payment_transaction devuelve sus transaction_id
+payment_transaction = Table(
+    "payment_transaction",
     metadata,
-    Column("payment_transaction_id", Integer, primary_key=True),
+    Column("transaction_id", UUID, primary_key=True, server_default=text("gen_random_uuid()")),
     Column("payment_schedule_id", Integer, ForeignKey("payment_schedule.payment_schedule_id", ondelete="CASCADE"), nullable=False),
     Column("transaction_type", String(20), nullable=False),  # payment, refund, adjustment
     Column("amount", Numeric(15,2), nullable=False),
@@ -44,8 +45,8 @@ payment_transactions = Table(
     Column("transaction_date", Date, nullable=False),
     Column("processed_by", UUID),
     Column("notes", Text),
-    Column("url_bank_receipt", Text, nullable=False),
-    Column("url_payment_receipt", Text, nullable=False),
+    Column("url_bank_receipt", Text),
+    Column("url_payment_receipt", Text),  # la completa el outbox de uploads si el recibo es diferido
     Column("is_active", Boolean, server_default=text("true")),
     Column("created_at", DateTime, server_default=text("CURRENT_TIMESTAMP")),
     Column("updated_at", DateTime, server_default=text("CURRENT_TIMESTAMP")),
@@ -67,6 +68,7 @@ class PaymentSchedule(Base):
     interest_amount = Column(Numeric(15,2), nullable=False)
     balance = Column(Numeric(15,2), nullable=False)
     payment_status = Column(String(20), default="pending")
+    aging_bucket = Column(String(10))
     payment_date = Column(Date)
     amount_paid = Column(Numeric(15,2))
     notes = Column(Text)
@@ -76,9 +78,9 @@ class PaymentSchedule(Base):
 
 class PaymentTransaction(Base):
     """SQLAlchemy model for payment transaction records"""
-    __tablename__ = "payment_transactions"
+    __tablename__ = "payment_transaction"
 
-    payment_transaction_id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(UUID, primary_key=True, server_default=text("gen_random_uuid()"))
     payment_schedule_id = Column(Integer, ForeignKey("payment_schedule.payment_schedule_id"), nullable=False)
     transaction_type = Column(String(20), nullable=False)
     amount = Column(Numeric(15,2), nullable=False)
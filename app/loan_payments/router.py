@@ -1,16 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Header, Query
+from typing import Dict, Any, List, Literal, Optional
+from datetime import date, datetime
 from pathlib import Path
+import hashlib
 
 from app.auth.dependencies import get_current_user
-from .service import LoanPaymentService
+from .service import LoanPaymentService, ScheduleFilters
 from .payment_image_service import PaymentImageService
+from .statement_import import StatementImportService, parse_statement
 from .schemas import *
 from app.database import DepDatabase
 from app.config import settings
+from app.idempotency.models import IDEMPOTENCY_HEADER
+from app.idempotency.service import IdempotencyService, request_fingerprint
+from app.receipts.receipt_schemas import ReceiptMode
 from app.receipts.receipt_service import ReceiptService
+from app.uploads.models import UPLOAD_PAYMENT_VOUCHER, UPLOAD_PENDING
+from app.uploads.outbox import enqueue_upload
 from sqlalchemy import text
+import logging
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/loan-payments", tags=["loan-payments"])
 
@@ -22,7 +32,7 @@ def get_loan_payment_service(db: DepDatabase) -> LoanPaymentService:
 def get_payment_image_service() -> PaymentImageService:
     """Dependency para obtener servicio de imágenes de pagos"""
     contracts_dir = Path(settings.CONTRACTS_DIR)
-    return PaymentImageService(contracts_dir, use_google_drive=True)
+    return PaymentImageService(contracts_dir)
 
 
 def get_receipt_service() -> ReceiptService:
@@ -30,6 +40,11 @@ def get_receipt_service() -> ReceiptService:
     return ReceiptService()
 
 
+def get_idempotency_service() -> IdempotencyService:
+    """Dependency para obtener servicio de claves de idempotencia"""
+    return IdempotencyService()
+
+
 async def _persist_payment_receipt_url(db: DepDatabase, transaction_ids: list, drive_link: str) -> None:
     """Guarda la URL del recibo en public.payment_transaction por transaction_id (UUID)."""
     if not transaction_ids or not drive_link:
@@ -45,6 +60,69 @@ async def _persist_payment_receipt_url(db: DepDatabase, transaction_ids: list, d
         pass
 
 
+def _outbox_before_commit(
+    db: DepDatabase,
+    receipt_service: ReceiptService,
+    state: Dict[str, Any],
+    voucher: Optional[Dict[str, Any]] = None,
+    receipt_mode: ReceiptMode = ReceiptMode.INLINE,
+    requested_by: Optional[str] = None,
+):
+    """
+    Hook para register_auto_payment: registra en el outbox el voucher y el recibo
+    dentro de la transacción del pago. Las URLs se guardan cuando el despachador termina.
+
+    Cada registro va en su propio savepoint y state solo se completa cuando se libera.
+    Un error con el voucher se propaga (el pago no se confirma sin su comprobante);
+    un error con el recibo solo se registra.
+    """
+    async def before_commit(payment_data: Dict[str, Any]) -> None:
+        data = payment_data.get("data") or {}
+        transaction_ids = [str(t["transaction_id"]) for t in data.get("transactions", [])]
+        state.clear()
+
+        if voucher:
+            async with db.begin_nested():
+                voucher_upload_id = await enqueue_upload(
+                    db,
+                    UPLOAD_PAYMENT_VOUCHER,
+                    voucher["content"],
+                    voucher["filename"],
+                    voucher["content_type"],
+                    {"contract_loan_id": voucher["contract_loan_id"], "reference": voucher["reference"], "transaction_ids": transaction_ids},
+                )
+            state["voucher_upload_id"] = voucher_upload_id
+
+        try:
+            async with db.begin_nested():
+                receipt = await receipt_service.enqueue_receipt_from_payment(
+                    payment_data, db, transaction_ids, receipt_mode, requested_by=requested_by
+                )
+            state["receipt"] = receipt
+        except Exception as e:
+            # No fallar el pago si falla la generación del recibo
+            log.error("Error generating payment receipt", exc_info=e)
+
+    return before_commit
+
+
+def _resolve_receipt_mode(receipt_mode: Optional[ReceiptMode]) -> ReceiptMode:
+    """receipt_mode de la petición o el configurado (RECEIPT_DEFAULT_MODE)"""
+    return receipt_mode or ReceiptMode(settings.RECEIPT_DEFAULT_MODE)
+
+
+def _receipt_summary(receipt_result) -> Dict[str, Any]:
+    return {
+        "receipt_id": receipt_result.receipt_id,
+        "image_base64": receipt_result.image_base64,
+        "download_url": receipt_result.download_url,
+        "drive_link": receipt_result.drive_link,
+        "filename": receipt_result.filename,
+        "upload_id": receipt_result.upload_id,
+        "upload_status": receipt_result.upload_status,
+    }
+
+
 @router.post("/generate-schedule", response_model=GeneratePaymentScheduleResponse)
 async def generate_payment_schedule(
     request: GeneratePaymentScheduleRequest,
@@ -61,6 +139,43 @@ async def generate_payment_schedule(
     return await service.generate_payment_schedule(request)
 
 
+@router.post("/schedule/preview", response_model=SchedulePreviewResponse)
+async def preview_payment_schedule(
+    request: SchedulePreviewRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Calcula un cronograma de pagos sin escribirlo
+
+    Usa el motor de amortización en proceso (francés, flat o solo interés, con
+    pago final opcional); no consulta ni modifica la base de datos.
+    """
+    return LoanPaymentService.preview_payment_schedule(request)
+
+
+@router.post("/schedule/bulk", response_model=ScheduleBulkResponse)
+async def insert_payment_schedules(
+    requests: List[SchedulePreviewRequest],
+    db: DepDatabase,
+    service: LoanPaymentService = Depends(get_loan_payment_service),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Genera e inserta en bloque los cronogramas de varios préstamos
+
+    Todas las cuotas se insertan en una sola transacción; si algún préstamo ya
+    tiene cronograma no se inserta ninguno (409).
+    """
+    terms = [service.schedule_terms(request) for request in requests]
+    inserted = await service.insert_payment_schedules(terms)
+    return ScheduleBulkResponse(
+        success=True,
+        message="Cronogramas de pagos generados exitosamente",
+        schedules=len(terms),
+        total_payments_generated=inserted,
+    )
+
+
 
 @router.post("/register-payment")
 async def register_payment_with_image(
@@ -73,9 +188,12 @@ async def register_payment_with_image(
     notes: Optional[str] = Form(None),
     url_payment_receipt: Optional[str] = Form(None),
     image_file: Optional[UploadFile] = File(default=None),
+    receipt_mode: Optional[ReceiptMode] = Form(None),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     image_service: PaymentImageService = Depends(get_payment_image_service),
     service: LoanPaymentService = Depends(get_loan_payment_service),
     receipt_service: ReceiptService = Depends(get_receipt_service),
+    idempotency: IdempotencyService = Depends(get_idempotency_service),
     current_user: str = Depends(get_current_user),
 ):
     """
@@ -84,10 +202,53 @@ async def register_payment_with_image(
     - Sube el archivo a la carpeta del contrato (Drive o local)
     - Si ocurre un error, hace rollback y elimina el archivo
     - Retorna metadata de la transacción y del archivo
+    - Con cabecera Idempotency-Key, un reintento devuelve la respuesta original sin registrar otro pago
     """
+    form = {
+        "contract_loan_id": contract_loan_id, "amount": amount, "payment_method": payment_method,
+        "reference": reference, "transaction_date": transaction_date, "notes": notes,
+        "url_payment_receipt": url_payment_receipt, "receipt_mode": receipt_mode,
+    }
+    fingerprint = None
+    if idempotency_key is not None:
+        image_hash = None
+        if image_file and image_file.filename:
+            image_hash = hashlib.sha256(await image_file.read()).hexdigest()
+            await image_file.seek(0)
+        fingerprint = request_fingerprint({**form, "image_file": image_hash})
+
+    return await idempotency.run(
+        idempotency_key, current_user, "register-payment", fingerprint,
+        lambda: _register_payment_with_image(
+            db, image_file=image_file, image_service=image_service, service=service,
+            receipt_service=receipt_service, requested_by=current_user, **form,
+        ),
+    )
+
+
+async def _register_payment_with_image(
+    db,
+    contract_loan_id: int,
+    amount: float,
+    payment_method: str,
+    reference: Optional[str],
+    transaction_date: Optional[str],
+    notes: Optional[str],
+    url_payment_receipt: Optional[str],
+    image_file: Optional[UploadFile],
+    receipt_mode: Optional[ReceiptMode],
+    image_service: PaymentImageService,
+    service: LoanPaymentService,
+    receipt_service: ReceiptService,
+    requested_by: Optional[str] = None,
+):
+    """Registro del pago con voucher (cuerpo de /register-payment)"""
+    receipt_mode = _resolve_receipt_mode(receipt_mode)
     payment_image_url = None
     uploaded_filename = None
     file_remove_func = None  # función para limpiar si la DB falla
+    voucher = None
+    outbox_state: Dict[str, Any] = {}
 
     # 1. Procesar el archivo si existe (y es realmente un archivo subido)
     if image_file and hasattr(image_file, 'filename') and image_file.filename and image_file.filename.strip():
@@ -109,15 +270,25 @@ async def register_payment_with_image(
             if len(contents) > max_size:
                 raise HTTPException(400, "El archivo excede el tamaño máximo de 8MB")
             
-            # Subida atómica: solo sube después de validar
-            result = await image_service.upload_payment_image(
-                str(contract_loan_id), reference, image_file, db, file_bytes=contents
-            )
-            payment_image_url = result.get("drive_view_link") or result.get("local_path")
-            uploaded_filename = result.get("filename")
-            # Prepara función de limpieza
-            if result.get("remove_func"):
-                file_remove_func = result["remove_func"]
+            if settings.UPLOAD_OUTBOX_ENABLED:
+                # La subida se registra en el outbox junto con el pago
+                voucher = {
+                    "content": contents,
+                    "filename": image_file.filename,
+                    "content_type": image_file.content_type,
+                    "contract_loan_id": contract_loan_id,
+                    "reference": reference,
+                }
+            else:
+                # Subida atómica: solo sube después de validar
+                result = await image_service.upload_payment_image(
+                    str(contract_loan_id), reference, image_file, db, file_bytes=contents
+                )
+                payment_image_url = result.get("url")
+                uploaded_filename = result.get("filename")
+                # Prepara función de limpieza
+                if result.get("remove_func"):
+                    file_remove_func = result["remove_func"]
         except HTTPException:
             raise
         except Exception as e:
@@ -145,7 +316,10 @@ async def register_payment_with_image(
             transaction_date=tx_date,
             notes=notes,
             url_bank_receipt=payment_image_url,
-            url_payment_receipt=url_payment_receipt
+            url_payment_receipt=url_payment_receipt,
+            before_commit=_outbox_before_commit(
+                db, receipt_service, outbox_state, voucher, receipt_mode, requested_by
+            ) if settings.UPLOAD_OUTBOX_ENABLED else None
         )
 
         if not result.get("success", False):
@@ -194,28 +368,27 @@ async def register_payment_with_image(
         raise HTTPException(500, f"Error al registrar el pago: {e}")
     
     # 3. Generar recibo automáticamente si el pago fue exitoso
-    receipt_result = None
-    try:
-        # Usar la respuesta del procedimiento para generar el recibo
-        # El servicio de recibos espera los datos completos como en auto-payment
-        receipt_result = await receipt_service.generate_receipt_from_payment(result, db)
-        
-        # Agregar información del recibo a la respuesta
-        if receipt_result.success:
-            result["receipt"] = {
-                "receipt_id": receipt_result.receipt_id,
-                "image_base64": receipt_result.image_base64,
-                "drive_link": receipt_result.drive_link,
-                "filename": receipt_result.filename
-            }
-            if receipt_result.drive_link:
-                result["data"]["url_payment_receipt"] = receipt_result.drive_link
-                transaction_ids = [t["transaction_id"] for t in result["data"].get("transactions", [])]
-                await _persist_payment_receipt_url(db, transaction_ids, receipt_result.drive_link)
+    receipt_result = outbox_state.get("receipt")
+    if receipt_result:
+        # Recibo ya generado y registrado en el outbox junto con el pago
+        result["receipt"] = _receipt_summary(receipt_result)
+    elif not settings.UPLOAD_OUTBOX_ENABLED:
+        try:
+            # Usar la respuesta del procedimiento para generar el recibo
+            # El servicio de recibos espera los datos completos como en auto-payment
+            receipt_result = await receipt_service.generate_receipt_from_payment(result, db, receipt_mode)
+
+            # Agregar información del recibo a la respuesta
+            if receipt_result.success:
+                result["receipt"] = _receipt_summary(receipt_result)
+                if receipt_result.drive_link:
+                    result["data"]["url_payment_receipt"] = receipt_result.drive_link
+                    transaction_ids = [t["transaction_id"] for t in result["data"].get("transactions", [])]
+                    await _persist_payment_receipt_url(db, transaction_ids, receipt_result.drive_link)
 
-    except Exception:
-        # No fallar el pago si falla la generación del recibo
-        pass
+        except Exception:
+            # No fallar el pago si falla la generación del recibo
+            pass
     
     # 4. Retornar respuesta enriquecida
     return {
@@ -226,7 +399,9 @@ async def register_payment_with_image(
         # "transaction_result": result,
         "voucher_url": payment_image_url,
         "voucher_filename": uploaded_filename,
-        "receipt": receipt_result.dict() if receipt_result else None,
+        "voucher_upload_id": outbox_state.get("voucher_upload_id"),
+        "voucher_status": UPLOAD_PENDING if outbox_state.get("voucher_upload_id") else None,
+        "receipt": result.get("receipt"),
         "error": None
     }
 
@@ -253,11 +428,8 @@ async def register_payment_transaction(
             image_result = await image_service.upload_payment_image(contract_id, request.reference, request.image_file, db)
             
             if image_result.get("success"):
-                # Usar URL de Google Drive si está disponible, sino URL local
-                if image_result.get("drive_success") and image_result.get("drive_view_link"):
-                    request.payment_image_url = image_result.get("drive_view_link")
-                else:
-                    request.payment_image_url = image_result.get("local_path")
+                # Enlace del backend donde quedó guardada (Drive, S3 o ruta local)
+                request.payment_image_url = image_result.get("url")
         except Exception as e:
             print(f"Error subiendo imagen: {e}")
     
@@ -269,18 +441,30 @@ async def get_payment_schedule(
     db: DepDatabase,
     service: LoanPaymentService = Depends(get_loan_payment_service),
     current_user: str = Depends(get_current_user),
-    contract_id: Optional[str] = None
+    contract_id: Optional[str] = None,
+    status: Optional[Literal["pending", "paid", "overdue", "partial"]] = Query(None, description="Estado de la cuota"),
+    due_from: Optional[date] = Query(None, description="due_date desde (inclusive)"),
+    due_to: Optional[date] = Query(None, description="due_date hasta (inclusive)"),
+    aging_bucket: Optional[Literal["1-30", "31-60", "61-90", "90+"]] = Query(None, description="Tramo de días de atraso"),
+    limit: int = Query(default=100, ge=1, le=1000, description="Cuotas por página"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    include_total: bool = Query(False, description="Calcular el total de cuotas (siempre incluido con contract_id)"),
 ):
     """
-    Obtiene el cronograma de pagos de un contrato
+    Obtiene el cronograma de pagos, paginado por cursor
     
     Args:
-        contract_id: ID del contrato (opcional). Si no se proporciona, devuelve todos los cronogramas.
+        contract_id: ID del contrato (opcional). Si no se proporciona, lista las cuotas
+            de todos los préstamos por fecha de vencimiento.
     
     Returns:
-        Cronograma de pagos del contrato usando la función SQL sp_get_payment_schedule
+        Página del cronograma (sp_get_payment_schedule con contract_id, cacheado por
+        contrato); para la siguiente se envía next_cursor mientras has_more sea true
     """
-    result = await service.get_payment_schedule(contract_id=contract_id)
+    filters = ScheduleFilters(status=status, due_from=due_from, due_to=due_to, aging_bucket=aging_bucket)
+    result = await service.get_payment_schedule(
+        contract_id=contract_id, filters=filters, limit=limit, cursor=cursor, include_total=include_total
+    )
     
     if not result.get("success", False):
         raise HTTPException(
@@ -295,9 +479,11 @@ async def get_payment_schedule(
 async def register_auto_payment(
     request: AutoPaymentRequest,
     db: DepDatabase,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     service: LoanPaymentService = Depends(get_loan_payment_service),
     image_service: PaymentImageService = Depends(get_payment_image_service),
     receipt_service: ReceiptService = Depends(get_receipt_service),
+    idempotency: IdempotencyService = Depends(get_idempotency_service),
     current_user: str = Depends(get_current_user)
 ):
 
@@ -310,12 +496,31 @@ async def register_auto_payment(
     - Manejar pagos adelantados si el monto excede las cuotas pendientes
     - Actualizar el estado de los pagos (pending -> partial -> paid)
     
+    Con cabecera Idempotency-Key, un reintento con el mismo cuerpo devuelve la
+    respuesta original sin volver a registrar el pago.
+    
     Args:
         request: Datos del pago automático
         
     Returns:
         Resumen del pago procesado con detalles de transacciones y actualizaciones
     """
+    return await idempotency.run(
+        idempotency_key, current_user, "auto-payment", request_fingerprint(request.model_dump()),
+        lambda: _register_auto_payment(request, db, service, image_service, receipt_service, requested_by=current_user),
+        response_model=AutoPaymentResponse,
+    )
+
+
+async def _register_auto_payment(
+    request: AutoPaymentRequest,
+    db,
+    service: LoanPaymentService,
+    image_service: PaymentImageService,
+    receipt_service: ReceiptService,
+    requested_by: Optional[str] = None,
+):
+    """Registro del pago automático (cuerpo de /auto-payment)"""
     # Convertir transaction_date si se proporciona
     transaction_date = None
     if request.transaction_date:
@@ -335,14 +540,13 @@ async def register_auto_payment(
             image_result = await image_service.upload_payment_image(contract_id, request.reference, request.image_file, db)
             
             if image_result.get("success"):
-                # Usar URL de Google Drive si está disponible, sino URL local
-                if image_result.get("drive_success") and image_result.get("drive_view_link"):
-                    url_bank_receipt = image_result.get("drive_view_link")
-                else:
-                    url_bank_receipt = image_result.get("local_path")
+                # Enlace del backend donde quedó guardada (Drive, S3 o ruta local)
+                url_bank_receipt = image_result.get("url")
         except Exception:
             pass
     
+    receipt_mode = _resolve_receipt_mode(request.receipt_mode)
+    outbox_state: Dict[str, Any] = {}
     result = await service.register_auto_payment(
         contract_loan_id=request.contract_loan_id,
         amount=request.amount,
@@ -351,7 +555,10 @@ async def register_auto_payment(
         transaction_date=transaction_date,
         notes=request.notes,
         url_bank_receipt=url_bank_receipt,
-        url_payment_receipt=request.url_payment_receipt
+        url_payment_receipt=request.url_payment_receipt,
+        before_commit=_outbox_before_commit(
+            db, receipt_service, outbox_state, receipt_mode=receipt_mode, requested_by=requested_by
+        ) if settings.UPLOAD_OUTBOX_ENABLED else None
     )
     
     if not result.get("success", False):
@@ -359,18 +566,21 @@ async def register_auto_payment(
         error_detail = result.get("error", {}).get("message", "Error al procesar el pago")
         raise HTTPException(status_code=status_code, detail=error_detail)
     
+    if settings.UPLOAD_OUTBOX_ENABLED:
+        # El recibo se generó dentro de la transacción y su subida quedó en el outbox
+        if outbox_state.get("receipt"):
+            result["receipt"] = _receipt_summary(outbox_state["receipt"])
+        result["status_code"] = 200
+        result["message"] = "Pago registrado correctamente"
+        return result
+
     # Generar recibo automáticamente si el pago fue exitoso
     try:
-        receipt_result = await receipt_service.generate_receipt_from_payment(result, db)
+        receipt_result = await receipt_service.generate_receipt_from_payment(result, db, receipt_mode)
         
         # Agregar información del recibo a la respuesta
         if receipt_result.success:
-            result["receipt"] = {
-                "receipt_id": receipt_result.receipt_id,
-                "image_base64": receipt_result.image_base64,
-                "drive_link": receipt_result.drive_link,
-                "filename": receipt_result.filename
-            }
+            result["receipt"] = _receipt_summary(receipt_result)
             # También agregar la URL del recibo al campo url_payment_receipt
             if receipt_result.drive_link:
                 result["data"]["url_payment_receipt"] = receipt_result.drive_link
@@ -387,6 +597,37 @@ async def register_auto_payment(
     return result
 
 
+@router.post("/import-statement")
+async def import_bank_statement(
+    file: UploadFile = File(..., description="Extracto bancario CSV o NDJSON"),
+    payment_method: str = Form("Transferencia", description="Método de pago si la línea no lo indica"),
+    chunk_size: int = Form(100, ge=1, le=1000, description="Líneas por transacción"),
+    concurrency: int = Form(4, ge=1, le=16, description="Conexiones aplicando pagos a la vez"),
+    receipts: bool = Form(True, description="Registrar los recibos en el outbox (se generan después)"),
+    dry_run: bool = Form(False, description="Solo interpretar y asociar las líneas, sin aplicar pagos"),
+    receipt_service: ReceiptService = Depends(get_receipt_service),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Importa los pagos de un extracto bancario
+
+    Cada línea se asocia a un préstamo por su referencia (número de contrato) o por
+    contract_loan_id y se aplica con sp_register_payment_transaction, en bloques
+    transaccionales y respetando el orden de los pagos de cada préstamo. Devuelve
+    el informe de conciliación: estado de cada línea y totales.
+    """
+    lines = parse_statement(await file.read(), file.content_type, file.filename)
+    service = StatementImportService(
+        receipt_service,
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+        payment_method=payment_method,
+        receipts=receipts,
+        requested_by=current_user,
+    )
+    return await service.run(lines, dry_run=dry_run)
+
+
 @router.post("/specific-payment", response_model=SpecificPaymentResponse)
 async def register_specific_payments(
     request: SpecificPaymentRequest,
@@ -429,11 +670,8 @@ async def register_specific_payments(
             image_result = await image_service.upload_payment_image(contract_id, request.reference, request.image_file, db)
             
             if image_result.get("success"):
-                # Usar URL de Google Drive si está disponible, sino URL local
-                if image_result.get("drive_success") and image_result.get("drive_view_link"):
-                    url_bank_receipt = image_result.get("drive_view_link")
-                else:
-                    url_bank_receipt = image_result.get("local_path")
+                # Enlace del backend donde quedó guardada (Drive, S3 o ruta local)
+                url_bank_receipt = image_result.get("url")
         except Exception:
             pass
     
@@ -469,9 +707,9 @@ async def upload_payment_image(
     - Valida que la imagen sea de tipo permitido (JPEG, PNG, GIF)
     - Usa el contract_id directamente (UUID)
     - Crea la carpeta payments si no existe
-    - Guarda la imagen localmente con el nombre basado en la referencia
-    - Sube la imagen a Google Drive si está disponible
-    - Devuelve las URLs tanto locales como de Google Drive
+    - Guarda la imagen con el nombre basado en la referencia en el backend
+      de documentos del contrato (local, Google Drive o S3)
+    - Devuelve la URL del archivo guardado
     
     Args:
         contract_id: ID del contrato (UUID)
@@ -479,7 +717,7 @@ async def upload_payment_image(
         image_file: Archivo de imagen del voucher
         
     Returns:
-        Información del archivo subido con URLs locales y de Google Drive
+        Información del archivo subido y su URL
     """
     return await image_service.upload_payment_image_direct(contract_id, reference, image_file, db)
 
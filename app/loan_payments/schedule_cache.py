@@ -0,0 +1,109 @@
+"""Cache del cronograma de pagos por contrato (GET /loan-payments/schedule?contract_id=...).
+
+Guarda la respuesta de sp_get_payment_schedule ya adaptada (paymentt_list -> data),
+de modo que cada lectura solo filtra y pagina. Se invalida por contrato con las
+notificaciones contract_changed (los triggers de payment_schedule y
+payment_transaction de migrations/005 las emiten en cada pago) y, dentro del
+proceso, por préstamo desde los caminos que registran pagos, sin esperar a la
+notificación. Igual que el cache de detalle, solo se usa mientras LISTEN está activo.
+"""
+
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional
+
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class CachedSchedule:
+    """Cronograma de un contrato listo para filtrar y paginar"""
+    contract_id: str
+    payload: Dict[str, Any]
+    loan_ids: FrozenSet[int] = field(default_factory=frozenset)
+
+
+def schedule_cache_key(contract_id: str) -> Optional[str]:
+    """Clave del cache (UUID en minúsculas, como el payload de contract_changed); None si no es un UUID"""
+    try:
+        return str(uuid.UUID(str(contract_id)))
+    except ValueError:
+        return None
+
+
+class PaymentScheduleCache:
+    """LRU de cronogramas por contrato acotado por número de contratos"""
+
+    def __init__(self, max_entries: int = settings.PAYMENT_SCHEDULE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.enabled = False
+        self._entries: "OrderedDict[str, CachedSchedule]" = OrderedDict()
+        self._by_loan: Dict[int, str] = {}
+        # Contador de invalidaciones: una lectura empezada antes de una invalidación no se guarda
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, contract_id: str) -> Optional[CachedSchedule]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(contract_id)
+        if entry is not None:
+            self._entries.move_to_end(contract_id)
+        return entry
+
+    def put(self, entry: CachedSchedule, generation: int) -> bool:
+        """Guardar el cronograma si nada se invalidó desde generation (leída antes de consultar la BD)"""
+        if not self.enabled or generation != self._generation or self.max_entries <= 0:
+            return False
+        self._discard(entry.contract_id)
+        self._entries[entry.contract_id] = entry
+        for loan_id in entry.loan_ids:
+            self._by_loan[loan_id] = entry.contract_id
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+        return True
+
+    def _discard(self, contract_id: str) -> None:
+        entry = self._entries.pop(contract_id, None)
+        if entry is None:
+            return
+        for loan_id in entry.loan_ids:
+            if self._by_loan.get(loan_id) == contract_id:
+                del self._by_loan[loan_id]
+
+    def invalidate(self, contract_id: str) -> None:
+        """Olvidar el cronograma de un contrato (payload de contract_changed)"""
+        self._generation += 1
+        key = schedule_cache_key(contract_id)
+        if key is not None:
+            self._discard(key)
+
+    def invalidate_loan(self, contract_loan_id: int) -> None:
+        """
+        Olvidar el cronograma del contrato de un préstamo tras registrar un pago.
+
+        Si ninguna entrada conoce el préstamo (la función SQL no devolvió
+        contract_loan_id) se descartan las entradas sin préstamos indexados.
+        """
+        self._generation += 1
+        contract_id = self._by_loan.get(int(contract_loan_id))
+        if contract_id is not None:
+            self._discard(contract_id)
+            return
+        for key in [key for key, entry in self._entries.items() if not entry.loan_ids]:
+            self._discard(key)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        self._by_loan.clear()
+
+
+payment_schedule_cache = PaymentScheduleCache()
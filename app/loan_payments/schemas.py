@@ -1,9 +1,11 @@
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Literal, Union
 from uuid import UUID
 from pydantic import BaseModel, Field
 from datetime import datetime, date
 from decimal import Decimal
 
+from app.receipts.receipt_schemas import ReceiptMode
+
 # ========================================
 # Request Models
 # ========================================
@@ -20,6 +22,16 @@ class GeneratePaymentScheduleRequest(BaseModel):
     last_principal: Decimal = Field(..., description="Monto del capital del último pago")
     last_interest: Decimal = Field(..., description="Monto del interés del último pago")
 
+class SchedulePreviewRequest(BaseModel):
+    """Condiciones para calcular un cronograma con el motor de amortización"""
+    contract_loan_id: Optional[int] = Field(None, description="ID del préstamo (obligatorio para insertar)")
+    principal: Decimal = Field(..., gt=0, description="Monto del préstamo")
+    quotes: int = Field(..., ge=1, le=600, description="Número de cuotas mensuales")
+    start_date: date = Field(..., description="Fecha de inicio; la primera cuota vence un mes después")
+    monthly_rate: Decimal = Field(Decimal(0), ge=0, le=100, description="Tasa de interés mensual (%)")
+    method: Literal["french", "flat", "interest_only"] = Field("french", description="Sistema de amortización")
+    final_payment: Decimal = Field(Decimal(0), ge=0, description="Pago final (capital que se paga con la última cuota)")
+
 # ========================================
 # Response Models
 # ========================================
@@ -33,6 +45,22 @@ class GeneratePaymentScheduleResponse(BaseModel):
     schedule_summary: Optional[Dict[str, Any]] = None
 
 
+class SchedulePreviewResponse(BaseModel):
+    """Cronograma calculado sin escribirlo en payment_schedule"""
+    success: bool
+    contract_loan_id: Optional[int] = None
+    schedule_summary: Dict[str, Any]
+    schedule: List[Dict[str, Any]]
+
+
+class ScheduleBulkResponse(BaseModel):
+    """Resultado de insertar cronogramas en bloque"""
+    success: bool
+    message: str
+    schedules: int
+    total_payments_generated: int
+
+
 class RegisterPaymentTransactionRequest(BaseModel):
     """Request model for registering payment transaction"""
     contract_loan_id: int
@@ -74,6 +102,11 @@ class PaymentScheduleResponse(BaseModel):
     data: Optional[List[Dict[str, Any]]] = None
     error: Optional[str] = None
     message: Optional[str] = None
+    # Paginación (ver GET /loan-payments/schedule)
+    total: Optional[int] = None
+    count: int = 0
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 class AutoPaymentRequest(BaseModel):
@@ -88,6 +121,7 @@ class AutoPaymentRequest(BaseModel):
     url_payment_receipt: Optional[str] = Field(None, description="URL del recibo de la transacción")
     payment_image_url: Optional[str] = Field(None, description="URL de la imagen del voucher subida")
     image_file: Optional[Any] = Field(None, description="Archivo de imagen del voucher")
+    receipt_mode: Optional[ReceiptMode] = Field(None, description="Cómo se entrega el recibo (por defecto RECEIPT_DEFAULT_MODE)")
 
 class AutoPaymentResponse(BaseModel):
     """Response model for automatic payment registration"""
@@ -131,6 +165,8 @@ class PaymentImageUploadResponse(BaseModel):
     success: bool
     message: str
     filename: Optional[str] = None
+    url: Optional[str] = None
+    storage_type: Optional[str] = None
     local_path: Optional[str] = None
     drive_success: Optional[bool] = None
     drive_view_link: Optional[str] = None
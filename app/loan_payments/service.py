@@ -1,21 +1,150 @@
-from typing import Dict, Any, Optional, List, Union
+import base64
+import binascii
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Tuple, Union, Callable, Awaitable
 from datetime import datetime, date
 from decimal import Decimal
 from fastapi import HTTPException
 from sqlalchemy import text as sql_text
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import and_, literal, select, tuple_, update, delete, func
 from sqlalchemy.orm import selectinload
 
-from .models import payment_schedule, payment_transactions, PaymentSchedule, PaymentTransaction
+from .amortization import ScheduleTerms, compute_schedules, terms_from_request
+from .models import payment_schedule, payment_transaction, PaymentSchedule, PaymentTransaction
 from .schemas import (
     GeneratePaymentScheduleRequest,
     GeneratePaymentScheduleResponse,
+    SchedulePreviewRequest,
+    SchedulePreviewResponse,
     RegisterPaymentTransactionRequest,
     RegisterPaymentTransactionResponse,
     LoanSummaryResponse
 )
-from app.database import DepDatabase
+from .schedule_cache import CachedSchedule, payment_schedule_cache, schedule_cache_key
+from app.contracts.models import contract_loan
+from app.contracts.services.contract_kpi_service import ContractKpiService, refresh_loan_kpis
+from app.database import DepDatabase, fetch_all, fetch_one
+
+log = logging.getLogger(__name__)
+
+# Aplica un pago a las cuotas pendientes del préstamo en orden cronológico
+REGISTER_PAYMENT_SQL = sql_text("""
+    SELECT sp_register_payment_transaction(
+        :contract_loan_id,
+        :amount,
+        :payment_method,
+        :reference,
+        :transaction_date,
+        :url_bank_receipt,
+        :url_payment_receipt,
+        :notes
+    )
+""")
+
+
+# Columnas de payment_schedule en el listado de cuotas de todos los préstamos
+SCHEDULE_LIST_FIELDS = (
+    "payment_schedule_id", "contract_loan_id", "payment_number", "due_date", "amount_due", "capital_amount",
+    "interest_amount", "balance", "payment_status", "aging_bucket", "payment_date", "amount_paid", "notes",
+)
+
+
+@dataclass
+class ScheduleFilters:
+    """Filtros de GET /loan-payments/schedule"""
+    status: Optional[str] = None  # pending, paid, overdue, partial
+    due_from: Optional[date] = None
+    due_to: Optional[date] = None
+    aging_bucket: Optional[str] = None  # 1-30, 31-60, 61-90, 90+ (ver aging.py); solo se filtra en la BD
+
+    def matches(self, item: Dict[str, Any]) -> bool:
+        """Filtro en memoria sobre una cuota de sp_get_payment_schedule"""
+        if self.status and item.get("payment_status") != self.status:
+            return False
+        if self.due_from or self.due_to:
+            due = str(item.get("due_date") or "")[:10]
+            if not due or (self.due_from and due < self.due_from.isoformat()) or (self.due_to and due > self.due_to.isoformat()):
+                return False
+        return True
+
+
+def encode_schedule_cursor(*key: Any) -> str:
+    """Cursor opaco: (due_date, payment_schedule_id) en el listado general, posición en el de un contrato"""
+    raw = json.dumps([k.isoformat() if isinstance(k, date) else k for k in key]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_schedule_cursor(cursor: str, keyset: bool = False) -> Tuple:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if keyset:
+            due_date, schedule_id = key
+            return date.fromisoformat(due_date), int(schedule_id)
+        (offset,) = key
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError(offset)
+        return (offset,)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(400, "Cursor inválido")
+
+
+def normalize_schedule_payload(payment_data: Any) -> Dict[str, Any]:
+    """
+    Adaptar la respuesta de sp_get_payment_schedule a PaymentScheduleResponse
+    (paymentt_list -> data). Se hace una vez, antes de guardarla en el cache.
+    """
+    if isinstance(payment_data, str):
+        try:
+            payment_data = json.loads(payment_data)
+        except json.JSONDecodeError as e:
+            return {
+                "success": False,
+                "error": "PARSE_ERROR",
+                "message": f"Error al procesar los datos de pagos: {str(e)}",
+                "data": None
+            }
+    if not isinstance(payment_data, dict):
+        return {"success": True, "data": payment_data if isinstance(payment_data, list) else []}
+    if "paymentt_list" in payment_data:
+        payment_data["data"] = payment_data.pop("paymentt_list")
+    elif "data" not in payment_data:
+        # Sin ninguna de las dos claves el diccionario completo es la cuota
+        payment_data = {
+            "success": payment_data.get("success", True),
+            "data": [payment_data],
+            "error": payment_data.get("error"),
+            "message": payment_data.get("message")
+        }
+    if payment_data.get("data") is None:
+        payment_data["data"] = []
+    return payment_data
+
+
+def schedule_loan_ids(items: List[Dict[str, Any]]) -> frozenset:
+    """Préstamos presentes en un cronograma (para invalidar el cache por préstamo)"""
+    return frozenset(
+        int(item["contract_loan_id"]) for item in items
+        if isinstance(item, dict) and str(item.get("contract_loan_id", "")).isdigit()
+    )
+
+
+def page_contract_schedule(schedule: Dict[str, Any], filters: ScheduleFilters, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """Página del cronograma de un contrato; no modifica schedule (puede venir del cache)"""
+    items = [item for item in schedule["data"] if not isinstance(item, dict) or filters.matches(item)]
+    (offset,) = decode_schedule_cursor(cursor) if cursor else (0,)
+    page = items[offset:offset + limit]
+    has_more = offset + limit < len(items)
+    return {
+        **schedule,
+        "data": page,
+        "total": len(items),
+        "count": len(page),
+        "has_more": has_more,
+        "next_cursor": encode_schedule_cursor(offset + limit) if has_more else None,
+    }
 
 
 class LoanPaymentService:
@@ -59,13 +188,14 @@ class LoanPaymentService:
             )
             
             await self.db.commit()
+            payment_schedule_cache.invalidate_loan(request.contract_loan_id)
             
             return GeneratePaymentScheduleResponse(
                 success=True,
                 message="Cronograma de pagos generado exitosamente",
                 contract_loan_id=request.contract_loan_id,
                 total_payments_generated=request.monthly_quotes,
-                schedule_summary=None
+                schedule_summary=self._schedule_summary(request)
             )
             
         except Exception as e:
@@ -74,61 +204,131 @@ class LoanPaymentService:
                 detail=f"Error al generar el cronograma de pagos: {str(e)}"
             )
 
-    async def get_payment_schedule(self, contract_id: Optional[str] = None) -> Dict[str, Any]:
+    @staticmethod
+    def _schedule_summary(request: GeneratePaymentScheduleRequest) -> Optional[Dict[str, Any]]:
+        """Resumen del cronograma con los mismos parámetros que la función SQL (sin consultar la BD)"""
+        try:
+            return compute_schedules([terms_from_request(request)]).summaries()[0]
+        except ValueError as e:
+            log.warning("Could not summarize schedule for loan %s: %s", request.contract_loan_id, e)
+            return None
+
+    @staticmethod
+    def schedule_terms(request: SchedulePreviewRequest) -> ScheduleTerms:
+        try:
+            return ScheduleTerms(
+                principal=request.principal,
+                quotes=request.quotes,
+                start_date=request.start_date,
+                monthly_rate=request.monthly_rate,
+                method=request.method,
+                final_payment=request.final_payment,
+                contract_loan_id=request.contract_loan_id,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @classmethod
+    def preview_payment_schedule(cls, request: SchedulePreviewRequest) -> SchedulePreviewResponse:
+        """Calcula el cronograma con el motor de amortización sin escribirlo"""
+        batch = compute_schedules([cls.schedule_terms(request)])
+        return SchedulePreviewResponse(
+            success=True,
+            contract_loan_id=request.contract_loan_id,
+            schedule_summary=batch.summaries()[0],
+            schedule=batch.rows(),
+        )
+
+    async def insert_payment_schedules(self, terms: List[ScheduleTerms]) -> int:
+        """
+        Calcula e inserta en bloque los cronogramas de varios préstamos (una sola
+        sentencia y un commit). Los préstamos que ya tienen cuotas activas se
+        rechazan con 409 para no duplicar el cronograma; las filas de contract_loan
+        se bloquean antes de comprobarlo, así dos llamadas concurrentes para el
+        mismo préstamo no pueden pasar ambas la comprobación.
+        """
+        if not terms:
+            return 0
+        loan_ids = [t.contract_loan_id for t in terms]
+        if None in loan_ids or len(set(loan_ids)) != len(loan_ids):
+            raise HTTPException(status_code=400, detail="Cada cronograma necesita un contract_loan_id distinto")
+
+        # Orden fijo para que dos llamadas con préstamos en común no se bloqueen mutuamente
+        await self.db.execute(
+            select(contract_loan.c.contract_loan_id)
+            .where(contract_loan.c.contract_loan_id.in_(loan_ids))
+            .order_by(contract_loan.c.contract_loan_id)
+            .with_for_update()
+        )
+        existing = await self.db.execute(
+            select(payment_schedule.c.contract_loan_id).distinct().where(
+                payment_schedule.c.contract_loan_id.in_(loan_ids),
+                payment_schedule.c.is_active.is_not(False),
+            )
+        )
+        existing_ids = sorted(row[0] for row in existing)
+        if existing_ids:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail=f"Los préstamos {existing_ids} ya tienen cronograma de pagos",
+            )
+
+        rows = compute_schedules(terms).rows()
+        await self.db.execute(payment_schedule.insert(), rows)
+        # KPIs de los préstamos nuevos en la misma transacción, sin abortarla si fallan
+        try:
+            async with self.db.begin_nested():
+                await ContractKpiService.refresh_loans(loan_ids, connection=self.db)
+        except Exception as e:
+            log.warning("Could not refresh KPIs for new schedules: %s", e)
+        await self.db.commit()
+        for loan_id in loan_ids:
+            payment_schedule_cache.invalidate_loan(loan_id)
+        return len(rows)
+
+    async def get_payment_schedule(
+        self,
+        contract_id: Optional[str] = None,
+        filters: Optional[ScheduleFilters] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+    ) -> Dict[str, Any]:
         """
-        Obtiene el cronograma de pagos de un contrato usando la función SQL sp_get_payment_schedule
+        Página del cronograma de pagos.
+
+        Con contract_id se usa sp_get_payment_schedule (respuesta cacheada por
+        contrato y filtrada/paginada en memoria); sin él se listan las cuotas de
+        todos los préstamos directamente desde payment_schedule, con los filtros
+        en la BD y paginación por cursor.
         """
+        filters = filters or ScheduleFilters()
+        if not contract_id:
+            return await self.list_payment_schedules(filters, limit, cursor, include_total)
+        if filters.aging_bucket:
+            # sp_get_payment_schedule no devuelve aging_bucket: se filtra en payment_schedule
+            key = schedule_cache_key(contract_id)
+            if key is None:
+                raise HTTPException(400, "aging_bucket con contract_id requiere el UUID del contrato")
+            return await self.list_payment_schedules(filters, limit, cursor, include_total=True, contract_id=key)
+
+        schedule = await self.contract_payment_schedule(contract_id)
+        if not schedule.get("success", False):
+            return schedule
+        return page_contract_schedule(schedule, filters, limit, cursor)
+
+    async def contract_payment_schedule(self, contract_id: str) -> Dict[str, Any]:
+        """Cronograma completo de un contrato (sp_get_payment_schedule), desde el cache si está"""
+        key = schedule_cache_key(contract_id)
+        cached = payment_schedule_cache.get(key) if key else None
+        if cached is not None:
+            return cached.payload
+
+        generation = payment_schedule_cache.generation
         try:
-            if contract_id:
-                query = sql_text("SELECT sp_get_payment_schedule(:contract_id)")
-                result = await self.db.execute(query, {"contract_id": contract_id})
-            else:
-                query = sql_text("SELECT sp_get_payment_schedule()")
-                result = await self.db.execute(query)
-            
-            # Obtener el resultado
+            result = await self.db.execute(sql_text("SELECT sp_get_payment_schedule(:contract_id)"), {"contract_id": contract_id})
             row = result.fetchone()
-            if not row or not row[0]:
-                return {
-                    "success": False,
-                    "error": "NO_DATA",
-                    "message": "No se encontraron datos de pagos",
-                    "data": None
-                }
-            
-            # El resultado ya viene como diccionario desde la función SQL
-            payment_data = row[0]
-            
-            # Si es un string JSON, parsearlo
-            if isinstance(payment_data, str):
-                import json
-                try:
-                    payment_data = json.loads(payment_data)
-                except json.JSONDecodeError as e:
-                    return {
-                        "success": False,
-                        "error": "PARSE_ERROR",
-                        "message": f"Error al procesar los datos de pagos: {str(e)}",
-                        "data": None
-                    }
-            
-            # Adaptar la estructura para que sea compatible con el schema
-            if isinstance(payment_data, dict):
-                # Si tiene "paymentt_list", adaptarlo a "data"
-                if "paymentt_list" in payment_data:
-                    payment_data["data"] = payment_data.pop("paymentt_list")
-                # Si tiene "data" pero no "paymentt_list", dejarlo como está
-                elif "data" not in payment_data:
-                    # Si no tiene ninguna de las dos claves, asumir que el diccionario completo es la data
-                    payment_data = {
-                        "success": payment_data.get("success", True),
-                        "data": [payment_data] if isinstance(payment_data, dict) else [],
-                        "error": payment_data.get("error"),
-                        "message": payment_data.get("message")
-                    }
-            
-            return payment_data
-                
         except Exception as e:
             return {
                 "success": False,
@@ -136,30 +336,93 @@ class LoanPaymentService:
                 "message": f"Error inesperado al recuperar pagos: {str(e)}",
                 "data": None
             }
+        if not row or not row[0]:
+            return {
+                "success": False,
+                "error": "NO_DATA",
+                "message": "No se encontraron datos de pagos",
+                "data": None
+            }
+
+        payment_data = normalize_schedule_payload(row[0])
+        if key and payment_data.get("success", False):
+            payment_schedule_cache.put(
+                CachedSchedule(key, payment_data, schedule_loan_ids(payment_data["data"])), generation
+            )
+        return payment_data
+
+    async def list_payment_schedules(
+        self,
+        filters: ScheduleFilters,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        contract_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Cuotas de todos los préstamos (o de un contrato) ordenadas por (due_date, payment_schedule_id)"""
+        conditions = [payment_schedule.c.is_active.is_not(False)]
+        if contract_id:
+            conditions.append(contract_loan.c.contract_id == contract_id)
+        if filters.status:
+            conditions.append(payment_schedule.c.payment_status == filters.status)
+        if filters.due_from:
+            conditions.append(payment_schedule.c.due_date >= filters.due_from)
+        if filters.due_to:
+            conditions.append(payment_schedule.c.due_date <= filters.due_to)
+        if filters.aging_bucket:
+            conditions.append(payment_schedule.c.aging_bucket == filters.aging_bucket)
+
+        page_conditions = list(conditions)
+        if cursor:
+            due_date, schedule_id = decode_schedule_cursor(cursor, keyset=True)
+            page_conditions.append(tuple_(payment_schedule.c.due_date, payment_schedule.c.payment_schedule_id) > tuple_(
+                literal(due_date, payment_schedule.c.due_date.type),
+                literal(schedule_id, payment_schedule.c.payment_schedule_id.type),
+            ))
+        source = payment_schedule.join(contract_loan, contract_loan.c.contract_loan_id == payment_schedule.c.contract_loan_id)
+        query = (
+            select(*[payment_schedule.c[name] for name in SCHEDULE_LIST_FIELDS], contract_loan.c.contract_id)
+            .select_from(source)
+            .where(and_(*page_conditions))
+            .order_by(payment_schedule.c.due_date, payment_schedule.c.payment_schedule_id)
+            .limit(limit + 1)
+        )
+        rows = await fetch_all(query, connection=self.db)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        total = None
+        if include_total:
+            count_query = select(func.count().label("total")).select_from(source).where(and_(*conditions))
+            total = (await fetch_one(count_query, connection=self.db))["total"]
+
+        return {
+            "success": True,
+            "data": rows,
+            "total": total,
+            "count": len(rows),
+            "has_more": has_more,
+            "next_cursor": encode_schedule_cursor(rows[-1]["due_date"], rows[-1]["payment_schedule_id"]) if has_more else None,
+        }
 
     async def register_auto_payment(self, contract_loan_id: int, amount: float,
                                      payment_method: str = "Cash", reference: Optional[str] = None, 
                                      transaction_date: Optional[datetime] = None, 
                                      notes: Optional[str] = None,
                                      url_bank_receipt: Optional[str] = None,
-                                     url_payment_receipt: Optional[str] = None) -> Dict[str, Any]:
+                                     url_payment_receipt: Optional[str] = None,
+                                     before_commit: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
         """
         Registra un pago automático usando la función SQL sp_register_payment_transaction
+
+        before_commit se ejecuta (en un savepoint) antes de confirmar el pago exitoso,
+        de modo que lo que registre se confirma junto con el pago. Si falla, el pago
+        se revierte y se devuelve el error: lo que el hook debía registrar no se pierde
+        en silencio.
         """
         try:
-            query = sql_text("""
-                SELECT sp_register_payment_transaction(
-                    :contract_loan_id,
-                    :amount,
-                    :payment_method,
-                    :reference,
-                    :transaction_date,
-                    :url_bank_receipt,
-                    :url_payment_receipt,
-                    :notes
-                )
-            """)
-            
+            query = REGISTER_PAYMENT_SQL
+
             # Usar la fecha actual si no se proporciona
             if not transaction_date:
                 transaction_date = datetime.now()
@@ -177,34 +440,56 @@ class LoanPaymentService:
 
             result = await self.db.execute(query, params)
 
-            await self.db.commit()
-
             # Obtener el resultado
             row = result.fetchone()
-            if not row or not row[0]:
-                return {
-                    "success": False,
-                    "error": "NO_DATA",
-                    "message": "No se recibió respuesta del procedimiento",
-                    "data": None
-                }
+            payment_data = row[0] if row else None
 
-            # El resultado ya viene como diccionario desde la función SQL
-            payment_data = row[0]
-            
             # Si es un string JSON, parsearlo
             if isinstance(payment_data, str):
                 import json
                 try:
                     payment_data = json.loads(payment_data)
                 except json.JSONDecodeError as e:
+                    await self.db.commit()
                     return {
                         "success": False,
                         "error": "PARSE_ERROR",
                         "message": f"Error al procesar la respuesta: {str(e)}",
                         "data": None
                     }
-            
+
+            # Registrar efectos secundarios (p. ej. outbox de subidas) en la misma transacción
+            if before_commit and isinstance(payment_data, dict) and payment_data.get("success"):
+                try:
+                    async with self.db.begin_nested():
+                        await before_commit(payment_data)
+                except Exception as e:
+                    log.error("Could not register post-payment side effects, rolling back the payment", exc_info=e)
+                    await self.db.rollback()
+                    return {
+                        "success": False,
+                        "status_code": 500,
+                        "error": {
+                            "code": "SIDE_EFFECTS_ERROR",
+                            "message": f"No se registró el pago: error al guardar el comprobante ({e})",
+                        },
+                        "data": None
+                    }
+
+            if isinstance(payment_data, dict) and payment_data.get("success"):
+                await refresh_loan_kpis(self.db, contract_loan_id)
+
+            await self.db.commit()
+            payment_schedule_cache.invalidate_loan(contract_loan_id)
+
+            if not payment_data:
+                return {
+                    "success": False,
+                    "error": "NO_DATA",
+                    "message": "No se recibió respuesta del procedimiento",
+                    "data": None
+                }
+
             return payment_data
                 
         except Exception as e:
@@ -257,8 +542,10 @@ class LoanPaymentService:
                     "notes": notes
                 }
             )
-            
+
+            await refresh_loan_kpis(self.db, contract_loan_id)
             await self.db.commit()
+            payment_schedule_cache.invalidate_loan(contract_loan_id)
             
             # Obtener el resultado
             row = result.fetchone()
@@ -330,8 +617,10 @@ class LoanPaymentService:
                     "notes": request.notes
                 }
             )
-            
+
+            await refresh_loan_kpis(self.db, request.contract_loan_id)
             await self.db.commit()
+            payment_schedule_cache.invalidate_loan(request.contract_loan_id)
             
             # Obtener el resultado de la función SQL
             transaction_result = result.fetchone()
@@ -0,0 +1,454 @@
+"""Importación masiva de pagos desde extractos bancarios.
+
+El extracto (CSV o NDJSON) se interpreta línea a línea y cada crédito se asocia
+a un préstamo por su referencia (número de contrato) o por contract_loan_id
+explícito, con una sola consulta para todo el archivo. Los pagos se aplican con
+sp_register_payment_transaction en transacciones de `chunk_size` líneas, un
+savepoint por línea para que un pago rechazado no aborte el bloque.
+
+Los préstamos se reparten entre `concurrency` conexiones y cada préstamo queda
+entero en una de ellas, así sus pagos se aplican en el orden del extracto. Los
+recibos no se dibujan durante la importación: se registran en el outbox en modo
+diferido dentro de la transacción del bloque y el despachador los genera
+después. Los KPIs se recalculan una vez por bloque.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import bindparam, text
+
+from app.config import settings
+from app.contracts.services.contract_kpi_service import ContractKpiService
+from app.database import engine
+from app.loan_payments.schedule_cache import payment_schedule_cache
+from app.loan_payments.service import REGISTER_PAYMENT_SQL
+from app.receipts.receipt_schemas import ReceiptMode
+
+log = logging.getLogger(__name__)
+
+# Nombres de columna aceptados en el extracto
+COLUMN_ALIASES = {
+    "reference": ("reference", "referencia", "ref", "contract_number", "numero_contrato", "concepto"),
+    "amount": ("amount", "monto", "importe", "credit", "credito", "crédito", "deposito", "depósito"),
+    "transaction_date": ("transaction_date", "date", "fecha", "fecha_valor", "fecha_operacion"),
+    "description": ("description", "descripcion", "descripción", "detalle", "memo"),
+    "bank_reference": ("bank_reference", "transaction_id", "id_transaccion", "numero_operacion", "documento"),
+    "contract_loan_id": ("contract_loan_id", "loan_id", "prestamo", "préstamo"),
+    "payment_method": ("payment_method", "metodo_pago", "método_pago"),
+}
+_ALIASES = {alias: name for name, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d/%m/%y")
+
+LINE_APPLIED = "applied"
+LINE_FAILED = "failed"
+LINE_UNMATCHED = "unmatched"
+LINE_DUPLICATE = "duplicate"
+LINE_IGNORED = "ignored"
+LINE_INVALID = "invalid"
+LINE_MATCHED = "matched"  # solo en dry_run
+LINE_STATUSES = (LINE_APPLIED, LINE_FAILED, LINE_UNMATCHED, LINE_DUPLICATE, LINE_IGNORED, LINE_INVALID, LINE_MATCHED)
+
+# Préstamos activos por número de contrato (en mayúsculas)
+MATCH_REFERENCES_SQL = text("""
+    SELECT upper(c.contract_number) AS reference, cl.contract_loan_id
+    FROM public.contract c
+    JOIN public.contract_loan cl ON cl.contract_id = c.contract_id
+    WHERE upper(c.contract_number) IN :references
+      AND cl.is_active IS NOT FALSE
+""").bindparams(bindparam("references", expanding=True))
+
+EXISTING_LOANS_SQL = text("""
+    SELECT contract_loan_id FROM public.contract_loan
+    WHERE contract_loan_id IN :loan_ids AND is_active IS NOT FALSE
+""").bindparams(bindparam("loan_ids", expanding=True))
+
+
+class StatementLineError(ValueError):
+    """Línea del extracto que no se pudo interpretar"""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(message)
+        self.line = line
+
+
+@dataclass
+class StatementLine:
+    line: int
+    reference: Optional[str]
+    amount: Decimal
+    transaction_date: Optional[datetime] = None
+    description: Optional[str] = None
+    bank_reference: Optional[str] = None
+    contract_loan_id: Optional[int] = None
+    payment_method: Optional[str] = None
+
+
+@dataclass
+class LineResult:
+    line: int
+    status: str
+    reference: Optional[str] = None
+    amount: Optional[Decimal] = None
+    contract_loan_id: Optional[int] = None
+    transaction_ids: List[str] = field(default_factory=list)
+    upload_id: Optional[int] = None
+    message: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {key: value for key, value in vars(self).items() if value not in (None, [])}
+
+
+def parse_amount(value: Any) -> Decimal:
+    """Importe con separador decimal "." o "," y separadores de miles opcionales"""
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    cleaned = re.sub(r"[^\d,.\-]", "", str(value or ""))
+    if "," in cleaned and "." in cleaned:
+        # El último separador es el decimal
+        thousands = "." if cleaned.rfind(",") > cleaned.rfind(".") else ","
+        cleaned = cleaned.replace(thousands, "")
+    if "," in cleaned:
+        whole, _, decimals = cleaned.rpartition(",")
+        cleaned = f"{whole.replace(',', '')}.{decimals}" if len(decimals) <= 2 else cleaned.replace(",", "")
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f"Monto inválido: {value}")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Fechas con zona horaria a UTC sin tzinfo, para poder compararlas con las fechas simples"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_date(value: Any) -> Optional[datetime]:
+    """Fecha de una línea del extracto, siempre sin tzinfo (las que traen zona se pasan a UTC)"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return _naive_utc(value)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    value = str(value).strip()
+    try:
+        return _naive_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha inválida: {value}")
+
+
+def _normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    normalized = {}
+    for key, value in record.items():
+        name = _ALIASES.get(str(key or "").strip().lower())
+        if name and name not in normalized:
+            normalized[name] = value.strip() if isinstance(value, str) else value
+    return normalized
+
+
+def _statement_line(number: int, record: Dict[str, Any]) -> StatementLine:
+    data = _normalize_record(record)
+    if data.get("amount") in (None, ""):
+        raise ValueError("Falta el monto")
+    contract_loan_id = data.get("contract_loan_id")
+    return StatementLine(
+        line=number,
+        reference=str(data["reference"]) if data.get("reference") not in (None, "") else None,
+        amount=parse_amount(data["amount"]),
+        transaction_date=parse_date(data.get("transaction_date")),
+        description=data.get("description") or None,
+        bank_reference=str(data["bank_reference"]) if data.get("bank_reference") not in (None, "") else None,
+        contract_loan_id=int(contract_loan_id) if contract_loan_id not in (None, "") else None,
+        payment_method=data.get("payment_method") or None,
+    )
+
+
+def _records(text_body: str, is_ndjson: bool) -> Iterable[Tuple[int, Union[Dict[str, Any], StatementLineError]]]:
+    if is_ndjson:
+        for number, raw_line in enumerate(text_body.splitlines(), start=1):
+            if not raw_line.strip():
+                continue
+            try:
+                record = json.loads(raw_line)
+            except json.JSONDecodeError as e:
+                yield number, StatementLineError(number, f"JSON inválido: {e.msg}")
+                continue
+            yield number, record if isinstance(record, dict) else StatementLineError(number, "Cada línea debe ser un objeto JSON")
+        return
+
+    sample = text_body[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text_body), dialect=dialect)
+    for record in reader:
+        # La cabecera es la línea 1 del archivo
+        yield reader.line_num, record
+
+
+def parse_statement(
+    raw: Union[bytes, str], content_type: Optional[str] = None, filename: Optional[str] = None
+) -> List[Union[StatementLine, StatementLineError]]:
+    """
+    Interpretar un extracto bancario CSV (con cabecera, separador , ; o tab) o NDJSON.
+
+    Las líneas que no se pueden interpretar se devuelven como StatementLineError
+    para reportarlas sin abortar la importación.
+    """
+    text_body = raw.decode("utf-8-sig") if isinstance(raw, bytes) else raw
+    is_ndjson = bool(
+        (content_type and ("ndjson" in content_type or "jsonl" in content_type))
+        or (filename and filename.lower().endswith((".ndjson", ".jsonl")))
+        or (not filename and text_body.lstrip()[:1] == "{")
+    )
+    lines: List[Union[StatementLine, StatementLineError]] = []
+    for number, record in _records(text_body, is_ndjson):
+        if isinstance(record, StatementLineError):
+            lines.append(record)
+            continue
+        try:
+            lines.append(_statement_line(number, record))
+        except (ValueError, TypeError) as e:
+            lines.append(StatementLineError(number, str(e)))
+    return lines
+
+
+def partition_by_loan(lines: Sequence[StatementLine], partitions: int) -> List[List[StatementLine]]:
+    """
+    Repartir las líneas entre `partitions` grupos sin separar un préstamo.
+
+    Dentro de cada préstamo se respeta el orden del extracto (fecha y línea); los
+    préstamos se asignan al grupo con menos líneas, empezando por los más grandes.
+    """
+    by_loan: Dict[int, List[StatementLine]] = {}
+    for line in lines:
+        by_loan.setdefault(line.contract_loan_id, []).append(line)
+    groups: List[List[StatementLine]] = [[] for _ in range(max(1, partitions))]
+    for loan_lines in sorted(by_loan.values(), key=len, reverse=True):
+        loan_lines.sort(key=lambda item: (item.transaction_date or datetime.min, item.line))
+        min(groups, key=len).extend(loan_lines)
+    return [group for group in groups if group]
+
+
+def _payment_data(row) -> Dict[str, Any]:
+    payment_data = row[0] if row else None
+    if isinstance(payment_data, str):
+        payment_data = json.loads(payment_data)
+    return payment_data or {}
+
+
+class _PaymentRejected(Exception):
+    """El procedimiento rechazó el pago; el savepoint de la línea se revierte"""
+
+
+class StatementImportService:
+    """Aplica los pagos de un extracto bancario y devuelve el informe de conciliación"""
+
+    def __init__(
+        self,
+        receipt_service=None,
+        chunk_size: int = 100,
+        concurrency: int = 4,
+        payment_method: str = "Transferencia",
+        receipts: bool = True,
+        requested_by: Optional[str] = None,
+    ):
+        self.receipt_service = receipt_service
+        self.chunk_size = max(1, chunk_size)
+        self.concurrency = max(1, concurrency)
+        self.payment_method = payment_method
+        self.receipts = receipts and settings.UPLOAD_OUTBOX_ENABLED
+        # Usuario que importa el extracto: puede consultar el estado de los recibos
+        self.requested_by = requested_by
+
+    async def match(self, connection, lines: Sequence[StatementLine]) -> Dict[int, LineResult]:
+        """
+        Asignar contract_loan_id a cada línea (en sitio) y devolver las que no se pudieron
+        asociar. Un número de contrato con varios préstamos activos es ambiguo.
+        """
+        rejected: Dict[int, LineResult] = {}
+        explicit = sorted({line.contract_loan_id for line in lines if line.contract_loan_id is not None})
+        references = sorted({line.reference.upper() for line in lines if line.contract_loan_id is None and line.reference})
+
+        known_loans = set()
+        if explicit:
+            result = await connection.execute(EXISTING_LOANS_SQL, {"loan_ids": explicit})
+            known_loans = {row[0] for row in result}
+        loans_by_reference: Dict[str, List[int]] = {}
+        if references:
+            result = await connection.execute(MATCH_REFERENCES_SQL, {"references": references})
+            for reference, contract_loan_id in result:
+                loans_by_reference.setdefault(reference, []).append(contract_loan_id)
+
+        for line in lines:
+            message = None
+            if line.contract_loan_id is not None:
+                if line.contract_loan_id not in known_loans:
+                    message = f"Préstamo {line.contract_loan_id} no encontrado"
+            elif not line.reference:
+                message = "Línea sin referencia ni contract_loan_id"
+            else:
+                candidates = loans_by_reference.get(line.reference.upper(), [])
+                if len(candidates) == 1:
+                    line.contract_loan_id = candidates[0]
+                elif candidates:
+                    message = f"La referencia {line.reference} corresponde a varios préstamos activos"
+                else:
+                    message = f"Ningún contrato activo con la referencia {line.reference}"
+            if message:
+                rejected[line.line] = LineResult(line.line, LINE_UNMATCHED, line.reference, line.amount, message=message)
+        return rejected
+
+    def _screen(self, parsed: Sequence[Union[StatementLine, StatementLineError]]) -> Tuple[List[StatementLine], Dict[int, LineResult]]:
+        """Separar errores de formato, débitos y operaciones repetidas en el extracto"""
+        results: Dict[int, LineResult] = {}
+        lines: List[StatementLine] = []
+        seen_bank_references = set()
+        for line in parsed:
+            if isinstance(line, StatementLineError):
+                results[line.line] = LineResult(line.line, LINE_INVALID, message=str(line))
+            elif line.amount <= 0:
+                results[line.line] = LineResult(line.line, LINE_IGNORED, line.reference, line.amount, message="No es un crédito")
+            elif line.bank_reference and line.bank_reference in seen_bank_references:
+                results[line.line] = LineResult(
+                    line.line, LINE_DUPLICATE, line.reference, line.amount,
+                    message=f"Operación {line.bank_reference} repetida en el extracto",
+                )
+            else:
+                if line.bank_reference:
+                    seen_bank_references.add(line.bank_reference)
+                lines.append(line)
+        return lines, results
+
+    def _params(self, line: StatementLine) -> Dict[str, Any]:
+        notes = f"Importado de extracto bancario (línea {line.line})"
+        return {
+            "contract_loan_id": line.contract_loan_id,
+            "amount": line.amount,
+            "payment_method": line.payment_method or self.payment_method,
+            "reference": line.bank_reference or line.reference,
+            "transaction_date": line.transaction_date or datetime.now(),
+            "url_bank_receipt": None,
+            "url_payment_receipt": None,
+            "notes": f"{line.description} - {notes}" if line.description else notes,
+        }
+
+    async def _apply_line(self, connection, line: StatementLine) -> LineResult:
+        async with connection.begin_nested():
+            payment_data = _payment_data((await connection.execute(REGISTER_PAYMENT_SQL, self._params(line))).fetchone())
+            if not payment_data.get("success"):
+                error = payment_data.get("error")
+                message = error.get("message") if isinstance(error, dict) else payment_data.get("message") or error
+                raise _PaymentRejected(message or "El procedimiento no aplicó el pago")
+            data = payment_data.get("data") or {}
+            transaction_ids = [str(t["transaction_id"]) for t in data.get("transactions", [])]
+            result = LineResult(line.line, LINE_APPLIED, line.reference, line.amount, line.contract_loan_id, transaction_ids)
+            if self.receipts and self.receipt_service is not None:
+                receipt = await self.receipt_service.enqueue_receipt_from_payment(
+                    payment_data, connection, transaction_ids, ReceiptMode.DEFERRED, requested_by=self.requested_by
+                )
+                result.upload_id = receipt.upload_id
+        return result
+
+    async def _apply_chunk(self, connection, chunk: Sequence[StatementLine]) -> List[LineResult]:
+        """Aplicar un bloque de líneas en una transacción (un savepoint por línea)"""
+        results = []
+        for line in chunk:
+            try:
+                results.append(await self._apply_line(connection, line))
+            except Exception as e:
+                if not isinstance(e, _PaymentRejected):
+                    log.warning("Could not apply statement line %s: %s", line.line, e)
+                results.append(LineResult(line.line, LINE_FAILED, line.reference, line.amount, line.contract_loan_id, message=str(e)))
+
+        applied_loans = {result.contract_loan_id for result in results if result.status == LINE_APPLIED}
+        try:
+            if applied_loans:
+                try:
+                    async with connection.begin_nested():
+                        await ContractKpiService.refresh_loans(applied_loans, connection=connection)
+                except Exception as e:
+                    log.warning("Could not refresh KPIs for imported payments: %s", e)
+            await connection.commit()
+            for loan_id in applied_loans:
+                payment_schedule_cache.invalidate_loan(loan_id)
+        except Exception as e:
+            log.error("Could not commit statement chunk", exc_info=e)
+            await connection.rollback()
+            for result in results:
+                if result.status == LINE_APPLIED:
+                    result.status, result.transaction_ids, result.upload_id = LINE_FAILED, [], None
+                    result.message = f"No se confirmó el bloque: {e}"
+        return results
+
+    async def _apply_partition(self, lines: Sequence[StatementLine]) -> List[LineResult]:
+        results = []
+        async with engine.connect() as connection:
+            for start in range(0, len(lines), self.chunk_size):
+                results.extend(await self._apply_chunk(connection, lines[start:start + self.chunk_size]))
+        return results
+
+    async def run(self, parsed: Sequence[Union[StatementLine, StatementLineError]], dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Importar el extracto y devolver el informe de conciliación: una entrada por
+        línea (en el orden del archivo) y los totales por estado.
+
+        Con dry_run solo se interpretan y asocian las líneas, sin aplicar pagos.
+        """
+        started = time.perf_counter()
+        lines, results = self._screen(parsed)
+
+        async with engine.connect() as connection:
+            results.update(await self.match(connection, lines))
+        matched = [line for line in lines if line.line not in results]
+
+        if dry_run:
+            for line in matched:
+                results[line.line] = LineResult(line.line, LINE_MATCHED, line.reference, line.amount, line.contract_loan_id)
+        elif matched:
+            partitions = partition_by_loan(matched, self.concurrency)
+            for partition_results in await asyncio.gather(*(self._apply_partition(group) for group in partitions)):
+                results.update((result.line, result) for result in partition_results)
+
+        return self.report(results, time.perf_counter() - started, dry_run)
+
+    def report(self, results: Dict[int, LineResult], elapsed: float, dry_run: bool = False) -> Dict[str, Any]:
+        ordered = [results[number] for number in sorted(results)]
+        totals = {status: 0 for status in LINE_STATUSES}
+        for result in ordered:
+            totals[result.status] += 1
+        applied_amount = sum((result.amount for result in ordered if result.status == LINE_APPLIED), Decimal(0))
+        return {
+            "success": totals[LINE_FAILED] == 0 and totals[LINE_INVALID] == 0,
+            "dry_run": dry_run,
+            "total_lines": len(ordered),
+            "totals": totals,
+            "applied_amount": applied_amount,
+            "unapplied_amount": sum(
+                (result.amount for result in ordered if result.amount and result.status in (LINE_FAILED, LINE_UNMATCHED)),
+                Decimal(0),
+            ),
+            "receipts_queued": sum(1 for result in ordered if result.upload_id),
+            "elapsed_seconds": round(elapsed, 2),
+            "lines_per_minute": round(len(ordered) * 60 / elapsed) if elapsed else None,
+            "lines": [result.as_dict() for result in ordered],
+        }
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import os
 import warnings
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
@@ -22,10 +23,18 @@ from starlette.middleware.cors import CORSMiddleware
 
 from app.api import register_routers
 from app.config import app_configs, settings
+from app.contracts.gdrive_service import get_shared_drive_service, reset_shared_drive_service
+from app.contracts.services.contract_detail_cache import ContractDetailCacheListener, contract_detail_cache
+from app.contracts.services.contract_kpi_service import KpiRefresher
 from app.enums import ErrorCodeEnum
+from app.loan_payments.aging import PaymentAgingJob
+from app.loan_payments.schedule_cache import payment_schedule_cache
 from app.exceptions import GenericHTTPException
 from app.auth.middleware import token_refresh_middleware
 from app.exceptions import NotAuthenticated
+from app.storage import close_document_stores
+from app.uploads.dispatcher import UploadDispatcher
+from app.receipts.render_pool import receipt_render_pool
 
 log = logging.getLogger(__name__)
 
@@ -51,6 +60,40 @@ async def lifespan(_app: FastAPI) -> AsyncGenerator:
             max_queries=50000,  # Reciclar conexiones después de 50k queries
         )
 
+        # Crear el cliente de Google Drive una sola vez para toda la aplicación
+        if os.getenv("GOOGLE_CREDENTIALS_PATH"):
+            try:
+                _app.state.drive_service = await asyncio.to_thread(get_shared_drive_service)
+                log.info("Google Drive client initialized")
+            except Exception:
+                log.warning("Google Drive client could not be initialized at startup", exc_info=True)
+
+        # Despachador del outbox de subidas (Drive fuera del camino de la petición)
+        if settings.UPLOAD_OUTBOX_ENABLED:
+            _app.state.upload_dispatcher = UploadDispatcher(_app.state.db_pool)
+            await _app.state.upload_dispatcher.start()
+            log.info("Upload outbox dispatcher started")
+
+        # Caches del detalle de contratos y del cronograma de pagos; solo se usan mientras
+        # LISTEN contract_changed esté activo
+        if settings.CONTRACT_DETAIL_CACHE_ENABLED or settings.PAYMENT_SCHEDULE_CACHE_ENABLED:
+            _app.state.detail_cache_listener = ContractDetailCacheListener(
+                _app.state.db_pool,
+                cache=contract_detail_cache if settings.CONTRACT_DETAIL_CACHE_ENABLED else None,
+                extra_caches=(payment_schedule_cache,) if settings.PAYMENT_SCHEDULE_CACHE_ENABLED else (),
+            )
+            await _app.state.detail_cache_listener.start()
+
+        # KPIs de la cartera: reconstrucción al arrancar y periódica
+        if settings.CONTRACT_KPI_ENABLED:
+            _app.state.kpi_refresher = KpiRefresher()
+            await _app.state.kpi_refresher.start()
+
+        # Morosidad de cuotas (overdue y tramos de atraso): al arrancar y periódica
+        if settings.PAYMENT_AGING_ENABLED:
+            _app.state.payment_aging_job = PaymentAgingJob()
+            await _app.state.payment_aging_job.start()
+
         # Configurar auto-login para desarrollo local
         if settings.ENVIRONMENT.is_debug:
             from app.auth.local_dev import setup_local_dev_auth
@@ -64,6 +107,26 @@ async def lifespan(_app: FastAPI) -> AsyncGenerator:
     except Exception:
         log.error("Error during application startup", exc_info=True)
     finally:
+        if getattr(_app.state, "upload_dispatcher", None) is not None:
+            try:
+                await _app.state.upload_dispatcher.stop()
+            except Exception as e:
+                log.error(f"Error stopping upload dispatcher: {e}", exc_info=True)
+        if getattr(_app.state, "kpi_refresher", None) is not None:
+            try:
+                await _app.state.kpi_refresher.stop()
+            except Exception as e:
+                log.error(f"Error stopping KPI refresher: {e}", exc_info=True)
+        if getattr(_app.state, "payment_aging_job", None) is not None:
+            try:
+                await _app.state.payment_aging_job.stop()
+            except Exception as e:
+                log.error(f"Error stopping payment aging job: {e}", exc_info=True)
+        if getattr(_app.state, "detail_cache_listener", None) is not None:
+            try:
+                await _app.state.detail_cache_listener.stop()
+            except Exception as e:
+                log.error(f"Error stopping contract detail cache listener: {e}", exc_info=True)
         if hasattr(_app.state, "db_pool"):
             try:
                 # Establecer un timeout de 10 segundos para el cierre del pool
@@ -72,6 +135,17 @@ async def lifespan(_app: FastAPI) -> AsyncGenerator:
                 log.error("Timeout while closing database pool")
             except Exception as e:
                 log.error(f"Error closing database pool: {e}", exc_info=True)
+        if getattr(_app.state, "drive_service", None) is not None:
+            try:
+                await _app.state.drive_service.aclose()
+            except Exception as e:
+                log.error(f"Error closing Google Drive client: {e}", exc_info=True)
+        receipt_render_pool.shutdown()
+        try:
+            await close_document_stores()
+        except Exception as e:
+            log.error(f"Error closing document stores: {e}", exc_info=True)
+        reset_shared_drive_service()
         log.info("Application is shutting down...")
 
 
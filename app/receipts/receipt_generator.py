@@ -1,11 +1,59 @@
 import base64
 import io
 import datetime as dt
-from typing import Dict
+import threading
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
 from PIL import Image, ImageDraw, ImageFont, ImageOps
 import qrcode
 
+FONT_DIR = "/usr/share/fonts/truetype/roboto/unhinted/RobotoTTF"
+
+# Meses en español sin depender de locale.setlocale (global del proceso y no thread-safe)
+SPANISH_MONTHS = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+)
+
+# La parte fija del recibo (cabecera, títulos, etiquetas y badge) termina aquí
+STATIC_LAYER_BOTTOM = 547
+
+
+class ReceiptFonts(NamedTuple):
+    title: ImageFont.ImageFont
+    header: ImageFont.ImageFont
+    normal: ImageFont.ImageFont
+    small: ImageFont.ImageFont
+    tiny: ImageFont.ImageFont
+
+
+@lru_cache(maxsize=1)
+def load_fonts() -> ReceiptFonts:
+    """Fuentes Roboto del recibo, cargadas una sola vez"""
+    try:
+        return ReceiptFonts(
+            title=ImageFont.truetype(f"{FONT_DIR}/Roboto-Bold.ttf", 26),
+            header=ImageFont.truetype(f"{FONT_DIR}/Roboto-Bold.ttf", 17),
+            normal=ImageFont.truetype(f"{FONT_DIR}/Roboto-Regular.ttf", 16),
+            small=ImageFont.truetype(f"{FONT_DIR}/Roboto-Regular.ttf", 14),
+            tiny=ImageFont.truetype(f"{FONT_DIR}/Roboto-Regular.ttf", 13),
+        )
+    except OSError:
+        default = ImageFont.load_default()
+        return ReceiptFonts(default, default, default, default, default)
+
+
+def format_spanish_datetime(value: dt.datetime) -> str:
+    """Fecha del pago como "05 marzo 2025, 02:30 p.m." """
+    meridiem = "a.m." if value.hour < 12 else "p.m."
+    return f"{value.day:02d} {SPANISH_MONTHS[value.month - 1]} {value.year}, {value:%I:%M} {meridiem}"
+
+
 class ReceiptGenerator:
+    # Lienzo con la parte fija ya dibujada; cada recibo parte de una copia
+    _base_layer: Optional[Image.Image] = None
+    _base_lock = threading.Lock()
+
     def __init__(self):
         self.width = 614
         self.height = 1280
@@ -19,33 +67,28 @@ class ReceiptGenerator:
         self.badge_green = "#36B169"
         self.box_green = "#2C9A55"
 
-    def generate_receipt(self, payment_data: Dict) -> bytes:
-        """Genera el recibo como imagen PNG siguiendo el diseño exacto"""
-        # Configure locale in spanish for dates
-        import locale
-        try:
-            locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-        except:
-            try:
-                locale.setlocale(locale.LC_TIME, 'Spanish_Spain.1252')
-            except:
-                pass  
-        
+    @classmethod
+    def clear_cache(cls) -> None:
+        """Descartar fuentes, lienzo base y códigos QR cacheados"""
+        with cls._base_lock:
+            cls._base_layer = None
+        load_fonts.cache_clear()
+        cls._generate_qr_code.cache_clear()
+
+    def _get_base_layer(self) -> Image.Image:
+        base = ReceiptGenerator._base_layer
+        if base is None:
+            with ReceiptGenerator._base_lock:
+                base = ReceiptGenerator._base_layer
+                if base is None:
+                    base = ReceiptGenerator._base_layer = self._draw_static_layer(load_fonts())
+        return base
+
+    def _draw_static_layer(self, fonts: ReceiptFonts) -> Image.Image:
+        """Dibuja lo que es igual en todos los recibos"""
         img = Image.new('RGB', (self.width, self.height), self.bg_color)
         draw = ImageDraw.Draw(img)
 
-        # Roboto Fonts
-        try:
-            title_font = ImageFont.truetype("/usr/share/fonts/truetype/roboto/unhinted/RobotoTTF/Roboto-Bold.ttf", 26)
-            header_font = ImageFont.truetype("/usr/share/fonts/truetype/roboto/unhinted/RobotoTTF/Roboto-Bold.ttf", 17)
-            normal_font = ImageFont.truetype("/usr/share/fonts/truetype/roboto/unhinted/RobotoTTF/Roboto-Regular.ttf", 16)
-            small_font = ImageFont.truetype("/usr/share/fonts/truetype/roboto/unhinted/RobotoTTF/Roboto-Regular.ttf", 14)
-            tiny_font = ImageFont.truetype("/usr/share/fonts/truetype/roboto/unhinted/RobotoTTF/Roboto-Regular.ttf", 13)
-        except:
-            title_font = header_font = normal_font = small_font = tiny_font = ImageFont.load_default()
-
-        y_pos = 0
-
         # 1. GREEN HEADER WITH ROUNDED CORNERS
         # Create green header with rounded corners only at the top
         header_height = 135
@@ -57,20 +100,59 @@ class ReceiptGenerator:
         draw.ellipse([logo_x, logo_y, logo_x + logo_size, logo_y + logo_size], fill="white")
         
         # Letter Y centered in the circle
-        y_text_x = logo_x + (logo_size // 2) - 12
         y_text_y = logo_y + (logo_size // 2) - 18
-        self._draw_center_text(draw, "Y", y_text_y, self.width, title_font, self.header_green)
+        self._draw_center_text(draw, "Y", y_text_y, self.width, fonts.title, self.header_green)
         
         # Textos del header
-        self._draw_center_text(draw, "YnterX App", 48, self.width, title_font, "white")
-        self._draw_center_text(draw, "Finance Solutions", 78, self.width, normal_font, "white")
-
-        y_pos = 153
+        self._draw_center_text(draw, "YnterX App", 48, self.width, fonts.title, "white")
+        self._draw_center_text(draw, "Finance Solutions", 78, self.width, fonts.normal, "white")
 
         # 2. CENTERED TITLE
-        self._draw_center_text(draw, "Recibo de Pago", y_pos, self.width, title_font, self.text_color)
-        y_pos += 36
+        self._draw_center_text(draw, "Recibo de Pago", 153, self.width, fonts.title, self.text_color)
+
+        # Divider line
+        line_margin = 30
+        draw.line([line_margin, 235, self.width - line_margin, 235], fill=self.border_gray, width=2)
+
+        # 3. CLIENT INFORMATION
+        draw.text((38, 257), "Informacion del Cliente", fill=self.text_color, font=fonts.header)
+        for index, label in enumerate(("Cliente:", "Cédula:", "Contrato:")):
+            draw.text((38, 285 + index * 26), label, fill=self.gray, font=fonts.normal)
+
+        # 4. PAYMENT INFORMATION
+        draw.text((38, 381), "Informacion del Pago", fill=self.text_color, font=fonts.header)
+        for index, label in enumerate(("Fecha:", "Método:", "Referencia:")):
+            draw.text((38, 409 + index * 24), label, fill=self.gray, font=fonts.normal)
+
+        # Badge of State "PAGADO"
+        y_pos = 481
+        draw.text((38, y_pos), "Estado:", fill=self.gray, font=fonts.normal)
+        badge_text = "PAGADO"
+        badge_width = 80
+        badge_height = 27
+        badge_x = self.width - 38 - badge_width
+        draw.rounded_rectangle([badge_x, y_pos - 4, badge_x + badge_width, y_pos + badge_height - 4], 
+                             radius=12, fill=self.badge_green)
         
+        # Centrar texto en el badge
+        badge_text_x = badge_x + (badge_width - self._get_text_width(draw, badge_text, fonts.tiny)) // 2
+        draw.text((badge_text_x, y_pos + 3), badge_text, fill="white", font=fonts.tiny)
+
+        # 5. TABLA DE CUOTAS PAGADAS (título; la tabla depende de las cuotas)
+        draw.text((38, 521), "Cuotas Pagadas", fill=self.text_color, font=fonts.header)
+        return img
+
+    def generate_receipt(self, payment_data: Dict) -> bytes:
+        """Genera el recibo como imagen PNG siguiendo el diseño exacto"""
+        return self._image_to_bytes(self.render_image(payment_data))
+
+    def render_image(self, payment_data: Dict) -> Image.Image:
+        """Dibuja el recibo (sin codificar)"""
+        fonts = load_fonts()
+        header_font, normal_font, small_font, tiny_font = fonts.header, fonts.normal, fonts.small, fonts.tiny
+        img = self._get_base_layer().copy()
+        draw = ImageDraw.Draw(img)
+
         # Centered receipt number - Handle case when client_data is None
         client_data = payment_data.get('client_data')
         if client_data and 'receiptNumber' in client_data:
@@ -79,17 +161,8 @@ class ReceiptGenerator:
             # Generate a receipt number if not available
             receipt_number = f"RCP-{dt.datetime.now().strftime('%Y%m%d%H%M%S')}"
         
-        self._draw_center_text(draw, f"No. {receipt_number}", y_pos, self.width, normal_font, self.gray)
-        y_pos += 32
-
-        # Divider line
-        line_margin = 30
-        draw.line([line_margin, y_pos + 14, self.width - line_margin, y_pos + 14], fill=self.border_gray, width=2)
-        y_pos += 36
-
-        # 3. CLIENT INFORMATION
-        draw.text((38, y_pos), "Informacion del Cliente", fill=self.text_color, font=header_font)
-        y_pos += 28
+        self._draw_center_text(draw, f"No. {receipt_number}", 189, self.width, normal_font, self.gray)
+        y_pos = 285
 
         # Unificar y robustecer extracción de datos del cliente
         client_data = payment_data.get('client_data') or {}
@@ -116,61 +189,28 @@ class ReceiptGenerator:
             or str(payment_data.get('contract_loan_id', 'N/A'))
         )
 
-        client_info = [
-            ("Cliente:", client_name),
-            ("Cédula:", client_id),
-            ("Contrato:", contract_number),
-        ]
-
-        for label, value in client_info:
-            draw.text((38, y_pos), label, fill=self.gray, font=normal_font)
+        # Las etiquetas ya están en el lienzo base
+        for value in (client_name, client_id, contract_number):
             # Align values to the right of the available area
             value_x = self.width - 38 - self._get_text_width(draw, value, normal_font)
             draw.text((value_x, y_pos), value, fill=self.text_color, font=normal_font)
             y_pos += 26
         
-        y_pos += 18
-
         # 4. PAYMENT INFORMATION
-        draw.text((38, y_pos), "Informacion del Pago", fill=self.text_color, font=header_font)
-        y_pos += 28
-        
-        
+        y_pos = 409
         payment_date = dt.datetime.fromisoformat(payment_data['payment_date'].replace('Z', '+00:00'))
-        formatted_date = payment_date.strftime("%d %B %Y, %I:%M %p").replace('AM', 'a.m.').replace('PM', 'p.m.')
+        formatted_date = format_spanish_datetime(payment_date)
         
         # Generar referencia si no existe
         payment_ref = payment_data.get('payment_reference', f"TRF-{payment_date.strftime('%Y%m%d%H%M')}")
         
-        payment_info = [
-            ("Fecha:", formatted_date), 
-            ("Método:", payment_data['payment_method']), 
-            ("Referencia:", payment_ref)
-        ]
-        
-        for label, value in payment_info:
-            draw.text((38, y_pos), label, fill=self.gray, font=normal_font)
+        for value in (formatted_date, payment_data['payment_method'], payment_ref):
             value_x = self.width - 38 - self._get_text_width(draw, value, normal_font)
             draw.text((value_x, y_pos), value, fill=self.text_color, font=normal_font)
             y_pos += 24
 
-        # Badge of State "PAGADO"
-        draw.text((38, y_pos), "Estado:", fill=self.gray, font=normal_font)
-        badge_text = "PAGADO"
-        badge_width = 80
-        badge_height = 27
-        badge_x = self.width - 38 - badge_width
-        draw.rounded_rectangle([badge_x, y_pos - 4, badge_x + badge_width, y_pos + badge_height - 4], 
-                             radius=12, fill=self.badge_green)
-        
-        # Centrar texto en el badge
-        badge_text_x = badge_x + (badge_width - self._get_text_width(draw, badge_text, tiny_font)) // 2
-        draw.text((badge_text_x, y_pos + 3), badge_text, fill="white", font=tiny_font)
-        y_pos += 40
-
         # 5. TABLA DE CUOTAS PAGADAS
-        draw.text((38, y_pos), "Cuotas Pagadas", fill=self.text_color, font=header_font)
-        y_pos += 26
+        y_pos = STATIC_LAYER_BOTTOM
         
         # Calculate table height
         paid_items = [item for item in payment_data['payment_items'] if item['paid_amount'] > 0]
@@ -303,7 +343,7 @@ class ReceiptGenerator:
             self._draw_center_text(draw, line, y_pos, self.width, tiny_font, self.gray)
             y_pos += 20
 
-        return self._image_to_bytes(img)
+        return img
 
     def _get_text_width(self, draw, text, font):
         """Obtiene el ancho del texto de manera compatible con diferentes versiones de PIL"""
@@ -325,8 +365,10 @@ class ReceiptGenerator:
         x = (width - text_width) // 2
         draw.text((x, y), text, fill=color, font=font)
 
-    def _generate_qr_code(self, contract_number: str) -> Image.Image:
-        """Genera código QR con el estilo exacto de la imagen"""
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _generate_qr_code(contract_number: str) -> Image.Image:
+        """Genera código QR con el estilo exacto de la imagen (cacheado por contrato, no modificar)"""
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -351,9 +393,21 @@ class ReceiptGenerator:
         img.save(img_byte_arr, format='PNG', quality=95, optimize=True)
         return img_byte_arr.getvalue()
 
-    def image_to_base64(self, img_bytes: bytes) -> str:
+    def image_to_base64(self, img_bytes: bytes, mime_type: str = "image/png") -> str:
         """Convierte bytes de imagen a base64 para retorno"""
-        return f"data:image/png;base64,{base64.b64encode(img_bytes).decode()}"
+        return f"data:{mime_type};base64,{base64.b64encode(img_bytes).decode()}"
+
+    def image_to_webp(self, img: Image.Image) -> bytes:
+        """WebP sin pérdida: mismo recibo, alrededor de un tercio del PNG"""
+        img_byte_arr = io.BytesIO()
+        img.save(img_byte_arr, format='WEBP', lossless=True, method=4)
+        return img_byte_arr.getvalue()
+
+    def image_to_palette_png(self, img: Image.Image, colors: int = 32) -> bytes:
+        """PNG de paleta (el recibo usa pocos colores planos)"""
+        img_byte_arr = io.BytesIO()
+        img.quantize(colors=colors, method=Image.Quantize.MEDIANCUT).save(img_byte_arr, format='PNG', optimize=True)
+        return img_byte_arr.getvalue()
 
     def generate_receipt_id(self) -> str:
         """Genera un ID único para el recibo"""
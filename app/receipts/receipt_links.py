@@ -0,0 +1,31 @@
+"""URLs firmadas y de corta duración para descargar un recibo.
+
+La firma (HMAC-SHA256) cubre el upload_id del recibo en upload_outbox y la
+expiración, así la descarga no necesita el token del usuario y el enlace deja
+de valer pasados RECEIPT_URL_TTL_SECONDS.
+"""
+
+import hashlib
+import hmac
+import time
+from typing import Optional
+
+from app.config import settings
+
+
+def _signature(upload_id: int, expires: int) -> str:
+    secret = (settings.RECEIPT_URL_SECRET or settings.JWT_SECRET_KEY).encode("utf-8")
+    return hmac.new(secret, f"receipt:{upload_id}:{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def sign_receipt_url(upload_id: int, now: Optional[float] = None) -> str:
+    """Ruta firmada de /receipts/{upload_id}/download"""
+    expires = int(now if now is not None else time.time()) + settings.RECEIPT_URL_TTL_SECONDS
+    return f"/receipts/{upload_id}/download?expires={expires}&signature={_signature(upload_id, expires)}"
+
+
+def verify_receipt_signature(upload_id: int, expires: int, signature: str, now: Optional[float] = None) -> bool:
+    """La firma corresponde al recibo y no ha expirado"""
+    if expires < (now if now is not None else time.time()):
+        return False
+    return hmac.compare_digest(_signature(upload_id, expires), signature)
@@ -0,0 +1,278 @@
+"""Regeneración masiva de recibos de transacciones históricas.
+
+Las transacciones se leen por páginas de id (keyset) y cada recibo se dibuja en
+un pool de procesos con ReceiptGenerator; el proceso principal solo sube las
+imágenes al backend de documentos y actualiza url_payment_receipt. Como mucho
+hay `window` recibos en vuelo y una página de filas en memoria, así el consumo
+no depende del número de transacciones.
+
+Las transacciones son las de public.payment_transaction, identificadas por el
+transaction_id (UUID) que devuelve sp_register_payment_transaction, igual que en
+el outbox de uploads. El checkpoint guarda el último id terminado en orden: al
+relanzar el comando se continúa desde ahí. Los ids no son correlativos, así que
+un pago registrado durante la regeneración puede quedar antes del checkpoint; esos
+ya reciben su recibo por el outbox. El nombre del archivo depende solo de la
+transacción, por lo que rehacer un recibo sobrescribe el anterior.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+# person_type_id del cliente en contract_participant (ver contract_list_service)
+CLIENT_PERSON_TYPE_ID = 1
+
+# Transacciones de pago con los datos del recibo; $1 = último id procesado (NULL = desde el principio)
+TRANSACTIONS_SQL = """
+    SELECT t.transaction_id,
+           t.amount,
+           t.payment_method,
+           t.reference_number,
+           t.transaction_date,
+           s.contract_loan_id,
+           s.payment_number,
+           s.due_date,
+           s.balance,
+           c.contract_number,
+           client.client_name,
+           client.client_document
+    FROM public.payment_transaction t
+    JOIN public.payment_schedule s ON s.payment_schedule_id = t.payment_schedule_id
+    JOIN public.contract_loan cl ON cl.contract_loan_id = s.contract_loan_id
+    JOIN public.contract c ON c.contract_id = cl.contract_id
+    LEFT JOIN LATERAL (
+        SELECT concat_ws(' ', p.first_name, p.last_name) AS client_name,
+               (SELECT d.document_number FROM public.person_document d
+                WHERE d.person_id = p.person_id AND d.is_active
+                ORDER BY d.is_primary DESC LIMIT 1) AS client_document
+        FROM public.contract_participant cp
+        JOIN public.person p ON p.person_id = cp.person_id
+        WHERE cp.contract_id = c.contract_id AND cp.person_type_id = $2
+        ORDER BY cp.is_primary DESC NULLS LAST
+        LIMIT 1
+    ) client ON TRUE
+    WHERE ($1::uuid IS NULL OR t.transaction_id > $1::uuid)
+      AND t.transaction_type = 'payment'
+      AND t.is_active IS NOT FALSE
+      AND ($3::integer IS NULL OR s.contract_loan_id = $3)
+    ORDER BY t.transaction_id
+    LIMIT $4
+"""
+
+UPDATE_URL_SQL = """
+    UPDATE public.payment_transaction
+    SET url_payment_receipt = $2, updated_at = CURRENT_TIMESTAMP
+    WHERE transaction_id = $1::uuid
+"""
+
+
+def receipt_reference(transaction_id: str) -> str:
+    """Nombre del recibo de una transacción (sin extensión)"""
+    return f"receipt_tx{transaction_id}"
+
+
+def payment_info_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Datos del pago con la forma que espera ReceiptGenerator (solo tipos serializables)"""
+    amount = float(row["amount"] or 0)
+    transaction_date = row["transaction_date"]
+    return {
+        "contract_loan_id": row["contract_loan_id"],
+        "payment_date": transaction_date.isoformat() if transaction_date else None,
+        "payment_method": row["payment_method"] or "N/A",
+        "payment_reference": row["reference_number"] or f"TX-{row['transaction_id']}",
+        "client_data": {
+            "receiptNumber": f"RCP-TX{row['transaction_id'].replace('-', '')[:12].upper()}",
+            "clientName": row["client_name"] or "N/A",
+            "clientId": row["client_document"] or "N/A",
+            "contractNumber": row["contract_number"] or str(row["contract_loan_id"]),
+        },
+        "payment_items": [{
+            "payment_number": row["payment_number"],
+            "due_date": row["due_date"].isoformat() if row["due_date"] else None,
+            "paid_amount": amount,
+        }],
+        "sub_total": amount,
+        "discount": 0,
+        "total_paid": amount,
+        "total_applied": amount,
+        "remaining_balance": float(row["balance"]) if row["balance"] is not None else None,
+    }
+
+
+_generator = None
+
+
+def render_receipt(payment_info: Dict[str, Any]) -> bytes:
+    """Dibujar un recibo en el proceso actual (se ejecuta en los workers del pool)"""
+    global _generator
+    if _generator is None:
+        from app.receipts.receipt_generator import ReceiptGenerator
+        _generator = ReceiptGenerator()
+    return _generator.generate_receipt(payment_info)
+
+
+class ReceiptCheckpoint:
+    """Último id de transacción terminado, en un archivo JSON escrito de forma atómica"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def load(self) -> Optional[str]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))["last_transaction_id"]
+        except FileNotFoundError:
+            return None
+
+    def save(self, last_transaction_id: Optional[str], processed: int, failed: int) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({
+            "last_transaction_id": last_transaction_id,
+            "processed": processed,
+            "failed": failed,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        }), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+@dataclass
+class RegenerationOptions:
+    workers: int = os.cpu_count() or 2
+    window: int = 0               # recibos en vuelo; 0 = 2 por worker
+    batch_size: int = 500         # filas por página de la consulta
+    checkpoint_every: int = 50    # recibos entre escrituras del checkpoint
+    update_urls: bool = True
+    contract_loan_id: Optional[int] = None
+    limit: Optional[int] = None
+
+
+class ReceiptRegenerationService:
+    """Regenera los recibos de las transacciones de pago y emite un evento por recibo"""
+
+    def __init__(self, db_pool, checkpoint: ReceiptCheckpoint, options: Optional[RegenerationOptions] = None, store_receipt=None):
+        self.db_pool = db_pool
+        self.checkpoint = checkpoint
+        self.options = options or RegenerationOptions()
+        self.store_receipt = store_receipt or self._store_receipt
+
+    async def stream_transactions(self, after_id: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        """Transacciones con id mayor que after_id (None = todas), una página en memoria cada vez"""
+        remaining = self.options.limit
+        while remaining is None or remaining > 0:
+            page_size = self.options.batch_size if remaining is None else min(self.options.batch_size, remaining)
+            rows = await self.db_pool.fetch(
+                TRANSACTIONS_SQL, after_id, CLIENT_PERSON_TYPE_ID, self.options.contract_loan_id, page_size
+            )
+            for row in rows:
+                # asyncpg devuelve uuid.UUID; el checkpoint y los eventos usan el texto
+                yield dict(row, transaction_id=str(row["transaction_id"]))
+            if len(rows) < page_size:
+                return
+            after_id = str(rows[-1]["transaction_id"])
+            if remaining is not None:
+                remaining -= len(rows)
+
+    async def _store_receipt(self, row: Dict[str, Any], content: bytes) -> str:
+        """Subir el recibo a la carpeta payments del contrato y devolver su URL"""
+        from app.config import settings
+        from app.loan_payments.payment_image_service import PaymentImageService
+        from app.uploads.handlers import _InMemoryUpload
+
+        reference = receipt_reference(row["transaction_id"])
+        result = await PaymentImageService(Path(settings.CONTRACTS_DIR)).upload_payment_image(
+            str(row["contract_loan_id"]),
+            reference,
+            _InMemoryUpload(content, f"{reference}.png", "image/png"),
+            None,
+            file_bytes=content,
+        )
+        if not result.get("url"):
+            raise RuntimeError("El almacenamiento no devolvió la URL del recibo")
+        return result["url"]
+
+    async def _regenerate(self, executor: ProcessPoolExecutor, row: Dict[str, Any]) -> Dict[str, Any]:
+        transaction_id = row["transaction_id"]
+        try:
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(executor, render_receipt, payment_info_from_row(row))
+            url = await self.store_receipt(row, content)
+            if self.options.update_urls:
+                await self.db_pool.execute(UPDATE_URL_SQL, transaction_id, url)
+        except BrokenExecutor:
+            # Sin workers no hay nada que reintentar: se corta el lote sin avanzar el checkpoint
+            raise
+        except Exception as e:
+            log.warning("Could not regenerate receipt for transaction %s: %s", transaction_id, e)
+            return {"event": "error", "transaction_id": transaction_id, "error": str(e)}
+        return {"event": "receipt", "transaction_id": transaction_id, "size": len(content), "url": url}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # spawn: los workers no heredan el event loop ni las conexiones abiertas
+        return ProcessPoolExecutor(max_workers=self.options.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def run(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Regenerar los recibos desde el checkpoint.
+
+        Emite {"event": "receipt" | "error", ...} en orden de id y al final un
+        {"event": "summary", ...} con el rendimiento. Un recibo que falla no detiene
+        el lote: queda en el evento de error y el checkpoint sigue avanzando.
+        """
+        options = self.options
+        window = options.window or options.workers * 2
+        start_id = last_id = self.checkpoint.load()
+        processed = failed = 0
+        started = time.perf_counter()
+        pending: deque = deque()
+        executor = self._executor()
+
+        async def finish_oldest() -> Dict[str, Any]:
+            nonlocal last_id, processed, failed
+            transaction_id, task = pending.popleft()
+            event = await task
+            last_id = transaction_id
+            processed += 1
+            failed += event["event"] == "error"
+            if processed % options.checkpoint_every == 0:
+                self.checkpoint.save(last_id, processed, failed)
+            return event
+
+        try:
+            async for row in self.stream_transactions(start_id):
+                if len(pending) >= window:
+                    yield await finish_oldest()
+                pending.append((row["transaction_id"], asyncio.create_task(self._regenerate(executor, row))))
+            while pending:
+                yield await finish_oldest()
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.checkpoint.save(last_id, processed, failed)
+
+        elapsed = time.perf_counter() - started
+        yield {
+            "event": "summary",
+            "processed": processed,
+            "succeeded": processed - failed,
+            "failed": failed,
+            "first_transaction_id": start_id,
+            "last_transaction_id": last_id,
+            "elapsed_seconds": round(elapsed, 2),
+            "receipts_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        }
@@ -1,3 +1,4 @@
+import enum
 from datetime import datetime
 from decimal import Decimal
 from typing import Optional
@@ -16,11 +17,24 @@ class ReceiptData(BaseModel):
     reference: Optional[str] = None
 
 
+class ReceiptMode(str, enum.Enum):
+    """Cómo se entrega el recibo en la respuesta del pago"""
+    INLINE = "inline"            # PNG completo en base64 (comportamiento anterior)
+    INLINE_WEBP = "inline_webp"  # WebP sin pérdida en base64
+    INLINE_PNG8 = "inline_png8"  # PNG de paleta en base64
+    LINK = "link"                # Sin imagen: drive_link / estado de la subida
+    SIGNED_URL = "signed_url"    # URL firmada de corta duración a /receipts/{upload_id}/download
+    DEFERRED = "deferred"        # Se renderiza y sube tras el commit; respuesta con upload_id y download_url
+
+
 class ReceiptResponse(BaseModel):
     """Respuesta simple del recibo generado"""
     success: bool
     message: str
     receipt_id: str
-    image_base64: str
+    image_base64: Optional[str] = None
+    download_url: Optional[str] = None
     drive_link: Optional[str] = None
-    filename: str
\ No newline at end of file
+    filename: str
+    upload_id: Optional[int] = None
+    upload_status: Optional[str] = None
\ No newline at end of file
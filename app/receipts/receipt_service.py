@@ -1,25 +1,33 @@
-from typing import Dict, Any
-from .receipt_schemas import ReceiptResponse
+from typing import Dict, Any, List, Optional
+from fastapi.encoders import jsonable_encoder
+from .receipt_schemas import ReceiptMode, ReceiptResponse
+from .receipt_links import sign_receipt_url
 from .receipt_generator import ReceiptGenerator
+from .render_pool import ReceiptRenderPool, receipt_render_pool
+from app.uploads.models import UPLOAD_PAYMENT_RECEIPT, UPLOAD_PENDING
+from app.uploads.outbox import enqueue_upload
 from pathlib import Path
-import tempfile
-import os
 from datetime import datetime
 
 
 class ReceiptService:
     """Servicio simple para generar recibos"""
     
-    def __init__(self):
+    def __init__(self, render_pool: ReceiptRenderPool = receipt_render_pool):
         self.generator = ReceiptGenerator()
+        self.render_pool = render_pool
     
-    async def generate_receipt_from_payment(self, payment_data: Dict[str, Any], db=None) -> ReceiptResponse:
+    async def generate_receipt_from_payment(
+        self, payment_data: Dict[str, Any], db=None, mode: ReceiptMode = ReceiptMode.INLINE
+    ) -> ReceiptResponse:
         """
         Genera recibo a partir de datos de pago y lo sube a Google Drive
         
         Args:
             payment_data: Datos de la respuesta del auto-payment
             db: Conexión a la base de datos para Google Drive
+            mode: Cómo se entrega la imagen; sin outbox no hay URL firmada ni
+                pipeline diferido y signed_url/deferred se comportan como link
             
         Returns:
             Recibo generado con imagen base64 y link de Google Drive
@@ -29,9 +37,8 @@ class ReceiptService:
             payment_info = payment_data.get("data", payment_data)
             contract_loan_id = payment_info.get("contract_loan_id")
             
-            # Generar imagen del recibo
-            image_bytes = self.generator.generate_receipt(payment_info)
-            image_base64 = self.generator.image_to_base64(image_bytes)
+            # Generar imagen del recibo (en el pool de render, fuera del event loop)
+            image_bytes, image_base64 = await self.render_pool.render(payment_info, mode)
             
             # Generar ID único
             receipt_id = self.generator.generate_receipt_id()
@@ -44,8 +51,8 @@ class ReceiptService:
                     drive_result = await self._upload_receipt_to_drive(
                         contract_loan_id, receipt_id, image_bytes, db
                     )
-                    if drive_result.get("drive_success"):
-                        drive_link = drive_result.get("drive_view_link")
+                    if drive_result.get("success"):
+                        drive_link = drive_result.get("url")
                 except Exception:
                     pass
             
@@ -62,58 +69,95 @@ class ReceiptService:
                 success=False,
                 message=f"Error generando recibo: {str(e)}",
                 receipt_id="",
-                image_base64="",
                 drive_link=None,
                 filename=""
             )
     
+    async def enqueue_receipt_from_payment(
+        self,
+        payment_data: Dict[str, Any],
+        db,
+        transaction_ids: List[str],
+        mode: ReceiptMode = ReceiptMode.INLINE,
+        requested_by: Optional[str] = None,
+    ) -> ReceiptResponse:
+        """
+        Genera el recibo y registra su subida en el outbox, en la transacción actual de db.
+
+        El despachador sube la imagen y guarda url_payment_receipt cuando termina.
+        Con mode=signed_url la respuesta lleva una URL firmada a /receipts/{upload_id}/download.
+        Con mode=deferred no se renderiza aquí: el despachador lo hace tras el commit
+        con los datos del pago guardados en el outbox, y la URL firmada sirve el
+        recibo cuando está listo. requested_by (usuario que registró el pago) es el
+        único que puede consultar el estado con GET /receipts/{upload_id}.
+        """
+        payment_info = payment_data.get("data", payment_data)
+        contract_loan_id = payment_info.get("contract_loan_id")
+        receipt_id = self.generator.generate_receipt_id()
+        filename = f"receipt_{receipt_id}.png"
+        target = {"contract_loan_id": contract_loan_id, "receipt_id": receipt_id, "transaction_ids": transaction_ids}
+        if requested_by:
+            target["requested_by"] = str(requested_by)
+
+        deferred = mode == ReceiptMode.DEFERRED and bool(contract_loan_id)
+        image_bytes = image_base64 = None
+        if deferred:
+            # Decimal -> float: el generador compara y formatea importes
+            target["payment"] = jsonable_encoder(payment_info)
+        else:
+            image_bytes, image_base64 = await self.render_pool.render(payment_info, mode)
+
+        upload_id = None
+        if contract_loan_id:
+            upload_id = await enqueue_upload(db, UPLOAD_PAYMENT_RECEIPT, image_bytes, filename, "image/png", target)
+
+        return ReceiptResponse(
+            success=True,
+            message="Recibo en preparación" if deferred else "Recibo generado exitosamente",
+            receipt_id=receipt_id,
+            image_base64=image_base64,
+            download_url=sign_receipt_url(upload_id) if upload_id and mode in (ReceiptMode.SIGNED_URL, ReceiptMode.DEFERRED) else None,
+            drive_link=None,
+            filename=filename,
+            upload_id=upload_id,
+            upload_status=UPLOAD_PENDING if upload_id else None
+        )
+    
     async def _upload_receipt_to_drive(self, contract_loan_id: int, receipt_id: str, image_bytes: bytes, db) -> Dict[str, Any]:
-        """Sube el recibo a Google Drive en la carpeta payments del contrato"""
+        """Sube el recibo a la carpeta payments del contrato, en su backend de documentos"""
         try:
             # Importar el servicio de imágenes aquí para evitar importación circular
             from app.loan_payments.payment_image_service import PaymentImageService
             
-            # Crear archivo temporal
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-                temp_file.write(image_bytes)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Inicializar servicio de imágenes
-                contracts_dir = Path("contracts")
-                image_service = PaymentImageService(contracts_dir, use_google_drive=True)
-                
-                # Crear un objeto similar a UploadFile para el servicio de imágenes
-                class MockUploadFile:
-                    def __init__(self, content: bytes, filename: str):
-                        self.content = content
-                        self.filename = filename
-                        self.content_type = 'image/png'
-                        self.size = len(content)
-                    
-                    async def read(self):
-                        return self.content
-                
-                mock_file = MockUploadFile(image_bytes, f"receipt_{receipt_id}.png")
-                
-                # Usar el servicio de imágenes para subir al Drive
-                result = await image_service.upload_payment_image(
-                    str(contract_loan_id),
-                    f"receipt_{receipt_id}",
-                    mock_file,
-                    db,
-                    file_bytes=image_bytes
-                )
-                
-                return result
-                
-            finally:
-                # Limpiar archivo temporal
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                    
+            # Inicializar servicio de imágenes
+            contracts_dir = Path("contracts")
+            image_service = PaymentImageService(contracts_dir)
+
+            # Crear un objeto similar a UploadFile para el servicio de imágenes
+            class MockUploadFile:
+                def __init__(self, content: bytes, filename: str):
+                    self.content = content
+                    self.filename = filename
+                    self.content_type = 'image/png'
+                    self.size = len(content)
+
+                async def read(self):
+                    return self.content
+
+            mock_file = MockUploadFile(image_bytes, f"receipt_{receipt_id}.png")
+
+            # Usar el servicio de imágenes para subir directamente desde memoria
+            return await image_service.upload_payment_image(
+                str(contract_loan_id),
+                f"receipt_{receipt_id}",
+                mock_file,
+                db,
+                file_bytes=image_bytes
+            )
+
         except Exception as e:
             return {
+                "success": False,
                 "drive_success": False,
                 "drive_error": str(e)
             }
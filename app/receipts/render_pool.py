@@ -0,0 +1,104 @@
+"""Render de recibos en un pool de hilos dedicado.
+
+Dibujar el recibo, generar el QR y codificar el PNG y su base64 es CPU en
+Python/PIL: en el event loop bloquea todas las peticiones mientras dura. El
+pool lo ejecuta en sus propios hilos (no en el executor por defecto de
+asyncio, que comparten to_thread y las subidas), con un máximo de recibos en
+cola o en curso y un tiempo máximo de espera por recibo.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.config import settings
+from .receipt_generator import ReceiptGenerator
+from .receipt_schemas import ReceiptMode
+
+log = logging.getLogger(__name__)
+
+
+class ReceiptRenderError(Exception):
+    """El recibo no se pudo renderizar a tiempo (pool lleno o timeout)"""
+
+
+class RenderedReceipt(NamedTuple):
+    image_bytes: bytes                   # PNG que se guarda en el almacenamiento
+    image_base64: Optional[str] = None   # Imagen para la respuesta, según el modo
+
+
+class ReceiptRenderPool:
+    """Pool acotado de hilos para renderizar recibos"""
+
+    def __init__(
+        self,
+        workers: int = settings.RECEIPT_RENDER_WORKERS,
+        max_pending: int = settings.RECEIPT_RENDER_MAX_PENDING,
+        timeout: float = settings.RECEIPT_RENDER_TIMEOUT_SECONDS,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.generator = ReceiptGenerator()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Recibos en cola o renderizándose"""
+        return self._pending
+
+    def _render(self, payment_info: Dict[str, Any], mode: ReceiptMode) -> RenderedReceipt:
+        generator = self.generator
+        img = generator.render_image(payment_info)
+        image_bytes = generator._image_to_bytes(img)
+        if mode == ReceiptMode.INLINE:
+            return RenderedReceipt(image_bytes, generator.image_to_base64(image_bytes))
+        if mode == ReceiptMode.INLINE_WEBP:
+            return RenderedReceipt(image_bytes, generator.image_to_base64(generator.image_to_webp(img), "image/webp"))
+        if mode == ReceiptMode.INLINE_PNG8:
+            return RenderedReceipt(image_bytes, generator.image_to_base64(generator.image_to_palette_png(img)))
+        return RenderedReceipt(image_bytes)
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, payment_info: Dict[str, Any], mode: ReceiptMode):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ReceiptRenderError(f"Hay {self._pending} recibos pendientes de render")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="receipt-render")
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._render, payment_info, mode)
+        except Exception:
+            self._release(None)
+            raise
+        # El hueco se libera cuando el hilo termina, aunque quien esperaba ya no lo haga
+        future.add_done_callback(self._release)
+        return future
+
+    async def render(self, payment_info: Dict[str, Any], mode: ReceiptMode = ReceiptMode.INLINE) -> RenderedReceipt:
+        """Renderizar un recibo sin bloquear el event loop (PNG y, según mode, la imagen en base64)"""
+        future = self._submit(payment_info, mode)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise ReceiptRenderError(f"El recibo no se renderizó en {self.timeout:g}s") from None
+
+    def shutdown(self) -> None:
+        """Cerrar los hilos; los recibos en cola que no empezaron se descartan"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            log.info("Receipt render pool stopped")
+
+
+receipt_render_pool = ReceiptRenderPool()
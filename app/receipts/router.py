@@ -0,0 +1,117 @@
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, RedirectResponse, Response
+from sqlalchemy import select
+
+from app.auth.dependencies import get_current_user
+from app.database import DepDatabase, fetch_one
+from app.storage import store_for_location
+from app.storage.responses import document_response
+from app.uploads.models import UPLOAD_FAILED, UPLOAD_PAYMENT_RECEIPT, upload_outbox
+from .receipt_links import sign_receipt_url, verify_receipt_signature
+
+router = APIRouter(prefix="/receipts", tags=["receipts"])
+
+# Segundos sugeridos al cliente para volver a pedir un recibo que aún se prepara
+RECEIPT_RETRY_AFTER_SECONDS = 2
+
+
+async def _get_receipt_row(upload_id: int, db) -> Dict[str, Any]:
+    row = await fetch_one(
+        select(
+            upload_outbox.c.status,
+            upload_outbox.c.filename,
+            upload_outbox.c.mime_type,
+            upload_outbox.c.content,
+            upload_outbox.c.result,
+            upload_outbox.c.target,
+            upload_outbox.c.last_error,
+        ).where(upload_outbox.c.upload_id == upload_id, upload_outbox.c.kind == UPLOAD_PAYMENT_RECEIPT),
+        connection=db,
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Recibo no encontrado")
+    return row
+
+
+def _public_url(url: Optional[str]) -> Optional[str]:
+    """URL del recibo solo si el cliente puede abrirla (el backend local guarda rutas del servidor)"""
+    return url if url and url.startswith(("http://", "https://")) else None
+
+
+@router.get("/{upload_id}")
+async def get_receipt_status(
+    upload_id: int,
+    db: DepDatabase,
+    current_user: str = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """
+    Estado de un recibo (receipt_mode=deferred) y una URL firmada nueva para descargarlo
+
+    status es el de su subida en el outbox: pending, processing, done o failed.
+    Solo lo consulta el usuario que registró el pago (los upload_id son correlativos);
+    para cualquier otro el recibo no existe.
+    """
+    row = await _get_receipt_row(upload_id, db)
+    if (row["target"] or {}).get("requested_by") != str(current_user):
+        raise HTTPException(status_code=404, detail="Recibo no encontrado")
+    url = (row["result"] or {}).get("url")
+    return {
+        "upload_id": upload_id,
+        "status": row["status"],
+        "ready": row["content"] is not None or bool(url),
+        "url": _public_url(url) if row["status"] != UPLOAD_FAILED else None,
+        "download_url": sign_receipt_url(upload_id),
+        "error": row["last_error"] if row["status"] == UPLOAD_FAILED else None,
+    }
+
+
+@router.get("/{upload_id}/download")
+async def download_receipt(
+    upload_id: int,
+    request: Request,
+    db: DepDatabase,
+    expires: int = Query(..., description="Expiración de la URL (epoch)"),
+    signature: str = Query(..., description="Firma de la URL"),
+):
+    """
+    Descargar un recibo de pago con la URL firmada de receipt_mode=signed_url/deferred
+
+    Mientras la subida está pendiente se sirve la imagen guardada en el outbox;
+    cuando ya se subió se redirige al enlace del almacenamiento (Drive, S3) o,
+    si es una ruta local, se envía el archivo desde su backend. Si el recibo
+    diferido aún no se ha renderizado responde 202 con Retry-After.
+    """
+    if not verify_receipt_signature(upload_id, expires, signature):
+        raise HTTPException(status_code=403, detail="URL de recibo inválida o expirada")
+
+    row = await _get_receipt_row(upload_id, db)
+    if row["content"] is not None:
+        max_age = max(int(expires - time.time()), 0)
+        return Response(
+            content=bytes(row["content"]),
+            media_type=row["mime_type"],
+            headers={
+                "Content-Disposition": f'inline; filename="{row["filename"]}"',
+                "Cache-Control": f"private, max-age={max_age}",
+            },
+        )
+    url = (row["result"] or {}).get("url")
+    if _public_url(url):
+        return RedirectResponse(url, status_code=307)
+    if url:
+        store = store_for_location(url)
+        stat = await store.stat(Path(url).name)
+        if stat is None:
+            raise HTTPException(status_code=404, detail="Recibo no disponible")
+        return document_response(store, stat, request, filename=row["filename"])
+    if row["status"] == UPLOAD_FAILED:
+        raise HTTPException(status_code=404, detail="Recibo no disponible")
+    return JSONResponse(
+        status_code=202,
+        content={"upload_id": upload_id, "status": row["status"], "message": "Recibo en preparación"},
+        headers={"Retry-After": str(RECEIPT_RETRY_AFTER_SECONDS)},
+    )
@@ -0,0 +1,34 @@
+"""
+Storage Module
+
+Almacenamiento de documentos (contratos, vouchers, recibos) detrás de una
+interfaz común DocumentStore con operaciones put/get/stat/stream/link.
+Backends: sistema de archivos local, Google Drive y servicios compatibles con S3.
+"""
+from app.storage.base import (
+    DEFAULT_CHUNK_SIZE,
+    DOCX_MIME_TYPE,
+    DocumentNotFound,
+    DocumentStat,
+    DocumentStore,
+)
+from app.storage.local import LocalDocumentStore
+from app.storage.registry import (
+    close_document_stores,
+    get_document_store,
+    resolve_backend,
+    store_for_location,
+)
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "DOCX_MIME_TYPE",
+    "DocumentNotFound",
+    "DocumentStat",
+    "DocumentStore",
+    "LocalDocumentStore",
+    "close_document_stores",
+    "get_document_store",
+    "resolve_backend",
+    "store_for_location",
+]
@@ -0,0 +1,108 @@
+"""Interfaz común de almacenamiento de documentos."""
+
+import mimetypes
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Union
+
+# Tamaño de trozo por defecto para stream()
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+DocumentContent = Union[bytes, bytearray, memoryview]
+
+
+class DocumentNotFound(Exception):
+    """El documento no existe en el almacenamiento"""
+
+    def __init__(self, key: str):
+        super().__init__(f"Documento no encontrado: {key}")
+        self.key = key
+
+
+@dataclass(frozen=True)
+class DocumentStat:
+    """Metadatos de un documento almacenado"""
+    key: str
+    size: int
+    content_type: str
+    etag: str
+    link: str
+    modified_at: Optional[datetime] = None
+    # Ruta en disco (solo backend local; permite sendfile)
+    path: Optional[Path] = None
+    # Datos propios del backend (ids de Drive, ruta local...) que se añaden a las respuestas
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+def normalize_key(key: str) -> str:
+    """Clave relativa con '/' como separador; rechaza segmentos vacíos o '..'"""
+    parts = [part for part in str(key).replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or ".." in parts:
+        raise ValueError(f"Clave de documento inválida: {key!r}")
+    return "/".join(parts)
+
+
+def guess_content_type(key: str) -> str:
+    if key.endswith(".docx"):
+        return DOCX_MIME_TYPE
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class DocumentStore(ABC):
+    """
+    Almacenamiento de documentos por clave ("contract_X/X.docx", "contract_X/payments/ref.png").
+
+    Las claves usan '/' como separador; el primer segmento es la carpeta del contrato.
+    """
+
+    name: str = ""
+    # True si put() sale de la máquina (Drive, S3): esas subidas pueden diferirse al outbox
+    is_remote: bool = False
+
+    @abstractmethod
+    async def put(self, key: str, content: DocumentContent, content_type: Optional[str] = None) -> DocumentStat:
+        """Crear o reemplazar el documento"""
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[DocumentStat]:
+        """Metadatos del documento; None si no existe"""
+
+    @abstractmethod
+    def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """Contenido en trozos desde start hasta end (inclusivo); DocumentNotFound si no existe"""
+
+    @abstractmethod
+    async def link(self, key: str) -> str:
+        """Enlace o ruta del documento o de la carpeta indicada por key"""
+
+    def stream_document(
+        self, stat: DocumentStat, start: int = 0, end: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """Como stream(), reutilizando un stat ya obtenido (evita volver a buscar el documento)"""
+        return self.stream(stat.key, start, end, chunk_size)
+
+    async def get(self, key: str) -> bytes:
+        """Contenido completo del documento"""
+        return b"".join([chunk async for chunk in self.stream(key)])
+
+    def remember_folder(self, prefix: str, folder_id: Optional[str]) -> None:
+        """
+        Pista opcional con el id ya conocido de una carpeta.
+
+        Por defecto no hace nada: solo los backends con carpetas (Drive) la usan.
+        """
+        return None
+
+    async def aclose(self) -> None:
+        """
+        Liberar conexiones del backend.
+
+        Por defecto no hace nada: los backends sin clientes abiertos (local) no tienen qué cerrar.
+        """
+        return None
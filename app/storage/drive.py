@@ -0,0 +1,173 @@
+"""Almacenamiento de documentos en Google Drive (sobre AsyncDriveClient)."""
+
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+from app.contracts.gdrive_async import FILE_STAT_FIELDS, DriveAPIError
+from app.storage.base import (
+    DEFAULT_CHUNK_SIZE, DocumentContent, DocumentNotFound, DocumentStat, DocumentStore, guess_content_type,
+    normalize_key,
+)
+
+FOLDER_LINK = "https://drive.google.com/drive/folders/{}"
+
+
+class DriveDocumentStore(DocumentStore):
+    """
+    Documentos en Google Drive bajo la carpeta principal.
+
+    Cada segmento de la clave es una carpeta; los ids de carpeta resueltos se
+    recuerdan (LRU) para que las escrituras repetidas no vuelvan a listar Drive.
+    """
+
+    name = "drive"
+    is_remote = True
+
+    def __init__(self, drive_service, root_folder_id: Optional[str] = None, max_folders: int = 4096):
+        self.drive_service = drive_service
+        self.root_folder_id = root_folder_id or drive_service.main_folder_id
+        self.max_folders = max_folders
+        self._folder_ids: "OrderedDict[str, str]" = OrderedDict()
+        self._folder_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def client(self):
+        return self.drive_service.async_client()
+
+    def remember_folder(self, prefix: str, folder_id: Optional[str]) -> None:
+        if not folder_id:
+            return
+        prefix = normalize_key(prefix)
+        self._folder_ids[prefix] = folder_id
+        self._folder_ids.move_to_end(prefix)
+        while len(self._folder_ids) > self.max_folders:
+            self._folder_ids.popitem(last=False)
+
+    def _forget_folders(self, prefix: str) -> None:
+        for cached in [p for p in self._folder_ids if p == prefix or p.startswith(prefix + "/")]:
+            del self._folder_ids[cached]
+
+    async def _resolve_folder(self, prefix: str, create: bool) -> Optional[str]:
+        """Id de la carpeta prefix (creándola si create); None si no existe"""
+        if not prefix:
+            return self.root_folder_id
+        if prefix in self._folder_ids:
+            self._folder_ids.move_to_end(prefix)
+            return self._folder_ids[prefix]
+
+        if self._folder_lock is None:
+            self._folder_lock = asyncio.Lock()
+        # Serializar la creación evita carpetas duplicadas con el mismo nombre
+        async with self._folder_lock:
+            parent_id = self.root_folder_id
+            walked = []
+            for segment in prefix.split("/"):
+                walked.append(segment)
+                path = "/".join(walked)
+                folder_id = self._folder_ids.get(path)
+                if folder_id is None:
+                    found = await self.client.find_child(segment, parent_id, folder=True, fields="id")
+                    if found is not None:
+                        folder_id = found["id"]
+                    elif create:
+                        folder_id = await self.client.create_folder(segment, parent_id)
+                    else:
+                        return None
+                    self.remember_folder(path, folder_id)
+                parent_id = folder_id
+            return parent_id
+
+    @staticmethod
+    def _split(key: str):
+        key = normalize_key(key)
+        prefix, _, name = key.rpartition("/")
+        return key, prefix, name
+
+    async def _find(self, key: str) -> Optional[Dict]:
+        key, prefix, name = self._split(key)
+        folder_id = await self._resolve_folder(prefix, create=False)
+        if folder_id is None:
+            return None
+        return await self.client.find_child(name, folder_id, folder=False)
+
+    def _to_stat(self, key: str, file: Dict, folder_id: Optional[str]) -> DocumentStat:
+        links = self.drive_service._build_file_links(file)
+        modified = file.get("modifiedTime")
+        extra = {
+            "drive_success": True,
+            "drive_file_id": links["file_id"],
+            "drive_view_link": links["web_view_link"],
+            "drive_download_link": links["download_link"],
+        }
+        if folder_id:
+            extra.update(drive_folder_id=folder_id, drive_link=FOLDER_LINK.format(folder_id))
+        return DocumentStat(
+            key=normalize_key(key),
+            size=int(file.get("size") or 0),
+            content_type=file.get("mimeType") or guess_content_type(key),
+            etag=f'"{file.get("md5Checksum") or file["id"] + (modified or "")}"',
+            link=links["web_view_link"],
+            modified_at=datetime.fromisoformat(modified.replace("Z", "+00:00")) if modified else None,
+            extra=extra,
+        )
+
+    async def put(self, key: str, content: DocumentContent, content_type: Optional[str] = None) -> DocumentStat:
+        key, prefix, name = self._split(key)
+        content_type = content_type or guess_content_type(name)
+
+        for attempt in range(2):
+            folder_id = await self._resolve_folder(prefix, create=True)
+            try:
+                existing = await self.client.find_child(name, folder_id, folder=False, fields="id")
+                if existing is not None:
+                    file = await self.client.update_bytes(content, existing["id"], content_type, fields=FILE_STAT_FIELDS)
+                else:
+                    file = await self.client.upload_bytes(content, folder_id, name, content_type, fields=FILE_STAT_FIELDS)
+                return self._to_stat(key, file, folder_id)
+            except DriveAPIError as e:
+                # Alguna carpeta recordada ya no existe en Drive: resolver de nuevo
+                # toda la rama del contrato una sola vez
+                if e.status_code != 404 or attempt or not prefix:
+                    raise
+                self._forget_folders(prefix.split("/", 1)[0])
+
+    async def stat(self, key: str) -> Optional[DocumentStat]:
+        file = await self._find(key)
+        if file is None:
+            return None
+        _, prefix, _ = self._split(key)
+        return self._to_stat(key, file, self._folder_ids.get(prefix))
+
+    async def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        file = await self._find(key)
+        if file is None:
+            raise DocumentNotFound(key)
+        async for chunk in self.client.download(file["id"], start, end, chunk_size):
+            yield chunk
+
+    async def stream_document(
+        self, stat: DocumentStat, start: int = 0, end: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        file_id = stat.extra.get("drive_file_id")
+        if not file_id:
+            async for chunk in self.stream(stat.key, start, end, chunk_size):
+                yield chunk
+            return
+        async for chunk in self.client.download(file_id, start, end, chunk_size):
+            yield chunk
+
+    async def link(self, key: str) -> str:
+        key = normalize_key(key)
+        if key in self._folder_ids:
+            return FOLDER_LINK.format(self._folder_ids[key])
+        file = await self._find(key)
+        if file is not None:
+            return self.drive_service._build_file_links(file)["web_view_link"]
+        folder_id = await self._resolve_folder(key, create=False)
+        if folder_id is None:
+            raise DocumentNotFound(key)
+        return FOLDER_LINK.format(folder_id)
@@ -0,0 +1,96 @@
+"""Almacenamiento de documentos en el sistema de archivos local."""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from app.storage.base import (
+    DEFAULT_CHUNK_SIZE, DocumentContent, DocumentNotFound, DocumentStat, DocumentStore, guess_content_type,
+    normalize_key,
+)
+
+
+class LocalDocumentStore(DocumentStore):
+    """Documentos bajo un directorio raíz (p. ej. app/generated_contracts)"""
+
+    name = "local"
+    is_remote = False
+
+    def __init__(self, root: Path):
+        self.root = Path(root).resolve()
+
+    def path(self, key: str) -> Path:
+        """Ruta en disco de la clave, siempre dentro de root"""
+        return self.root.joinpath(*normalize_key(key).split("/"))
+
+    def _stat_path(self, key: str, path: Path) -> Optional[DocumentStat]:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        if not path.is_file():
+            return None
+        return DocumentStat(
+            key=normalize_key(key),
+            size=st.st_size,
+            content_type=guess_content_type(path.name),
+            etag=f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+            link=str(path),
+            modified_at=datetime.fromtimestamp(st.st_mtime),
+            path=path,
+            extra={"local_path": str(path)},
+        )
+
+    def _write(self, key: str, content: DocumentContent) -> DocumentStat:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Escribir a un temporal y renombrar: los lectores nunca ven un archivo a medias
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return self._stat_path(key, path)
+
+    async def put(self, key: str, content: DocumentContent, content_type: Optional[str] = None) -> DocumentStat:
+        return await asyncio.to_thread(self._write, key, content)
+
+    async def stat(self, key: str) -> Optional[DocumentStat]:
+        return await asyncio.to_thread(self._stat_path, key, self.path(key))
+
+    async def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        path = self.path(key)
+        try:
+            f = await asyncio.to_thread(open, path, "rb")
+        except (FileNotFoundError, IsADirectoryError) as exc:
+            raise DocumentNotFound(key) from exc
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await asyncio.to_thread(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def get(self, key: str) -> bytes:
+        try:
+            return await asyncio.to_thread(self.path(key).read_bytes)
+        except (FileNotFoundError, IsADirectoryError) as exc:
+            raise DocumentNotFound(key) from exc
+
+    async def link(self, key: str) -> str:
+        return str(self.path(key))
@@ -0,0 +1,87 @@
+"""Selección y reutilización de los backends de almacenamiento."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import settings
+from app.storage.base import DocumentStore
+from app.storage.local import LocalDocumentStore
+
+# Misma carpeta que ContractConfig.CONTRACTS_DIR
+DEFAULT_LOCAL_DIR = Path(__file__).resolve().parent.parent / "generated_contracts"
+
+_stores: Dict[str, DocumentStore] = {}
+_stores_lock = threading.Lock()
+
+
+def resolve_backend(use_google_drive: Optional[bool] = None) -> str:
+    """Backend configurado; sin DOCUMENT_STORE_BACKEND se decide por USE_GOOGLE_DRIVE"""
+    if settings.DOCUMENT_STORE_BACKEND:
+        return settings.DOCUMENT_STORE_BACKEND.lower()
+    if use_google_drive is None:
+        use_google_drive = os.getenv("USE_GOOGLE_DRIVE", "false").lower() == "true"
+    return "drive" if use_google_drive else "local"
+
+
+def _create_store(backend: str) -> DocumentStore:
+    if backend == "local":
+        return LocalDocumentStore(Path(settings.DOCUMENT_STORE_LOCAL_DIR or DEFAULT_LOCAL_DIR))
+    if backend == "drive":
+        from app.contracts.gdrive_service import get_shared_drive_service
+        from app.storage.drive import DriveDocumentStore
+        return DriveDocumentStore(get_shared_drive_service())
+    if backend == "s3":
+        from app.storage.s3 import S3DocumentStore
+        if not settings.S3_ENDPOINT_URL:
+            raise ValueError("S3_ENDPOINT_URL no configurado")
+        return S3DocumentStore(
+            settings.S3_ENDPOINT_URL,
+            settings.S3_BUCKET,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            region=settings.S3_REGION,
+        )
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
+
+
+def get_document_store(backend: Optional[str] = None) -> DocumentStore:
+    """Instancia compartida del backend indicado (por defecto, el configurado)"""
+    backend = backend or resolve_backend()
+    store = _stores.get(backend)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(backend)
+            if store is None:
+                store = _stores[backend] = _create_store(backend)
+    return store
+
+
+def store_for_location(location: str) -> DocumentStore:
+    """
+    Backend que guarda el documento o carpeta indicado por un enlace/ruta ya persistido
+    (contract.folder_path, file_path...).
+    """
+    if location.startswith("http"):
+        if "drive.google.com" in location or "docs.google.com" in location:
+            return get_document_store("drive")
+        if settings.S3_ENDPOINT_URL and location.startswith(settings.S3_ENDPOINT_URL.rstrip("/")):
+            return get_document_store("s3")
+        raise ValueError(f"No hay backend para la ubicación {location}")
+
+    local = get_document_store("local")
+    root = Path(location).resolve().parent
+    if isinstance(local, LocalDocumentStore) and root == local.root:
+        return local
+    # Carpeta local fuera de la raíz configurada (p. ej. CONTRACTS_DIR antiguo)
+    return LocalDocumentStore(root)
+
+
+async def close_document_stores() -> None:
+    """Cerrar los clientes de todos los backends creados"""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        await store.aclose()
@@ -0,0 +1,150 @@
+"""Respuestas HTTP de descarga de documentos (Range, ETag, sendfile)."""
+
+import os
+import re
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.storage.base import DEFAULT_CHUNK_SIZE, DocumentStat, DocumentStore
+
+_RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+
+
+class RangeNotSatisfiable(Exception):
+    """El rango pedido queda fuera del documento"""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Rango (start, end inclusivo) de una cabecera Range de un solo tramo.
+
+    Devuelve None si no hay cabecera o no se entiende (varios tramos, otras
+    unidades): en ese caso se sirve el documento completo, como permite HTTP.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header)
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Sufijo: los últimos N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match con el ETag del documento"""
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    strip = lambda value: value.strip().removeprefix("W/")
+    return strip(etag) in {strip(candidate) for candidate in header.split(",")}
+
+
+def _content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def _base_headers(stat: DocumentStat) -> Dict[str, str]:
+    headers = {"ETag": stat.etag, "Accept-Ranges": "bytes"}
+    if stat.modified_at is not None:
+        headers["Last-Modified"] = formatdate(stat.modified_at.timestamp(), usegmt=True)
+    return headers
+
+
+class SendfileResponse(FileResponse):
+    """
+    FileResponse que entrega el archivo con sendfile cuando el servidor ASGI
+    ofrece las extensiones http.response.zerocopy o http.response.pathsend;
+    si no, Starlette lo lee por trozos.
+    """
+
+    chunk_size = DEFAULT_CHUNK_SIZE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._extensions = scope.get("extensions") or {}
+        await super().__call__(scope, receive, send)
+
+    async def _zerocopy(self, send: Send, offset: int, count: int) -> None:
+        with open(self.path, "rb") as file:
+            await send({
+                "type": "http.response.zerocopy", "file": file, "offset": offset, "count": count, "more_body": False,
+            })
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+        if "http.response.zerocopy" in self._extensions:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            return await self._zerocopy(send, 0, int(self.headers["content-length"]))
+        if "http.response.pathsend" in self._extensions:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            return await send({"type": "http.response.pathsend", "path": os.fspath(self.path)})
+        await super()._handle_simple(send, send_header_only)
+
+    async def _handle_single_range(self, send: Send, start: int, end: int, file_size: int, send_header_only: bool) -> None:
+        if send_header_only or "http.response.zerocopy" not in self._extensions:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._zerocopy(send, start, end - start)
+
+
+def document_response(store: DocumentStore, stat: DocumentStat, request: Request, filename: str) -> Response:
+    """
+    Respuesta de descarga del documento con memoria constante por petición.
+
+    - If-None-Match con el ETag actual: 304 sin cuerpo.
+    - Archivo local: SendfileResponse (Range e If-Range los resuelve Starlette).
+    - Backend remoto: se reenvía en trozos desde el backend, pidiéndole solo el rango.
+    """
+    headers = _base_headers(stat)
+    if etag_matches(request.headers.get("if-none-match"), stat.etag):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = _content_disposition(filename)
+    if stat.path is not None:
+        return SendfileResponse(stat.path, headers=headers, media_type=stat.content_type)
+
+    # If-Range con otro ETag: el documento cambió, se envía completo
+    if_range = request.headers.get("if-range")
+    range_header = request.headers.get("range") if not if_range or if_range == stat.etag else None
+    try:
+        byte_range = parse_range(range_header, stat.size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{stat.size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, None, 200
+        headers["Content-Length"] = str(stat.size)
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        store.stream_document(stat, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=stat.content_type,
+    )
@@ -0,0 +1,171 @@
+"""Almacenamiento de documentos en un servicio compatible con S3 (AWS, MinIO...)."""
+
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import quote
+
+import httpx
+
+from app.storage.base import (
+    DEFAULT_CHUNK_SIZE, DocumentContent, DocumentNotFound, DocumentStat, DocumentStore, guess_content_type,
+    normalize_key,
+)
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class S3Error(Exception):
+    """Respuesta de error del servicio S3"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"S3 error {status_code}: {message}")
+        self.status_code = status_code
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign_v4(
+    method: str,
+    url: httpx.URL,
+    headers: Dict[str, str],
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """Cabeceras de autenticación AWS Signature V4 (servicio s3) para la petición"""
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date_stamp = now.strftime("%Y%m%d")
+
+    signed = {
+        "host": url.netloc.decode("ascii"),
+        "x-amz-content-sha256": payload_hash,
+        "x-amz-date": amz_date,
+        **{k.lower(): v.strip() for k, v in headers.items()},
+    }
+    signed_headers = ";".join(sorted(signed))
+    canonical_headers = "".join(f"{name}:{signed[name]}\n" for name in sorted(signed))
+    canonical_query = "&".join(
+        f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(url.params.multi_items())
+    )
+    canonical_request = "\n".join([
+        method, quote(url.path, safe="/-_.~"), canonical_query, canonical_headers, signed_headers, payload_hash,
+    ])
+
+    scope = f"{date_stamp}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    signing_key = _hmac(_hmac(_hmac(_hmac(f"AWS4{secret_key}".encode("utf-8"), date_stamp), region), "s3"), "aws4_request")
+    signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    return {
+        "x-amz-content-sha256": payload_hash,
+        "x-amz-date": amz_date,
+        "Authorization": (
+            f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        ),
+    }
+
+
+class S3DocumentStore(DocumentStore):
+    """
+    Documentos en un bucket S3 con URLs de estilo path (endpoint/bucket/clave).
+
+    Sin credenciales las peticiones van sin firmar (servidor local de pruebas).
+    """
+
+    name = "s3"
+    is_remote = True
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        region: str = "us-east-1",
+        max_connections: int = 20,
+        timeout: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            transport=transport,
+        )
+
+    def _url(self, key: str) -> httpx.URL:
+        return httpx.URL(f"{self.endpoint_url}/{self.bucket}/{quote(normalize_key(key), safe='/-_.~')}")
+
+    def _headers(self, method: str, url: httpx.URL, payload_hash: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        headers = dict(headers or {})
+        if self.access_key and self.secret_key:
+            headers.update(sign_v4(method, url, headers, payload_hash, self.access_key, self.secret_key, self.region))
+        return headers
+
+    def _stat_from_headers(self, key: str, url: httpx.URL, headers: httpx.Headers, size: Optional[int] = None) -> DocumentStat:
+        modified = headers.get("Last-Modified")
+        return DocumentStat(
+            key=normalize_key(key),
+            size=size if size is not None else int(headers.get("Content-Length", 0)),
+            content_type=headers.get("Content-Type") or guess_content_type(key),
+            etag=headers.get("ETag", ""),
+            link=str(url),
+            modified_at=parsedate_to_datetime(modified) if modified else datetime.now(timezone.utc),
+            extra={"s3_bucket": self.bucket, "s3_key": normalize_key(key)},
+        )
+
+    async def put(self, key: str, content: DocumentContent, content_type: Optional[str] = None) -> DocumentStat:
+        body = memoryview(content).cast("B").tobytes()
+        url = self._url(key)
+        content_type = content_type or guess_content_type(key)
+        headers = self._headers("PUT", url, hashlib.sha256(body).hexdigest(), {"Content-Type": content_type})
+        response = await self._client.put(url, content=body, headers=headers)
+        if response.status_code >= 400:
+            raise S3Error(response.status_code, response.text)
+        response.headers.setdefault("Content-Type", content_type)
+        return self._stat_from_headers(key, url, response.headers, size=len(body))
+
+    async def stat(self, key: str) -> Optional[DocumentStat]:
+        url = self._url(key)
+        response = await self._client.head(url, headers=self._headers("HEAD", url, EMPTY_SHA256))
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 400:
+            raise S3Error(response.status_code, response.reason_phrase)
+        return self._stat_from_headers(key, url, response.headers)
+
+    async def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        url = self._url(key)
+        extra = {}
+        if start or end is not None:
+            extra["Range"] = f"bytes={start}-{'' if end is None else end}"
+        async with self._client.stream("GET", url, headers={**extra, **self._headers("GET", url, EMPTY_SHA256)}) as response:
+            if response.status_code == 404:
+                raise DocumentNotFound(key)
+            if response.status_code >= 400:
+                raise S3Error(response.status_code, (await response.aread()).decode("utf-8", "replace"))
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def link(self, key: str) -> str:
+        return str(self._url(key))
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,7 @@
+"""
+Uploads Module
+
+Outbox de subidas al almacenamiento de documentos: las subidas se registran en la misma
+transacción que la operación de negocio y un despachador en segundo plano las
+procesa con concurrencia acotada y reintentos con backoff exponencial.
+"""
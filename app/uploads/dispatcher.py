@@ -0,0 +1,204 @@
+"""Despachador en segundo plano del outbox de subidas."""
+
+import asyncio
+import json
+import logging
+import random
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import asyncpg
+
+from app.config import settings
+from app.uploads.models import UPLOAD_OUTBOX_CHANNEL
+
+log = logging.getLogger(__name__)
+
+CLAIM_SQL = """
+    UPDATE public.upload_outbox o
+    SET status = 'processing',
+        attempts = o.attempts + 1,
+        locked_until = CURRENT_TIMESTAMP + make_interval(secs => $2),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE o.upload_id IN (
+        SELECT upload_id
+        FROM public.upload_outbox
+        WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+           OR (status = 'processing' AND locked_until < CURRENT_TIMESTAMP)
+        ORDER BY next_attempt_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING o.upload_id, o.kind, o.filename, o.mime_type, o.content, o.target, o.result, o.attempts
+"""
+
+COMPLETE_SQL = """
+    UPDATE public.upload_outbox
+    SET status = 'done', result = $2::jsonb, content = NULL, last_error = NULL,
+        locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+    WHERE upload_id = $1
+"""
+
+FAIL_SQL = """
+    UPDATE public.upload_outbox
+    SET status = CASE WHEN attempts >= $3 THEN 'failed' ELSE 'pending' END,
+        next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => $4),
+        last_error = $2, locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+    WHERE upload_id = $1
+"""
+
+
+@dataclass
+class UploadJob:
+    """Subida reclamada del outbox"""
+    upload_id: int
+    kind: str
+    filename: str
+    mime_type: str
+    content: bytes
+    target: Dict[str, Any]
+    attempts: int
+    # Progreso guardado por un intento anterior (save_progress), para no repetir pasos
+    result: Optional[Dict[str, Any]] = None
+
+
+UploadHandler = Callable[[UploadJob], Awaitable[Dict[str, Any]]]
+
+
+def backoff_delay(attempts: int, base: float, maximum: float) -> float:
+    """Backoff exponencial con jitter: base * 2^(intentos-1), acotado a maximum"""
+    delay = min(maximum, base * (2 ** max(0, attempts - 1)))
+    return delay * (0.5 + random.random() / 2)
+
+
+class UploadDispatcher:
+    """Procesa el outbox con concurrencia acotada; se despierta con NOTIFY o por sondeo"""
+
+    def __init__(
+        self,
+        db_pool: asyncpg.Pool,
+        handlers: Optional[Dict[str, UploadHandler]] = None,
+        concurrency: int = settings.UPLOAD_OUTBOX_CONCURRENCY,
+        max_attempts: int = settings.UPLOAD_OUTBOX_MAX_ATTEMPTS,
+        poll_interval: float = settings.UPLOAD_OUTBOX_POLL_SECONDS,
+        backoff_base: float = settings.UPLOAD_OUTBOX_BACKOFF_SECONDS,
+        backoff_max: float = settings.UPLOAD_OUTBOX_MAX_BACKOFF_SECONDS,
+        timeout: float = settings.UPLOAD_OUTBOX_TIMEOUT_SECONDS,
+    ):
+        if handlers is None:
+            from app.uploads.handlers import UPLOAD_HANDLERS
+            handlers = UPLOAD_HANDLERS
+        self.db_pool = db_pool
+        self.handlers = handlers
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._wake = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._tasks: set = set()
+        self._runner: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncpg.Connection] = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _on_notify(self, *args) -> None:
+        self._wake.set()
+
+    async def start(self) -> None:
+        """Arrancar el bucle del despachador y suscribirse a las notificaciones del outbox"""
+        try:
+            self._listener = await self.db_pool.acquire()
+            await self._listener.add_listener(UPLOAD_OUTBOX_CHANNEL, self._on_notify)
+        except Exception:
+            log.warning("Upload outbox LISTEN unavailable, falling back to polling", exc_info=True)
+            if self._listener is not None:
+                await self.db_pool.release(self._listener)
+                self._listener = None
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Detener el bucle y esperar (con límite) a las subidas en curso"""
+        self._stopping.set()
+        self._wake.set()
+        if self._runner is not None:
+            await self._runner
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+        if self._listener is not None:
+            try:
+                await self._listener.remove_listener(UPLOAD_OUTBOX_CHANNEL, self._on_notify)
+            finally:
+                await self.db_pool.release(self._listener)
+                self._listener = None
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.clear()
+            free = self.concurrency - len(self._tasks)
+            if free > 0:
+                try:
+                    jobs = await self._claim(free)
+                except Exception:
+                    log.error("Error claiming uploads from outbox", exc_info=True)
+                    jobs = []
+                for job in jobs:
+                    task = asyncio.create_task(self._process(job))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._task_done)
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._wake.set()
+
+    async def _claim(self, limit: int) -> List[UploadJob]:
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(CLAIM_SQL, limit, self.timeout * 2)
+        return [
+            UploadJob(
+                upload_id=row["upload_id"],
+                kind=row["kind"],
+                filename=row["filename"],
+                mime_type=row["mime_type"],
+                content=bytes(row["content"] or b""),
+                target=json.loads(row["target"]) if isinstance(row["target"], str) else (row["target"] or {}),
+                attempts=row["attempts"],
+                result=json.loads(row["result"]) if isinstance(row["result"], str) else row["result"],
+            )
+            for row in rows
+        ]
+
+    async def _process(self, job: UploadJob) -> None:
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"Tipo de subida desconocido: {job.kind}")
+            result = await asyncio.wait_for(handler(job), timeout=self.timeout)
+        except Exception as e:
+            delay = backoff_delay(job.attempts, self.backoff_base, self.backoff_max)
+            log.warning(
+                "Upload %s (%s) failed on attempt %s, retrying in %.0fs: %s",
+                job.upload_id, job.kind, job.attempts, delay, e,
+            )
+            await self._execute(FAIL_SQL, job.upload_id, str(e)[:2000], self.max_attempts, delay)
+            return
+
+        await self._execute(COMPLETE_SQL, job.upload_id, json.dumps(result or {}, default=str))
+
+    async def _execute(self, query: str, *args) -> None:
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.execute(query, *args)
+        except Exception:
+            # La fila vuelve a estar disponible cuando expire locked_until
+            log.error("Error updating upload outbox row %s", args[0], exc_info=True)
@@ -0,0 +1,149 @@
+"""Manejadores de cada tipo de subida del outbox."""
+
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import execute
+from app.uploads.dispatcher import UploadJob
+from app.uploads.models import UPLOAD_CONTRACT_DOCUMENT, UPLOAD_PAYMENT_RECEIPT, UPLOAD_PAYMENT_VOUCHER
+from app.uploads.outbox import save_progress
+
+log = logging.getLogger(__name__)
+
+
+class UploadFailed(Exception):
+    """La subida no se completó y debe reintentarse"""
+
+
+class _InMemoryUpload:
+    """Objeto con la interfaz de UploadFile que usa PaymentImageService"""
+
+    def __init__(self, content: bytes, filename: str, content_type: str):
+        self.content = content
+        self.filename = filename
+        self.content_type = content_type
+        self.size = len(content)
+
+    async def read(self) -> bytes:
+        return self.content
+
+
+async def _upload_payment_file(job: UploadJob, reference: str) -> Dict[str, Any]:
+    from app.loan_payments.payment_image_service import PaymentImageService
+
+    image_service = PaymentImageService(Path(settings.CONTRACTS_DIR))
+    result = await image_service.upload_payment_image(
+        str(job.target["contract_loan_id"]),
+        reference,
+        _InMemoryUpload(job.content, job.filename, job.mime_type),
+        None,
+        file_bytes=job.content,
+    )
+    if not result.get("url"):
+        raise UploadFailed("El almacenamiento no devolvió la URL del archivo")
+    return result
+
+
+async def _patch_transactions(column: str, url: str, transaction_ids: List[str]) -> None:
+    """Actualizar la URL en public.payment_transaction por transaction_id (UUID)"""
+    if not url or not transaction_ids:
+        return
+    await execute(
+        text(f"UPDATE public.payment_transaction SET {column} = :url WHERE transaction_id = ANY(CAST(:tx_ids AS uuid[]))")
+        .bindparams(url=url, tx_ids=[str(tx_id) for tx_id in transaction_ids]),
+        commit_after=True,
+    )
+
+
+async def upload_payment_voucher(job: UploadJob) -> Dict[str, Any]:
+    """
+    Subir el voucher del pago y guardar su URL en url_bank_receipt.
+
+    Como en los recibos, el resultado de la subida se guarda con save_progress
+    antes de actualizar las transacciones: un reintento no vuelve a subir el archivo.
+    """
+    uploaded = job.result if job.result and job.result.get("url") else None
+    if uploaded is None:
+        result = await _upload_payment_file(job, job.target.get("reference") or Path(job.filename).stem)
+        uploaded = {"url": result["url"], "storage_type": result.get("storage_type"), "drive_file_id": result.get("drive_file_id")}
+        await save_progress(job.upload_id, result=uploaded)
+
+    await _patch_transactions("url_bank_receipt", uploaded["url"], job.target.get("transaction_ids", []))
+    return uploaded
+
+
+async def upload_payment_receipt(job: UploadJob) -> Dict[str, Any]:
+    """
+    Subir el recibo y guardar su URL en url_payment_receipt.
+
+    Los recibos diferidos llegan sin contenido y con los datos del pago en
+    target["payment"]: se renderizan aquí. Cada paso terminado se guarda con
+    save_progress, así un reintento no vuelve a renderizar ni a subir.
+    """
+    if not job.content:
+        from app.receipts.receipt_schemas import ReceiptMode
+        from app.receipts.render_pool import receipt_render_pool
+
+        rendered = await receipt_render_pool.render(job.target["payment"], ReceiptMode.LINK)
+        job.content = rendered.image_bytes
+        await save_progress(job.upload_id, content=job.content)
+
+    uploaded = job.result if job.result and job.result.get("url") else None
+    if uploaded is None:
+        result = await _upload_payment_file(job, f"receipt_{job.target['receipt_id']}")
+        uploaded = {"url": result["url"], "storage_type": result.get("storage_type"), "drive_file_id": result.get("drive_file_id")}
+        await save_progress(job.upload_id, result=uploaded)
+
+    await _patch_transactions("url_payment_receipt", uploaded["url"], job.target.get("transaction_ids", []))
+    return uploaded
+
+
+async def upload_contract_document(job: UploadJob) -> Dict[str, Any]:
+    """Guardar el documento del contrato en su backend y sus enlaces en el contrato"""
+    from app.contracts.config import ContractConfig
+    from app.contracts.models import contract
+    from app.contracts.services.contract_file_service import ContractFileService
+    from app.contracts.services.contract_metadata_service import ContractMetadataService
+    from app.contracts.services.drive_folder_cache import DriveFolders, drive_folder_cache
+    from app.storage import get_document_store
+
+    file_service = ContractFileService(ContractConfig.CONTRACTS_DIR, get_document_store(job.target.get("backend")))
+    result = await file_service.save_contract_document(job.target["document_id"], job.content)
+    await ContractMetadataService().set_file_path(job.target["document_id"], result["path"])
+
+    contract_id = job.target["contract_id"]
+    await execute(
+        contract.update().where(contract.c.contract_id == contract_id).values(
+            file_path=result["path"],
+            folder_path=result["folder_path"],
+            updated_at=datetime.now(),
+        ),
+        commit_after=True,
+    )
+    if result.get("drive_folder_id"):
+        await drive_folder_cache.save(DriveFolders(
+            contract_id=str(contract_id),
+            folder_path=result["folder_path"],
+            contract_folder_id=result["drive_folder_id"],
+            folder_name=job.target["document_id"],
+        ))
+    else:
+        drive_folder_cache.invalidate(str(contract_id))
+    return {
+        "storage_type": result["storage_type"],
+        "path": result["path"],
+        "folder_path": result["folder_path"],
+        "drive_file_id": result.get("drive_file_id"),
+    }
+
+
+UPLOAD_HANDLERS = {
+    UPLOAD_CONTRACT_DOCUMENT: upload_contract_document,
+    UPLOAD_PAYMENT_VOUCHER: upload_payment_voucher,
+    UPLOAD_PAYMENT_RECEIPT: upload_payment_receipt,
+}
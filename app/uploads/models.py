@@ -0,0 +1,40 @@
+from sqlalchemy import (
+    TIMESTAMP, BigInteger, Column, Integer, LargeBinary, String, Table, Text, text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.database import metadata
+
+# Tipos de subida
+UPLOAD_CONTRACT_DOCUMENT = "contract_document"
+UPLOAD_PAYMENT_VOUCHER = "payment_voucher"
+UPLOAD_PAYMENT_RECEIPT = "payment_receipt"
+
+# Estados
+UPLOAD_PENDING = "pending"
+UPLOAD_PROCESSING = "processing"
+UPLOAD_DONE = "done"
+UPLOAD_FAILED = "failed"
+
+# Canal LISTEN/NOTIFY para despertar al despachador al confirmar la transacción
+UPLOAD_OUTBOX_CHANNEL = "upload_outbox"
+
+# Tabla upload_outbox (subidas pendientes a Google Drive)
+upload_outbox = Table(
+    "upload_outbox",
+    metadata,
+    Column("upload_id", BigInteger, primary_key=True),
+    Column("kind", String(30), nullable=False),
+    Column("status", String(20), nullable=False, server_default=text("'pending'")),
+    Column("filename", String(255), nullable=False),
+    Column("mime_type", String(100), nullable=False),
+    Column("content", LargeBinary),
+    Column("target", JSONB, nullable=False, server_default=text("'{}'::jsonb")),
+    Column("result", JSONB),
+    Column("attempts", Integer, nullable=False, server_default=text("0")),
+    Column("last_error", Text),
+    Column("next_attempt_at", TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP")),
+    Column("locked_until", TIMESTAMP),
+    Column("created_at", TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP")),
+    Column("updated_at", TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP")),
+)
@@ -0,0 +1,56 @@
+import json
+from typing import Any, Dict, Optional, Union
+
+from sqlalchemy import func, text
+
+from app.database import execute
+
+from app.uploads.models import UPLOAD_OUTBOX_CHANNEL, upload_outbox
+
+
+async def enqueue_upload(
+    db,
+    kind: str,
+    content: Optional[Union[bytes, bytearray, memoryview]],
+    filename: str,
+    mime_type: str,
+    target: Optional[Dict[str, Any]] = None,
+) -> int:
+    """
+    Registrar una subida pendiente en la transacción actual de db.
+
+    No hace commit: la fila (y la notificación al despachador) solo son visibles
+    cuando el llamador confirma la operación de negocio. content puede ser None
+    si el manejador lo genera al procesar la subida (recibos diferidos).
+    """
+    query = upload_outbox.insert().values(
+        kind=kind,
+        filename=filename,
+        mime_type=mime_type,
+        content=bytes(content) if content is not None else None,
+        # Normalizar a JSON (UUID, Decimal, fechas) antes de guardarlo como JSONB
+        target=json.loads(json.dumps(target or {}, default=str)),
+    ).returning(upload_outbox.c.upload_id)
+
+    result = await db.execute(query)
+    upload_id = result.scalar_one()
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": UPLOAD_OUTBOX_CHANNEL, "payload": str(upload_id)})
+    return upload_id
+
+
+async def save_progress(upload_id: int, content: Optional[bytes] = None, result: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Guardar lo ya hecho por una subida en curso (contenido generado, resultado parcial).
+
+    Si el intento falla después, el reintento lo recibe en UploadJob.content /
+    UploadJob.result y no repite esos pasos.
+    """
+    values: Dict[str, Any] = {"updated_at": func.now()}
+    if content is not None:
+        values["content"] = content
+    if result is not None:
+        values["result"] = json.loads(json.dumps(result, default=str))
+    await execute(
+        upload_outbox.update().where(upload_outbox.c.upload_id == upload_id).values(**values),
+        commit_after=True,
+    )
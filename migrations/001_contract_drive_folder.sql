@@ -0,0 +1,17 @@
+-- Ids de carpetas de Google Drive por contrato (carpeta del contrato, attachments y payments).
+-- Evita resolver o crear carpetas en cada subida de vouchers y recibos.
+CREATE TABLE IF NOT EXISTS public.contract_drive_folder (
+    contract_id           UUID PRIMARY KEY REFERENCES public.contract (contract_id) ON DELETE CASCADE,
+    folder_path           TEXT,
+    contract_folder_id    VARCHAR(128),
+    attachments_folder_id VARCHAR(128),
+    payments_folder_id    VARCHAR(128),
+    updated_at            TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Contratos existentes cuyo folder_path ya es un enlace de Drive
+INSERT INTO public.contract_drive_folder (contract_id, folder_path, contract_folder_id)
+SELECT contract_id, folder_path, regexp_replace(folder_path, '^.*/', '')
+FROM public.contract
+WHERE folder_path LIKE 'http%'
+ON CONFLICT (contract_id) DO NOTHING;
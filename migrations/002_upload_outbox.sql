@@ -0,0 +1,25 @@
+-- Outbox de subidas a Google Drive (documentos de contrato, vouchers y recibos).
+-- Las filas se insertan en la transacción de la operación de negocio y las procesa
+-- el despachador en segundo plano (app/uploads/dispatcher.py).
+CREATE TABLE IF NOT EXISTS public.upload_outbox (
+    upload_id       BIGSERIAL PRIMARY KEY,
+    kind            VARCHAR(30)  NOT NULL,
+    status          VARCHAR(20)  NOT NULL DEFAULT 'pending',
+    filename        VARCHAR(255) NOT NULL,
+    mime_type       VARCHAR(100) NOT NULL,
+    content         BYTEA,
+    target          JSONB        NOT NULL DEFAULT '{}'::jsonb,
+    result          JSONB,
+    attempts        INTEGER      NOT NULL DEFAULT 0,
+    last_error      TEXT,
+    next_attempt_at TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until    TIMESTAMP,
+    created_at      TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at      TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT upload_outbox_status_check CHECK (status IN ('pending', 'processing', 'done', 'failed'))
+);
+
+-- Solo las filas pendientes o en curso se consultan al reclamar trabajo
+CREATE INDEX IF NOT EXISTS idx_upload_outbox_due
+    ON public.upload_outbox (next_attempt_at)
+    WHERE status IN ('pending', 'processing');
@@ -0,0 +1,36 @@
+-- Índice de documentos de contrato y su historial de versiones (sustituye a metadata.json).
+-- document_id es el identificador de carpeta en el almacenamiento (contract_<número>).
+-- Los metadata.json existentes se importan con:
+--     python scripts/import_contract_metadata.py [--dir app/generated_contracts]
+CREATE TABLE IF NOT EXISTS public.contract_document (
+    document_id     VARCHAR(120) PRIMARY KEY,
+    contract_number VARCHAR(100) NOT NULL,
+    version         INTEGER      NOT NULL DEFAULT 1,
+    storage_type    VARCHAR(20)  NOT NULL DEFAULT 'local',
+    file_path       TEXT,
+    original_data   JSONB        NOT NULL DEFAULT '{}'::jsonb,
+    created_at      TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    modified_at     TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT contract_document_version_check CHECK (version >= 1)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_contract_document_number
+    ON public.contract_document (contract_number);
+CREATE INDEX IF NOT EXISTS idx_contract_document_modified_at
+    ON public.contract_document (modified_at);
+CREATE INDEX IF NOT EXISTS idx_contract_document_created_at
+    ON public.contract_document (created_at);
+
+-- Una fila por versión generada; la PK permite leer cualquier versión por índice
+CREATE TABLE IF NOT EXISTS public.contract_document_version (
+    document_id   VARCHAR(120) NOT NULL REFERENCES public.contract_document (document_id) ON DELETE CASCADE,
+    version       INTEGER      NOT NULL,
+    storage_type  VARCHAR(20)  NOT NULL,
+    file_path     TEXT,
+    original_data JSONB        NOT NULL DEFAULT '{}'::jsonb,
+    created_at    TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (document_id, version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_contract_document_version_created_at
+    ON public.contract_document_version (created_at);
@@ -0,0 +1,4 @@
+-- Manifiesto del último render de cada documento (párrafos, variables que leen y
+-- tiempos). Permite regenerar solo lo afectado al modificar un contrato.
+ALTER TABLE public.contract_document
+    ADD COLUMN IF NOT EXISTS render_manifest JSONB;
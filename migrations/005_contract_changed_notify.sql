@@ -0,0 +1,109 @@
+-- Notificar (canal contract_changed, payload contract_id) cualquier cambio que afecte al
+-- detalle de un contrato, para invalidar el cache de /contracts/{id}/detail
+-- (app/contracts/services/contract_detail_cache.py). Postgres entrega las notificaciones
+-- al confirmar la transacción y descarta duplicados dentro de la misma transacción.
+
+-- Tablas con contract_id propio
+CREATE OR REPLACE FUNCTION public.fn_notify_contract_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM pg_notify('contract_changed', OLD.contract_id::text);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM pg_notify('contract_changed', NEW.contract_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Cuotas: contrato a través del préstamo
+CREATE OR REPLACE FUNCTION public.fn_notify_payment_schedule_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('contract_changed', cl.contract_id::text)
+    FROM public.contract_loan cl
+    WHERE cl.contract_loan_id IN (
+        CASE WHEN TG_OP <> 'INSERT' THEN OLD.contract_loan_id END,
+        CASE WHEN TG_OP <> 'DELETE' THEN NEW.contract_loan_id END
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transacciones de pago: contrato a través de la cuota y el préstamo
+CREATE OR REPLACE FUNCTION public.fn_notify_payment_transaction_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('contract_changed', cl.contract_id::text)
+    FROM public.payment_schedule ps
+    JOIN public.contract_loan cl ON cl.contract_loan_id = ps.contract_loan_id
+    WHERE ps.payment_schedule_id IN (
+        CASE WHEN TG_OP <> 'INSERT' THEN OLD.payment_schedule_id END,
+        CASE WHEN TG_OP <> 'DELETE' THEN NEW.payment_schedule_id END
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Personas y propiedades: todos los contratos en los que participan
+CREATE OR REPLACE FUNCTION public.fn_notify_person_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('contract_changed', cp.contract_id::text)
+    FROM public.contract_participant cp
+    WHERE cp.person_id = OLD.person_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.fn_notify_property_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('contract_changed', cp.contract_id::text)
+    FROM public.contract_property cp
+    WHERE cp.property_id = OLD.property_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.contract;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.contract
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_contract_changed();
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.contract_participant;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.contract_participant
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_contract_changed();
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.contract_loan;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.contract_loan
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_contract_changed();
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.contract_property;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.contract_property
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_contract_changed();
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.contract_bank_account;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.contract_bank_account
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_contract_changed();
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.payment_schedule;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.payment_schedule
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_payment_schedule_changed();
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.payment_transaction;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.payment_transaction
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_payment_transaction_changed();
+
+-- Personas y propiedades solo cambian por UPDATE mientras están vinculadas a un contrato
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.person;
+CREATE TRIGGER trg_contract_changed
+    AFTER UPDATE ON public.person
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_person_changed();
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.property;
+CREATE TRIGGER trg_contract_changed
+    AFTER UPDATE ON public.property
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_property_changed();
@@ -0,0 +1,20 @@
+-- Índices del listado paginado por cursor (GET /contracts/list).
+-- El orden es (contract_date DESC, contract_id DESC); cada filtro tiene un índice
+-- que empieza por su columna y sigue con la clave de orden.
+CREATE INDEX IF NOT EXISTS idx_contract_list_order
+    ON public.contract (contract_date DESC, contract_id DESC);
+CREATE INDEX IF NOT EXISTS idx_contract_list_service
+    ON public.contract (contract_service_id, contract_date DESC, contract_id DESC);
+CREATE INDEX IF NOT EXISTS idx_contract_list_inactive
+    ON public.contract (contract_date DESC, contract_id DESC)
+    WHERE is_active IS FALSE;
+
+-- Participantes por contrato y rol (nombre del cliente/inversionista) y contratos de una persona
+CREATE INDEX IF NOT EXISTS idx_contract_participant_contract_type
+    ON public.contract_participant (contract_id, person_type_id);
+CREATE INDEX IF NOT EXISTS idx_contract_participant_person
+    ON public.contract_participant (person_id);
+
+-- Préstamo del contrato
+CREATE INDEX IF NOT EXISTS idx_contract_loan_contract
+    ON public.contract_loan (contract_id, contract_loan_id);
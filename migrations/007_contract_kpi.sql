@@ -0,0 +1,41 @@
+-- KPIs precalculados de préstamos (app/contracts/services/contract_kpi_service.py).
+-- contract_kpi tiene una fila por préstamo y se recalcula al registrar pagos;
+-- contract_kpi_portfolio guarda los totales de la cartera por moneda y se ajusta
+-- con la diferencia de cada recálculo. La actualización periódica reconstruye ambas.
+CREATE TABLE IF NOT EXISTS public.contract_kpi (
+    contract_loan_id      INTEGER       PRIMARY KEY REFERENCES public.contract_loan (contract_loan_id) ON DELETE CASCADE,
+    contract_id           UUID          NOT NULL,
+    currency              VARCHAR(3)    NOT NULL,
+    loan_amount           NUMERIC(15,2) NOT NULL DEFAULT 0,
+    total_paid            NUMERIC(15,2) NOT NULL DEFAULT 0,
+    outstanding_principal NUMERIC(15,2) NOT NULL DEFAULT 0,
+    pending_interest      NUMERIC(15,2) NOT NULL DEFAULT 0,
+    total_pending         NUMERIC(15,2) NOT NULL DEFAULT 0,
+    payments_made         INTEGER       NOT NULL DEFAULT 0,
+    payments_total        INTEGER       NOT NULL DEFAULT 0,
+    overdue_payments      INTEGER       NOT NULL DEFAULT 0,
+    refreshed_at          TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_contract_kpi_contract
+    ON public.contract_kpi (contract_id);
+
+CREATE TABLE IF NOT EXISTS public.contract_kpi_portfolio (
+    currency              VARCHAR(3)    PRIMARY KEY,
+    contracts             INTEGER       NOT NULL DEFAULT 0,
+    loan_amount           NUMERIC(18,2) NOT NULL DEFAULT 0,
+    total_paid            NUMERIC(18,2) NOT NULL DEFAULT 0,
+    outstanding_principal NUMERIC(18,2) NOT NULL DEFAULT 0,
+    pending_interest      NUMERIC(18,2) NOT NULL DEFAULT 0,
+    total_pending         NUMERIC(18,2) NOT NULL DEFAULT 0,
+    payments_made         BIGINT        NOT NULL DEFAULT 0,
+    payments_total        BIGINT        NOT NULL DEFAULT 0,
+    overdue_payments      BIGINT        NOT NULL DEFAULT 0,
+    refreshed_at          TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Cuotas y transacciones por préstamo (agregados del recálculo)
+CREATE INDEX IF NOT EXISTS idx_payment_schedule_loan
+    ON public.payment_schedule (contract_loan_id);
+CREATE INDEX IF NOT EXISTS idx_payment_transaction_schedule
+    ON public.payment_transaction (payment_schedule_id);
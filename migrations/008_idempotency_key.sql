@@ -0,0 +1,25 @@
+-- Respuestas de los endpoints de pago por Idempotency-Key (app/idempotency/service.py).
+-- La clave se reserva antes de ejecutar el pago y se completa con la respuesta; un
+-- reintento con la misma clave y la misma petición recibe la respuesta guardada sin
+-- volver a ejecutar el pago. Las peticiones concurrentes con la misma clave se
+-- serializan con un advisory lock. Las filas caducan tras IDEMPOTENCY_TTL_SECONDS.
+CREATE TABLE IF NOT EXISTS public.idempotency_key (
+    scope            VARCHAR(100)  NOT NULL,
+    endpoint         VARCHAR(100)  NOT NULL,
+    idempotency_key  VARCHAR(255)  NOT NULL,
+    request_hash     CHAR(64)      NOT NULL,
+    -- NULL mientras la operación está en curso: un reintento recibe 409, no se repite el pago
+    status_code      INTEGER,
+    response         JSONB,
+    created_at       TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (scope, endpoint, idempotency_key)
+);
+
+-- Bases creadas con la primera versión de esta migración (respuesta obligatoria)
+ALTER TABLE public.idempotency_key
+    ALTER COLUMN status_code DROP NOT NULL,
+    ALTER COLUMN response DROP NOT NULL;
+
+-- Purga de claves caducadas
+CREATE INDEX IF NOT EXISTS idx_idempotency_key_created
+    ON public.idempotency_key (created_at);
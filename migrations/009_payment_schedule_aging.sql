@@ -0,0 +1,15 @@
+-- Morosidad de las cuotas (app/loan_payments/aging.py).
+-- Un job periódico marca como overdue las cuotas pending vencidas y mantiene aging_bucket
+-- (tramo de días de atraso: 1-30, 31-60, 61-90, 90+; NULL si la cuota está al día o pagada)
+-- con un único UPDATE por ejecución que solo toca las filas que cambian de estado o de tramo.
+ALTER TABLE public.payment_schedule
+    ADD COLUMN IF NOT EXISTS aging_bucket VARCHAR(10);
+
+-- Candidatas del job (cuotas vencidas no pagadas) y consultas de morosidad por fecha y estado
+CREATE INDEX IF NOT EXISTS idx_payment_schedule_due_status
+    ON public.payment_schedule (due_date, payment_status);
+
+-- Cuotas con tramo de atraso (el job las revisa siempre, para limpiar las ya pagadas)
+CREATE INDEX IF NOT EXISTS idx_payment_schedule_aging
+    ON public.payment_schedule (aging_bucket, due_date)
+    WHERE aging_bucket IS NOT NULL;
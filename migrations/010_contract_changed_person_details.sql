@@ -0,0 +1,24 @@
+-- Documentos y direcciones de los participantes también forman parte de
+-- /contracts/{id}/detail: notificar contract_changed (ver 005_contract_changed_notify.sql)
+-- a todos los contratos de la persona al insertar, modificar o borrar cualquiera de ellos.
+CREATE OR REPLACE FUNCTION public.fn_notify_person_detail_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('contract_changed', cp.contract_id::text)
+    FROM public.contract_participant cp
+    WHERE cp.person_id IN (
+        CASE WHEN TG_OP <> 'INSERT' THEN OLD.person_id END,
+        CASE WHEN TG_OP <> 'DELETE' THEN NEW.person_id END
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.person_document;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.person_document
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_person_detail_changed();
+
+DROP TRIGGER IF EXISTS trg_contract_changed ON public.address;
+CREATE TRIGGER trg_contract_changed
+    AFTER INSERT OR UPDATE OR DELETE ON public.address
+    FOR EACH ROW EXECUTE FUNCTION public.fn_notify_person_detail_changed();
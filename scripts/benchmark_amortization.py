@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de amortización vectorizado (app/loan_payments/amortization.py).
+
+Mide cronogramas/segundo de compute_schedules con préstamos aleatorios
+(francés, flat y solo interés, con y sin pago final) y, por separado, el paso a
+filas de payment_schedule con importes Decimal.
+
+Uso:
+    python scripts/benchmark_amortization.py --schedules 10000 --rounds 5
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.loan_payments.amortization import FLAT, FRENCH, INTEREST_ONLY, ScheduleTerms, compute_schedules  # noqa: E402
+
+
+def sample_terms(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    terms = []
+    for i in range(count):
+        principal = Decimal(rng.randrange(100_000, 50_000_000)).scaleb(-2)
+        terms.append(ScheduleTerms(
+            principal=principal,
+            quotes=rng.choice((6, 12, 18, 24, 36, 48, 60)),
+            start_date=date(2025, rng.choice((1, 3, 5, 7, 8, 10, 12)), rng.randint(1, 31)),
+            monthly_rate=Decimal(rng.randrange(0, 500)).scaleb(-2),
+            method=rng.choice((FRENCH, FLAT, INTEREST_ONLY)),
+            final_payment=(principal * Decimal("0.3")).quantize(Decimal("0.01")) if rng.random() < 0.2 else Decimal(0),
+            contract_loan_id=i + 1,
+        ))
+    return terms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--schedules", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    terms = sample_terms(args.schedules)
+    compute_schedules(terms[:10])
+
+    compute_time = rows_time = 0.0
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        batch = compute_schedules(terms)
+        computed = time.perf_counter()
+        rows = batch.rows()
+        rows_time += time.perf_counter() - computed
+        compute_time += computed - started
+
+    total = args.schedules * args.rounds
+    print(f"{args.schedules} cronogramas ({len(rows)} cuotas) x {args.rounds} rondas")
+    print(f"  cálculo:         {total / compute_time:,.0f} cronogramas/s")
+    print(f"  cálculo + filas: {total / (compute_time + rows_time):,.0f} cronogramas/s")
+
+
+if __name__ == "__main__":
+    main()
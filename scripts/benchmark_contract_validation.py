@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la validación del payload de /contracts/generate-complete.
+
+Compara, sobre los JSON de contratos de tests/ y partiendo del cuerpo en bytes:
+  - antes: json.loads + el Dict[str, Any] que validaba FastAPI + las pasadas
+    escritas a mano de ContractValidator (datos, participantes, préstamo y
+    propiedades, cada una recorriendo el dict);
+  - después: parse_contract_payload (TypeAdapter compilado, una pasada).
+
+Uso:
+    python scripts/benchmark_contract_validation.py --iterations 20000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from pydantic import TypeAdapter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.contracts.validators import ContractValidator  # noqa: E402
+from app.contracts.validators.payload_validator import parse_contract_payload  # noqa: E402
+
+FASTAPI_BODY = TypeAdapter(Dict[str, Any])
+
+
+def load_fixtures() -> dict:
+    fixtures = {}
+    for path in sorted([*ROOT.glob("tests/*.json"), *ROOT.glob("tests/contracts/data/*.json")]):
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(data, dict) and "loan" in data:
+            fixtures[path.name] = json.dumps(data).encode()
+    return fixtures
+
+
+def hand_written(body: bytes) -> list:
+    data = FASTAPI_BODY.validate_python(json.loads(body))
+    errors = ContractValidator.validate_contract_data(data)
+    errors += ContractValidator.validate_participants(data)
+    if data.get("loan"):
+        errors += ContractValidator.validate_loan_data(data["loan"])
+    errors += ContractValidator.validate_property_data(data.get("properties") or [])
+    return errors
+
+
+def measure(validate, payload: bytes, iterations: int) -> float:
+    """Microsegundos por validación"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        validate(payload)
+    return (time.perf_counter() - started) * 1e6 / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'fixture':<45} {'antes (µs)':>12} {'después (µs)':>15}")
+    totals = [0.0, 0.0]
+    for name, payload in load_fixtures().items():
+        before = measure(hand_written, payload, args.iterations)
+        after = measure(parse_contract_payload, payload, args.iterations)
+        totals[0] += before
+        totals[1] += after
+        print(f"{name:<45} {before:>12.2f} {after:>15.2f}")
+    print(f"{'total':<45} {totals[0]:>12.2f} {totals[1]:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
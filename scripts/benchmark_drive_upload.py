@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark de subida de contratos a Google Drive contra el servidor falso.
+
+Compara el flujo serie (una llamada tras otra, como hacía upload_contract) con
+upload_contract_async (batch de subcarpetas + subidas concurrentes).
+
+Uso:
+    python scripts/benchmark_drive_upload.py --contracts 20 --attachments 3 --latency 0.05
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.contracts.gdrive_async import AsyncDriveClient  # noqa: E402
+from app.contracts.gdrive_service import GoogleDriveService  # noqa: E402
+from tests.contracts.fixtures.fake_drive import FakeDrive  # noqa: E402
+
+
+async def _token() -> str:
+    return "benchmark-token"
+
+
+async def upload_serial(client: AsyncDriveClient, contract_id: str, content: bytes, attachments: list) -> None:
+    folder_id = await client.create_folder(contract_id, "root")
+    attachments_id = await client.create_folder("attachments", folder_id)
+    await client.upload_bytes(content, folder_id, f"{contract_id}.docx", "application/octet-stream")
+    await client.upload_bytes(b"{}", folder_id, "metadata.json", "application/json")
+    for index, attachment in enumerate(attachments):
+        await client.upload_bytes(attachment, attachments_id, f"anexo_{index}.pdf", "application/pdf")
+
+
+async def run(args) -> None:
+    content = b"D" * args.size
+    workdir = Path("temp") / "drive_benchmark"
+    attachments_dir = workdir / "attachments"
+    attachments_dir.mkdir(parents=True, exist_ok=True)
+    attachments = []
+    for index in range(args.attachments):
+        data = b"P" * args.size
+        (attachments_dir / f"anexo_{index}.pdf").write_bytes(data)
+        attachments.append(data)
+    contract_path = workdir / "contract.docx"
+    contract_path.write_bytes(content)
+
+    for mode in ("serie", "async"):
+        fake = FakeDrive(latency=args.latency)
+        client = AsyncDriveClient(
+            _token,
+            base_url=args.base_url or "http://fake-drive",
+            upload_concurrency=args.upload_concurrency,
+            transport=None if args.base_url else httpx.ASGITransport(app=fake.app),
+        )
+        service = GoogleDriveService.__new__(GoogleDriveService)
+        service.main_folder_id = "root"
+        service._async_client = client
+        service._async_loop = asyncio.get_running_loop()
+
+        started = time.perf_counter()
+        for number in range(args.contracts):
+            contract_id = f"contract_BENCH-{number:06d}"
+            if mode == "serie":
+                await upload_serial(client, contract_id, content, attachments)
+            else:
+                result = await service.upload_contract_async(contract_id, contract_path, {"n": number})
+                if not result["drive_success"]:
+                    raise RuntimeError(result["drive_error"])
+        elapsed = time.perf_counter() - started
+        await client.aclose()
+
+        print(
+            f"{mode:>5}: {args.contracts} contratos en {elapsed:.2f}s "
+            f"({elapsed / args.contracts * 1000:.1f} ms/contrato, {args.contracts / elapsed:.2f} contratos/s)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de subidas a Google Drive")
+    parser.add_argument("--contracts", type=int, default=20)
+    parser.add_argument("--attachments", type=int, default=3)
+    parser.add_argument("--size", type=int, default=64 * 1024, help="Tamaño de cada archivo en bytes")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia simulada por petición (segundos)")
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--base-url", help="URL de un servidor falso externo (python -m tests.contracts.fixtures.fake_drive)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ Script para limpiar la base de datos de contratos y todas las tablas relacionada
 ESTRATEGIA DE LIMPIEZA:
 1. FASE 1 - Limpieza de tablas relacionadas con contratos (excepto personas):
    - Se limpian en orden inverso de dependencias para respetar foreign keys
-   - Orden: payment_transactions → payment_schedule → contract_loan → contract_participant → 
+   - Orden: payment_transaction → payment_schedule → contract_loan → contract_participant → 
             contract_bank_account → contract_property → contract → contracts → contract_paragraphs
    - También: property (si está relacionada con contratos)
 
@@ -43,7 +43,7 @@ if "sslmode" in str(settings.DATABASE_ASYNC_URL):
 
 # Tablas relacionadas con contratos (en orden de eliminación - de más dependiente a menos)
 CONTRACT_RELATED_TABLES = [
-    "payment_transactions",      # Depende de payment_schedule
+    "payment_transaction",       # Depende de payment_schedule
     "payment_schedule",          # Depende de contract_loan
     "contract_loan",             # Depende de contract
     "contract_participant",      # Depende de contract y person (person no se toca)
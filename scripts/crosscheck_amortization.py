@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Contrasta el motor de amortización con sp_generate_loan_payment_schedule.
+
+Para cada caso generado llama a la función SQL sobre un préstamo existente,
+lee las cuotas que escribió y las compara con las del motor en modo fixed
+(mismos parámetros). Todo ocurre en una transacción que se revierte al final:
+la base de datos no cambia.
+
+Uso:
+    python scripts/crosscheck_amortization.py --cases 200 [--contract-loan-id 12]
+"""
+import argparse
+import asyncio
+import random
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import select, text  # noqa: E402
+
+from app.contracts.models import contract_loan  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.loan_payments.amortization import build_schedule, terms_from_request  # noqa: E402
+from app.loan_payments.models import payment_schedule  # noqa: E402
+
+COMPARED = ("payment_number", "due_date", "capital_amount", "interest_amount", "amount_due", "balance")
+
+SP_SQL = text("""
+    SELECT public.sp_generate_loan_payment_schedule(
+        :contract_loan_id, :monthly_quotes, :monthly_amount, :interest_amount, :start_date,
+        :end_date, :last_payment_date, :last_principal, :last_interest
+    )
+""")
+
+
+def generated_case(rng: random.Random, contract_loan_id: int) -> SimpleNamespace:
+    quotes = rng.choice((1, 2, 6, 12, 24, 36))
+    start = date(2024, 1, 1) + timedelta(days=rng.randrange(730))
+    end = date(start.year + (start.month + quotes - 1) // 12, (start.month + quotes - 1) % 12 + 1, 1)
+    return SimpleNamespace(
+        contract_loan_id=contract_loan_id,
+        monthly_quotes=quotes,
+        monthly_amount=Decimal(rng.randrange(0, 500_000)).scaleb(-2),
+        interest_amount=Decimal(rng.randrange(0, 200_000)).scaleb(-2),
+        start_date=start,
+        end_date=end,
+        last_payment_date=end,
+        last_principal=Decimal(rng.randrange(0, 5_000_000)).scaleb(-2),
+        last_interest=Decimal(rng.randrange(0, 200_000)).scaleb(-2),
+    )
+
+
+def _differences(expected: list, stored: list) -> list:
+    if len(expected) != len(stored):
+        return [f"{len(stored)} cuotas en la BD, {len(expected)} en el motor"]
+    return [
+        f"cuota {row['payment_number']} {name}: BD={stored_row[name]} motor={row[name]}"
+        for row, stored_row in zip(expected, stored, strict=True)
+        for name in COMPARED
+        if stored_row[name] != row[name]
+    ]
+
+
+async def crosscheck(cases: int, contract_loan_id: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        try:
+            if contract_loan_id is None:
+                contract_loan_id = (await connection.execute(
+                    select(contract_loan.c.contract_loan_id).order_by(contract_loan.c.contract_loan_id).limit(1)
+                )).scalar()
+                if contract_loan_id is None:
+                    print("No hay préstamos en contract_loan para el contraste")
+                    return 1
+
+            for number in range(1, cases + 1):
+                case = generated_case(rng, contract_loan_id)
+                savepoint = await connection.begin_nested()
+                await connection.execute(
+                    payment_schedule.delete().where(payment_schedule.c.contract_loan_id == contract_loan_id)
+                )
+                await connection.execute(SP_SQL, vars(case))
+                stored = (await connection.execute(
+                    select(payment_schedule)
+                    .where(payment_schedule.c.contract_loan_id == contract_loan_id)
+                    .order_by(payment_schedule.c.payment_number)
+                )).mappings().all()
+                await savepoint.rollback()
+
+                differences = _differences(build_schedule(terms_from_request(case)), stored)
+                if differences:
+                    failures += 1
+                    print(f"Caso {number} ({case.monthly_quotes} cuotas desde {case.start_date}):")
+                    for line in differences[:5]:
+                        print(f"  {line}")
+        finally:
+            await transaction.rollback()
+
+    print(f"{cases - failures}/{cases} casos coinciden con sp_generate_loan_payment_schedule")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--contract-loan-id", type=int, default=None, help="Préstamo sobre el que se prueba (por defecto el primero)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(crosscheck(args.cases, args.contract_loan_id, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
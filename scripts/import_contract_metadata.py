@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Importar los metadata.json de las carpetas de contratos a contract_document
+y contract_document_version (migrations/003_contract_document.sql).
+
+Es idempotente: un documento ya registrado con una versión igual o mayor no se toca.
+
+Uso:
+    python scripts/import_contract_metadata.py --dir app/generated_contracts [--dry-run]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.contracts.services.contract_metadata_service import ContractMetadataService  # noqa: E402
+from app.storage.registry import DEFAULT_LOCAL_DIR  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def find_metadata_files(contracts_dir: Path) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+    """(metadata, ruta del documento) de cada carpeta contract_*/metadata.json válida"""
+    for metadata_file in sorted(contracts_dir.glob("*/metadata.json")):
+        folder = metadata_file.parent
+        try:
+            metadata = json.loads(metadata_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Metadata ilegible en %s: %s", metadata_file, e)
+            continue
+        # El id de carpeta manda: algunos metadata antiguos guardan otro contract_id
+        metadata["contract_id"] = folder.name
+        document = next((p for p in (folder / f"{folder.name.replace('contract_', '', 1)}.docx",
+                                     folder / f"{folder.name}.docx") if p.exists()), None)
+        yield metadata, str(document) if document else None
+
+
+async def run(args) -> None:
+    from app.database import engine
+
+    contracts_dir = Path(args.dir)
+    found = list(find_metadata_files(contracts_dir))
+    logger.info("%s metadata.json encontrados en %s", len(found), contracts_dir)
+    if args.dry_run:
+        for metadata, document in found:
+            logger.info("%s v%s %s", metadata["contract_id"], metadata.get("version", 1), document or "(sin documento)")
+        return
+
+    service = ContractMetadataService()
+    # Una sola transacción: o se importa todo o nada
+    async with engine.begin() as connection:
+        for metadata, document in found:
+            await service.import_metadata(metadata, document, connection=connection)
+    await engine.dispose()
+    logger.info("Importados %s contratos", len(found))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importar metadata.json de contratos a la BD")
+    parser.add_argument("--dir", default=str(DEFAULT_LOCAL_DIR), help="Carpeta con las carpetas contract_*")
+    parser.add_argument("--dry-run", action="store_true", help="Solo listar lo que se importaría")
+    asyncio.run(run(parser.parse_args()))
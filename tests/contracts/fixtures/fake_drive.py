@@ -0,0 +1,251 @@
+"""
+Servidor falso de Google Drive (API REST v3) para pruebas y benchmarks.
+
+Implementa lo que usa AsyncDriveClient: creación, búsqueda, descarga (con Range)
+y actualización de archivos y carpetas, permisos, subidas multipart y
+reanudables, y peticiones batch. Puede usarse en
+proceso con httpx.ASGITransport o levantarse como servidor local:
+
+    python -m tests.contracts.fixtures.fake_drive --port 8765 --latency 0.05
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+class FakeDrive:
+    """Estado en memoria del Drive falso y su aplicación ASGI"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # Ids borrados: crear dentro de ellos responde 404, como Drive
+        self.deleted: set = set()
+        self.permissions: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self.app = Starlette(routes=[
+            Route("/drive/v3/files", self._create_file, methods=["POST"]),
+            Route("/drive/v3/files", self._list_files, methods=["GET"]),
+            Route("/drive/v3/files/{file_id}", self._get_file, methods=["GET"]),
+            Route("/drive/v3/files/{file_id}/permissions", self._create_permission, methods=["POST"]),
+            Route("/upload/drive/v3/files", self._upload, methods=["POST", "PUT"]),
+            Route("/upload/drive/v3/files/{file_id}", self._update_media, methods=["PATCH"]),
+            Route("/batch/drive/v3", self._batch, methods=["POST"]),
+        ])
+
+    def children(self, parent_id: str) -> List[Dict[str, Any]]:
+        return [f for f in self.files.values() if parent_id in f.get("parents", [])]
+
+    def find(self, name: str, parent_id: str) -> Dict[str, Any]:
+        return next(f for f in self.children(parent_id) if f["name"] == name)
+
+    def delete(self, file_id: str) -> None:
+        """Borrar un archivo o carpeta (y su contenido) fuera de la aplicación"""
+        for child in self.children(file_id):
+            self.delete(child["id"])
+        self.files.pop(file_id, None)
+        self.deleted.add(file_id)
+
+    def _missing_parent(self, metadata: Dict[str, Any]):
+        missing = [p for p in metadata.get("parents", []) if p in self.deleted]
+        if missing:
+            return JSONResponse({"error": {"code": 404, "message": f"File not found: {missing[0]}"}}, status_code=404)
+        return None
+
+    async def _simulate(self, request: Request) -> None:
+        self.requests.append((request.method, request.url.path))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    @staticmethod
+    def _set_content(record: Dict[str, Any], content: bytes) -> None:
+        record.update(
+            content=content,
+            size=str(len(content)),
+            md5Checksum=hashlib.md5(content).hexdigest(),
+            modifiedTime=datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        )
+
+    @staticmethod
+    def _public(record: Dict[str, Any]) -> Dict[str, Any]:
+        file_id = record["id"]
+        return {
+            **{k: v for k, v in record.items() if k != "content"},
+            "webViewLink": f"https://drive.google.com/file/d/{file_id}/view?usp=drivesdk",
+            "webContentLink": f"https://drive.google.com/uc?id={file_id}&export=download",
+        }
+
+    def _store(self, metadata: Dict[str, Any], content: bytes = b"") -> Dict[str, Any]:
+        file_id = uuid.uuid4().hex
+        record = {
+            "id": file_id,
+            "name": metadata.get("name"),
+            "mimeType": metadata.get("mimeType", "application/octet-stream"),
+            "parents": metadata.get("parents", []),
+        }
+        self._set_content(record, content)
+        self.files[file_id] = record
+        return self._public(record)
+
+    async def _create_file(self, request: Request) -> Response:
+        await self._simulate(request)
+        metadata = await request.json()
+        return self._missing_parent(metadata) or JSONResponse(self._store(metadata))
+
+    async def _list_files(self, request: Request) -> Response:
+        """Soporta las consultas que genera AsyncDriveClient.find_child"""
+        await self._simulate(request)
+        query = request.query_params.get("q", "")
+        name = re.search(r"name='((?:[^'\\]|\\.)*)'", query)
+        parent = re.search(r"'([^']+)' in parents", query)
+        matches = [
+            f for f in self.files.values()
+            if (name is None or f["name"] == re.sub(r"\\(.)", r"\1", name.group(1)))
+            and (parent is None or parent.group(1) in f.get("parents", []))
+            and ("mimeType='" + FOLDER_MIME_TYPE not in query or f["mimeType"] == FOLDER_MIME_TYPE)
+            and ("mimeType!='" + FOLDER_MIME_TYPE not in query or f["mimeType"] != FOLDER_MIME_TYPE)
+        ]
+        return JSONResponse({"files": [self._public(f) for f in matches]})
+
+    async def _get_file(self, request: Request) -> Response:
+        await self._simulate(request)
+        record = self.files.get(request.path_params["file_id"])
+        if record is None:
+            return JSONResponse({"error": {"code": 404, "message": "File not found"}}, status_code=404)
+        if request.query_params.get("alt") != "media":
+            return JSONResponse(self._public(record))
+
+        content = record["content"]
+        range_header = request.headers.get("range")
+        if not range_header:
+            return Response(content, media_type=record["mimeType"])
+        start, _, end = range_header.split("=", 1)[1].partition("-")
+        start, end = int(start), min(int(end) if end else len(content) - 1, len(content) - 1)
+        return Response(
+            content[start:end + 1],
+            status_code=206,
+            media_type=record["mimeType"],
+            headers={"Content-Range": f"bytes {start}-{end}/{len(content)}"},
+        )
+
+    async def _update_media(self, request: Request) -> Response:
+        await self._simulate(request)
+        record = self.files.get(request.path_params["file_id"])
+        if record is None:
+            return JSONResponse({"error": {"code": 404, "message": "File not found"}}, status_code=404)
+        self._set_content(record, await request.body())
+        return JSONResponse(self._public(record))
+
+    def _add_permission(self, file_id: str, permission: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if file_id not in self.files:
+            return 404, {"error": {"code": 404, "message": "File not found"}}
+        self.permissions.setdefault(file_id, []).append(permission)
+        return 200, {"id": uuid.uuid4().hex, **permission}
+
+    async def _create_permission(self, request: Request) -> Response:
+        await self._simulate(request)
+        status_code, body = self._add_permission(request.path_params["file_id"], await request.json())
+        return JSONResponse(body, status_code=status_code)
+
+    async def _upload(self, request: Request) -> Response:
+        await self._simulate(request)
+        upload_type = request.query_params.get("uploadType")
+        body = await request.body()
+
+        if request.method == "POST" and upload_type == "multipart":
+            boundary = request.headers["content-type"].split("boundary=", 1)[1].encode()
+            parts = [p for p in body.split(b"--" + boundary) if p.strip() not in (b"", b"--")]
+            metadata = json.loads(parts[0].split(b"\r\n\r\n", 1)[1].strip())
+            media_headers, _, content = parts[1].partition(b"\r\n\r\n")
+            mime_type = media_headers.decode().split("Content-Type:", 1)[1].strip()
+            return self._missing_parent(metadata) or JSONResponse(self._store({"mimeType": mime_type, **metadata}, content[:-2]))
+
+        if request.method == "POST" and upload_type == "resumable":
+            missing = self._missing_parent(json.loads(body))
+            if missing is not None:
+                return missing
+            upload_id = uuid.uuid4().hex
+            self._sessions[upload_id] = {
+                "metadata": {"mimeType": request.headers.get("x-upload-content-type"), **json.loads(body)},
+                "total": int(request.headers["x-upload-content-length"]),
+                "content": bytearray(),
+            }
+            location = str(request.url.replace(query=f"uploadType=resumable&upload_id={upload_id}"))
+            return Response(status_code=200, headers={"Location": location})
+
+        session = self._sessions.get(request.query_params.get("upload_id", ""))
+        if request.method == "PUT" and session is not None:
+            session["content"].extend(body)
+            received = len(session["content"])
+            if received < session["total"]:
+                return Response(status_code=308, headers={"Range": f"bytes=0-{received - 1}"})
+            del self._sessions[request.query_params["upload_id"]]
+            return JSONResponse(self._store(session["metadata"], bytes(session["content"])))
+
+        return JSONResponse({"error": {"code": 400, "message": "Unsupported upload"}}, status_code=400)
+
+    async def _batch(self, request: Request) -> Response:
+        await self._simulate(request)
+        boundary = request.headers["content-type"].split("boundary=", 1)[1]
+        body = (await request.body()).decode("utf-8")
+
+        responses = []
+        for part in body.split(f"--{boundary}"):
+            part = part.strip()
+            if not part or part == "--":
+                continue
+            part_headers, _, http_request = part.partition("\r\n\r\n")
+            content_id = next(
+                line.split(":", 1)[1].strip().strip("<>")
+                for line in part_headers.split("\r\n") if line.lower().startswith("content-id")
+            )
+            request_line, _, rest = http_request.partition("\r\n")
+            _, _, payload = rest.partition("\r\n\r\n")
+            method, url, _ = request_line.split(" ", 2)
+            path = url.split("?", 1)[0]
+            self.requests.append((method, f"batch:{path}"))
+
+            if method == "POST" and path == "/drive/v3/files":
+                status_code, result = 200, self._store(json.loads(payload))
+            elif method == "POST" and path.endswith("/permissions"):
+                status_code, result = self._add_permission(path.split("/")[4], json.loads(payload))
+            else:
+                status_code, result = 404, {"error": {"code": 404, "message": "Not found"}}
+
+            responses.append(
+                f"--batch_response\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status_code} {'OK' if status_code < 400 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(result)}\r\n"
+            )
+        responses.append("--batch_response--")
+        return Response("".join(responses), media_type="multipart/mixed; boundary=batch_response")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor falso de Google Drive")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por petición (segundos)")
+    args = parser.parse_args()
+    uvicorn.run(FakeDrive(latency=args.latency).app, host="127.0.0.1", port=args.port)
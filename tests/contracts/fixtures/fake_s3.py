@@ -0,0 +1,82 @@
+"""
+Servidor falso compatible con S3 (URLs de estilo path) para pruebas y benchmarks.
+
+Implementa lo que usa S3DocumentStore: PUT, HEAD y GET (con Range) de objetos.
+Puede usarse en proceso con httpx.ASGITransport o levantarse como servidor local:
+
+    python -m tests.contracts.fixtures.fake_s3 --port 9000 --latency 0.01
+"""
+import argparse
+import asyncio
+import hashlib
+from email.utils import formatdate
+from typing import Any, Dict, List, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+
+class FakeS3:
+    """Estado en memoria del S3 falso y su aplicación ASGI"""
+
+    def __init__(self, latency: float = 0.0, require_auth: bool = False):
+        self.latency = latency
+        self.require_auth = require_auth
+        self.objects: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.authorizations: List[str] = []
+        self.app = Starlette(routes=[
+            Route("/{bucket}/{key:path}", self._object, methods=["PUT", "GET", "HEAD"]),
+        ])
+
+    async def _object(self, request: Request) -> Response:
+        self.requests.append((request.method, request.url.path))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        authorization = request.headers.get("authorization", "")
+        self.authorizations.append(authorization)
+        if self.require_auth and not authorization.startswith("AWS4-HMAC-SHA256 Credential="):
+            return Response(status_code=403)
+
+        location = (request.path_params["bucket"], request.path_params["key"])
+        if request.method == "PUT":
+            body = await request.body()
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            self.objects[location] = {
+                "content": body,
+                "content_type": request.headers.get("content-type", "application/octet-stream"),
+                "etag": etag,
+                "last_modified": formatdate(usegmt=True),
+            }
+            return Response(status_code=200, headers={"ETag": etag})
+
+        obj = self.objects.get(location)
+        if obj is None:
+            return Response(status_code=404)
+
+        content = obj["content"]
+        headers = {"ETag": obj["etag"], "Last-Modified": obj["last_modified"], "Accept-Ranges": "bytes"}
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(content))
+            return Response(status_code=200, headers=headers, media_type=obj["content_type"])
+
+        range_header = request.headers.get("range")
+        if range_header:
+            start, _, end = range_header.split("=", 1)[1].partition("-")
+            start, end = int(start), min(int(end) if end else len(content) - 1, len(content) - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+            return Response(content[start:end + 1], status_code=206, headers=headers, media_type=obj["content_type"])
+        return Response(content, headers=headers, media_type=obj["content_type"])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor falso compatible con S3")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por petición (segundos)")
+    args = parser.parse_args()
+    uvicorn.run(FakeS3(latency=args.latency).app, host="127.0.0.1", port=args.port)
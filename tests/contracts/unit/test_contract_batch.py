@@ -0,0 +1,144 @@
+"""
+Pruebas unitarias del pipeline de generación masiva de contratos
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from app.contracts.schemas import ContractResponse
+from app.contracts.services.contract_batch_service import (
+    BatchPayloadError,
+    BatchStageLimits,
+    ContractBatchService,
+    parse_contract_batch,
+)
+
+
+class FakeGenerationService:
+    def __init__(self):
+        self.rendering = 0
+        self.max_rendering = 0
+
+    async def render_contract(self, data, connection=None):
+        self.rendering += 1
+        self.max_rendering = max(self.max_rendering, self.rendering)
+        await asyncio.sleep(0.01)
+        self.rendering -= 1
+        return {"contract_id": f"contract_{data['contract_number']}"}
+
+    async def store_contract(self, rendered):
+        return {"success": True, "filename": f"{rendered['contract_id']}.docx", "path": "/tmp/x.docx"}
+
+
+class FakeCreationService:
+    def __init__(self):
+        self.counter = 0
+
+    async def persist_contract_payload(self, data, db, request, current_user, participant_service):
+        if data.get("fail_persist"):
+            raise HTTPException(400, detail={"message": "participantes inválidos"})
+        self.counter += 1
+        return {
+            "contract_id": f"uuid-{self.counter}",
+            "contract_number": f"CNT-{self.counter:06d}",
+            "participants_for_contract": [],
+            "participant_errors": [],
+            "processed_persons_summary": {},
+            "loan_property_result": None,
+        }
+
+    def build_generation_payload(self, data, persisted):
+        return {**data, "contract_number": persisted["contract_number"]}
+
+    async def update_contract_with_document_info(self, contract_id, document_result, db):
+        return None
+
+    def build_contract_response(self, data, persisted, document_result):
+        return ContractResponse(
+            success=True,
+            message="ok",
+            contract_id=str(persisted["contract_id"]),
+            contract_number=persisted["contract_number"],
+            filename=document_result["filename"],
+            path=document_result["path"],
+        )
+
+
+@asynccontextmanager
+async def fake_connection():
+    yield object()
+
+
+def _valid_payload():
+    return {
+        "clients": [{"person": {}}],
+        "investors": [{"person": {}}],
+        "notaries": [{"person": {}}],
+        "properties": [{}],
+        "paragraph_request": [{}],
+        "loan": {"amount": 1000},
+    }
+
+
+def _run_batch(payloads, limits=None):
+    generation = FakeGenerationService()
+    service = ContractBatchService(
+        SimpleNamespace(generation_service=generation),
+        participant_service=None,
+        creation_service=FakeCreationService(),
+        limits=limits or BatchStageLimits(render=1),
+        connection_factory=fake_connection,
+    )
+
+    async def collect():
+        return [event async for event in service.run(payloads, request=None, current_user="user")]
+
+    return asyncio.run(collect()), generation
+
+
+def test_parse_json_list_and_wrapper():
+    assert list(parse_contract_batch('[{"a": 1}, {"b": 2}]')) == [{"a": 1}, {"b": 2}]
+    assert list(parse_contract_batch(b'{"contracts": [{"a": 1}]}')) == [{"a": 1}]
+
+
+def test_parse_ndjson_reports_invalid_lines():
+    raw = '{"a": 1}\n\nnot json\n[1]\n{"b": 2}\n'
+    items = list(parse_contract_batch(raw, "application/x-ndjson"))
+    assert items[0] == {"a": 1}
+    assert isinstance(items[1], BatchPayloadError) and "Línea 3" in str(items[1])
+    assert isinstance(items[2], BatchPayloadError)
+    assert items[3] == {"b": 2}
+
+
+def test_parse_ndjson_without_content_type():
+    items = list(parse_contract_batch('{"a": 1}\n{"b": 2}\n'))
+    assert items == [{"a": 1}, {"b": 2}]
+
+
+def test_batch_reports_per_item_errors_and_summary():
+    payloads = [_valid_payload(), {"loan": {}}, {**_valid_payload(), "fail_persist": True}, _valid_payload()]
+    events, generation = _run_batch(payloads)
+
+    items = {e["index"]: e for e in events if e["event"] == "item"}
+    summary = events[-1]
+
+    assert summary["event"] == "summary"
+    assert summary["total"] == 4
+    assert summary["succeeded"] == 2
+    assert summary["failed"] == 2
+    assert items[0]["success"] and items[3]["success"]
+    assert items[1]["stage"] == "validate"
+    assert "missing_fields" in items[1]["error"]
+    assert items[2]["stage"] == "persist"
+    assert generation.max_rendering == 1
+    json.dumps(events)
+
+
+def test_batch_accepts_parse_errors_as_items():
+    events, _ = _run_batch(parse_contract_batch("nope\n", "application/x-ndjson"))
+    assert events[0]["success"] is False
+    assert events[0]["stage"] == "validate"
+    assert events[-1]["failed"] == 1
@@ -0,0 +1,111 @@
+"""
+Pruebas del cache de /contracts/{id}/detail
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.contracts.router import _detail_response
+from app.contracts.services.contract_detail_cache import (
+    ENTRY_OVERHEAD_BYTES, CachedDetail, ContractDetailCache, ContractDetailCacheListener, detail_etag,
+)
+
+
+def _entry(contract_id, number, size=100):
+    body = (contract_id.encode() * size)[:size]
+    return CachedDetail(contract_id, number, body, detail_etag(body))
+
+
+def _cache(max_entries=2):
+    cache = ContractDetailCache(max_bytes=max_entries * (100 + ENTRY_OVERHEAD_BYTES))
+    cache.enabled = True
+    return cache
+
+
+def test_lookup_by_uuid_or_number_and_byte_bounded_eviction():
+    cache = _cache()
+    cache.put(_entry("a", "CNT-A"), cache.generation)
+    cache.put(_entry("b", "CNT-B"), cache.generation)
+    assert cache.get("CNT-A").contract_id == "a"
+
+    # "a" es el más reciente: al entrar "c" se desaloja "b"
+    cache.put(_entry("c", "CNT-C"), cache.generation)
+    assert cache.get("b") is None and cache.get("CNT-B") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size == 2 * (100 + ENTRY_OVERHEAD_BYTES)
+
+    assert not cache.put(_entry("big", None, size=10_000), cache.generation)
+
+
+def test_invalidation_discards_entry_and_stale_reads():
+    cache = _cache()
+    cache.put(_entry("a", "CNT-A"), cache.generation)
+    cache.invalidate("CNT-A")
+    assert cache.get("a") is None and len(cache) == 0
+
+    # Lectura empezada antes de una invalidación: no se guarda
+    generation = cache.generation
+    cache.invalidate("otro")
+    assert not cache.put(_entry("a", "CNT-A"), generation)
+
+    cache.enabled = False
+    assert not cache.put(_entry("a", "CNT-A"), cache.generation)
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.listeners = {}
+        self.terminate = None
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    async def remove_listener(self, channel, callback):
+        self.listeners.pop(channel, None)
+
+    def add_termination_listener(self, callback):
+        self.terminate = callback
+
+    def remove_termination_listener(self, callback):
+        self.terminate = None
+
+
+class _FakePool:
+    def __init__(self):
+        self.connection = _FakeConnection()
+        self.released = 0
+
+    async def acquire(self):
+        return self.connection
+
+    async def release(self, connection):
+        self.released += 1
+
+
+def test_listener_enables_cache_and_invalidates_on_notify():
+    cache = ContractDetailCache(max_bytes=10_000)
+    pool = _FakePool()
+    listener = ContractDetailCacheListener(pool, cache)
+
+    async def run():
+        await listener.start()
+        assert cache.enabled
+        cache.put(_entry("a", "CNT-A"), cache.generation)
+        pool.connection.listeners["contract_changed"](pool.connection, 1, "contract_changed", "a")
+        assert cache.get("a") is None
+
+        cache.put(_entry("a", "CNT-A"), cache.generation)
+        await listener.stop()
+        assert not cache.enabled and len(cache) == 0
+        assert pool.released == 1
+
+    asyncio.run(run())
+
+
+def test_detail_response_uses_etag():
+    entry = _entry("a", "CNT-A")
+    response = _detail_response(entry, SimpleNamespace(headers={}))
+    assert response.status_code == 200 and response.body == entry.body
+    assert response.headers["etag"] == entry.etag
+
+    response = _detail_response(entry, SimpleNamespace(headers={"if-none-match": entry.etag}))
+    assert response.status_code == 304 and response.body == b""
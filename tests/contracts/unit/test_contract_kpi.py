@@ -0,0 +1,67 @@
+"""
+Pruebas de los KPIs precalculados de la cartera
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from decimal import Decimal
+
+from sqlalchemy.dialects.postgresql import asyncpg as asyncpg_dialect
+
+from app.contracts.services import contract_kpi_service as kpi_module
+from app.contracts.services.contract_kpi_service import ContractKpiService, _with_progress, refresh_loan_kpis
+
+
+def test_refresh_loans_runs_one_statement_with_loan_ids(monkeypatch):
+    calls = []
+
+    async def fake_execute(query, connection=None, commit_after=False, **kwargs):
+        compiled = query.compile(dialect=asyncpg_dialect.dialect())
+        calls.append((str(compiled), compiled.construct_params(), connection, commit_after))
+
+    monkeypatch.setattr(kpi_module, "execute", fake_execute)
+
+    asyncio.run(ContractKpiService.refresh_loans([7, 3, 7], connection="db"))
+    asyncio.run(ContractKpiService.refresh_loans([]))
+
+    assert len(calls) == 1
+    sql, params, connection, commit_after = calls[0]
+    assert params == {"loan_ids": [3, 7]}
+    assert (connection, commit_after) == ("db", False)
+    assert "FOR UPDATE" in sql and "INSERT INTO public.contract_kpi_portfolio" in sql
+    assert "contracts = contract_kpi_portfolio.contracts + EXCLUDED.contracts" in sql
+
+
+class _FakeDb:
+    def __init__(self):
+        self.savepoints = 0
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        self.savepoints += 1
+        yield
+
+
+def test_refresh_loan_kpis_never_breaks_the_payment(monkeypatch):
+    async def failing_refresh(loan_ids, connection=None):
+        raise RuntimeError("relation contract_kpi does not exist")
+
+    monkeypatch.setattr(ContractKpiService, "refresh_loans", staticmethod(failing_refresh))
+    db = _FakeDb()
+
+    asyncio.run(refresh_loan_kpis(db, 5))
+    asyncio.run(refresh_loan_kpis(db, None))
+
+    assert db.savepoints == 1
+
+
+def test_rows_get_progress_and_plain_types():
+    contract_id = uuid.uuid4()
+    row = _with_progress({
+        "contract_id": contract_id, "loan_amount": Decimal("1000.50"), "payments_made": 3, "payments_total": 12,
+    })
+    assert row == {
+        "contract_id": str(contract_id), "loan_amount": 1000.5, "payments_made": 3, "payments_total": 12,
+        "progress_percentage": 25.0,
+    }
+    assert _with_progress({"payments_made": 0, "payments_total": 0})["progress_percentage"] == 0.0
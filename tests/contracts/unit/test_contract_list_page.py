@@ -0,0 +1,61 @@
+"""
+Pruebas del listado de contratos paginado por cursor
+"""
+import asyncio
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.contracts.services import contract_list_service as list_module
+from app.contracts.services.contract_list_service import (
+    ContractListFilters, ContractListService, decode_cursor, encode_cursor, parse_fields,
+)
+
+IDS = [f"00000000-0000-0000-0000-00000000000{i}" for i in range(1, 5)]
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    cursor = encode_cursor(date(2025, 3, 1), IDS[0])
+    assert decode_cursor(cursor) == (date(2025, 3, 1), IDS[0])
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("no-es-un-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_parse_fields_projection():
+    assert parse_fields("contract_number, client_name") == ["contract_id", "contract_number", "client_name"]
+    with pytest.raises(HTTPException):
+        parse_fields("contract_number,password")
+
+
+def test_page_uses_keyset_and_only_joins_projected_fields(monkeypatch):
+    queries = []
+
+    async def fake_fetch_all(query, connection=None, **kwargs):
+        queries.append(str(query.compile(dialect=postgresql.dialect())))
+        return [
+            {"contract_id": contract_id, "contract_number": f"CNT-{i}", "_cursor_date": date(2025, 1, 10 - i)}
+            for i, contract_id in enumerate(IDS[:3])
+        ]
+
+    monkeypatch.setattr(list_module, "fetch_all", fake_fetch_all)
+    cursor = encode_cursor(date(2025, 2, 1), IDS[3])
+
+    page = asyncio.run(ContractListService.list_contracts_page(
+        "db", ContractListFilters(status="active", date_from=date(2025, 1, 1)),
+        limit=2, cursor=cursor, fields=parse_fields("contract_number"),
+    ))
+
+    assert page["contracts"] == [
+        {"contract_id": IDS[0], "contract_number": "CNT-0"},
+        {"contract_id": IDS[1], "contract_number": "CNT-1"},
+    ]
+    assert page["has_more"] is True and page["count"] == 2 and page["total"] is None
+    assert decode_cursor(page["next_cursor"]) == (date(2025, 1, 9), IDS[1])
+
+    sql = queries[0]
+    assert "(contract.contract_date, contract.contract_id) < (" in sql
+    assert "ORDER BY contract.contract_date DESC, contract.contract_id DESC" in sql
+    assert "LATERAL" not in sql and "contract_service" not in sql
@@ -0,0 +1,91 @@
+"""
+Pruebas de los metadatos de contratos en la BD (contract_document)
+"""
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.contracts.services import contract_metadata_service as metadata_module
+from app.contracts.services.contract_generation_service import ContractGenerationService
+from app.contracts.services.contract_metadata_service import ContractMetadataService
+from app.storage import LocalDocumentStore
+
+
+def test_record_version_bumps_and_writes_history_in_one_statement(monkeypatch):
+    calls = []
+
+    async def fake_fetch_one(query, connection=None, commit_after=False, **kwargs):
+        calls.append((str(query.compile(dialect=postgresql.dialect())), connection, commit_after))
+        return {"version": 4}
+
+    monkeypatch.setattr(metadata_module, "fetch_one", fake_fetch_one)
+    service = ContractMetadataService()
+
+    async def run():
+        in_transaction = await service.record_version("contract_CNT-1", {"amount": 1}, "local", connection="db")
+        standalone = await service.record_version("contract_CNT-1", {"amount": 1}, "local")
+        return in_transaction, standalone
+
+    assert asyncio.run(run()) == (4, 4)
+    assert len(calls) == 2
+    sql, connection, commit_after = calls[0]
+    assert sql.startswith("WITH doc AS")
+    assert "ON CONFLICT (document_id) DO UPDATE SET version = (contract_document.version +" in sql
+    assert "INSERT INTO contract_document_version" in sql
+    assert (connection, commit_after) == ("db", False)
+    # Sin conexión del llamador la sentencia se confirma sola
+    assert calls[1][2] is True
+
+
+class _FakeMetadata:
+    def __init__(self, metadata=None):
+        self.metadata = metadata
+        self.recorded = []
+
+    async def load_contract_metadata(self, document_id, connection=None):
+        return self.metadata
+
+    async def record_version(self, document_id, data, storage_type, file_path=None, base_version=0,
+                             render_manifest=None, connection=None):
+        self.recorded.append((document_id, data, storage_type, file_path, base_version))
+        return base_version + 1
+
+
+def _generation_service(tmp_path, metadata):
+    service = ContractGenerationService(tmp_path / "templates", tmp_path, store=LocalDocumentStore(tmp_path))
+    service.metadata_service = metadata
+    service.template_service = SimpleNamespace(
+        select_template=lambda data: Path("template.docx"), render_template=lambda path, data: b"DOCX"
+    )
+    service.data_processor = SimpleNamespace(flatten_data=dict)
+    return service
+
+
+def test_update_contract_merges_db_metadata(tmp_path):
+    metadata = _FakeMetadata({"version": 2, "original_data": {"phone": "1", "name": "Ana"}})
+    service = _generation_service(tmp_path, metadata)
+
+    result = asyncio.run(service.update_contract("contract_CNT-1", {"phone": "2"}))
+
+    assert result["version"] == 1
+    assert (tmp_path / "contract_CNT-1" / "CNT-1.docx").read_bytes() == b"DOCX"
+    document_id, data, storage_type, file_path, base_version = metadata.recorded[0]
+    assert (document_id, data, storage_type, base_version) == ("contract_CNT-1", {"phone": "2", "name": "Ana"}, "local", 0)
+    assert file_path == str(tmp_path / "contract_CNT-1" / "CNT-1.docx")
+    assert not (tmp_path / "contract_CNT-1" / "metadata.json").exists()
+
+
+def test_update_contract_continues_legacy_metadata_json_version(tmp_path):
+    folder = tmp_path / "contract_CNT-1"
+    folder.mkdir()
+    (folder / "metadata.json").write_text(json.dumps({"version": 3, "original_data": {"name": "Ana"}}))
+    metadata = _FakeMetadata()
+    service = _generation_service(tmp_path, metadata)
+
+    result = asyncio.run(service.update_contract("contract_CNT-1", {"phone": "2"}))
+
+    assert result["version"] == 4
+    assert metadata.recorded[0][1] == {"name": "Ana", "phone": "2"}
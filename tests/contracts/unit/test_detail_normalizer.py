@@ -0,0 +1,63 @@
+"""
+Pruebas del normalizador del detalle de contrato
+"""
+from datetime import date
+from decimal import Decimal
+
+from app.contracts.processors.detail_normalizer import (
+    apply_missing_fields, decimals_to_float, needs_missing_fields, normalize_contract_detail,
+)
+
+
+def _detail():
+    return {
+        "contract_id": "6f1c7a52-3b1e-4f59-9a53-0c7d2b1f4e10",
+        "contract_type_id": "2",
+        "loan": {"amount": "150000.50", "term_months": "24", "interest_rate": "n/a"},
+        "properties": [{"postal_code": 10101, "surface_area": "-3", "title_number": 55}],
+        "participants": {
+            "clients": [
+                {"person": {"first_name": "Ana", "person": {"document_number": 4022, "company_id": "7"}}},
+                "sin datos",
+            ],
+            "investors": [{"person": {"first_name": "Luis"}}],
+            "witnesses": None,
+        },
+        "total": {"payments_made": ["1", "2.5", None]},
+    }
+
+
+def test_normalize_contract_detail_flattens_participants_and_converts_types():
+    data = normalize_contract_detail(_detail())
+
+    assert data["contract_type_id"] == 2
+    assert data["loan"] == {"amount": 150000.5, "term_months": 24, "interest_rate": "n/a"}
+    assert data["properties"] == [{"postal_code": "10101", "surface_area": -3, "title_number": "55"}]
+    assert data["participants"]["clients"][0]["person"] == {
+        "first_name": "Ana", "document_number": "4022", "company_id": 7
+    }
+    assert data["participants"]["clients"][1] == "sin datos"
+    assert data["participants"]["witnesses"] is None
+    assert data["total"]["payments_made"] == [1, 2.5, None]
+
+
+def test_missing_fields_are_filled_from_one_row():
+    data = {"contract_end_date": None, "loan": None}
+    assert needs_missing_fields(data)
+
+    apply_missing_fields(data, {
+        "end_date": date(2027, 3, 1), "has_bank_account": True, "bank_name": "BHD",
+        "account_number": "001", "account_type": "ahorro", "currency": "DOP",
+    })
+
+    assert data["contract_end_date"] == "01/03/2027"
+    assert data["loan"]["bank_account"]["bank_account_number"] == "001"
+    assert not needs_missing_fields(data)
+
+    untouched = {"contract_end_date": "02/02/2026", "loan": {"amount": 1}}
+    apply_missing_fields(untouched, {"end_date": None, "has_bank_account": False})
+    assert untouched == {"contract_end_date": "02/02/2026", "loan": {"amount": 1}}
+
+
+def test_decimals_to_float():
+    assert decimals_to_float({"a": [Decimal("1.5"), {"b": Decimal("2")}], "c": "x"}) == {"a": [1.5, {"b": 2.0}], "c": "x"}
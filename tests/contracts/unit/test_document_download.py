@@ -0,0 +1,121 @@
+"""
+Pruebas de las respuestas de descarga de documentos (Range, ETag, streaming)
+"""
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Route
+
+from app.storage import LocalDocumentStore
+from app.storage.responses import RangeNotSatisfiable, SendfileResponse, document_response, parse_range
+from tests.contracts.fixtures.fake_drive import FakeDrive
+from tests.contracts.unit.test_document_store import _drive_store
+
+CONTENT = bytes(range(256)) * 2048  # 512 KB, varios trozos
+
+
+def _app(store):
+    async def download(request: Request):
+        stat = await store.stat("contract_1/1.docx")
+        return document_response(store, stat, request, filename="contract_1.docx")
+
+    return Starlette(routes=[Route("/download", download)])
+
+
+async def _get(app, **headers):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get("/download", headers=headers)
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    for header in ("bytes=100-", "bytes=9-3", "bytes=-0"):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range(header, 100)
+
+
+def test_local_download_uses_file_response_with_etag_and_ranges(tmp_path):
+    store = LocalDocumentStore(tmp_path)
+
+    async def run():
+        stat = await store.put("contract_1/1.docx", CONTENT)
+        app = _app(store)
+        full = await _get(app)
+        ranged = await _get(app, range="bytes=1000-1999")
+        cached = await _get(app, **{"if-none-match": stat.etag})
+        return stat, full, ranged, cached
+
+    stat, full, ranged, cached = asyncio.run(run())
+    assert full.status_code == 200
+    assert full.content == CONTENT
+    assert full.headers["etag"] == stat.etag
+    assert full.headers["content-disposition"] == 'attachment; filename="contract_1.docx"'
+    assert ranged.status_code == 206
+    assert ranged.headers["content-range"] == f"bytes 1000-1999/{len(CONTENT)}"
+    assert ranged.content == CONTENT[1000:2000]
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_sendfile_response_uses_zerocopy_extension(tmp_path):
+    path = tmp_path / "doc.docx"
+    path.write_bytes(CONTENT)
+    messages = []
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopy":
+            # Lo que haría el servidor con os.sendfile
+            message["file"].seek(message["offset"])
+            message = {**message, "data": message["file"].read(message["count"])}
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    scope = {
+        "type": "http", "method": "GET", "headers": [(b"range", b"bytes=10-19")],
+        "extensions": {"http.response.zerocopy": {}},
+    }
+    asyncio.run(SendfileResponse(path)(scope, receive, send))
+    assert messages[0]["status"] == 206
+    assert messages[1]["type"] == "http.response.zerocopy"
+    assert messages[1]["data"] == CONTENT[10:20]
+
+
+def test_drive_download_streams_requested_range():
+    fake = FakeDrive()
+
+    async def run():
+        drive, store = _drive_store(fake)
+        try:
+            stat = await store.put("contract_1/1.docx", CONTENT)
+            app = _app(store)
+            fake.requests.clear()
+            ranged = await _get(app, range="bytes=-100")
+            full = await _get(app)
+            unsatisfiable = await _get(app, range=f"bytes={len(CONTENT)}-")
+            cached = await _get(app, **{"if-none-match": f"W/{stat.etag}"})
+            return ranged, full, unsatisfiable, cached
+        finally:
+            await drive.aclose()
+
+    ranged, full, unsatisfiable, cached = asyncio.run(run())
+    assert ranged.status_code == 206
+    assert ranged.content == CONTENT[-100:]
+    assert ranged.headers["content-length"] == "100"
+    assert full.status_code == 200
+    assert full.content == CONTENT
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(CONTENT)}"
+    assert cached.status_code == 304
+    # Descarga de contenido solo para las dos respuestas con cuerpo, con el id del stat
+    media = [path for method, path in fake.requests if path.startswith("/drive/v3/files/")]
+    assert len(media) == 2
@@ -0,0 +1,131 @@
+"""
+Pruebas de los backends de almacenamiento de documentos (local, S3 y Drive)
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.contracts.gdrive_async import AsyncDriveClient
+from app.contracts.gdrive_service import GoogleDriveService
+from app.storage import DocumentNotFound, LocalDocumentStore
+from app.storage.drive import DriveDocumentStore
+from app.storage.s3 import S3DocumentStore
+from tests.contracts.fixtures.fake_drive import FOLDER_MIME_TYPE, FakeDrive
+from tests.contracts.fixtures.fake_s3 import FakeS3
+
+CONTENT = b"0123456789" * 100
+
+
+async def _read(store, key, start=0, end=None):
+    return b"".join([chunk async for chunk in store.stream(key, start, end, chunk_size=64)])
+
+
+def test_local_store_roundtrip(tmp_path):
+    store = LocalDocumentStore(tmp_path)
+
+    async def run():
+        stat = await store.put("contract_1/1.docx", CONTENT)
+        assert stat.size == len(CONTENT)
+        assert stat.path == tmp_path / "contract_1" / "1.docx"
+        assert stat.content_type.endswith("wordprocessingml.document")
+        assert (await store.stat("contract_1/1.docx")).etag == stat.etag
+        assert await store.stat("contract_1/missing.docx") is None
+        assert await store.get("contract_1/1.docx") == CONTENT
+        assert await _read(store, "contract_1/1.docx", 10, 19) == CONTENT[10:20]
+        assert await store.link("contract_1") == str(tmp_path / "contract_1")
+        with pytest.raises(DocumentNotFound):
+            await _read(store, "contract_1/missing.docx")
+
+    asyncio.run(run())
+    assert not list(tmp_path.glob("contract_1/*.tmp"))
+
+
+def test_keys_cannot_escape_root(tmp_path):
+    store = LocalDocumentStore(tmp_path)
+    for key in ("../secret", "contract_1/../../secret", ""):
+        with pytest.raises(ValueError):
+            store.path(key)
+
+
+def test_s3_store_signs_requests_and_supports_ranges():
+    fake = FakeS3(require_auth=True)
+    store = S3DocumentStore(
+        "http://fake-s3", "contracts", access_key="key", secret_key="secret",
+        transport=httpx.ASGITransport(app=fake.app),
+    )
+
+    async def run():
+        try:
+            stat = await store.put("contract_1/payments/ref 1.png", CONTENT, "image/png")
+            assert stat.link == "http://fake-s3/contracts/contract_1/payments/ref%201.png"
+            head = await store.stat("contract_1/payments/ref 1.png")
+            assert (head.size, head.etag, head.content_type) == (len(CONTENT), stat.etag, "image/png")
+            assert await store.stat("contract_1/none.png") is None
+            assert await _read(store, "contract_1/payments/ref 1.png", 5, 14) == CONTENT[5:15]
+            assert await store.get("contract_1/payments/ref 1.png") == CONTENT
+            with pytest.raises(DocumentNotFound):
+                await _read(store, "contract_1/none.png")
+        finally:
+            await store.aclose()
+
+    asyncio.run(run())
+    assert fake.objects[("contracts", "contract_1/payments/ref 1.png")]["content"] == CONTENT
+    assert all(auth.startswith("AWS4-HMAC-SHA256 Credential=key/") for auth in fake.authorizations)
+
+
+def _drive_store(fake: FakeDrive):
+    async def token():
+        return "token"
+
+    drive = GoogleDriveService.__new__(GoogleDriveService)
+    drive.main_folder_id = "root"
+    drive._async_client = AsyncDriveClient(token, base_url="http://fake-drive", transport=httpx.ASGITransport(app=fake.app))
+    drive._async_loop = asyncio.get_running_loop()
+    return drive, DriveDocumentStore(drive)
+
+
+def test_drive_store_creates_folders_once_and_updates_in_place():
+    fake = FakeDrive()
+
+    async def run():
+        drive, store = _drive_store(fake)
+        try:
+            first = await store.put("contract_1/1.docx", b"v1")
+            second = await store.put("contract_1/1.docx", CONTENT)
+            stat = await store.stat("contract_1/1.docx")
+            ranged = await _read(store, "contract_1/1.docx", 100, 199)
+            folder_link = await store.link("contract_1")
+            return first, second, stat, ranged, folder_link
+        finally:
+            await drive.aclose()
+
+    first, second, stat, ranged, folder_link = asyncio.run(run())
+    folders = [f for f in fake.files.values() if f["mimeType"] == FOLDER_MIME_TYPE]
+    documents = [f for f in fake.files.values() if f["mimeType"] != FOLDER_MIME_TYPE]
+    assert [f["name"] for f in folders] == ["contract_1"]
+    assert len(documents) == 1
+    assert first.extra["drive_file_id"] == second.extra["drive_file_id"] == stat.extra["drive_file_id"]
+    assert first.etag != second.etag
+    assert stat.size == len(CONTENT)
+    assert ranged == CONTENT[100:200]
+    assert folder_link.endswith(folders[0]["id"])
+
+
+def test_drive_store_recovers_from_stale_folder_hint():
+    fake = FakeDrive()
+
+    async def run():
+        drive, store = _drive_store(fake)
+        try:
+            await store.put("contract_1/payments/old.png", b"PNG", "image/png")
+            # La carpeta del contrato se borra en Drive mientras su id sigue recordado
+            fake.delete(fake.find("contract_1", "root")["id"])
+            return await store.put("contract_1/payments/ref.png", b"PNG", "image/png")
+        finally:
+            await drive.aclose()
+
+    stat = asyncio.run(run())
+    payments = fake.find("payments", fake.find("contract_1", "root")["id"])
+    assert stat.extra["drive_folder_id"] == payments["id"]
+    assert fake.files[stat.extra["drive_file_id"]]["parents"] == [payments["id"]]
@@ -0,0 +1,111 @@
+"""
+Pruebas del cache de carpetas de Google Drive por contrato
+"""
+import asyncio
+
+import httpx
+
+from app.contracts.gdrive_async import AsyncDriveClient
+from app.contracts.gdrive_service import GoogleDriveService
+from app.contracts.services import drive_folder_cache as cache_module
+from app.contracts.services.drive_folder_cache import DriveFolderCache, DriveFolders
+from app.loan_payments.payment_image_service import PaymentImageService
+from app.storage.drive import DriveDocumentStore
+from tests.contracts.fixtures.fake_drive import FakeDrive
+
+CONTRACT_ID = "5f0c3c9e-0000-0000-0000-000000000001"
+
+
+def _row(**overrides):
+    row = {
+        "contract_id": CONTRACT_ID,
+        "contract_number": "TEST-0001",
+        "folder_path": "https://drive.google.com/drive/folders/contract-folder",
+        "contract_folder_id": None,
+        "attachments_folder_id": None,
+        "payments_folder_id": None,
+    }
+    row.update(overrides)
+    return row
+
+
+def _counting_fetch(monkeypatch, row):
+    calls = []
+
+    async def fake_fetch_one(query, connection=None, **kwargs):
+        calls.append(query)
+        return row
+
+    monkeypatch.setattr(cache_module, "fetch_one", fake_fetch_one)
+    return calls
+
+
+def test_get_by_loan_hits_db_once(monkeypatch):
+    calls = _counting_fetch(monkeypatch, _row())
+    cache = DriveFolderCache()
+
+    async def run():
+        first = await cache.get_by_loan(7, db=None)
+        second = await cache.get_by_loan(7, db=None)
+        by_contract = await cache.get_by_contract(CONTRACT_ID, db=None)
+        return first, second, by_contract
+
+    first, second, by_contract = asyncio.run(run())
+    assert len(calls) == 1
+    assert first is second is by_contract
+    assert first.contract_folder_id == "contract-folder"
+    assert first.is_drive
+
+
+def test_lru_evicts_least_recently_used(monkeypatch):
+    _counting_fetch(monkeypatch, None)
+    cache = DriveFolderCache(max_entries=2)
+    for index in range(3):
+        cache._remember(DriveFolders(contract_id=f"c{index}", folder_path="/tmp"), contract_loan_id=index)
+
+    assert cache._cached("c0") is None
+    assert asyncio.run(cache.get_by_loan(0, db=None)) is None
+    assert cache._cached("c2") is not None
+
+
+def test_payment_upload_reuses_cached_payments_folder(monkeypatch, tmp_path):
+    fake = FakeDrive()
+    saved = []
+
+    async def fake_execute(query, connection=None, commit_after=False, **kwargs):
+        saved.append(query)
+
+    calls = _counting_fetch(monkeypatch, _row(payments_folder_id="payments-folder"))
+    monkeypatch.setattr(cache_module, "execute", fake_execute)
+    monkeypatch.setattr(cache_module, "drive_folder_cache", DriveFolderCache())
+    monkeypatch.setattr("app.loan_payments.payment_image_service.drive_folder_cache", cache_module.drive_folder_cache)
+
+    class Upload:
+        content_type = "image/png"
+        size = 3
+
+        async def read(self):
+            return b"PNG"
+
+    async def token():
+        return "token"
+
+    async def run():
+        drive = GoogleDriveService.__new__(GoogleDriveService)
+        drive.main_folder_id = "root"
+        drive._async_client = AsyncDriveClient(token, base_url="http://fake-drive", transport=httpx.ASGITransport(app=fake.app))
+        drive._async_loop = asyncio.get_running_loop()
+
+        service = PaymentImageService(tmp_path, store=DriveDocumentStore(drive))
+        try:
+            return [await service.upload_payment_image("7", f"voucher_{n}", Upload(), db=None) for n in range(2)]
+        finally:
+            await drive.aclose()
+
+    results = asyncio.run(run())
+    assert all(result["drive_success"] and result["url"] for result in results)
+    assert len(calls) == 1
+    # Por subida: comprobar si ya existe en la carpeta y subir, sin resolver carpetas
+    assert [path for _, path in fake.requests] == ["/drive/v3/files", "/upload/drive/v3/files"] * 2
+    assert all(f["parents"] == ["payments-folder"] for f in fake.files.values())
+    assert saved == []
@@ -0,0 +1,118 @@
+"""
+Pruebas del transporte asíncrono de Google Drive contra el servidor falso
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.contracts.gdrive_async import UPLOAD_CHUNK_SIZE, AsyncDriveClient, DriveAPIError
+from app.contracts.gdrive_service import GoogleDriveService
+from tests.contracts.fixtures.fake_drive import FakeDrive
+
+
+async def _token():
+    return "test-token"
+
+
+def _client(fake: FakeDrive, upload_concurrency: int = 4) -> AsyncDriveClient:
+    return AsyncDriveClient(
+        _token,
+        base_url="http://fake-drive",
+        upload_concurrency=upload_concurrency,
+        transport=httpx.ASGITransport(app=fake.app),
+    )
+
+
+def _service(client: AsyncDriveClient) -> GoogleDriveService:
+    service = GoogleDriveService.__new__(GoogleDriveService)
+    service.main_folder_id = "root"
+    service._async_client = client
+    service._async_loop = asyncio.get_running_loop()
+    return service
+
+
+def test_upload_contract_async_batches_folders_and_uploads_in_parallel(tmp_path):
+    fake = FakeDrive(latency=0.01)
+    attachments = tmp_path / "attachments"
+    attachments.mkdir()
+    for index in range(3):
+        (attachments / f"anexo_{index}.pdf").write_bytes(b"%PDF" + bytes([index]))
+    contract_path = tmp_path / "contract_CNT-000001.docx"
+    contract_path.write_bytes(b"DOCX")
+
+    async def run():
+        client = _client(fake)
+        try:
+            return await _service(client).upload_contract_async(
+                "contract_CNT-000001", contract_path, {"contract_number": "CNT-000001"}
+            )
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+
+    assert result["drive_success"], result
+    contract_folder = fake.find("contract_CNT-000001", "root")
+    assert result["drive_folder_id"] == contract_folder["id"]
+    assert fake.find("CNT-000001.docx", contract_folder["id"])["content"] == b"DOCX"
+    assert fake.find("metadata.json", contract_folder["id"])["mimeType"] == "application/json"
+    assert result["drive_payments_folder_id"] == fake.find("payments", contract_folder["id"])["id"]
+    attachments_folder = fake.find("attachments", contract_folder["id"])
+    assert len(fake.children(attachments_folder["id"])) == 3
+    assert len(result["attachments_uploaded"]) == 3
+
+    # Subcarpetas en un solo batch y subidas solapadas
+    assert sum(1 for method, path in fake.requests if path == "/batch/drive/v3") == 1
+    assert fake.max_in_flight >= 3
+
+
+def test_upload_concurrency_is_bounded():
+    fake = FakeDrive(latency=0.02)
+
+    async def run():
+        client = _client(fake, upload_concurrency=2)
+        try:
+            await asyncio.gather(*(
+                client.upload_bytes(b"x", "root", f"file_{index}.png", "image/png") for index in range(6)
+            ))
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert len(fake.children("root")) == 6
+    assert fake.max_in_flight == 2
+
+
+def test_large_upload_is_resumable_in_chunks():
+    fake = FakeDrive()
+    content = bytes(range(256)) * ((UPLOAD_CHUNK_SIZE // 256) + 10)
+
+    async def run():
+        client = _client(fake)
+        try:
+            return await client.upload_bytes(memoryview(content), "root", "big.docx", "application/octet-stream")
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+    assert fake.files[result["id"]]["content"] == content
+    assert sum(1 for method, _ in fake.requests if method == "PUT") == 2
+
+
+def test_batch_permissions_report_errors():
+    fake = FakeDrive()
+
+    async def run():
+        client = _client(fake)
+        try:
+            folders = await client.create_folders(["a", "b"], "root")
+            await client.create_permissions(list(folders.values()), {"type": "anyone", "role": "reader"})
+            with pytest.raises(DriveAPIError):
+                await client.create_permissions(["missing"], {"type": "anyone", "role": "reader"})
+            return folders
+        finally:
+            await client.aclose()
+
+    folders = asyncio.run(run())
+    assert all(fake.permissions[folder_id] for folder_id in folders.values())
@@ -0,0 +1,149 @@
+"""
+Pruebas unitarias de las subidas a Google Drive desde memoria
+"""
+import json
+
+from app.contracts.gdrive_service import GoogleDriveService, MemoryViewReader, UPLOAD_CHUNK_SIZE
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeFiles:
+    def __init__(self):
+        self.created = []
+
+    def create(self, body, media_body=None, fields=None, supportsAllDrives=None):
+        content = media_body.getbytes(0, media_body.size()) if media_body else None
+        self.created.append({"body": body, "media": media_body, "content": content})
+        file_id = f"file-{len(self.created)}"
+        return FakeRequest({"id": file_id, "webViewLink": f"https://drive.google.com/file/d/{file_id}/view?usp=drivesdk"})
+
+
+class FakeDrive:
+    def __init__(self):
+        self._files = FakeFiles()
+
+    def files(self):
+        return self._files
+
+
+def _service():
+    service = GoogleDriveService.__new__(GoogleDriveService)
+    service.service = FakeDrive()
+    service.main_folder_id = "root"
+    return service
+
+
+def test_memoryview_reader_reads_in_chunks():
+    reader = MemoryViewReader(memoryview(b"abcdefghij"))
+    assert reader.size == 10
+    assert reader.read(4) == b"abcd"
+    reader.seek(8)
+    assert reader.read(4) == b"ij"
+    assert reader.read() == b""
+    reader.seek(-3, 2)
+    assert reader.read() == b"hij"
+
+
+def test_upload_bytes_small_is_single_request():
+    service = _service()
+    result = service._upload_bytes(b"PNGDATA", "folder", "receipt_1.png")
+
+    created = service.service.files().created[0]
+    assert created["content"] == b"PNGDATA"
+    assert created["body"] == {"name": "receipt_1.png", "parents": ["folder"]}
+    assert created["media"].mimetype() == "image/png"
+    assert not created["media"].resumable()
+    assert result["file_id"] == "file-1"
+
+
+def test_upload_bytes_large_is_resumable():
+    service = _service()
+    content = bytearray(UPLOAD_CHUNK_SIZE + 1)
+    service._upload_bytes(memoryview(content), "folder", "contrato.docx")
+
+    media = service.service.files().created[0]["media"]
+    assert media.resumable()
+    assert media.chunksize() == UPLOAD_CHUNK_SIZE
+
+
+def test_upload_metadata_does_not_touch_disk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = _service()
+    service._upload_metadata({"contract_id": "contract_1", "monto": "1000"}, "folder")
+
+    created = service.service.files().created[0]
+    assert json.loads(created["content"]) == {"contract_id": "contract_1", "monto": "1000"}
+    assert created["media"].mimetype() == "application/json"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_shared_drive_service_is_created_once(monkeypatch):
+    from app.contracts import gdrive_service
+
+    created = []
+
+    class CountingService:
+        def __init__(self):
+            created.append(self)
+
+    monkeypatch.setattr(gdrive_service, "GoogleDriveService", CountingService)
+    gdrive_service.reset_shared_drive_service()
+    try:
+        first = gdrive_service.get_shared_drive_service()
+        assert gdrive_service.get_shared_drive_service() is first
+        assert len(created) == 1
+    finally:
+        gdrive_service.reset_shared_drive_service()
+
+
+def test_shared_drive_service_retries_after_failure(monkeypatch):
+    from app.contracts import gdrive_service
+
+    attempts = []
+
+    class FlakyService:
+        def __init__(self):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ValueError("GOOGLE_CREDENTIALS_PATH environment variable not set")
+
+    monkeypatch.setattr(gdrive_service, "GoogleDriveService", FlakyService)
+    gdrive_service.reset_shared_drive_service()
+    try:
+        try:
+            gdrive_service.get_shared_drive_service()
+        except ValueError:
+            pass
+        assert isinstance(gdrive_service.get_shared_drive_service(), FlakyService)
+        assert len(attempts) == 2
+    finally:
+        gdrive_service.reset_shared_drive_service()
+
+
+def test_each_thread_gets_its_own_http():
+    import threading
+
+    class ValidCredentials:
+        valid = True
+
+    service = GoogleDriveService.__new__(GoogleDriveService)
+    service._credentials = ValidCredentials()
+    service._refresh_lock = threading.Lock()
+    service._local = threading.local()
+
+    main_http = service._thread_http()
+    assert service._thread_http() is main_http
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(service._thread_http()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main_http
+    assert other[0].credentials is service._credentials
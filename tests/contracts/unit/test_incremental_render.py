@@ -0,0 +1,109 @@
+"""
+Pruebas de la regeneración incremental de contratos (manifiesto de render)
+"""
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+from app.contracts import paragraphs as paragraphs_module
+from app.contracts.processors.incremental_render import RenderManifest, RenderStats, TrackingDict, changed_keys
+from app.contracts.services.contract_generation_service import ContractGenerationService
+from app.storage import LocalDocumentStore
+
+TEMPLATES = {
+    "client": "Cliente {{client_name}}, teléfono {{client_phone}}",
+    "investor": "Inversionista {{investor_name}}",
+}
+
+
+def test_tracking_dict_records_reads_and_changed_keys():
+    tracked = TrackingDict({"a": 1, "b": 2})
+    tracked.get("a")
+    "c" in tracked
+    tracked["b"]
+
+    assert tracked.reads == {"a", "b", "c"}
+    assert changed_keys({"a": 1, "b": 2}, {"a": 1, "b": 3, "c": None}) == {"b", "c"}
+
+
+def _fake_db(monkeypatch):
+    lookups = []
+
+    async def fake_get_paragraph_from_db(connection, person_role, contract_type, section, contract_services):
+        lookups.append((person_role, section))
+        return TEMPLATES[person_role] if section == "identification" else None
+
+    monkeypatch.setattr(paragraphs_module, "get_paragraph_from_db", fake_get_paragraph_from_db)
+    return lookups
+
+
+def test_second_pass_reuses_unaffected_paragraphs_without_db(monkeypatch, tmp_path):
+    lookups = _fake_db(monkeypatch)
+    service = ContractGenerationService(tmp_path, tmp_path, store=LocalDocumentStore(tmp_path))
+    data = {"client_name": "Ana", "client_phone": "809-555-0101", "investor_name": "Luis"}
+
+    first = dict(data)
+    entries = asyncio.run(service._process_paragraphs_from_db("db", data, first))
+    assert first["client_paragraph"] == "Cliente Ana, teléfono 809-555-0101"
+    assert first["investor_paragraph"] == "Inversionista Luis"
+    assert len(lookups) == 20
+
+    previous = RenderManifest.from_dict(RenderManifest(entries).to_dict())
+    updated = {**data, "investor_name": "Marta"}
+    second = dict(updated)
+    stats = RenderStats()
+    asyncio.run(service._process_paragraphs_from_db(
+        "db", updated, second, previous, changed_keys(data, updated), stats
+    ))
+
+    assert len(lookups) == 20
+    assert second["client_paragraph"] == first["client_paragraph"]
+    assert second["investor_paragraph"] == "Inversionista Marta"
+    assert (stats.paragraphs_total, stats.paragraphs_recomputed, stats.db_lookups) == (20, 1, 0)
+
+
+class _FakeMetadata:
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.recorded = []
+
+    async def load_contract_metadata(self, document_id, connection=None):
+        return self.metadata
+
+    async def record_version(self, document_id, data, storage_type, file_path=None, base_version=0,
+                             render_manifest=None, connection=None):
+        self.recorded.append((data, render_manifest))
+        return 2
+
+
+def test_update_reuses_document_when_no_template_variable_changed(tmp_path):
+    store = LocalDocumentStore(tmp_path)
+    asyncio.run(store.put("contract_CNT-1/CNT-1.docx", memoryview(b"DOCX v1"), "application/octet-stream"))
+    manifest = RenderManifest(template_name="template.docx", render_ms=120.0)
+    metadata = _FakeMetadata({"original_data": {"name": "Ana", "notes": "x"}, "render_manifest": manifest.to_dict()})
+    renders = []
+
+    service = ContractGenerationService(tmp_path, tmp_path, store=store)
+    service.metadata_service = metadata
+    service.data_processor = SimpleNamespace(flatten_data=dict)
+    service.template_service = SimpleNamespace(
+        select_template=lambda data: Path("template.docx"),
+        get_template_variables=lambda path: frozenset({"name"}),
+        render_template=lambda path, data: renders.append(data) or b"DOCX v2",
+    )
+
+    result = asyncio.run(service.update_contract("contract_CNT-1", {"notes": "y"}))
+    assert renders == []
+    assert result["render_stats"]["document_reused"] is True
+    assert result["render_stats"]["estimated_full_ms"] >= 120.0
+    assert result["path"] == str(tmp_path / "contract_CNT-1" / "CNT-1.docx")
+    assert metadata.recorded[0][1]["render_ms"] == 120.0
+
+    result = asyncio.run(service.update_contract("contract_CNT-1", {"name": "Eva"}))
+    assert len(renders) == 1
+    assert result["render_stats"]["document_reused"] is False
+    assert (tmp_path / "contract_CNT-1" / "CNT-1.docx").read_bytes() == b"DOCX v2"
+
+    # incremental=False ignora el manifiesto
+    asyncio.run(service.update_contract("contract_CNT-1", {"notes": "z"}, incremental=False))
+    assert len(renders) == 2
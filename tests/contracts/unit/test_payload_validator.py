@@ -0,0 +1,69 @@
+"""
+Pruebas de la validación compilada del payload de /generate-complete
+"""
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.contracts.utils.validators import contract_payload_body, validate_contract_data
+from app.contracts.validators.payload_validator import contract_payload_errors, parse_contract_payload
+from app.exceptions import GenericHTTPException
+
+FIXTURE = Path(__file__).resolve().parents[1] / "data" / "test_contract_fisica_soltera_cliente.json"
+
+
+def _payload():
+    return json.loads(FIXTURE.read_text(encoding="utf-8"))
+
+
+def test_fixture_is_valid_and_keeps_extra_keys_and_numbers():
+    body = FIXTURE.read_bytes()
+    data, errors = parse_contract_payload(body)
+    assert errors == [] and contract_payload_errors(_payload()) == []
+    assert data == json.loads(body)
+
+
+def test_minimum_rules_keep_missing_fields_messages():
+    payload = _payload()
+    for key in ("investors", "notary", "properties", "paragraph_request", "loan"):
+        payload.pop(key)
+    payload["investor_company"] = [{"company_name": None}]
+
+    assert contract_payload_errors(payload) == [
+        "investors o investor_company: Se requiere al menos 1 inversionista (persona física o empresa)",
+        "notaries: Se requiere al menos 1 notario",
+        "properties: Se requiere al menos 1 propiedad",
+        "paragraph_request: Se requiere la configuración de párrafos",
+        "loan: Se requiere información del préstamo",
+    ]
+
+    payload["investor_company"] = [{"company_name": "Inversiones SRL"}]
+    assert not any(error.startswith("investors") for error in contract_payload_errors(payload))
+
+
+def test_type_errors_use_the_field_path():
+    payload = _payload()
+    payload["loan"]["amount"] = "mucho"
+    payload["client_company"] = {"company_name": 5}
+    payload["clients"] = ["persona"]
+
+    with pytest.raises(GenericHTTPException) as exc:
+        validate_contract_data(payload)
+    assert exc.value.status_code == 400
+    assert exc.value.detail["missing_fields"] == [
+        "client_company.company_name: Input should be a valid string",
+        "loan.amount: Input should be a valid number, unable to parse string as a number",
+        "clients.0: Input should be a valid dictionary",
+    ]
+
+
+def test_body_dependency_rejects_invalid_json():
+    async def body():
+        return b"{no es json"
+
+    with pytest.raises(GenericHTTPException) as exc:
+        asyncio.run(contract_payload_body(SimpleNamespace(body=body)))
+    assert exc.value.detail["missing_fields"][0].startswith("Invalid JSON")
@@ -0,0 +1,148 @@
+"""
+Pruebas del motor de amortización vectorizado
+"""
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.loan_payments.amortization import (
+    FLAT, FRENCH, INTEREST_ONLY, ScheduleTerms, build_schedule, compute_schedules, terms_from_loan,
+    terms_from_request,
+)
+from app.loan_payments.schemas import SchedulePreviewRequest
+from app.loan_payments import service as service_module
+from app.loan_payments.service import LoanPaymentService
+
+CENT = Decimal("0.01")
+
+
+def _reference_french(principal: Decimal, rate: Decimal, quotes: int):
+    """Cronograma francés calculado cuota a cuota en Decimal"""
+    r = rate / 100
+    payment = (principal * r / (1 - (1 + r) ** -quotes)).quantize(CENT, ROUND_HALF_UP) if r else principal / quotes
+    balance, rows = principal, []
+    for number in range(1, quotes + 1):
+        interest = (balance * r).quantize(CENT, ROUND_HALF_UP)
+        capital = balance if number == quotes else payment.quantize(CENT, ROUND_HALF_UP) - interest
+        balance -= capital
+        rows.append((capital, interest))
+    return rows
+
+
+def test_french_matches_decimal_reference_exactly():
+    rng = random.Random(3)
+    terms = [
+        ScheduleTerms(Decimal(rng.randrange(100_000, 10_000_000)).scaleb(-2), rng.choice((3, 12, 36)),
+                      date(2025, 1, 15), Decimal(rng.randrange(1, 400)).scaleb(-2), contract_loan_id=i)
+        for i in range(200)
+    ]
+    rows = compute_schedules(terms).rows()
+
+    for t in terms:
+        schedule = [row for row in rows if row["contract_loan_id"] == t.contract_loan_id]
+        assert sum(row["capital_amount"] for row in schedule) == t.principal
+        assert schedule[-1]["balance"] == 0
+        assert all(row["amount_due"] == row["capital_amount"] + row["interest_amount"] for row in schedule)
+        assert len({row["amount_due"] for row in schedule[:-1]}) <= 1
+        assert [(row["capital_amount"], row["interest_amount"]) for row in schedule] == \
+            _reference_french(t.principal, t.monthly_rate, t.quotes)
+
+
+def test_flat_interest_only_and_balloon():
+    start = date(2025, 1, 31)
+    flat, interest_only, balloon = compute_schedules([
+        ScheduleTerms(Decimal("1000"), 3, start, Decimal("2"), FLAT),
+        ScheduleTerms(Decimal("5000"), 3, start, Decimal("5"), INTEREST_ONLY),
+        ScheduleTerms(Decimal("10000"), 6, start, Decimal("3"), FLAT, final_payment=Decimal("4000")),
+    ]).summaries()
+
+    assert (flat["regular_payment"], flat["final_payment"], flat["total_interest"]) == (
+        Decimal("353.33"), Decimal("353.34"), Decimal("60.00"))
+    assert (interest_only["regular_payment"], interest_only["final_payment"]) == (Decimal("250.00"), Decimal("5250.00"))
+    assert (balloon["regular_payment"], balloon["final_payment"]) == (Decimal("1300.00"), Decimal("5300.00"))
+    assert (flat["first_due_date"], flat["last_due_date"]) == (date(2025, 2, 28), date(2025, 4, 30))
+
+
+def test_fixed_mode_mirrors_stored_function_parameters():
+    request = SimpleNamespace(
+        contract_loan_id=9, monthly_quotes=3, monthly_amount=Decimal("100"), interest_amount=Decimal("50"),
+        start_date=date(2025, 3, 10), end_date=date(2025, 6, 10), last_payment_date=date(2025, 6, 30),
+        last_principal=Decimal("1000"), last_interest=Decimal("5.5"),
+    )
+    rows = build_schedule(terms_from_request(request))
+
+    assert [(r["due_date"], r["capital_amount"], r["interest_amount"], r["balance"]) for r in rows] == [
+        (date(2025, 4, 10), Decimal("100.00"), Decimal("50.00"), Decimal("1100.00")),
+        (date(2025, 5, 10), Decimal("100.00"), Decimal("50.00"), Decimal("1000.00")),
+        (date(2025, 6, 30), Decimal("1000.00"), Decimal("5.50"), Decimal("0.00")),
+    ]
+    assert rows[0]["contract_loan_id"] == 9 and rows[0]["payment_status"] == "pending"
+
+
+def test_terms_from_loan_payload():
+    terms = terms_from_loan({
+        "amount": 20000, "interest_rate": 1.5, "term_months": 24,
+        "loan_payments_details": {"payment_qty_quotes": 12, "final_payment": 5000, "payment_type": "Interes"},
+    }, date(2025, 1, 1), contract_loan_id=4)
+    assert (terms.quotes, terms.method, terms.final_payment, terms.monthly_rate) == (
+        12, INTEREST_ONLY, Decimal("5000"), Decimal("1.5"))
+    with pytest.raises(ValueError):
+        ScheduleTerms(Decimal("100"), 0, date(2025, 1, 1), method=FRENCH)
+
+
+class _FakeDb:
+    def __init__(self, existing):
+        self.existing = existing
+        self.inserted = None
+        self.locked = False
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, query, params=None):
+        if "FOR UPDATE" in str(query):
+            self.locked = True
+            return []
+        if params is None:
+            assert self.locked, "los préstamos se bloquean antes de comprobar sus cuotas"
+            return [(loan_id,) for loan_id in self.existing]
+        self.inserted = params
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        yield
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def test_preview_and_bulk_insert(monkeypatch):
+    refreshed = []
+
+    async def fake_refresh(loan_ids, connection=None):
+        refreshed.append((sorted(loan_ids), connection.inserted is not None, connection.commits))
+
+    monkeypatch.setattr(service_module.ContractKpiService, "refresh_loans", staticmethod(fake_refresh))
+    request = SchedulePreviewRequest(principal=Decimal("1200"), quotes=12, start_date=date(2025, 1, 1), contract_loan_id=3)
+    preview = LoanPaymentService.preview_payment_schedule(request)
+    assert len(preview.schedule) == 12 and preview.schedule_summary["total_principal"] == Decimal("1200.00")
+
+    db = _FakeDb(existing=[])
+    terms = [LoanPaymentService.schedule_terms(request), ScheduleTerms(Decimal("500"), 2, date(2025, 1, 1), contract_loan_id=4)]
+    assert asyncio.run(LoanPaymentService(db).insert_payment_schedules(terms)) == 14
+    assert len(db.inserted) == 14 and db.commits == 1
+    # KPIs recalculados tras insertar y antes del commit
+    assert refreshed == [([3, 4], True, 0)]
+
+    conflicting = _FakeDb(existing=[4])
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(LoanPaymentService(conflicting).insert_payment_schedules(terms))
+    assert exc.value.status_code == 409 and conflicting.rollbacks == 1 and conflicting.inserted is None
@@ -0,0 +1,120 @@
+"""
+Pruebas de los recibos diferidos (render y subida tras el commit del pago)
+"""
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from app.receipts.receipt_schemas import ReceiptMode
+from app.receipts.receipt_service import ReceiptService
+from app.receipts.render_pool import RenderedReceipt
+from app.uploads import handlers
+from app.uploads.dispatcher import UploadJob
+
+
+class _Pool:
+    def __init__(self):
+        self.rendered = []
+
+    async def render(self, payment_info, mode=ReceiptMode.INLINE):
+        self.rendered.append((payment_info, mode))
+        return RenderedReceipt(b"PNG")
+
+
+def test_deferred_receipt_is_enqueued_without_rendering(monkeypatch):
+    enqueued = []
+
+    async def fake_enqueue(db, kind, content, filename, mime_type, target):
+        enqueued.append((content, target))
+        return 11
+
+    monkeypatch.setattr("app.receipts.receipt_service.enqueue_upload", fake_enqueue)
+    pool = _Pool()
+    service = ReceiptService(render_pool=pool)
+    payment = {"data": {"contract_loan_id": 5, "total_paid": Decimal("10.50")}}
+
+    receipt = asyncio.run(service.enqueue_receipt_from_payment(
+        payment, "db", ["tx-1"], ReceiptMode.DEFERRED, requested_by="user-1"))
+
+    assert pool.rendered == []
+    content, target = enqueued[0]
+    assert content is None and target["payment"] == {"contract_loan_id": 5, "total_paid": 10.5}
+    assert target["transaction_ids"] == ["tx-1"] and target["receipt_id"] == receipt.receipt_id
+    assert target["requested_by"] == "user-1"
+    assert receipt.upload_id == 11 and receipt.image_base64 is None
+    assert receipt.download_url.startswith("/receipts/11/download?")
+
+
+def _job(content=b"", result=None):
+    return UploadJob(
+        upload_id=11, kind="payment_receipt", filename="receipt_RCP-1.png", mime_type="image/png", content=content,
+        target={"contract_loan_id": 5, "receipt_id": "RCP-1", "transaction_ids": ["tx-1"], "payment": {"x": 1}},
+        attempts=1, result=result,
+    )
+
+
+def test_handler_renders_uploads_and_checkpoints_each_step(monkeypatch):
+    pool, progress, uploads, patches = _Pool(), [], [], []
+
+    async def save_progress(upload_id, content=None, result=None):
+        progress.append((upload_id, content, result))
+
+    async def upload(job, reference):
+        uploads.append((job.content, reference))
+        return {"url": "https://drive/r", "storage_type": "drive"}
+
+    async def patch(column, url, transaction_ids):
+        patches.append((column, url, transaction_ids))
+
+    monkeypatch.setattr("app.receipts.render_pool.receipt_render_pool", pool)
+    monkeypatch.setattr(handlers, "save_progress", save_progress)
+    monkeypatch.setattr(handlers, "_upload_payment_file", upload)
+    monkeypatch.setattr(handlers, "_patch_transactions", patch)
+
+    result = asyncio.run(handlers.upload_payment_receipt(_job()))
+
+    assert pool.rendered == [({"x": 1}, ReceiptMode.LINK)]
+    assert uploads == [(b"PNG", "receipt_RCP-1")]
+    assert [(content, result and result["url"]) for _, content, result in progress] == [(b"PNG", None), (None, "https://drive/r")]
+    assert patches == [("url_payment_receipt", "https://drive/r", ["tx-1"])]
+    assert result["url"] == "https://drive/r"
+
+    # Reintento después de subir: ni se renderiza ni se sube otra vez
+    pool.rendered.clear()
+    uploads.clear()
+    asyncio.run(handlers.upload_payment_receipt(_job(content=b"PNG", result={"url": "https://drive/r"})))
+    assert pool.rendered == [] and uploads == [] and len(patches) == 2
+
+
+def test_voucher_handler_checkpoints_upload_before_patching(monkeypatch):
+    progress, uploads, patches = [], [], []
+
+    async def save_progress(upload_id, content=None, result=None):
+        progress.append((upload_id, result))
+
+    async def upload(job, reference):
+        uploads.append(reference)
+        return {"url": "https://drive/v", "storage_type": "drive"}
+
+    async def failing_patch(column, url, transaction_ids):
+        patches.append((column, url))
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(handlers, "save_progress", save_progress)
+    monkeypatch.setattr(handlers, "_upload_payment_file", upload)
+    monkeypatch.setattr(handlers, "_patch_transactions", failing_patch)
+    job = UploadJob(
+        upload_id=12, kind="payment_voucher", filename="v.png", mime_type="image/png", content=b"IMG",
+        target={"contract_loan_id": 5, "reference": "R-1", "transaction_ids": ["tx-1"]}, attempts=1,
+    )
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(handlers.upload_payment_voucher(job))
+    assert uploads == ["R-1"] and progress[0][1]["url"] == "https://drive/v"
+
+    # El reintento recibe el resultado guardado: solo actualiza las transacciones
+    job.result = progress[0][1]
+    with pytest.raises(RuntimeError):
+        asyncio.run(handlers.upload_payment_voucher(job))
+    assert uploads == ["R-1"] and patches == [("url_bank_receipt", "https://drive/v")] * 2
@@ -0,0 +1,144 @@
+"""
+Pruebas de las claves de idempotencia de los endpoints de pago
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.idempotency import service as idempotency_module
+from app.idempotency.service import REPLAY_HEADER, IdempotencyService, advisory_lock_id, request_fingerprint
+
+
+class _FakeConnection:
+    """Simula idempotency_key y los advisory locks sobre un dict compartido"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def execute(self, query, params=None):
+        sql = str(query)
+        if "pg_advisory_lock" in sql:
+            self.engine.log.append(("lock", params["lock_id"]))
+        elif "pg_advisory_unlock" in sql:
+            self.engine.log.append(("unlock", params["lock_id"]))
+        elif sql.startswith("INSERT INTO idempotency_key"):
+            values = query.compile().params
+            self.engine.rows[values["idempotency_key"]] = SimpleNamespace(
+                request_hash=values["request_hash"], status_code=values["status_code"], response=values["response"])
+        elif sql.startswith("UPDATE idempotency_key"):
+            values = query.compile().params
+            if self.engine.fail_complete:
+                raise RuntimeError("connection lost")
+            row = self.engine.rows[values["idempotency_key_1"]]
+            row.status_code, row.response = values["status_code"], values["response"]
+        elif sql.startswith("DELETE FROM idempotency_key WHERE idempotency_key.scope"):
+            self.engine.rows.pop(query.compile().params["idempotency_key_1"], None)
+        elif sql.startswith("SELECT idempotency_key.request_hash"):
+            key = query.compile().params["idempotency_key_1"]
+            return SimpleNamespace(first=lambda: self.engine.rows.get(key))
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class _FakeEngine:
+    def __init__(self):
+        self.rows = {}
+        self.fail_complete = False
+        self.log = []
+
+    @asynccontextmanager
+    async def connect(self):
+        yield _FakeConnection(self)
+
+
+def _run(service, key, fingerprint, handler):
+    return asyncio.run(service.run(key, "user-1", "auto-payment", fingerprint, handler))
+
+
+def test_retry_replays_stored_response(monkeypatch):
+    fake_engine = _FakeEngine()
+    monkeypatch.setattr(idempotency_module, "engine", fake_engine)
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return {"success": True, "data": {"transaction_id": f"tx-{len(calls)}"}}
+
+    service = IdempotencyService()
+    fingerprint = request_fingerprint({"contract_loan_id": 1, "amount": 100})
+    first = _run(service, "k-1", fingerprint, handler)
+    retry = _run(service, "k-1", fingerprint, handler)
+
+    assert calls == [1]
+    assert json.loads(first.body) == json.loads(retry.body) == {"success": True, "data": {"transaction_id": "tx-1"}}
+    assert REPLAY_HEADER.lower() not in first.headers and retry.headers[REPLAY_HEADER] == "true"
+    lock_id = advisory_lock_id("user-1", "auto-payment", "k-1")
+    assert fake_engine.log == [("lock", lock_id), ("unlock", lock_id)]
+
+
+def test_key_reused_with_other_body_is_rejected(monkeypatch):
+    monkeypatch.setattr(idempotency_module, "engine", _FakeEngine())
+
+    async def handler():
+        return {"success": True}
+
+    service = IdempotencyService()
+    _run(service, "k-2", request_fingerprint({"amount": 100}), handler)
+    with pytest.raises(HTTPException) as exc:
+        _run(service, "k-2", request_fingerprint({"amount": 200}), handler)
+    assert exc.value.status_code == 422
+
+
+def test_failed_handler_releases_lock_and_is_not_stored(monkeypatch):
+    fake_engine = _FakeEngine()
+    monkeypatch.setattr(idempotency_module, "engine", fake_engine)
+
+    async def failing():
+        raise HTTPException(status_code=400, detail="Monto inválido")
+
+    with pytest.raises(HTTPException):
+        _run(IdempotencyService(), "k-3", "hash", failing)
+    assert fake_engine.rows == {} and [entry[0] for entry in fake_engine.log] == ["lock", "unlock"]
+
+
+def test_without_key_calls_handler_directly(monkeypatch):
+    fake_engine = _FakeEngine()
+    monkeypatch.setattr(idempotency_module, "engine", fake_engine)
+
+    async def handler():
+        return {"success": True}
+
+    assert _run(IdempotencyService(), None, None, handler) == {"success": True}
+    assert fake_engine.log == []
+    with pytest.raises(HTTPException) as exc:
+        _run(IdempotencyService(), "x" * 256, "hash", handler)
+    assert exc.value.status_code == 400
+    assert request_fingerprint({"b": 1, "a": 2}) == request_fingerprint({"a": 2, "b": 1})
+
+
+def test_unfinished_key_is_not_executed_again(monkeypatch):
+    fake_engine = _FakeEngine()
+    fake_engine.fail_complete = True
+    monkeypatch.setattr(idempotency_module, "engine", fake_engine)
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return {"success": True}
+
+    service = IdempotencyService()
+    # El pago se aplicó pero no se pudo guardar la respuesta: la clave queda en curso
+    assert json.loads(_run(service, "k-4", "hash", handler).body) == {"success": True}
+    assert fake_engine.rows["k-4"].status_code is None
+
+    with pytest.raises(HTTPException) as exc:
+        _run(service, "k-4", "hash", handler)
+    assert exc.value.status_code == 409 and calls == [1]
@@ -0,0 +1,83 @@
+"""
+Pruebas del job de morosidad de cuotas
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from types import SimpleNamespace
+
+from app.loan_payments import aging as aging_module
+from app.loan_payments.aging import AGING_UPDATE_SQL, PaymentAgingJob, PaymentAgingService, aging_bucket
+from app.loan_payments.schedule_cache import CachedSchedule, PaymentScheduleCache
+
+
+def test_buckets_boundaries():
+    assert [aging_bucket(days) for days in (0, 1, 30, 31, 60, 61, 90, 91, 400)] == [
+        None, "1-30", "1-30", "31-60", "31-60", "61-90", "61-90", "90+", "90+"]
+    # Un único UPDATE que solo escribe las filas que cambian
+    assert AGING_UPDATE_SQL.count("UPDATE") == 1 and "IS DISTINCT FROM" in AGING_UPDATE_SQL
+
+
+class _FakeConnection:
+    def __init__(self, locked=True, rows=()):
+        self.locked = locked
+        self.rows = list(rows)
+        self.statements = []
+
+    async def execute(self, query, params=None):
+        sql = str(query)
+        self.statements.append((sql, params))
+        if "pg_try_advisory_xact_lock" in sql:
+            return SimpleNamespace(scalar=lambda: self.locked)
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+def test_run_aggregates_changes_and_refreshes_kpis(monkeypatch):
+    refreshed = []
+
+    async def fake_refresh(loan_ids, connection=None):
+        refreshed.append(sorted(loan_ids))
+
+    monkeypatch.setattr(aging_module.ContractKpiService, "refresh_loans", staticmethod(fake_refresh))
+    connection = _FakeConnection(rows=[(1, "overdue", "1-30"), (1, "overdue", "31-60"), (2, "partial", "90+"), (3, "paid", None)])
+
+    result = asyncio.run(PaymentAgingService.run(connection, as_of=date(2025, 6, 1)))
+
+    assert (result.updated, result.marked_overdue, result.loan_ids) == (4, 2, {1, 2, 3})
+    assert result.buckets == {"1-30": 1, "31-60": 1, "90+": 1}
+    assert connection.statements[1][1] == {"as_of": date(2025, 6, 1)}
+    assert refreshed == [[1, 2, 3]]
+
+
+def test_run_skips_when_another_worker_holds_the_lock():
+    connection = _FakeConnection(locked=False)
+    result = asyncio.run(PaymentAgingService.run(connection))
+    assert result.skipped and result.updated == 0 and len(connection.statements) == 1
+
+
+def test_job_invalidates_schedule_cache(monkeypatch):
+    cache = PaymentScheduleCache()
+    cache.enabled = True
+    cache.put(CachedSchedule("c-1", {"success": True, "data": []}, frozenset({5})), cache.generation)
+    connection = _FakeConnection(rows=[(5, "overdue", "1-30")])
+
+    @asynccontextmanager
+    async def begin():
+        yield connection
+
+    async def fake_refresh(loan_ids, connection=None):
+        pass
+
+    monkeypatch.setattr(aging_module, "engine", SimpleNamespace(begin=begin))
+    monkeypatch.setattr(aging_module, "payment_schedule_cache", cache)
+    monkeypatch.setattr(aging_module.ContractKpiService, "refresh_loans", staticmethod(fake_refresh))
+
+    job = PaymentAgingJob(interval=60)
+
+    async def run():
+        await job.start()
+        await asyncio.sleep(0)
+        await job.stop()
+
+    asyncio.run(run())
+    assert cache.get("c-1") is None
@@ -0,0 +1,158 @@
+"""
+Pruebas del cronograma de pagos paginado y su cache por contrato
+"""
+import asyncio
+import json
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.loan_payments import service as service_module
+from app.loan_payments.schedule_cache import CachedSchedule, PaymentScheduleCache
+from app.loan_payments.service import LoanPaymentService, ScheduleFilters, decode_schedule_cursor
+
+CONTRACT_ID = "5b1c8a44-9a43-4a43-a8a4-3c0f6c1d2e10"
+
+
+def _sp_payload():
+    return json.dumps({
+        "success": True,
+        "paymentt_list": [
+            {"contract_loan_id": 7, "payment_number": n, "due_date": f"2025-0{n}-10",
+             "payment_status": "paid" if n < 3 else "pending"}
+            for n in range(1, 6)
+        ],
+    })
+
+
+class _FakeDb:
+    def __init__(self):
+        self.calls = 0
+
+    async def execute(self, query, params=None):
+        self.calls += 1
+        return SimpleNamespace(fetchone=lambda: (_sp_payload(),))
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PaymentScheduleCache(max_entries=10)
+    cache.enabled = True
+    monkeypatch.setattr(service_module, "payment_schedule_cache", cache)
+    return cache
+
+
+def test_contract_schedule_is_reshaped_once_and_paginated(cache):
+    db = _FakeDb()
+    service = LoanPaymentService(db)
+
+    first = asyncio.run(service.get_payment_schedule(CONTRACT_ID, limit=2))
+    assert [item["payment_number"] for item in first["data"]] == [1, 2]
+    assert (first["total"], first["count"], first["has_more"]) == (5, 2, True)
+
+    second = asyncio.run(service.get_payment_schedule(CONTRACT_ID.upper(), limit=2, cursor=first["next_cursor"]))
+    assert [item["payment_number"] for item in second["data"]] == [3, 4]
+
+    pending = asyncio.run(service.get_payment_schedule(
+        CONTRACT_ID, ScheduleFilters(status="pending", due_to=date(2025, 4, 30)), limit=10))
+    assert [item["payment_number"] for item in pending["data"]] == [3, 4] and not pending["has_more"]
+
+    # Una sola llamada a la función SQL; el cache conserva el cronograma completo
+    assert db.calls == 1
+    assert len(cache.get(CONTRACT_ID).payload["data"]) == 5 and "paymentt_list" not in cache.get(CONTRACT_ID).payload
+
+
+def test_payment_invalidates_loan_and_stale_reads(cache):
+    db = _FakeDb()
+    service = LoanPaymentService(db)
+    asyncio.run(service.get_payment_schedule(CONTRACT_ID))
+
+    cache.invalidate_loan(7)
+    assert cache.get(CONTRACT_ID) is None
+    asyncio.run(service.get_payment_schedule(CONTRACT_ID))
+    assert db.calls == 2
+
+    cache.invalidate(CONTRACT_ID)
+    assert len(cache) == 0
+
+    # Lectura empezada antes de una invalidación: no se guarda
+    generation = cache.generation
+    cache.invalidate_loan(99)
+    assert not cache.put(CachedSchedule(CONTRACT_ID, {"success": True, "data": []}), generation)
+
+    # Entradas sin préstamos conocidos se descartan con cualquier invalidación por préstamo
+    cache.put(CachedSchedule(CONTRACT_ID, {"success": True, "data": []}), cache.generation)
+    cache.invalidate_loan(99)
+    assert len(cache) == 0
+
+
+def test_all_schedules_use_keyset_query(monkeypatch):
+    captured = {}
+
+    async def fake_fetch_all(query, connection=None):
+        captured["sql"] = str(query.compile(dialect=postgresql.dialect()))
+        return [{"payment_schedule_id": n, "due_date": date(2025, 1, n)} for n in (4, 5, 6)]
+
+    monkeypatch.setattr(service_module, "fetch_all", fake_fetch_all)
+    page = asyncio.run(LoanPaymentService(None).get_payment_schedule(
+        filters=ScheduleFilters(status="overdue"), limit=2, cursor=None))
+
+    assert "payment_schedule.payment_status = " in captured["sql"] and "LIMIT" in captured["sql"]
+    assert page["count"] == 2 and page["has_more"]
+    assert decode_schedule_cursor(page["next_cursor"], keyset=True) == (date(2025, 1, 5), 5)
+
+    asyncio.run(LoanPaymentService(None).get_payment_schedule(limit=2, cursor=page["next_cursor"]))
+    assert "(payment_schedule.due_date, payment_schedule.payment_schedule_id) > " in captured["sql"]
+    with pytest.raises(HTTPException):
+        decode_schedule_cursor("no-es-un-cursor", keyset=True)
+
+
+def test_contract_changed_listener_drives_schedule_cache():
+    from app.contracts.services.contract_detail_cache import ContractDetailCacheListener
+    from tests.contracts.unit.test_contract_detail_cache import _FakePool
+
+    schedule_cache = PaymentScheduleCache(max_entries=10)
+    pool = _FakePool()
+    listener = ContractDetailCacheListener(pool, cache=None, extra_caches=(schedule_cache,))
+
+    async def run():
+        await listener.start()
+        assert schedule_cache.enabled
+        schedule_cache.put(CachedSchedule(CONTRACT_ID, {"success": True, "data": []}, frozenset({7})), schedule_cache.generation)
+        pool.connection.listeners["contract_changed"](pool.connection, 1, "contract_changed", CONTRACT_ID)
+        assert schedule_cache.get(CONTRACT_ID) is None
+        await listener.stop()
+        assert not schedule_cache.enabled
+
+    asyncio.run(run())
+
+
+def test_aging_bucket_with_contract_reads_payment_schedule(cache, monkeypatch):
+    captured = {}
+
+    async def fake_fetch_all(query, connection=None):
+        captured["sql"] = str(query.compile(dialect=postgresql.dialect()))
+        captured["params"] = query.compile().params
+        return [{"payment_schedule_id": 9, "due_date": date(2025, 2, 10), "aging_bucket": "31-60"}]
+
+    async def fake_fetch_one(query, connection=None):
+        return {"total": 1}
+
+    monkeypatch.setattr(service_module, "fetch_all", fake_fetch_all)
+    monkeypatch.setattr(service_module, "fetch_one", fake_fetch_one)
+    db = _FakeDb()
+
+    page = asyncio.run(LoanPaymentService(db).get_payment_schedule(CONTRACT_ID, ScheduleFilters(aging_bucket="31-60")))
+
+    assert [item["payment_schedule_id"] for item in page["data"]] == [9] and page["total"] == 1
+    assert "contract_loan.contract_id = " in captured["sql"] and "payment_schedule.aging_bucket = " in captured["sql"]
+    assert CONTRACT_ID in captured["params"].values()
+    # No pasa por sp_get_payment_schedule ni por el cache
+    assert db.calls == 0 and len(cache) == 0
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(LoanPaymentService(db).get_payment_schedule("CNT-001", ScheduleFilters(aging_bucket="31-60")))
+    assert exc.value.status_code == 400
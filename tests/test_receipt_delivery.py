@@ -0,0 +1,115 @@
+"""
+Pruebas de los modos de entrega del recibo (receipt_mode) y de su URL firmada
+"""
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from fastapi import HTTPException
+
+from app.receipts import router as receipts_router
+from app.receipts.receipt_links import sign_receipt_url, verify_receipt_signature
+from app.receipts.receipt_schemas import ReceiptMode
+from app.receipts.render_pool import ReceiptRenderPool
+
+PAYMENT = {
+    "payment_date": "2025-03-05T14:30:00Z",
+    "payment_method": "Transferencia",
+    "client_data": {"receiptNumber": "RCP-1", "clientName": "Ana", "clientId": "001", "contractNumber": "CNT-1"},
+    "payment_items": [{"payment_number": 1, "due_date": "2025-03-05", "paid_amount": 100.0}],
+    "sub_total": 100.0,
+    "discount": 0,
+    "total_paid": 100.0,
+}
+
+
+def _signed(upload_id, now=1_000):
+    query = parse_qs(urlparse(sign_receipt_url(upload_id, now=now)).query)
+    return int(query["expires"][0]), query["signature"][0]
+
+
+def test_signed_url_expires_and_is_bound_to_the_receipt():
+    expires, signature = _signed(7)
+    assert verify_receipt_signature(7, expires, signature, now=1_000)
+    assert not verify_receipt_signature(8, expires, signature, now=1_000)
+    assert not verify_receipt_signature(7, expires + 60, signature, now=1_000)
+    assert not verify_receipt_signature(7, expires, signature, now=expires + 1)
+
+
+def test_modes_shrink_the_inline_image():
+    pool = ReceiptRenderPool(workers=1, max_pending=4, timeout=30)
+
+    async def render_all():
+        return {mode: await pool.render(PAYMENT, mode) for mode in ReceiptMode}
+
+    rendered = asyncio.run(render_all())
+    pool.shutdown()
+
+    png = rendered[ReceiptMode.INLINE].image_base64
+    assert png.startswith("data:image/png;base64,")
+    assert rendered[ReceiptMode.INLINE_WEBP].image_base64.startswith("data:image/webp;base64,")
+    assert len(rendered[ReceiptMode.INLINE_WEBP].image_base64) < len(png) / 2
+    assert len(rendered[ReceiptMode.INLINE_PNG8].image_base64) < len(png) / 2
+    assert rendered[ReceiptMode.LINK].image_base64 is None and rendered[ReceiptMode.SIGNED_URL].image_base64 is None
+    # El PNG para el almacenamiento no cambia con el modo
+    assert len({r.image_bytes for r in rendered.values()}) == 1
+
+
+def test_download_serves_pending_content_or_redirects(monkeypatch, tmp_path):
+    local_receipt = tmp_path / "receipt_4.png"
+    local_receipt.write_bytes(b"LOCAL")
+    rows = {
+        1: {"filename": "receipt_1.png", "mime_type": "image/png", "content": b"PNG", "result": None},
+        2: {"filename": "receipt_2.png", "mime_type": "image/png", "content": None, "result": {"url": "https://drive/2"}},
+        4: {"filename": "receipt_4.png", "mime_type": "image/png", "content": None, "result": {"url": str(local_receipt)}},
+        5: {"filename": "receipt_5.png", "mime_type": "image/png", "content": None, "result": {"url": str(tmp_path / "gone.png")}},
+    }
+
+    async def fake_fetch_one(query, connection=None, **kwargs):
+        return rows.get(query.compile().params["upload_id_1"])
+
+    monkeypatch.setattr(receipts_router, "fetch_one", fake_fetch_one)
+
+    def download(upload_id, signature=None):
+        expires, valid = _signed(upload_id, now=receipts_router.time.time())
+        request = SimpleNamespace(headers={})
+        return asyncio.run(receipts_router.download_receipt(upload_id, request, "db", expires, signature or valid))
+
+    response = download(1)
+    assert response.status_code == 200 and response.body == b"PNG"
+    assert download(2).headers["location"] == "https://drive/2"
+    # Backend local: la URL guardada es una ruta del servidor, se envía el archivo
+    local = download(4)
+    assert local.status_code == 200 and "location" not in local.headers and local.path == local_receipt
+    with pytest.raises(HTTPException) as exc:
+        download(5)
+    assert exc.value.status_code == 404
+    with pytest.raises(HTTPException) as exc:
+        download(1, signature="0" * 64)
+    assert exc.value.status_code == 403
+    with pytest.raises(HTTPException) as exc:
+        download(3)
+    assert exc.value.status_code == 404
+
+
+def test_status_is_only_visible_to_the_payer(monkeypatch):
+    rows = {
+        1: {"status": "done", "filename": "receipt_1.png", "mime_type": "image/png", "content": None,
+            "result": {"url": "/srv/contracts/receipt_1.png"}, "target": {"requested_by": "user-1"}, "last_error": None},
+        2: {"status": "pending", "filename": "receipt_2.png", "mime_type": "image/png", "content": b"PNG",
+            "result": None, "target": {}, "last_error": None},
+    }
+
+    async def fake_fetch_one(query, connection=None, **kwargs):
+        return rows.get(query.compile().params["upload_id_1"])
+
+    monkeypatch.setattr(receipts_router, "fetch_one", fake_fetch_one)
+
+    status = asyncio.run(receipts_router.get_receipt_status(1, "db", current_user="user-1"))
+    assert status["ready"] and status["url"] is None and status["download_url"].startswith("/receipts/1/download?")
+    # Otro usuario (o un recibo sin usuario, p. ej. del CLI) no lo ve: mismo 404 que si no existiera
+    for upload_id, user in ((1, "user-2"), (2, "user-1"), (3, "user-1")):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(receipts_router.get_receipt_status(upload_id, "db", current_user=user))
+        assert exc.value.status_code == 404
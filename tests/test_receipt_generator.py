@@ -0,0 +1,47 @@
+"""
+Pruebas del generador de recibos (fuentes y lienzo base cacheados, fechas sin locale)
+"""
+import datetime as dt
+import io
+import locale
+
+from PIL import Image
+
+from app.receipts.receipt_generator import ReceiptGenerator, format_spanish_datetime, load_fonts
+
+
+def _payment(**overrides):
+    payment = {
+        "payment_date": "2025-03-05T14:30:00Z",
+        "payment_method": "Transferencia",
+        "client_data": {"receiptNumber": "RCP-1", "clientName": "Ana", "clientId": "001", "contractNumber": "CNT-1"},
+        "payment_items": [{"payment_number": 1, "due_date": "2025-03-05", "paid_amount": 100.0}],
+        "sub_total": 100.0,
+        "discount": 0,
+        "total_paid": 100.0,
+    }
+    payment.update(overrides)
+    return payment
+
+
+def test_spanish_dates_without_locale():
+    assert format_spanish_datetime(dt.datetime(2025, 3, 5, 14, 30)) == "05 marzo 2025, 02:30 p.m."
+    assert format_spanish_datetime(dt.datetime(2025, 12, 1, 9, 5)) == "01 diciembre 2025, 09:05 a.m."
+
+
+def test_receipts_reuse_fonts_and_base_layer(monkeypatch):
+    def no_setlocale(*args):
+        raise AssertionError("generate_receipt no debe cambiar el locale")
+
+    monkeypatch.setattr(locale, "setlocale", no_setlocale)
+    ReceiptGenerator.clear_cache()
+
+    first = ReceiptGenerator().generate_receipt(_payment())
+    base = ReceiptGenerator._base_layer
+    base_pixels = base.tobytes()
+    second = ReceiptGenerator().generate_receipt(_payment(payment_method="Efectivo"))
+
+    assert load_fonts.cache_info().misses == 1
+    assert ReceiptGenerator._base_layer is base and base.tobytes() == base_pixels
+    assert first != second
+    assert Image.open(io.BytesIO(first)).size == (614, 1280)
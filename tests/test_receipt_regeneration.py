@@ -0,0 +1,103 @@
+"""
+Pruebas de la regeneración masiva de recibos
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+
+from app.receipts import receipt_regeneration as regeneration_module
+from app.receipts.receipt_regeneration import (
+    ReceiptCheckpoint, ReceiptRegenerationService, RegenerationOptions, payment_info_from_row,
+)
+
+
+def _tx(n):
+    """transaction_id (UUID) que ordena igual que n"""
+    return str(UUID(int=n))
+
+
+def _row(n, loan_id=7):
+    return {
+        "transaction_id": UUID(int=n), "amount": Decimal("1250.75"), "payment_method": "Transferencia",
+        "reference_number": None, "transaction_date": date(2025, 3, 5), "contract_loan_id": loan_id,
+        "payment_number": n, "due_date": date(2025, 3, 1), "balance": Decimal("48000.00"),
+        "contract_number": "CNT-000007", "client_name": "María Fernández", "client_document": "001-1234567-8",
+    }
+
+
+class _FakePool:
+    def __init__(self, ids):
+        self.rows = [_row(i) for i in ids]
+        self.fetches = []
+        self.updates = []
+
+    async def fetch(self, sql, after_id, person_type_id, contract_loan_id, page_size):
+        self.fetches.append((after_id, page_size))
+        return [row for row in self.rows if after_id is None or row["transaction_id"] > UUID(after_id)][:page_size]
+
+    async def execute(self, sql, transaction_id, url):
+        self.updates.append((transaction_id, url))
+
+
+def _run(service):
+    async def collect():
+        return [event async for event in service.run()]
+    return asyncio.run(collect())
+
+
+def _service(monkeypatch, pool, checkpoint, **options):
+    monkeypatch.setattr(regeneration_module, "render_receipt", lambda info: info["client_data"]["receiptNumber"].encode())
+
+    async def store(row, content):
+        if row["transaction_id"] == _tx(3):
+            raise RuntimeError("drive caído")
+        return f"https://files/{row['transaction_id']}.png"
+
+    service = ReceiptRegenerationService(pool, checkpoint, RegenerationOptions(workers=2, **options), store_receipt=store)
+    service._executor = lambda: ThreadPoolExecutor(max_workers=2)
+    return service
+
+
+def test_payment_info_has_receipt_shape():
+    info = payment_info_from_row(dict(_row(12), transaction_id="5b1c8a44-9a43-4a43-a8a4-3c0f6c1d2e10"))
+    assert info["client_data"] == {
+        "receiptNumber": "RCP-TX5B1C8A449A43", "clientName": "María Fernández",
+        "clientId": "001-1234567-8", "contractNumber": "CNT-000007",
+    }
+    assert info["payment_items"] == [{"payment_number": 12, "due_date": "2025-03-01", "paid_amount": 1250.75}]
+    assert info["total_paid"] == 1250.75 and info["remaining_balance"] == 48000.0
+    json.dumps(info)
+
+
+def test_regenerates_in_pages_and_reports_failures(monkeypatch, tmp_path):
+    pool = _FakePool(range(1, 8))
+    checkpoint = ReceiptCheckpoint(tmp_path / "checkpoint.json")
+
+    events = _run(_service(monkeypatch, pool, checkpoint, batch_size=3, checkpoint_every=2))
+
+    receipts = [event for event in events if event["event"] != "summary"]
+    assert [event["transaction_id"] for event in receipts] == [_tx(i) for i in range(1, 8)]
+    assert [event["event"] for event in receipts].count("error") == 1
+    assert pool.fetches == [(None, 3), (_tx(3), 3), (_tx(6), 3)]
+    assert pool.updates == [(_tx(i), f"https://files/{_tx(i)}.png") for i in (1, 2, 4, 5, 6, 7)]
+
+    summary = events[-1]
+    assert (summary["processed"], summary["succeeded"], summary["failed"]) == (7, 6, 1)
+    assert checkpoint.load() == _tx(7)
+
+
+def test_resumes_from_checkpoint_and_respects_limit(monkeypatch, tmp_path):
+    pool = _FakePool(range(1, 11))
+    checkpoint = ReceiptCheckpoint(tmp_path / "checkpoint.json")
+    checkpoint.save(_tx(5), 5, 0)
+
+    events = _run(_service(monkeypatch, pool, checkpoint, batch_size=10, limit=3, update_urls=False))
+
+    assert [event["transaction_id"] for event in events[:-1]] == [_tx(6), _tx(7), _tx(8)]
+    assert pool.fetches == [(_tx(5), 3)] and pool.updates == []
+    assert checkpoint.load() == _tx(8)
+    checkpoint.clear()
+    assert checkpoint.load() is None
@@ -0,0 +1,79 @@
+"""
+Pruebas del pool de render de recibos (hilos propios, cola acotada y timeout)
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.receipts.receipt_generator import ReceiptGenerator
+from app.receipts.receipt_schemas import ReceiptMode
+from app.receipts.render_pool import ReceiptRenderError, ReceiptRenderPool
+
+
+class _BlockingGenerator:
+    def __init__(self):
+        self.release = threading.Event()
+        self.threads = []
+
+    def render_image(self, payment_info):
+        self.threads.append(threading.current_thread().name)
+        self.release.wait(5)
+        return payment_info["png"]
+
+    def _image_to_bytes(self, img):
+        return img
+
+    def image_to_base64(self, img_bytes, mime_type="image/png"):
+        return ReceiptGenerator.image_to_base64(None, img_bytes, mime_type)
+
+
+def _pool(**kwargs):
+    pool = ReceiptRenderPool(**{"workers": 1, "max_pending": 2, "timeout": 5, **kwargs})
+    pool.generator = _BlockingGenerator()
+    return pool
+
+
+def test_render_runs_in_pool_thread_and_encodes_base64():
+    pool = _pool()
+    pool.generator.release.set()
+
+    rendered = asyncio.run(pool.render({"png": b"PNG"}))
+
+    assert rendered.image_bytes == b"PNG"
+    assert rendered.image_base64 == "data:image/png;base64,UE5H"
+    assert pool.generator.threads[0].startswith("receipt-render")
+    assert asyncio.run(pool.render({"png": b"PNG"}, ReceiptMode.LINK)).image_base64 is None
+    pool.shutdown()
+
+
+def test_full_queue_is_rejected_and_slots_are_released():
+    pool = _pool()
+
+    async def run():
+        first = asyncio.ensure_future(pool.render({"png": b"1"}))
+        second = asyncio.ensure_future(pool.render({"png": b"2"}))
+        await asyncio.sleep(0)
+        with pytest.raises(ReceiptRenderError):
+            await pool.render({"png": b"3"})
+        # Mientras un recibo se renderiza el event loop sigue atendiendo
+        await asyncio.sleep(0.01)
+        pool.generator.release.set()
+        return await asyncio.gather(first, second)
+
+    results = asyncio.run(run())
+    assert [r.image_bytes for r in results] == [b"1", b"2"]
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_timeout_raises_but_keeps_slot_until_thread_finishes():
+    pool = _pool(timeout=0.05)
+
+    with pytest.raises(ReceiptRenderError):
+        asyncio.run(pool.render({"png": b"1"}))
+    assert pool.pending == 1
+
+    pool.generator.release.set()
+    pool._executor.shutdown(wait=True)
+    assert pool.pending == 0
@@ -0,0 +1,144 @@
+"""
+Pruebas de la importación de extractos bancarios
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.loan_payments import statement_import as import_module
+from app.loan_payments.statement_import import (
+    StatementImportService, StatementLine, StatementLineError, parse_amount, parse_statement, partition_by_loan,
+)
+
+CSV = """fecha;referencia;monto;descripcion;numero_operacion
+05/03/2025;CNT-001;1.250,75;Pago marzo;OP-1
+06/03/2025;cnt-002;300,00;;OP-2
+06/03/2025;CNT-404;10,00;;OP-3
+07/03/2025;CNT-001;-50,00;Comisión;OP-4
+07/03/2025;CNT-001;200,00;;OP-1
+08/03/2025;CNT-001;abc;;OP-5
+04/03/2025;CNT-001;100,00;;OP-6
+"""
+
+
+def test_parse_csv_and_ndjson():
+    lines = parse_statement(CSV.encode(), "text/csv", "extracto.csv")
+    first = lines[0]
+    assert (first.line, first.reference, first.amount, first.transaction_date, first.bank_reference) == (
+        2, "CNT-001", Decimal("1250.75"), datetime(2025, 3, 5), "OP-1")
+    assert isinstance(lines[5], StatementLineError) and lines[5].line == 7
+
+    ndjson = '{"contract_loan_id": 7, "amount": "99.5", "date": "2025-03-01"}\nnot json\n'
+    parsed = parse_statement(ndjson, "application/x-ndjson")
+    assert parsed[0].contract_loan_id == 7 and parsed[0].amount == Decimal("99.5")
+    assert isinstance(parsed[1], StatementLineError)
+    assert [parse_amount(v) for v in ("1,234.50", "1.234,50", "$ 1,234", "10")] == [
+        Decimal("1234.50"), Decimal("1234.50"), Decimal("1234"), Decimal("10")]
+
+
+def test_partition_keeps_each_loan_together_and_in_order():
+    lines = [
+        StatementLine(line=n, reference=None, amount=Decimal(1), transaction_date=datetime(2025, 1, d), contract_loan_id=loan)
+        for n, (loan, d) in enumerate([(1, 3), (2, 1), (1, 1), (3, 2), (1, 2), (2, 5)], start=1)
+    ]
+    groups = partition_by_loan(lines, 2)
+    assert len(groups) == 2
+    loan_1 = next(group for group in groups if group[0].contract_loan_id == 1)
+    assert [line.line for line in loan_1] == [3, 5, 1]
+    loans_per_group = [{line.contract_loan_id for line in group} for group in groups]
+    assert sorted(loan for loans in loans_per_group for loan in loans) == [1, 2, 3]
+
+
+class _FakeConnection:
+    def __init__(self, log):
+        self.log = log
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        yield
+
+    async def execute(self, query, params=None):
+        sql = str(query)
+        if "upper(c.contract_number)" in sql:
+            return [("CNT-001", 1), ("CNT-002", 2)]
+        if "sp_register_payment_transaction" in sql:
+            self.log.append((params["contract_loan_id"], params["reference"], params["amount"]))
+            if params["contract_loan_id"] == 2:
+                payload = {"success": False, "error": {"message": "Préstamo sin cuotas pendientes"}}
+            else:
+                payload = {"success": True, "data": {"contract_loan_id": params["contract_loan_id"],
+                                                      "transactions": [{"transaction_id": f"tx-{params['reference']}"}]}}
+            return SimpleNamespace(fetchone=lambda: (json.dumps(payload),))
+        return []
+
+    async def commit(self):
+        self.log.append("commit")
+
+    async def rollback(self):
+        self.log.append("rollback")
+
+
+class _FakeEngine:
+    def __init__(self):
+        self.log = []
+
+    @asynccontextmanager
+    async def connect(self):
+        yield _FakeConnection(self.log)
+
+
+class _FakeReceipts:
+    async def enqueue_receipt_from_payment(self, payment_data, db, transaction_ids, mode, requested_by=None):
+        return SimpleNamespace(upload_id=len(transaction_ids[0]))
+
+
+def test_import_applies_in_order_and_reports(monkeypatch):
+    fake_engine = _FakeEngine()
+    refreshed = []
+
+    async def fake_refresh(loan_ids, connection=None):
+        refreshed.append(sorted(loan_ids))
+
+    monkeypatch.setattr(import_module, "engine", fake_engine)
+    monkeypatch.setattr(import_module.ContractKpiService, "refresh_loans", staticmethod(fake_refresh))
+    service = StatementImportService(_FakeReceipts(), chunk_size=2, concurrency=1)
+
+    report = asyncio.run(service.run(parse_statement(CSV, filename="extracto.csv")))
+
+    applied = [entry for entry in fake_engine.log if entry != "commit"]
+    assert [(loan, ref) for loan, ref, _ in applied if loan == 1] == [(1, "OP-6"), (1, "OP-1")]
+    assert fake_engine.log.count("commit") == 2
+    assert report["totals"] == {
+        "applied": 2, "failed": 1, "unmatched": 1, "duplicate": 1, "ignored": 1, "invalid": 1, "matched": 0}
+    assert report["applied_amount"] == Decimal("1350.75") and report["receipts_queued"] == 2
+    by_line = {entry["line"]: entry for entry in report["lines"]}
+    assert by_line[3]["message"] == "Préstamo sin cuotas pendientes"
+    assert by_line[2]["transaction_ids"] == ["tx-OP-1"]
+    assert refreshed == [[1]]
+
+
+def test_dry_run_only_matches(monkeypatch):
+    fake_engine = _FakeEngine()
+    monkeypatch.setattr(import_module, "engine", fake_engine)
+
+    report = asyncio.run(StatementImportService().run(parse_statement(CSV, filename="extracto.csv"), dry_run=True))
+
+    assert report["totals"]["matched"] == 3 and report["totals"]["applied"] == 0
+    assert fake_engine.log == []
+
+
+def test_mixed_date_formats_for_one_loan_sort_together():
+    ndjson = "\n".join(json.dumps(record) for record in (
+        {"contract_loan_id": 1, "amount": "10", "date": "2026-01-05T10:00:00Z"},
+        {"contract_loan_id": 1, "amount": "20", "date": "2026-01-06"},
+        {"contract_loan_id": 1, "amount": "30", "date": "2026-01-05T08:00:00-05:00"},
+        {"contract_loan_id": 1, "amount": "40"},
+    ))
+    lines = parse_statement(ndjson, "application/x-ndjson")
+    assert lines[0].transaction_date == datetime(2026, 1, 5, 10) and lines[2].transaction_date == datetime(2026, 1, 5, 13)
+
+    (group,) = partition_by_loan(lines, 2)
+    assert [line.amount for line in group] == [Decimal("40"), Decimal("10"), Decimal("30"), Decimal("20")]
@@ -0,0 +1,244 @@
+"""
+Pruebas del outbox de subidas: despachador (sin BD: pool falso en memoria) y
+registro de las subidas junto con el pago
+"""
+import asyncio
+import importlib
+import json
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from app.loan_payments import service as service_module
+from app.loan_payments.service import LoanPaymentService
+from app.receipts.receipt_schemas import ReceiptMode
+from app.uploads.dispatcher import CLAIM_SQL, COMPLETE_SQL, FAIL_SQL, UploadDispatcher, backoff_delay
+
+# app.loan_payments exporta el APIRouter con el nombre router
+router_module = importlib.import_module("app.loan_payments.router")
+
+
+class FakeOutboxConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def fetch(self, query, limit, lock_seconds):
+        assert query == CLAIM_SQL
+        now = time.monotonic()
+        claimed = []
+        for row in self.pool.rows.values():
+            if len(claimed) >= limit:
+                break
+            if row["status"] == "pending" and row["next_attempt_at"] <= now:
+                row["status"] = "processing"
+                row["attempts"] += 1
+                claimed.append(dict(row))
+        return claimed
+
+    async def execute(self, query, upload_id, *args):
+        row = self.pool.rows[upload_id]
+        if query == COMPLETE_SQL:
+            row.update(status="done", result=args[0], content=None)
+        elif query == FAIL_SQL:
+            error, max_attempts, delay = args
+            row["status"] = "failed" if row["attempts"] >= max_attempts else "pending"
+            row["last_error"] = error
+            row["next_attempt_at"] = time.monotonic() + delay
+
+    async def add_listener(self, channel, callback):
+        self.pool.listeners.append(callback)
+
+    async def remove_listener(self, channel, callback):
+        self.pool.listeners.remove(callback)
+
+
+class _Acquire:
+    def __init__(self, pool):
+        self.conn = FakeOutboxConnection(pool)
+
+    def __await__(self):
+        async def _conn():
+            return self.conn
+        return _conn().__await__()
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeOutboxPool:
+    def __init__(self):
+        self.rows = {}
+        self.listeners = []
+
+    def add(self, upload_id, kind, content=b"data"):
+        self.rows[upload_id] = {
+            "upload_id": upload_id,
+            "kind": kind,
+            "status": "pending",
+            "filename": f"{upload_id}.png",
+            "mime_type": "image/png",
+            "content": content,
+            "target": '{"transaction_ids": []}',
+            "result": None,
+            "attempts": 0,
+            "next_attempt_at": 0.0,
+        }
+
+    def acquire(self):
+        return _Acquire(self)
+
+    async def release(self, conn):
+        pass
+
+
+async def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timeout esperando al despachador")
+        await asyncio.sleep(0.01)
+
+
+def test_backoff_delay_is_exponential_and_capped():
+    for attempts, expected in [(1, 5), (2, 10), (3, 20), (10, 60)]:
+        delay = backoff_delay(attempts, base=5, maximum=60)
+        assert expected / 2 <= delay <= expected
+
+
+def test_dispatcher_processes_with_bounded_concurrency():
+    pool = FakeOutboxPool()
+    for upload_id in range(1, 9):
+        pool.add(upload_id, "payment_receipt")
+
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(job):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return {"url": f"https://drive.example/{job.upload_id}"}
+
+    async def run():
+        dispatcher = UploadDispatcher(pool, {"payment_receipt": handler}, concurrency=3, poll_interval=0.05)
+        await dispatcher.start()
+        await _wait_until(lambda: all(row["status"] == "done" for row in pool.rows.values()))
+        await dispatcher.stop()
+
+    asyncio.run(run())
+
+    assert max_in_flight == 3
+    assert all(row["content"] is None for row in pool.rows.values())
+    assert pool.listeners == []
+
+
+def test_dispatcher_retries_with_backoff_until_success():
+    pool = FakeOutboxPool()
+    pool.add(1, "payment_voucher")
+    attempts = []
+
+    async def flaky(job):
+        attempts.append(job.attempts)
+        if job.attempts < 3:
+            raise RuntimeError("Drive no disponible")
+        return {"url": "https://drive.example/1"}
+
+    async def run():
+        dispatcher = UploadDispatcher(
+            pool, {"payment_voucher": flaky}, poll_interval=0.01, backoff_base=0.01, backoff_max=0.02
+        )
+        await dispatcher.start()
+        await _wait_until(lambda: pool.rows[1]["status"] == "done")
+        await dispatcher.stop()
+
+    asyncio.run(run())
+
+    assert attempts == [1, 2, 3]
+
+
+def test_dispatcher_marks_failed_after_max_attempts():
+    pool = FakeOutboxPool()
+    pool.add(1, "unknown_kind")
+
+    async def run():
+        dispatcher = UploadDispatcher(pool, {}, max_attempts=2, poll_interval=0.01, backoff_base=0.01, backoff_max=0.01)
+        await dispatcher.start()
+        await _wait_until(lambda: pool.rows[1]["status"] == "failed")
+        await dispatcher.stop()
+
+    asyncio.run(run())
+
+    assert pool.rows[1]["attempts"] == 2
+    assert "desconocido" in pool.rows[1]["last_error"]
+
+
+class _PaymentDb:
+    """Sesión falsa: sp_register_payment_transaction responde un pago y los savepoints se registran"""
+
+    def __init__(self):
+        self.events = []
+
+    async def execute(self, query, params=None):
+        payload = {"success": True, "data": {"contract_loan_id": 5, "transactions": [{"transaction_id": "tx-1"}]}}
+        return SimpleNamespace(fetchone=lambda: (json.dumps(payload),))
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        try:
+            yield
+        except Exception:
+            self.events.append("rollback savepoint")
+            raise
+        self.events.append("release savepoint")
+
+    async def commit(self):
+        self.events.append("commit")
+
+    async def rollback(self):
+        self.events.append("rollback")
+
+
+def _register_with_outbox(monkeypatch, fail_voucher=False, fail_receipt=False):
+    async def fake_enqueue(db, kind, content, filename, mime_type, target):
+        if fail_voucher:
+            raise RuntimeError("outbox no disponible")
+        return 21
+
+    async def fake_receipt(payment_data, db, transaction_ids, mode, requested_by=None):
+        if fail_receipt:
+            raise RuntimeError("render falló")
+        return SimpleNamespace(upload_id=22)
+
+    async def fake_refresh(db, contract_loan_id):
+        pass
+
+    monkeypatch.setattr(router_module, "enqueue_upload", fake_enqueue)
+    monkeypatch.setattr(service_module, "refresh_loan_kpis", fake_refresh)
+    db, state = _PaymentDb(), {}
+    voucher = {"content": b"IMG", "filename": "v.png", "content_type": "image/png", "contract_loan_id": 5, "reference": "R-1"}
+    hook = router_module._outbox_before_commit(
+        db, SimpleNamespace(enqueue_receipt_from_payment=fake_receipt), state, voucher, ReceiptMode.INLINE)
+    result = asyncio.run(LoanPaymentService(db).register_auto_payment(5, 100, before_commit=hook))
+    return result, db.events, state
+
+
+def test_receipt_failure_keeps_payment_and_voucher(monkeypatch):
+    result, events, state = _register_with_outbox(monkeypatch, fail_receipt=True)
+
+    assert result["success"] and state == {"voucher_upload_id": 21}
+    # Cada registro en su savepoint: el del recibo se revierte sin abortar el del hook
+    assert events == ["release savepoint", "rollback savepoint", "release savepoint", "commit"]
+
+
+def test_voucher_failure_rolls_back_the_payment(monkeypatch):
+    result, events, state = _register_with_outbox(monkeypatch, fail_voucher=True)
+
+    assert not result["success"] and result["status_code"] == 500
+    assert result["error"]["code"] == "SIDE_EFFECTS_ERROR"
+    assert events == ["rollback savepoint", "rollback savepoint", "rollback"] and "commit" not in events
+    assert state == {}